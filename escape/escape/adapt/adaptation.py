@@ -19,10 +19,12 @@ import pprint
 import time
 import urlparse
 import weakref
+from multiprocessing.pool import ThreadPool
 
 from escape.adapt import log as log, LAYER_NAME
 from escape.adapt.adapters import UnifyRESTAdapter
-from escape.adapt.managers import UnifyDomainManager, BaseResultEvent
+from escape.adapt.managers import UnifyDomainManager, SDNDomainManager, \
+  BaseResultEvent
 from escape.adapt.virtualization import DomainVirtualizer
 from escape.nffg_lib.nffg import NFFG, NFFGToolBox
 from escape.util.com_logger import MessageDumper
@@ -31,7 +33,8 @@ from escape.util.config import ConfigurationError
 from escape.util.conversion import NFFGConverter
 from escape.util.domain import DomainChangedEvent, AbstractDomainManager, \
   AbstractRemoteDomainManager
-from escape.util.misc import notify_remote_visualizer, VERBOSE
+from escape.util.misc import notify_remote_visualizer, VERBOSE, LazyDump, \
+  call_as_coop_task
 from escape.util.stat import stats
 from escape.util.virtualizer_helper import get_nfs_from_info, \
   strip_info_by_nfs, get_bb_nf_from_path
@@ -543,6 +546,16 @@ class ControllerAdapter(object):
     self._with_infr = with_infr
     # Timer for VNFM
     self.__vnfm_timer = None
+    # Worker pool for parallel domain deployment
+    self.__deploy_pool = None
+    # Parallel installations: (request id, domain) -->
+    # (AsyncResult, DomainManager, part, mapped NFFG, deploy status)
+    self.__running_installs = {}
+    # Parallel installations reached the deploy timeout: (request id, domain)
+    self.__expired_installs = set()
+    # Rollbacks waiting for a running installation:
+    # (request id, domain) --> (deploy status, previous state)
+    self.__deferred_rollbacks = {}
     # Set virtualizer-related components
     self.DoVManager = GlobalResourceManager()
     self.domains = ComponentConfigurator(self)
@@ -550,9 +563,10 @@ class ControllerAdapter(object):
     self.init_managers(with_infr=with_infr)
     # Here every domainManager is up and running
     # Notify the remote visualizer about collected data if it's needed
-    notify_remote_visualizer(data=self.DoVManager.dov.get_resource_info(),
-                             unique_id="DOV",
-                             params={"event": "create"})
+    notify_remote_visualizer(
+      data=lambda: self.DoVManager.dov.get_snapshot().nffg,
+      unique_id="DOV",
+      params={"event": "create"})
 
   def init_managers (self, with_infr=False):
     """
@@ -584,9 +598,11 @@ class ControllerAdapter(object):
       self.domains.clear_initiated_mgrs()
     # Stop initiated DomainManagers
     self.domains.stop_initiated_mgrs()
+    if self.__deploy_pool is not None:
+      self.__deploy_pool.terminate()
 
   def install_nffg (self, mapped_nffg, original_request=None,
-                    direct_deploy=False):
+                    direct_deploy=False, revision=None):
     """
     Start NF-FG installation.
 
@@ -599,6 +615,9 @@ class ControllerAdapter(object):
     :type original_request: :class:`NFFG`
     :param direct_deploy: skip external hook call before deploy (default: False)
     :type direct_deploy: bool
+    :param revision: DoV revision the request was orchestrated on in case of
+      concurrent orchestration (optional)
+    :type revision: int
     :return: deploy result
     :rtype: DomainRequestStatus
     """
@@ -630,15 +649,25 @@ class ControllerAdapter(object):
     else:
       log.debug("Direct deploy is set! "
                 "Bypass external VNFM and proceed with deploy...")
-    self.DoVManager.backup_dov_state()
+    if revision is not None and not self.DoVManager.reserve_domains(
+       id=deploy_status.id, domains=deploy_status.domains, revision=revision):
+      log.error("Request: %s conflicts with the changes of other requests! "
+                "Skip deployment..." % deploy_status.id)
+      for domain in deploy_status.domains:
+        deploy_status.set_domain_failed(domain=domain)
+      deploy_status.set_conflict()
+      return deploy_status
+    self.DoVManager.backup_dov_state(id=deploy_status.id)
     # If DoV update is based on status updates, rewrite the whole DoV as the
     # first step
     if self.DoVManager.status_updates:
       log.debug("Status-based update is enabled! "
                 "Rewrite DoV with mapping result...")
-      self.DoVManager.rewrite_global_view_with_status(nffg=mapped_nffg)
+      self.DoVManager.rewrite_global_view_with_status(id=deploy_status.id,
+                                                      nffg=mapped_nffg)
     notify_remote_visualizer(data=mapped_nffg,
                              unique_id="DOV",
+                             copy=True,
                              params={"event": "datastore"})
     # Split the mapped NFFG into slices based on domains
     slices = NFFGToolBox.split_into_domains(nffg=mapped_nffg, log=log)
@@ -646,6 +675,7 @@ class ControllerAdapter(object):
     if slices is None:
       log.warning("Given mapped NFFG: %s can not be sliced! "
                   "Skip domain notification steps" % mapped_nffg)
+      self.DoVManager.release_request(id=deploy_status.id)
       # Return with deploy result: fail
       return deploy_status
     NFFGToolBox.rewrite_interdomain_tags(slices=slices,
@@ -653,99 +683,26 @@ class ControllerAdapter(object):
     log.info("Notify initiated domains: %s" %
              [d for d in self.domains.initiated])
     # Perform domain installations
-    for domain, part in slices:
-      stats.add_measurement_start_entry(type=stats.TYPE_DEPLOY_DOMAIN,
-                                        info=domain)
-      log.debug("Search DomainManager for domain: %s" % domain)
-      # Get Domain Manager
-      domain_mgr = self.domains.get_component_by_domain(domain_name=domain)
-      if domain_mgr is None:
-        log.warning("No DomainManager has been initialized for domain: %s! "
-                    "Skip install domain part..." % domain)
-        deploy_status.set_domain_failed(domain=domain)
-        continue
-      log.log(VERBOSE, "Splitted domain: %s part:\n%s" % (domain, part.dump()))
-      # Check if need to reset domain before install
-      if CONFIG.reset_domains_before_install():
-        log.debug("Reset %s domain before deploying mapped NFFG..." %
-                  domain_mgr.domain_name)
-        domain_mgr.reset_domain()
-      log.info("Delegate splitted part: %s to %s" % (part, domain_mgr))
-      # Invoke DomainAdapter's install
-      domain_install_result = domain_mgr.install_nffg(part)
-      # Update the DoV based on the mapping result covering some corner case
-      if domain_install_result is None:
-        log.error("Installation of %s in %s was unsuccessful!" % (part, domain))
-        log.debug("Update installed part with collective result: %s" %
-                  NFFG.STATUS_FAIL)
-        deploy_status.set_domain_failed(domain=domain)
-        log.debug("Installation status: %s" % deploy_status)
-        if CONFIG.rollback_on_failure():
+    if CONFIG.parallel_domain_deploy():
+      self.__deploy_domains_in_parallel(slices=slices,
+                                        mapped_nffg=mapped_nffg,
+                                        deploy_status=deploy_status)
+    else:
+      for domain, part in slices:
+        domain_mgr = self.__prepare_domain_install(domain=domain,
+                                                   part=part,
+                                                   deploy_status=deploy_status)
+        if domain_mgr is None:
+          continue
+        log.info("Delegate splitted part: %s to %s" % (part, domain_mgr))
+        # Invoke DomainAdapter's install
+        domain_install_result = domain_mgr.install_nffg(part)
+        if not self.__process_domain_install_result(
+           domain=domain, domain_mgr=domain_mgr, part=part,
+           result=domain_install_result, mapped_nffg=mapped_nffg,
+           deploy_status=deploy_status):
           # Stop deploying remained nffg_parts and initiate delayed rollback
-          log.info("Rollback mode is enabled! Skip installation process...")
           break
-        # Update failed status info of mapped elements in NFFG part for DoV
-        # update
-        if self.DoVManager.status_updates:
-          NFFGToolBox.update_status_info(nffg=part, status=NFFG.STATUS_FAIL,
-                                         log=log)
-        else:
-          log.warning("Skip DoV update with domain: %s! Cause: "
-                      "Domain installation was unsuccessful!" % domain)
-          continue
-      if domain_install_result == 0:
-        log.info("Installation of %s in %s was skipped!" % (part, domain))
-        deploy_status.set_domain_ok(domain=domain)
-        log.debug("Installation status: %s" % deploy_status)
-        continue
-      log.info("Installation of %s in %s was successful!" % (part, domain))
-      if self.DoVManager.status_updates:
-        log.debug("Update installed part with collective result: %s" %
-                  NFFG.STATUS_DEPLOY)
-        # Update successful status info of mapped elements in NFFG part for
-        # DoV update
-        NFFGToolBox.update_status_info(nffg=part, status=NFFG.STATUS_DEPLOY,
-                                       log=log)
-      # If the domain manager does not poll the domain update here
-      # else polling takes care of domain updating
-      if isinstance(domain_mgr,
-                    AbstractRemoteDomainManager) and domain_mgr.polling:
-        log.info("Skip explicit DoV update for domain: %s. "
-                 "Cause: polling enabled!" % domain)
-        if isinstance(domain_mgr,
-                      UnifyDomainManager) and domain_mgr.callback_manager:
-          log.debug("Callback is enabled for domain: %s!" % domain)
-        else:
-          log.debug("Consider deploy into a polled domain OK...")
-          deploy_status.set_domain_ok(domain=domain)
-          log.debug("Installation status: %s" % deploy_status)
-          continue
-
-      if isinstance(domain_mgr,
-                    UnifyDomainManager) and domain_mgr.callback_manager:
-        log.info("Skip explicit DoV update for domain: %s. "
-                 "Cause: callback registered!" % domain)
-        deploy_status.set_domain_waiting(domain=domain)
-        log.debug("Installation status: %s" % deploy_status)
-        continue
-
-      if domain_mgr.IS_INTERNAL_MANAGER:
-        self.__perform_internal_mgr_update(mapped_nffg=mapped_nffg,
-                                           domain=domain)
-        # In case of Local manager skip the rest of the update
-        continue
-
-      if CONFIG.one_step_update():
-        log.debug("One-step-update is enabled. Skip explicit domain update!")
-      else:
-        # Explicit domain update
-        self.DoVManager.update_domain(domain=domain, nffg=part)
-      # self.status_mgr.get_status(mapped_nffg.id).set_domain_ok(domain)
-      deploy_status.set_domain_ok(domain=domain)
-      log.debug("Installation status: %s" % deploy_status)
-      if CONFIG.domain_deploy_delay():
-        log.warning("Delay next deploy with %ss" % CONFIG.domain_deploy_delay())
-        time.sleep(CONFIG.domain_deploy_delay())
     # END of domain deploy loop
     log.info("NF-FG installation is finished by %s" % self.__class__.__name__)
     log.debug("Overall installation status: %s" % deploy_status)
@@ -756,7 +713,8 @@ class ControllerAdapter(object):
       log.info("All installation processes have been finished with success!")
       if CONFIG.one_step_update():
         log.debug("One-step-update is enabled. Update DoV now...")
-        self.DoVManager.set_global_view(nffg=deploy_status.data)
+        self.DoVManager.commit_global_view(id=deploy_status.id,
+                                           nffg=deploy_status.data)
     elif deploy_status.still_pending:
       log.warning("Installation process is still pending! "
                   "Waiting for results...")
@@ -764,12 +722,388 @@ class ControllerAdapter(object):
       log.error("%s installation was not successful!" % mapped_nffg)
       # No pending install part here
       if CONFIG.rollback_on_failure():
-        self.__do_rollback(status=deploy_status,
-                           previous_state=self.DoVManager.get_backup_state())
+        backup = self.DoVManager.get_backup_state(id=deploy_status.id)
+        self.__do_rollback(status=deploy_status, previous_state=backup)
     else:
       log.info("All installation processes have been finished!")
+    self.__release_request(status=deploy_status)
     return deploy_status
 
+  def __prepare_domain_install (self, domain, part, deploy_status):
+    """
+    Look up the DomainManager of the given domain part and perform the
+    pre-deploy steps.
+
+    :param domain: domain name
+    :type domain: str
+    :param part: splitted domain part
+    :type part: :class:`NFFG`
+    :param deploy_status: deploy status object
+    :type deploy_status: :any:`DomainRequestStatus`
+    :return: DomainManager of the domain or None if it is not found
+    :rtype: :any:`AbstractDomainManager`
+    """
+    stats.add_measurement_start_entry(type=stats.TYPE_DEPLOY_DOMAIN,
+                                      info=domain)
+    log.debug("Search DomainManager for domain: %s" % domain)
+    # Get Domain Manager
+    domain_mgr = self.domains.get_component_by_domain(domain_name=domain)
+    if domain_mgr is None:
+      log.warning("No DomainManager has been initialized for domain: %s! "
+                  "Skip install domain part..." % domain)
+      deploy_status.set_domain_failed(domain=domain)
+      return
+    log.log(VERBOSE, "Splitted domain: %s part:\n%s", domain,
+            LazyDump(part.dump))
+    # Check if need to reset domain before install
+    if CONFIG.reset_domains_before_install():
+      log.debug("Reset %s domain before deploying mapped NFFG..." %
+                domain_mgr.domain_name)
+      domain_mgr.reset_domain()
+    return domain_mgr
+
+  def __process_domain_install_result (self, domain, domain_mgr, part, result,
+                                       mapped_nffg, deploy_status):
+    """
+    Process the result of a domain installation and update the deploy status
+    and the DoV accordingly.
+
+    :param domain: domain name
+    :type domain: str
+    :param domain_mgr: DomainManager of the domain
+    :type domain_mgr: :any:`AbstractDomainManager`
+    :param part: installed domain part
+    :type part: :class:`NFFG`
+    :param result: result of the domain installation
+    :type result: bool or int or None
+    :param mapped_nffg: mapped NF-FG instance which need to be installed
+    :type mapped_nffg: :class:`NFFG`
+    :param deploy_status: deploy status object
+    :type deploy_status: :any:`DomainRequestStatus`
+    :return: the deploy process can be continued or not
+    :rtype: bool
+    """
+    # Update the DoV based on the mapping result covering some corner case
+    if result is None:
+      log.error("Installation of %s in %s was unsuccessful!" % (part, domain))
+      log.debug("Update installed part with collective result: %s" %
+                NFFG.STATUS_FAIL)
+      deploy_status.set_domain_failed(domain=domain)
+      log.debug("Installation status: %s" % deploy_status)
+      if CONFIG.rollback_on_failure():
+        log.info("Rollback mode is enabled! Skip installation process...")
+        return False
+      # Update failed status info of mapped elements in NFFG part for DoV
+      # update
+      if self.DoVManager.status_updates:
+        NFFGToolBox.update_status_info(nffg=part, status=NFFG.STATUS_FAIL,
+                                       log=log)
+      else:
+        log.warning("Skip DoV update with domain: %s! Cause: "
+                    "Domain installation was unsuccessful!" % domain)
+        return True
+    if result == 0:
+      log.info("Installation of %s in %s was skipped!" % (part, domain))
+      deploy_status.set_domain_ok(domain=domain)
+      log.debug("Installation status: %s" % deploy_status)
+      return True
+    log.info("Installation of %s in %s was successful!" % (part, domain))
+    if self.DoVManager.status_updates:
+      log.debug("Update installed part with collective result: %s" %
+                NFFG.STATUS_DEPLOY)
+      # Update successful status info of mapped elements in NFFG part for
+      # DoV update
+      NFFGToolBox.update_status_info(nffg=part, status=NFFG.STATUS_DEPLOY,
+                                     log=log)
+    # If the domain manager does not poll the domain update here
+    # else polling takes care of domain updating
+    if isinstance(domain_mgr,
+                  AbstractRemoteDomainManager) and domain_mgr.polling:
+      log.info("Skip explicit DoV update for domain: %s. "
+               "Cause: polling enabled!" % domain)
+      if isinstance(domain_mgr,
+                    UnifyDomainManager) and domain_mgr.callback_manager:
+        log.debug("Callback is enabled for domain: %s!" % domain)
+      else:
+        log.debug("Consider deploy into a polled domain OK...")
+        deploy_status.set_domain_ok(domain=domain)
+        log.debug("Installation status: %s" % deploy_status)
+        return True
+    if isinstance(domain_mgr,
+                  UnifyDomainManager) and domain_mgr.callback_manager:
+      log.info("Skip explicit DoV update for domain: %s. "
+               "Cause: callback registered!" % domain)
+      deploy_status.set_domain_waiting(domain=domain)
+      log.debug("Installation status: %s" % deploy_status)
+      return True
+    if isinstance(domain_mgr, SDNDomainManager) and domain_mgr.confirm:
+      log.info("Skip explicit DoV update for domain: %s. "
+               "Cause: waiting for switch confirmations!" % domain)
+      deploy_status.set_domain_waiting(domain=domain)
+      log.debug("Installation status: %s" % deploy_status)
+      return True
+    if domain_mgr.IS_INTERNAL_MANAGER:
+      self.__perform_internal_mgr_update(mapped_nffg=mapped_nffg,
+                                         domain=domain)
+      # In case of Local manager skip the rest of the update
+      return True
+    if CONFIG.one_step_update():
+      log.debug("One-step-update is enabled. Skip explicit domain update!")
+    else:
+      # Explicit domain update
+      self.DoVManager.update_domain(domain=domain, nffg=part)
+    deploy_status.set_domain_ok(domain=domain)
+    log.debug("Installation status: %s" % deploy_status)
+    if CONFIG.domain_deploy_delay() and not CONFIG.parallel_domain_deploy():
+      log.warning("Delay next deploy with %ss" % CONFIG.domain_deploy_delay())
+      time.sleep(CONFIG.domain_deploy_delay())
+    return True
+
+  @property
+  def _deploy_pool (self):
+    """
+    Return the worker pool used for parallel domain deployment.
+
+    :return: worker pool
+    :rtype: :class:`ThreadPool`
+    """
+    if self.__deploy_pool is None:
+      workers = CONFIG.get_domain_deploy_workers()
+      log.debug("Initiate domain deploy pool with workers: %s" % workers)
+      self.__deploy_pool = ThreadPool(processes=workers)
+    return self.__deploy_pool
+
+  @staticmethod
+  def _install_domain_part (domain_mgr, part):
+    """
+    Install the given domain part in a worker thread. The communication with
+    the domain is serialized by the deploy lock of the DomainManager.
+
+    :param domain_mgr: DomainManager of the domain
+    :type domain_mgr: :any:`AbstractRemoteDomainManager`
+    :param part: splitted domain part
+    :type part: :class:`NFFG`
+    :return: result of the domain installation
+    :rtype: bool or int or None
+    """
+    try:
+      with domain_mgr.deploy_lock:
+        return domain_mgr.install_nffg(part)
+    except Exception:
+      log.exception("Got exception during parallel installation into: %s!"
+                    % domain_mgr.domain_name)
+      return None
+
+  def __get_install_callback (self, request_id, domain):
+    """
+    Return the callback of a parallel domain installation which is called in
+    the worker thread when the installation is finished.
+
+    :param request_id: request ID
+    :type request_id: str or int
+    :param domain: domain name
+    :type domain: str
+    :return: callback function
+    :rtype: callable
+    """
+
+    def install_finished (result):
+      call_as_coop_task(self.__finish_running_install, request_id=request_id,
+                        domain=domain, result=result)
+
+    return install_finished
+
+  def __is_domain_deploying (self, domain):
+    """
+    Return True if an installation is still running in the given domain.
+
+    :param domain: domain name
+    :type domain: str
+    :return: domain is under installation or not
+    :rtype: bool
+    """
+    return any(key[1] == domain and not running[0].ready()
+               for key, running in self.__running_installs.iteritems())
+
+  def __finish_running_install (self, request_id, domain, result):
+    """
+    Process the result of a finished parallel domain installation and perform
+    the rollbacks of the domain which were deferred due to the running
+    installation.
+
+    :param request_id: request ID
+    :type request_id: str or int
+    :param domain: domain name
+    :type domain: str
+    :param result: result of the domain installation
+    :type result: bool or int or None
+    :return: None
+    """
+    key = (request_id, domain)
+    running = self.__running_installs.pop(key, None)
+    if key in self.__expired_installs:
+      self.__expired_installs.discard(key)
+      log.warning("Installation into domain: %s is finished after timeout! "
+                  "Skip result: %s" % (domain, result))
+    elif key in self.__deferred_rollbacks:
+      log.debug("Rollback of domain: %s is already initiated! "
+                "Skip result: %s" % (domain, result))
+    elif running is not None:
+      job, domain_mgr, part, mapped_nffg, deploy_status = running
+      log.info("Installation into domain: %s is finished!" % domain)
+      self.__process_domain_install_result(domain=domain,
+                                           domain_mgr=domain_mgr,
+                                           part=part,
+                                           result=result,
+                                           mapped_nffg=mapped_nffg,
+                                           deploy_status=deploy_status)
+      if not deploy_status.still_pending:
+        self.__finish_deploy(deploy_status=deploy_status)
+    self.__perform_deferred_rollbacks(domain=domain)
+
+  def __expire_running_installs (self, request_id, timeout):
+    """
+    Consider the still running parallel installations of the given request
+    failed after the deploy timeout.
+
+    :param request_id: request ID
+    :type request_id: str or int
+    :param timeout: deploy timeout
+    :type timeout: float
+    :return: None
+    """
+    deploy_status = None
+    for key, running in self.__running_installs.items():
+      job, domain_mgr, part, mapped_nffg, status = running
+      if key[0] != request_id or job.ready() or key in self.__expired_installs:
+        continue
+      log.error("Installation into domain: %s reached timeout limit: %ss! "
+                "The installation is still running in the background..."
+                % (key[1], timeout))
+      self.__expired_installs.add(key)
+      status.set_domain_failed(domain=key[1])
+      deploy_status = status
+    if deploy_status is None:
+      return
+    log.debug("Installation status: %s" % deploy_status)
+    if not deploy_status.still_pending:
+      self.__finish_deploy(deploy_status=deploy_status)
+
+  def __deploy_domains_in_parallel (self, slices, mapped_nffg, deploy_status):
+    """
+    Install the domain parts of remote domains concurrently using a bounded
+    worker pool. Parts of local domains are installed in the calling coop
+    task meanwhile. The remote domains are set to WAITING and their results
+    are processed in separate coop tasks, so the caller is not blocked.
+
+    :param slices: list of (domain, part) tuples
+    :type slices: list
+    :param mapped_nffg: mapped NF-FG instance which need to be installed
+    :type mapped_nffg: :class:`NFFG`
+    :param deploy_status: deploy status object
+    :type deploy_status: :any:`DomainRequestStatus`
+    :return: None
+    """
+    log.debug("Parallel deploy is enabled! Dispatch domain parts...")
+    if CONFIG.domain_deploy_delay():
+      log.warning("Domain deploy delay is ignored in parallel deploy mode!")
+    remote_parts = []
+    local_parts = []
+    for domain, part in slices:
+      domain_mgr = self.__prepare_domain_install(domain=domain,
+                                                 part=part,
+                                                 deploy_status=deploy_status)
+      if domain_mgr is None:
+        continue
+      log.info("Delegate splitted part: %s to %s" % (part, domain_mgr))
+      if isinstance(domain_mgr, AbstractRemoteDomainManager):
+        remote_parts.append((domain, domain_mgr, part))
+      else:
+        # Local managers rely on the coop context (e.g. OpenFlow connections)
+        local_parts.append((domain, domain_mgr, part))
+    # Every remote part is pending until its result is processed
+    for domain, domain_mgr, part in remote_parts:
+      deploy_status.set_domain_waiting(domain=domain)
+    for domain, domain_mgr, part in remote_parts:
+      # Keep the trace context of the request in the worker thread
+      job = self._deploy_pool.apply_async(
+        stats.bind_context(self._install_domain_part),
+        args=(domain_mgr, part),
+        callback=self.__get_install_callback(request_id=deploy_status.id,
+                                             domain=domain))
+      self.__running_installs[(deploy_status.id, domain)] = (job,
+                                                             domain_mgr,
+                                                             part,
+                                                             mapped_nffg,
+                                                             deploy_status)
+    # Every part is already sent out, so process all results to track every
+    # affected domain for a possible rollback
+    for domain, domain_mgr, part in local_parts:
+      self.__process_domain_install_result(domain=domain,
+                                           domain_mgr=domain_mgr,
+                                           part=part,
+                                           result=domain_mgr.install_nffg(part),
+                                           mapped_nffg=mapped_nffg,
+                                           deploy_status=deploy_status)
+    if remote_parts:
+      timeout = CONFIG.get_domain_deploy_timeout()
+      log.debug("Waiting for remote domain installations with timeout: %ss..."
+                % timeout)
+      Timer(timeout, self.__expire_running_installs,
+            kw={'request_id': deploy_status.id, 'timeout': timeout})
+
+  def __finish_deploy (self, deploy_status):
+    """
+    Perform the post-deploy steps of a request without pending domain
+    installation and notify the upper layer about the overall result.
+
+    :param deploy_status: deploy status object
+    :type deploy_status: :any:`DomainRequestStatus`
+    :return: None
+    """
+    if deploy_status.success:
+      log.info("All installation process has been finished for request: %s! "
+               "Result: %s" % (deploy_status.id, deploy_status.status))
+      if CONFIG.one_step_update():
+        log.info("One-step-update is enabled. Update DoV now...")
+        self.DoVManager.commit_global_view(id=deploy_status.id,
+                                           nffg=deploy_status.data)
+    elif deploy_status.failed:
+      log.error("All installation process has been finished for request: %s! "
+                "Result: %s" % (deploy_status.id, deploy_status.status))
+      if CONFIG.one_step_update():
+        log.warning("One-step-update is enabled. "
+                    "Skip update due to failed request...")
+      if CONFIG.rollback_on_failure():
+        backup = self.DoVManager.get_backup_state(id=deploy_status.id)
+        self.__do_rollback(status=deploy_status, previous_state=backup)
+    result = InstallationFinishedEvent.get_result_from_status(deploy_status)
+    log.info("Overall installation result: %s" % result)
+    # Rollback set back the domains to WAITING status
+    if not deploy_status.still_pending:
+      is_fail = InstallationFinishedEvent.is_error(result)
+      self._layer_API._process_mapping_result(nffg_id=deploy_status.id,
+                                              fail=is_fail)
+      self._layer_API.raiseEventNoErrors(InstallationFinishedEvent,
+                                         id=deploy_status.id,
+                                         result=result)
+    self.__release_request(status=deploy_status)
+
+  def __release_request (self, status):
+    """
+    Release the DoV reservation and backup of the request if its deployment
+    and rollback are finished.
+
+    :param status: deploy status object
+    :type status: :class:`DomainRequestStatus`
+    :return: None
+    """
+    if status.still_pending:
+      return
+    if any(key[0] == status.id for key in self.__deferred_rollbacks):
+      return
+    self.DoVManager.release_request(id=status.id)
+
   def collate_deploy_request (self, request):
     """
     Collate request BiSBiS node IDs to the existent nodes in DoV and correct
@@ -781,7 +1115,7 @@ class ControllerAdapter(object):
     :rtype: :class:`NFFG`
     """
     log.debug("Collate deploy request node IDs...")
-    dov = self.DoVManager.dov.get_resource_info()
+    dov = self.DoVManager.dov.get_snapshot().nffg
     for node in request.infras:
       if node.id not in dov.network:
         log.warning("Found non-existent infra node: %s in deploy request: %s!"
@@ -899,7 +1233,7 @@ class ControllerAdapter(object):
           self.status_mgr.get_status(mapped_nffg.id).set_domain_ok(domain)
       else:
         # Override the whole DoV by default
-        self.DoVManager.set_global_view(nffg=mapped_nffg)
+        self.DoVManager.commit_global_view(id=mapped_nffg.id, nffg=mapped_nffg)
         self.status_mgr.get_status(mapped_nffg.id).set_domain_ok(domain)
     else:
       log.warning("Detected virtualized Infrastructure node in mapped NFFG!"
@@ -921,44 +1255,106 @@ class ControllerAdapter(object):
     status.set_mapping_result(data=previous_state)
     log.debug("Current status: %s" % status)
     for domain in status.domains:
-      domain_mgr = self.domains.get_component_by_domain(domain_name=domain)
-      if domain_mgr is None:
-        log.error("DomainManager for domain: %s is not found!" % domain)
+      if self.__is_domain_deploying(domain=domain):
+        log.warning("Installation into domain: %s is still running! "
+                    "Defer rollback of the domain..." % domain)
+        self.__deferred_rollbacks[(status.id, domain)] = (status,
+                                                          previous_state)
         continue
-      if isinstance(domain_mgr, UnifyDomainManager):
-        ds = status.get_domain_status(domain=domain)
-        # Skip rollback if the domain skipped by rollback interrupt
-        if ds != status.INITIALIZED:
-          result = domain_mgr.rollback_install(request_id=status.id)
-          if not result:
-            log.debug("RESET request has been failed!")
-            status.set_domain_failed(domain=domain)
-            continue
-          if isinstance(domain_mgr,
-                        UnifyDomainManager) and domain_mgr.callback_manager:
-            status.set_domain_waiting(domain=domain)
-          elif isinstance(domain_mgr,
-                          AbstractRemoteDomainManager) and domain_mgr.polling:
-            log.debug("Polling in domain: %s is enabled! "
-                      "Set rollback status to RESET" % domain)
-            status.set_domain_reset(domain=domain)
-          else:
-            status.set_domain_reset(domain=domain)
-            if not CONFIG.one_step_update():
-              log.debug("Extract domain state from previous state...")
-              reset_state = NFFGToolBox.extract_domain(domain=domain,
-                                                       nffg=previous_state)
-              self.DoVManager.update_domain(domain=domain,
-                                            nffg=reset_state)
-        else:
-          log.debug("Domain: %s is not affected. Skip rollback..." % domain)
-      else:
-        log.warning("%s does not support rollback! Skip rollback step...")
+      self.__rollback_domain(domain=domain, status=status,
+                             previous_state=previous_state)
       log.debug("Installation status: %s" % status)
+    self.__restore_rolled_back_state(status=status,
+                                     previous_state=previous_state)
+    log.info("Rollback process has been finished!")
+
+  def __perform_deferred_rollbacks (self, domain):
+    """
+    Perform the deferred rollbacks of the given domain if no installation is
+    running in the domain anymore.
+
+    :param domain: domain name
+    :type domain: str
+    :return: None
+    """
+    if self.__is_domain_deploying(domain=domain):
+      return
+    for key in [k for k in self.__deferred_rollbacks if k[1] == domain]:
+      status, previous_state = self.__deferred_rollbacks.pop(key)
+      log.info("Installation into domain: %s is finished! Perform deferred "
+               "rollback of request: %s..." % (domain, status.id))
+      self.__rollback_domain(domain=domain, status=status,
+                             previous_state=previous_state)
+      log.debug("Installation status: %s" % status)
+      self.__restore_rolled_back_state(status=status,
+                                       previous_state=previous_state)
+      self.__release_request(status=status)
+
+  def __restore_rolled_back_state (self, status, previous_state):
+    """
+    Restore the DoV state in one-step-update mode if every domain of the
+    request has been rolled back.
+
+    :param status: deploy status object
+    :type status: :class:`DomainRequestStatus`
+    :param previous_state: previous state stored before deploy
+    :type previous_state: :class:`NFFG`
+    :return: None
+    """
+    if any(key[0] == status.id for key in self.__deferred_rollbacks):
+      log.debug("Rollback of request: %s is deferred in some domains! "
+                "Skip restoring DoV state..." % status.id)
+      return
     if status.reset and CONFIG.one_step_update():
       log.debug("One-step-update is enabled. Restore DoV state now...")
-      self.DoVManager.set_global_view(nffg=previous_state)
-    log.info("Rollback process has been finished!")
+      self.DoVManager.commit_global_view(id=status.id, nffg=previous_state)
+
+  def __rollback_domain (self, domain, status, previous_state):
+    """
+    Perform the rollback of the given domain.
+
+    :param domain: domain name
+    :type domain: str
+    :param status: deploy status object
+    :type status: :class:`DomainRequestStatus`
+    :param previous_state: previous state stored before deploy
+    :type previous_state: :class:`NFFG`
+    :return: None
+    """
+    domain_mgr = self.domains.get_component_by_domain(domain_name=domain)
+    if domain_mgr is None:
+      log.error("DomainManager for domain: %s is not found!" % domain)
+      return
+    if isinstance(domain_mgr, UnifyDomainManager):
+      ds = status.get_domain_status(domain=domain)
+      # Skip rollback if the domain skipped by rollback interrupt
+      if ds != status.INITIALIZED:
+        with domain_mgr.deploy_lock:
+          result = domain_mgr.rollback_install(request_id=status.id)
+        if not result:
+          log.debug("RESET request has been failed!")
+          status.set_domain_failed(domain=domain)
+          return
+        if isinstance(domain_mgr,
+                      UnifyDomainManager) and domain_mgr.callback_manager:
+          status.set_domain_waiting(domain=domain)
+        elif isinstance(domain_mgr,
+                        AbstractRemoteDomainManager) and domain_mgr.polling:
+          log.debug("Polling in domain: %s is enabled! "
+                    "Set rollback status to RESET" % domain)
+          status.set_domain_reset(domain=domain)
+        else:
+          status.set_domain_reset(domain=domain)
+          if not CONFIG.one_step_update():
+            log.debug("Extract domain state from previous state...")
+            reset_state = NFFGToolBox.extract_domain(domain=domain,
+                                                     nffg=previous_state)
+            self.DoVManager.update_domain(domain=domain,
+                                          nffg=reset_state)
+      else:
+        log.debug("Domain: %s is not affected. Skip rollback..." % domain)
+    else:
+      log.warning("%s does not support rollback! Skip rollback step...")
 
   def _handle_DomainChangedEvent (self, event):
     """
@@ -988,7 +1384,7 @@ class ControllerAdapter(object):
     # If domain has changed
     elif event.cause == DomainChangedEvent.TYPE.DOMAIN_CHANGED:
       if isinstance(event.data, NFFG):
-        log.log(VERBOSE, "Changed topology:\n%s" % event.data.dump())
+        log.log(VERBOSE, "Changed topology:\n%s", LazyDump(event.data.dump))
       self.DoVManager.update_domain(domain=event.domain,
                                     nffg=event.data)
       # Handle install status in case the DomainManager is polling the domain
@@ -1021,14 +1417,15 @@ class ControllerAdapter(object):
             log.warning("One-step-update is enabled with domain polling! "
                         "Skip update...")
           elif deploy_status.failed and CONFIG.rollback_on_failure():
-            self.__do_rollback(status=deploy_status,
-                               previous_state=self.DoVManager.get_backup_state())
+            backup = self.DoVManager.get_backup_state(id=deploy_status.id)
+            self.__do_rollback(status=deploy_status, previous_state=backup)
           result = InstallationFinishedEvent.get_result_from_status(
             deploy_status)
           log.info("Overall installation result: %s" % result)
           self._layer_API.raiseEventNoErrors(InstallationFinishedEvent,
                                              id=deploy_status.id,
                                              result=result)
+          self.__release_request(status=deploy_status)
       else:
         log.debug("No service under deployment: deploy-status is missing!")
 
@@ -1051,7 +1448,8 @@ class ControllerAdapter(object):
       log.debug("Update success status for service request: %s..." % request_id)
       deploy_status.set_domain_ok(domain=event.domain)
       if isinstance(event.callback.data, NFFG):
-        log.log(VERBOSE, "Changed topology:\n%s" % event.callback.data.dump())
+        log.log(VERBOSE, "Changed topology:\n%s",
+                LazyDump(event.callback.data.dump))
       domain_mgr = self.domains.get_component_by_domain(event.domain)
       if domain_mgr is None:
         log.error("DomainManager for domain: %s is not found!" % event.domain)
@@ -1067,31 +1465,7 @@ class ControllerAdapter(object):
                                       nffg=event.callback.data)
     log.debug("Installation status: %s" % deploy_status)
     if not deploy_status.still_pending:
-      if deploy_status.success:
-        log.info("All installation process has been finished for request: %s! "
-                 "Result: %s" % (deploy_status.id, deploy_status.status))
-        if CONFIG.one_step_update():
-          log.info("One-step-update is enabled. Update DoV now...")
-          self.DoVManager.set_global_view(nffg=deploy_status.data)
-      elif deploy_status.failed:
-        log.error("All installation process has been finished for request: %s! "
-                  "Result: %s" % (deploy_status.id, deploy_status.status))
-        if CONFIG.one_step_update():
-          log.warning("One-step-update is enabled. "
-                      "Skip update due to failed request...")
-        if CONFIG.rollback_on_failure():
-          self.__do_rollback(status=deploy_status,
-                             previous_state=self.DoVManager.get_backup_state())
-      result = InstallationFinishedEvent.get_result_from_status(deploy_status)
-      log.info("Overall installation result: %s" % result)
-      # Rollback set back the domains to WAITING status
-      if not deploy_status.still_pending:
-        is_fail = InstallationFinishedEvent.is_error(result)
-        self._layer_API._process_mapping_result(nffg_id=request_id,
-                                                fail=is_fail)
-        self._layer_API.raiseEventNoErrors(InstallationFinishedEvent,
-                                           id=request_id,
-                                           result=result)
+      self.__finish_deploy(deploy_status=deploy_status)
     else:
       log.debug("Installation process is still pending! Waiting for results...")
 
@@ -1122,7 +1496,7 @@ class ControllerAdapter(object):
         log.debug("One-step-update is enabled. Skip explicit domain update!")
       else:
         log.debug("Extract domain state from previous state...")
-        previous_state = self.DoVManager.get_backup_state()
+        previous_state = self.DoVManager.get_backup_state(id=request_id)
         reset_state = NFFGToolBox.extract_domain(domain=event.domain,
                                                  nffg=previous_state)
         self.DoVManager.update_domain(domain=event.domain,
@@ -1134,8 +1508,8 @@ class ControllerAdapter(object):
                  deploy_status.status)
         if CONFIG.one_step_update():
           log.debug("One-step-update is enabled. Restore DoV state now...")
-          backup = self.DoVManager.get_backup_state()
-          self.DoVManager.set_global_view(nffg=backup)
+          backup = self.DoVManager.get_backup_state(id=request_id)
+          self.DoVManager.commit_global_view(id=request_id, nffg=backup)
       elif deploy_status.failed:
         log.error("All ROLLBACK process has been finished! Result: %s" %
                   deploy_status.status)
@@ -1147,6 +1521,7 @@ class ControllerAdapter(object):
       self._layer_API.raiseEventNoErrors(InstallationFinishedEvent,
                                          id=request_id,
                                          result=result)
+      self.__release_request(status=deploy_status)
 
   def _handle_InfoHookEvent (self, event):
     """
@@ -1160,7 +1535,7 @@ class ControllerAdapter(object):
     request_id = event.callback.request_id
     req_status = self.status_mgr.get_status(id=request_id)
     original_info, binding = req_status.data
-    log.log(VERBOSE, "Original Info:\n%s" % original_info.xml())
+    log.log(VERBOSE, "Original Info:\n%s", LazyDump(original_info.xml))
     if event.was_error():
       log.warning("Update failed status for info request: %s..." % request_id)
       req_status.set_domain_failed(domain=event.domain)
@@ -1172,11 +1547,12 @@ class ControllerAdapter(object):
         log.debug("Parsing received callback data...")
         body = event.callback.body if event.callback.body else ""
         new_info = Info.parse_from_text(body)
-        log.log(VERBOSE, "Received data:\n%s" % new_info.xml())
+        log.log(VERBOSE, "Received data:\n%s", LazyDump(new_info.xml))
         log.debug("Update collected info with parsed data...")
         log.debug("Merging received data...")
         original_info.merge(new_info)
-        log.log(VERBOSE, "Updated Info data:\n%s" % original_info.xml())
+        log.log(VERBOSE, "Updated Info data:\n%s",
+                LazyDump(original_info.xml))
       except Exception:
         log.exception("Got error while processing Info data!")
         req_status.set_domain_failed(domain=event.domain)
@@ -1246,7 +1622,7 @@ class ControllerAdapter(object):
     """
     log.debug("Resolve NF paths...")
     reverse_binding = {}
-    dov = self.DoVManager.dov.get_resource_info()
+    dov = self.DoVManager.dov.get_snapshot().nffg
     for attr in (getattr(info, e) for e in info._sorted_children):
       rewrite = []
       for element in attr:
@@ -1307,7 +1683,7 @@ class ControllerAdapter(object):
         e.object.set_value(p)
         attr.add(e)
         log.debug("Overrided new path for NF --> %s" % e.object.get_value())
-    log.log(VERBOSE, info.xml())
+    log.log(VERBOSE, "%s", LazyDump(info.xml))
     return info
 
   def __split_info_request_by_domain (self, info):
@@ -1319,7 +1695,7 @@ class ControllerAdapter(object):
     :return: splitted info dict keyed by domain names
     :rtype: dict
     """
-    dov = self.DoVManager.dov.get_resource_info()
+    dov = self.DoVManager.dov.get_snapshot().nffg
     vnfs = get_nfs_from_info(info=info)
     if not vnfs:
       log.debug("No NF has been detected from info request!")
@@ -1328,7 +1704,7 @@ class ControllerAdapter(object):
     for domain, nfs in splitted.items():
       log.debug("Splitted domain: %s --> %s" % (domain, nfs))
       info_part = strip_info_by_nfs(info, nfs)
-      log.log(VERBOSE, "Splitted info part:\n%s" % info_part.xml())
+      log.log(VERBOSE, "Splitted info part:\n%s", LazyDump(info_part.xml))
       splitted[domain] = info_part
     return splitted
 
@@ -1365,8 +1741,8 @@ class ControllerAdapter(object):
         log.warning("Domain manager: %s does not support info request! Skip...")
         status.set_domain_failed(domain=domain)
         continue
-      log.log(VERBOSE, "Splitted info request: %s part:\n%s"
-              % (domain, info_part.xml()))
+      log.log(VERBOSE, "Splitted info request: %s part:\n%s", domain,
+              LazyDump(info_part.xml))
       success = domain_mgr.request_info_from_domain(req_id=id,
                                                     info_part=info_part)
       if not success:
@@ -1520,7 +1896,8 @@ class ControllerAdapter(object):
       except KeyError as e:
         log.warning("Missing required config entry %s from "
                     "RemoteDomainManager: %s" % (e, domain_mgr.prototype))
-      log.log(VERBOSE, "Used configuration:\n%s" % pprint.pformat(mgr_cfg))
+      log.log(VERBOSE, "Used configuration:\n%s",
+              LazyDump(pprint.pformat, mgr_cfg))
       log.info("Initiate DomainManager for detected external domain: %s, "
                "URL: %s" % (mgr_cfg['domain_name'], orchestrator_url))
       # Initialize DomainManager for detected domain
@@ -1559,6 +1936,7 @@ class DomainRequestStatus(object):
     self.__id = id
     self.__statuses = {}.fromkeys(domains, self.INITIALIZED)
     self.__standby = False
+    self.__conflict = False
     self.__data = data
 
   @property
@@ -1606,6 +1984,7 @@ class DomainRequestStatus(object):
       self.__statuses[domain] = self.INITIALIZED
     self.set_mapping_result(data=data)
     self.reset_standby()
+    self.__conflict = False
 
   def set_standby (self):
     """
@@ -1646,6 +2025,25 @@ class DomainRequestStatus(object):
       log.debug("Reset request to active mode")
       self.__standby = False
 
+  def set_conflict (self):
+    """
+    Mark the request failed due to a conflict with other requests.
+
+    :return: None
+    """
+    log.debug("Set conflict for request: %s" % self.__id)
+    self.__conflict = True
+
+  @property
+  def conflict (self):
+    """
+    Return True if the request conflicts with other requests.
+
+    :return: conflict
+    :rtype: bool
+    """
+    return self.__conflict
+
   def clear (self):
     """
     Clear tracked domain statuses.
@@ -1777,7 +2175,7 @@ class DomainRequestStatus(object):
     self.__statuses[domain] = status
     if status in (self.OK, self.FAILED, self.RESET):
       stats.add_measurement_end_entry(type=stats.TYPE_DEPLOY_DOMAIN,
-                                      info="%s-->%s" % (domain, status))
+                                      info=domain)
     return self
 
   def set_domain_ok (self, domain):
@@ -1932,7 +2330,12 @@ class GlobalResourceManager(object):
     self.__tracked_domains = set()  # Cache for detected and stored domains
     self.status_updates = CONFIG.use_status_based_update()
     self.remerge_strategy = CONFIG.use_remerge_update_strategy()
-    self.__backup = None
+    # DoV snapshots stored before deploy: {request id: snapshot}
+    self.__backups = {}
+    # Domains reserved by the requests under deploy: {domain: request id}
+    self.__reservations = {}
+    # Last request committed into the domains: {domain: (revision, request id)}
+    self.__commits = {}
 
   @property
   def dov (self):
@@ -1954,25 +2357,133 @@ class GlobalResourceManager(object):
     """
     return tuple(self.tracked)
 
-  def backup_dov_state (self):
+  def __notify_visualizer (self):
+    """
+    Notify the remote visualizer about the actual DoV.
+
+    The DoV snapshot is taken only if the visualizer is enabled.
+
+    :return: None
+    """
+    notify_remote_visualizer(data=lambda: self.__dov.get_snapshot().nffg,
+                             unique_id="DOV",
+                             params={"event": "datastore"})
+
+  def backup_dov_state (self, id):
     """
-    Backup current state of DoV.
+    Backup current state of DoV for the request given by id.
+
+    The backup is the read-only snapshot of the actual DoV revision, so it is
+    shared with the other readers of the same revision.
 
+    :param id: request ID
+    :type id: str or int
     :return: None
     """
-    log.debug("Backup current DoV state...")
-    self.__backup = self.dov.get_resource_info()
-    self.__backup.id = (self.__backup.id + "-backup")
+    log.debug("Backup current DoV state for request: %s..." % id)
+    self.__backups[id] = self.dov.get_snapshot()
 
-  def get_backup_state (self):
+  def get_backup_state (self, id):
     """
-    Return with the stored beckup.
+    Return with the private copy of the backup stored for the request given by
+    id.
 
+    :param id: request ID
+    :type id: str or int
     :return: stashed DoV
     :rtype: :class:`NFFG`
     """
-    log.debug("Acquire previous DoV state...")
-    return self.__backup
+    log.debug("Acquire previous DoV state of request: %s..." % id)
+    backup = self.__backups.get(id)
+    if backup is None:
+      return None
+    backup = backup.copy()
+    backup.id = (backup.id + "-backup")
+    return backup
+
+  def reserve_domains (self, id, domains, revision):
+    """
+    Reserve the given domains for the request given by id.
+
+    The reservation is refused if another request holds any of the domains or
+    has committed into them after the given revision, i.e. the request was
+    orchestrated on an outdated view of the domains.
+
+    :param id: request ID
+    :type id: str or int
+    :param domains: domains affected by the request
+    :type domains: list
+    :param revision: DoV revision the request was orchestrated on
+    :type revision: int
+    :return: the domains are reserved or not
+    :rtype: bool
+    """
+    for domain in domains:
+      owner = self.__reservations.get(domain)
+      if owner is not None and owner != id:
+        log.warning("Domain: %s is reserved by request: %s!" % (domain, owner))
+        return False
+      commit = self.__commits.get(domain)
+      if commit is not None and commit[1] != id and commit[0] > revision:
+        log.warning("Domain: %s has been changed by request: %s since "
+                    "revision: %s!" % (domain, commit[1], revision))
+        return False
+    log.debug("Reserve domains: %s for request: %s" % (domains, id))
+    for domain in domains:
+      self.__reservations[domain] = id
+    return True
+
+  def get_reserved_domains (self, id):
+    """
+    :param id: request ID
+    :type id: str or int
+    :return: Return the domains reserved by the request given by id.
+    :rtype: list
+    """
+    return [d for d, owner in self.__reservations.iteritems() if owner == id]
+
+  def release_request (self, id):
+    """
+    Release the reserved domains and the backup of the finished request given
+    by id. The released domains are marked committed at the actual revision.
+
+    :param id: request ID
+    :type id: str or int
+    :return: None
+    """
+    self.__backups.pop(id, None)
+    domains = self.get_reserved_domains(id)
+    if not domains:
+      return
+    log.debug("Release domains: %s of request: %s" % (domains, id))
+    for domain in domains:
+      del self.__reservations[domain]
+      self.__commits[domain] = (self.__dov.revision, id)
+
+  def commit_global_view (self, id, nffg):
+    """
+    Commit the given global topology of the request given by id into the DoV.
+
+    Only the domains reserved by the request are merged into the actual DoV,
+    so the changes of other requests are kept. Without reservation the whole
+    global view is replaced.
+
+    :param id: request ID
+    :type id: str or int
+    :param nffg: global topology of the request
+    :type nffg: :class:`NFFG`
+    :return: None
+    """
+    domains = self.get_reserved_domains(id)
+    if not domains:
+      return self.set_global_view(nffg=nffg)
+    log.debug("Merge reserved domains: %s of request: %s into DoV..."
+              % (domains, id))
+    for domain in domains:
+      self.__dov.remerge_domain_in_dov(
+        domain=domain, nffg=NFFGToolBox.extract_domain(domain=domain,
+                                                       nffg=nffg))
+    self.__notify_visualizer()
 
   def set_global_view (self, nffg):
     """
@@ -1986,9 +2497,7 @@ class GlobalResourceManager(object):
     self.__dov.update_full_global_view(nffg=nffg)
     self.__tracked_domains.clear()
     self.__tracked_domains.update(NFFGToolBox.detect_domains(nffg))
-    notify_remote_visualizer(data=self.__dov.get_resource_info(),
-                             unique_id="DOV",
-                             params={"event": "datastore"})
+    self.__notify_visualizer()
 
   def update_global_view_status (self, status):
     """
@@ -2002,11 +2511,13 @@ class GlobalResourceManager(object):
     NFFGToolBox.update_status_info(nffg=self.__dov.get_resource_info(),
                                    status=status, log=log)
 
-  def rewrite_global_view_with_status (self, nffg):
+  def rewrite_global_view_with_status (self, id, nffg):
     """
-    Replace the global view with the given topology and add status for the
-    elements.
+    Commit the given topology of the request given by id into the global view
+    and add status for the elements.
 
+    :param id: request ID
+    :type id: str or int
     :param nffg: new global topology
     :type nffg: :class:`NFFG`
     :return: None
@@ -2017,7 +2528,7 @@ class GlobalResourceManager(object):
       return
     if nffg.is_virtualized():
       log.debug("Update NFFG contains virtualized node(s)!")
-      if self.__dov.get_resource_info().is_virtualized():
+      if self.__dov.get_snapshot().nffg.is_virtualized():
         log.debug("DoV also contains virtualized node(s)! "
                   "Enable DoV rewriting!")
       else:
@@ -2026,11 +2537,11 @@ class GlobalResourceManager(object):
         return
     log.debug("Migrate status info of deployed elements from DoV...")
     NFFGToolBox.update_status_by_dov(nffg=nffg,
-                                     dov=self.__dov.get_resource_info(),
+                                     dov=self.__dov.get_snapshot().nffg,
                                      log=log)
-    self.set_global_view(nffg=nffg)
-    log.log(VERBOSE,
-            "Updated DoV:\n%s" % self.__dov.get_resource_info().dump())
+    self.commit_global_view(id=id, nffg=nffg)
+    log.log(VERBOSE, "Updated DoV:\n%s",
+            LazyDump(lambda: self.__dov.get_snapshot().nffg.dump()))
 
   def add_domain (self, domain, nffg):
     """
@@ -2059,9 +2570,7 @@ class GlobalResourceManager(object):
           log.warning("Got empty data. Add uninitialized domain...")
       # Add detected domain to cached domains
       self.__tracked_domains.add(domain)
-      notify_remote_visualizer(data=self.__dov.get_resource_info(),
-                               unique_id="DOV",
-                               params={"event": "datastore"})
+      self.__notify_visualizer()
     else:
       log.error("New domain: %s has already tracked in domains: %s! "
                 "Abort adding..." % (domain, self.__tracked_domains))
@@ -2087,9 +2596,7 @@ class GlobalResourceManager(object):
       else:
         log.debug("Using UPDATE strategy for DoV update...")
         self.__dov.update_domain_in_dov(domain=domain, nffg=nffg)
-      notify_remote_visualizer(data=self.__dov.get_resource_info(),
-                               unique_id="DOV",
-                               params={"event": "datastore"})
+      self.__notify_visualizer()
     else:
       log.error(
         "Detected domain: %s is not included in tracked domains: %s! Abort "
@@ -2107,9 +2614,7 @@ class GlobalResourceManager(object):
       log.info("Remove domain: %s from DoV..." % domain)
       self.__dov.remove_domain_from_dov(domain=domain)
       self.__tracked_domains.remove(domain)
-      notify_remote_visualizer(data=self.__dov.get_resource_info(),
-                               unique_id="DOV",
-                               params={"event": "datastore"})
+      self.__notify_visualizer()
     else:
       log.warning("Removing domain: %s is not included in tracked domains: %s! "
                   "Skip removing..." % (domain, self.__tracked_domains))
@@ -2126,9 +2631,7 @@ class GlobalResourceManager(object):
       log.info(
         "Remove initiated VNFs and flowrules from the domain: %s" % domain)
       self.__dov.clean_domain_from_dov(domain=domain)
-      notify_remote_visualizer(data=self.__dov.get_resource_info(),
-                               unique_id="DOV",
-                               params={"event": "datastore"})
+      self.__notify_visualizer()
     else:
       log.error(
         "Detected domain: %s is not included in tracked domains: %s! Abort "
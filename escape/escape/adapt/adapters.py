@@ -15,9 +15,11 @@
 Contains Adapter classes which contains protocol and technology specific
 details for the connections between ESCAPEv2 and other different domains.
 """
+import httplib
 import json
 import os
 import pprint
+import time
 
 from escape import __version__
 from escape.nffg_lib.nffg import NFFGToolBox
@@ -25,7 +27,7 @@ from escape.util.com_logger import MessageDumper
 from escape.util.config import CONFIG, PROJECT_ROOT
 from escape.util.conversion import NFFGConverter, UC3MNFFGConverter
 from escape.util.domain import *
-from escape.util.misc import unicode_to_str
+from escape.util.misc import unicode_to_str, LazyDump
 from escape.util.stat import stats
 from escape.util.virtualizer_helper import is_identical, is_empty
 from pox.lib.util import dpid_to_str
@@ -150,6 +152,7 @@ class InternalPOXAdapter(AbstractOFControllerAdapter):
     :type event: :class:`pox.openflow.ConnectionDown`
     """
     log.debug("Handle disconnection by %s" % self.task_name)
+    super(InternalPOXAdapter, self)._handle_ConnectionDown(event)
     if event.dpid in self.infra_to_dpid.itervalues():
       for k in self.infra_to_dpid:
         if self.infra_to_dpid[k] == event.dpid:
@@ -440,7 +443,7 @@ class NFFGBasedStaticFileAdapter(StaticFileAdapter):
                       "Skip static link duplication..." % backward_links)
         else:
           log.debug("Skip static link duplication...")
-        log.log(VERBOSE, "Loaded topology:\n%s" % topo.dump())
+        log.log(VERBOSE, "Loaded topology:\n%s", LazyDump(topo.dump))
         # Save topology file
         self.topo = topo
         # print self.topo.dump()
@@ -506,10 +509,11 @@ class VirtualizerBasedStaticFileAdapter(StaticFileAdapter):
       path = os.path.join(PROJECT_ROOT, path)
       log.debug("Load topology from file: %s" % path)
       self.virtualizer = Virtualizer.parse_from_file(filename=path)
-      log.log(VERBOSE, "Loaded topology:\n%s" % self.virtualizer.xml())
+      log.log(VERBOSE, "Loaded topology:\n%s",
+              LazyDump(self.virtualizer.xml))
       nffg = self.converter.parse_from_Virtualizer(vdata=self.virtualizer)
       self.topo = self.rewrite_domain(nffg)
-      log.log(VERBOSE, "Converted topology:\n%s" % self.topo.dump())
+      log.log(VERBOSE, "Converted topology:\n%s", LazyDump(self.topo.dump))
     except IOError:
       log.warning("Topology file not found: %s" % path)
     except ValueError as e:
@@ -618,7 +622,8 @@ class UnifyRESTAdapter(AbstractRESTAdapter, AbstractESCAPEAdapter,
   CALLBACK_NAME = "call-back"
   SKIPPED_REQUEST = 0
 
-  def __init__ (self, url, prefix="", features=None, **kwargs):
+  def __init__ (self, url, prefix="", features=None, conditional_edit=False,
+                **kwargs):
     """
     Init.
 
@@ -628,6 +633,10 @@ class UnifyRESTAdapter(AbstractRESTAdapter, AbstractESCAPEAdapter,
     :type prefix: str
     :param features: limitation anf filter parameters for the Adapter class
     :type features: dict
+    :param conditional_edit: send the ETag of the topology as If-Match with
+      edit-config, only if the ETag of the domain covers the edit-config
+      target (default: False)
+    :type conditional_edit: bool
     :return: None
     """
     AbstractRESTAdapter.__init__(self, base_url=url, prefix=prefix, **kwargs)
@@ -641,10 +650,15 @@ class UnifyRESTAdapter(AbstractRESTAdapter, AbstractESCAPEAdapter,
       domain=self.domain_name,
       logger=log)
     self.features = features if features is not None else {}
+    self.conditional_edit = conditional_edit
     # Cache for parsed Virtualizer
     self.__last_virtualizer = None
     self.__last_request = None
     self.__original_virtualizer = None
+    # Freshness of the cached Virtualizer: revision, update time and ETag
+    self.__topo_revision = 0
+    self.__topo_timestamp = None
+    self.__topo_etag = None
 
   @property
   def last_virtualizer (self):
@@ -662,6 +676,51 @@ class UnifyRESTAdapter(AbstractRESTAdapter, AbstractESCAPEAdapter,
     """
     return self.__last_request
 
+  @property
+  def topology_revision (self):
+    """
+    :return: Return the revision of the cached topology.
+    :rtype: int
+    """
+    return self.__topo_revision
+
+  @property
+  def topology_age (self):
+    """
+    :return: Return the elapsed time since the cached topology has been
+      received or confirmed by the domain or None if it is invalidated.
+    :rtype: float
+    """
+    if self.__last_virtualizer is None or self.__topo_timestamp is None:
+      return None
+    return time.time() - self.__topo_timestamp
+
+  def invalidate_topology (self):
+    """
+    Mark the cached topology as outdated, so the next
+    :meth:`get_recent_config` call will request the domain explicitly.
+
+    :return: None
+    """
+    self.__topo_timestamp = None
+
+  def get_recent_config (self, max_age=None):
+    """
+    Return the cached topology if it was received or confirmed by the domain
+    within ``max_age`` seconds, otherwise request it with :meth:`get_config`.
+
+    :param max_age: max staleness of the cached topology in sec
+    :type max_age: float
+    :return: infrastructure view in the original format
+    :rtype: :class:`Virtualizer`
+    """
+    age = self.topology_age
+    if max_age and age is not None and age <= max_age:
+      log.debug("Reuse cached topology of domain: %s (revision: %s, age: "
+                "%.3fs)" % (self.domain_name, self.__topo_revision, age))
+      return self.__last_virtualizer
+    return self.get_config()
+
   def ping (self):
     """
     Call the ping RPC.
@@ -705,9 +764,10 @@ class UnifyRESTAdapter(AbstractRESTAdapter, AbstractESCAPEAdapter,
         log.error("Received data is not in XML format!")
         return
       virt = Virtualizer.parse_from_text(text=data)
-      log.log(VERBOSE,
-              "Received message to 'get-config' request:\n%s" % virt.xml())
+      log.log(VERBOSE, "Received message to 'get-config' request:\n%s",
+              LazyDump(virt.xml))
       self.__cache_topology(virt)
+      self.store_validators('get-config')
       return virt
     else:
       log.error("No data has been received from remote agent at %s!" %
@@ -756,7 +816,7 @@ class UnifyRESTAdapter(AbstractRESTAdapter, AbstractESCAPEAdapter,
           virtualizer=self.last_virtualizer, nffg=data, reinstall=diff)
       stats.add_measurement_end_entry(type=stats.TYPE_CONVERSION,
                                       info="%s-deploy" % self.domain_name)
-      log.log(VERBOSE, "Adapted Virtualizer:\n%s" % vdata.xml())
+      log.log(VERBOSE, "Adapted Virtualizer:\n%s", LazyDump(vdata.xml))
     else:
       raise RuntimeError("Not supported config format: %s for 'edit-config'!" %
                          type(data))
@@ -771,7 +831,7 @@ class UnifyRESTAdapter(AbstractRESTAdapter, AbstractESCAPEAdapter,
     else:
       log.debug("Using given Virtualizer as full mapping request")
     plain_data = vdata.xml()
-    log.log(VERBOSE, "Generated Virtualizer:\n%s" % plain_data)
+    log.log(VERBOSE, "Generated Virtualizer:\n%s", plain_data)
     if is_empty(virtualizer=vdata):
       log.info("Generated edit-config request is empty! Skip sending...")
       return self.SKIPPED_REQUEST
@@ -784,23 +844,54 @@ class UnifyRESTAdapter(AbstractRESTAdapter, AbstractESCAPEAdapter,
     if callback is not None:
       params[self.CALLBACK_NAME] = callback
       log.debug("Using explicit callback: %s" % callback)
-    MessageDumper().dump_to_file(data=plain_data,
-                                 unique="%s-edit-config" % self.domain_name)
+    headers = {}
+    if self.conditional_edit and self.__topo_etag is not None:
+      # Let the domain reject the request if the base topology is outdated
+      headers['If-Match'] = self.__topo_etag
+    # Drop previous response to avoid checking stale status code
+    self._response = None
+    failed = True
     try:
       response = self.send_with_timeout(method=self.POST,
                                         url='edit-config',
                                         body=plain_data,
-                                        params=params)
+                                        params=params,
+                                        headers=headers)
+      failed = response is None
     except Timeout:
       log.warning(
         "Reached timeout(%ss) while waiting for 'edit-config' response!"
         " Ignore exception..." % self.CONNECTION_TIMEOUT)
+      self.invalidate_topology()
+      failed = False
       # Ignore exception - assume the request was successful -> return True
       return True
+    finally:
+      MessageDumper().dump_to_file(data=plain_data,
+                                   unique="%s-edit-config" % self.domain_name,
+                                   failed=failed)
     if response is not None:
       log.debug("Deploy request has been sent successfully!")
+      # Domain state has been changed -> cached topology is outdated
+      self.invalidate_topology()
     return response
 
+  def is_conflict (self):
+    """
+    Return True if the last request was rejected by the domain due to an
+    outdated base topology.
+
+    A failed precondition only means a conflict if the request was sent with
+    If-Match, see ``conditional_edit``.
+
+    :return: conflict detected
+    :rtype: bool
+    """
+    status = self.get_last_response_status()
+    if status == httplib.PRECONDITION_FAILED:
+      return self.conditional_edit
+    return status == httplib.CONFLICT
+
   def get_last_message_id (self):
     """
     :return: Return the last sent request id
@@ -824,7 +915,7 @@ class UnifyRESTAdapter(AbstractRESTAdapter, AbstractESCAPEAdapter,
     :return: status code or the returned message-id if it is set
     :rtype: str
     """
-    log.log(VERBOSE, "Generated Info:\n%s" % info.xml())
+    log.log(VERBOSE, "Generated Info:\n%s", LazyDump(info.xml))
     params = {}
     if message_id is not None:
       params[self.MESSAGE_ID_NAME] = message_id
@@ -832,19 +923,25 @@ class UnifyRESTAdapter(AbstractRESTAdapter, AbstractESCAPEAdapter,
     if callback is not None:
       params[self.CALLBACK_NAME] = callback
       log.debug("Using explicit callback: %s" % callback)
-    MessageDumper().dump_to_file(data=info.xml(),
-                                 unique="%s-info" % self.domain_name)
+    plain_data = info.xml()
+    failed = True
     try:
       status = self.send_with_timeout(method=self.POST,
                                       url='info',
-                                      body=info.xml(),
+                                      body=plain_data,
                                       params=params)
+      failed = status is None
     except Timeout:
       log.warning(
         "Reached timeout(%ss) while waiting for 'info' response!"
         " Ignore exception..." % self.CONNECTION_TIMEOUT)
+      failed = False
       # Ignore exception - assume the request was successful -> return True
       return True
+    finally:
+      MessageDumper().dump_to_file(data=plain_data,
+                                   unique="%s-info" % self.domain_name,
+                                   failed=failed)
     if status is not None:
       log.debug("Info request has been sent successfully!")
     return status
@@ -887,8 +984,8 @@ class UnifyRESTAdapter(AbstractRESTAdapter, AbstractESCAPEAdapter,
     # Convert from XML-based Virtualizer to NFFG
     nffg = self.converter.parse_from_Virtualizer(vdata=virt)
     self.__process_features(nffg=nffg)
-    log.log(VERBOSE, "Converted NFFG of 'get-config' response:\n%s" %
-            nffg.dump())
+    log.log(VERBOSE, "Converted NFFG of 'get-config' response:\n%s",
+            LazyDump(nffg.dump))
     # If first get-config
     if self.__original_virtualizer is None:
       log.debug("Store Virtualizer(id: %s, name: %s) as the original domain "
@@ -919,15 +1016,22 @@ class UnifyRESTAdapter(AbstractRESTAdapter, AbstractESCAPEAdapter,
     the domain changed.
 
     Detection of changes is based on the ``reduce()`` function of the
-    ``Virtualizer``.
+    ``Virtualizer``. Parsing is skipped if the remote agent responds with
+    *Not Modified* to the conditional request or the received raw body is
+    identical to the last accepted one.
 
     :return: the received topology is different from cached one
     :rtype: bool or None or :class:`NFFG`
     """
     # Get full topology as a Virtualizer
-    data = self.send_no_error(self.POST, 'get-config')
+    data = self.send_conditional(self.POST, 'get-config')
+    if data is self.NOT_MODIFIED:
+      # The cached topology is confirmed by the domain
+      if self.last_virtualizer is not None:
+        self.__topo_timestamp = time.time()
+      return False
     # Got data
-    if data:
+    elif data:
       # Check the content type or try to recognize the standard XML opening tag
       if not self.is_content_type("xml") and \
          not data.startswith("<?xml version="):
@@ -945,16 +1049,20 @@ class UnifyRESTAdapter(AbstractRESTAdapter, AbstractESCAPEAdapter,
       return None
     # Get the changes happened since the last get-config
     if not self.__is_changed(virt):
+      # Same topology in different raw format -> skip parsing next time
+      self.store_validators('get-config')
+      self.__topo_timestamp = time.time()
       return False
     else:
       log.info("Received changed topology from domain: %s" % self.domain_name)
-      log.log(VERBOSE, "Changed domain topology from: %s:\n%s" % (
-        self.domain_name, virt.xml()))
+      log.log(VERBOSE, "Changed domain topology from: %s:\n%s",
+              self.domain_name, LazyDump(virt.xml))
       MessageDumper().dump_to_file(data=virt.xml(),
                                    unique="%s-get-config-changed" %
                                           self.domain_name)
       # Cache new topo
       self.__cache_topology(virt)
+      self.store_validators('get-config')
       # Return with the changed topo in NFFG
       changed_topo = self.converter.parse_from_Virtualizer(vdata=virt)
       self.__process_features(nffg=changed_topo)
@@ -972,6 +1080,9 @@ class UnifyRESTAdapter(AbstractRESTAdapter, AbstractESCAPEAdapter,
     # self.__last_virtualizer = data.full_copy()
     # Copy reference instead of full_copy to avoid overhead
     self.__last_virtualizer = data
+    self.__topo_revision += 1
+    self.__topo_timestamp = time.time()
+    self.__topo_etag = self.get_last_response_headers().get('ETag')
 
   def get_topo_cache (self):
     return self.__last_virtualizer
@@ -1089,8 +1200,8 @@ class BGPLSRESTAdapter(AbstractRESTAdapter, AbstractESCAPEAdapter,
       except ValueError:
         log.error("Received data from BGP-LS speaker is not valid JSON!")
         return
-      log.log(VERBOSE, "Received topology from BGP-LS speaker:\n%s" %
-              pprint.pformat(network_topo))
+      log.log(VERBOSE, "Received topology from BGP-LS speaker:\n%s",
+              LazyDump(pprint.pformat, network_topo))
       return network_topo
     else:
       log.warning("No data has been received from client at %s!" %
@@ -1110,6 +1221,7 @@ class BGPLSRESTAdapter(AbstractRESTAdapter, AbstractESCAPEAdapter,
     if nffg is not None:
       log.debug("Cache received topology...")
       self.__cache(nffg=nffg)
+      self.store_validators('virtualizer')
       return nffg
     log.warning("Converted NFFG is missing!")
 
@@ -1122,8 +1234,10 @@ class BGPLSRESTAdapter(AbstractRESTAdapter, AbstractESCAPEAdapter,
     :return: the received topology is different from cached one
     :rtype: bool or None or :class:`NFFG`
     """
-    raw_data = self.send_quietly(self.GET, 'virtualizer')
-    if raw_data is None:
+    raw_data = self.send_conditional(self.GET, 'virtualizer', quietly=True)
+    if raw_data is self.NOT_MODIFIED:
+      return False
+    elif raw_data is None:
       # Probably lost connection with agent
       log.warning("Requested network topology is missing from domain: %s!" %
                   self.domain_name)
@@ -1135,12 +1249,15 @@ class BGPLSRESTAdapter(AbstractRESTAdapter, AbstractESCAPEAdapter,
       log.warning("Missing last received topo description!")
       return
     if not self.__is_changed(new_data=nffg):
+      if nffg is not None:
+        self.store_validators('virtualizer')
       return False
     else:
       log.debug("Domain topology has been changed in domain: %s!" %
                 self.domain_name)
-      log.log(VERBOSE, "New topology \n%s" % nffg.dump())
+      log.log(VERBOSE, "New topology \n%s", LazyDump(nffg.dump))
       self.__cache(nffg=nffg)
+      self.store_validators('virtualizer')
       return nffg
 
   def __is_changed (self, new_data):
@@ -11,14 +11,16 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import math
 import threading
+import time
 import urlparse
 from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
-from threading import Thread, Timer
+from threading import Thread
 
 from escape.adapt import log as log
 from escape.util.config import CONFIG
-from escape.util.misc import Singleton
+from escape.util.misc import Singleton, call_as_coop_task
 from escape.util.stat import stats
 
 log = log.getChild('callback')
@@ -153,9 +155,193 @@ class CallbackHandler(BaseHTTPRequestHandler):
       return path[1]
 
 
+class WheelTimer(object):
+  """
+  Timer handler registered in a :class:`TimerWheel`.
+  """
+
+  def __init__ (self, wheel, interval, function, args=None, kwargs=None):
+    """
+    Init.
+
+    :param wheel: container timer wheel
+    :type wheel: :class:`TimerWheel`
+    :param interval: timeout value in sec
+    :type interval: float
+    :param function: function called at expiration
+    :type function: callable
+    :param args: positional args of the function
+    :type args: list
+    :param kwargs: keyword args of the function
+    :type kwargs: dict
+    """
+    self.wheel = wheel
+    self.interval = interval
+    self.function = function
+    self.args = args if args is not None else []
+    self.kwargs = kwargs if kwargs is not None else {}
+    # Position in the wheel
+    self.slot = None
+    self.rounds = 0
+    self.cancelled = False
+
+  def cancel (self):
+    """
+    Stop the timer if it has not been expired yet.
+
+    :return: None
+    """
+    self.wheel.cancel(self)
+
+  def fire (self):
+    """
+    Call the function of the expired timer unless it has been cancelled in
+    the meantime.
+
+    :return: None
+    """
+    if self.cancelled:
+      return
+    try:
+      self.function(*self.args, **self.kwargs)
+    except Exception:
+      log.exception("Got unexpected exception in expired timer of %s!"
+                    % self.function)
+
+
+class TimerWheel(Thread):
+  """
+  Hashed timing wheel which runs the expiration of every callback timer in one
+  background thread instead of starting a separate thread for each timer.
+
+  The functions of the expired timers are dispatched into the cooperative
+  context of POX by default.
+  """
+  DEFAULT_TICK = 0.1
+  """Resolution of the timers in sec"""
+  DEFAULT_SIZE = 512
+  """Number of slots in the wheel"""
+
+  def __init__ (self, tick=DEFAULT_TICK, size=DEFAULT_SIZE, dispatch=None):
+    """
+    Init.
+
+    :param tick: resolution of the timers in sec
+    :type tick: float
+    :param size: number of slots in the wheel
+    :type size: int
+    :param dispatch: function used to call the expired timers
+      (default: :func:`call_as_coop_task`)
+    :type dispatch: callable
+    """
+    Thread.__init__(self, name=self.__class__.__name__)
+    self.daemon = True
+    self.tick = tick
+    self.__slots = [set() for _ in xrange(size)]
+    self.__cursor = 0
+    self.__count = 0
+    self.__next_tick = None
+    self.__cond = threading.Condition()
+    self.__dispatch = dispatch if dispatch is not None else call_as_coop_task
+
+  def schedule (self, interval, function, args=None, kwargs=None):
+    """
+    Register a timer which calls the given ``function`` after ``interval``.
+
+    :param interval: timeout value in sec
+    :type interval: float
+    :param function: function called at expiration
+    :type function: callable
+    :param args: positional args of the function
+    :type args: list
+    :param kwargs: keyword args of the function
+    :type kwargs: dict
+    :return: registered timer
+    :rtype: :class:`WheelTimer`
+    """
+    timer = WheelTimer(wheel=self, interval=interval, function=function,
+                       args=args, kwargs=kwargs)
+    ticks = max(1, int(math.ceil(interval / self.tick)))
+    with self.__cond:
+      if not self.isAlive():
+        self.start()
+      if not self.__count:
+        # Wheel is idle -> restart ticking from now
+        self.__next_tick = time.time() + self.tick
+      timer.slot = (self.__cursor + ticks) % len(self.__slots)
+      timer.rounds = (ticks - 1) // len(self.__slots)
+      self.__slots[timer.slot].add(timer)
+      self.__count += 1
+      self.__cond.notify()
+    return timer
+
+  def cancel (self, timer):
+    """
+    Remove the given timer from the wheel.
+
+    :param timer: registered timer
+    :type timer: :class:`WheelTimer`
+    :return: None
+    """
+    with self.__cond:
+      if timer.slot is not None and timer in self.__slots[timer.slot]:
+        self.__slots[timer.slot].remove(timer)
+        self.__count -= 1
+      timer.slot = None
+      timer.cancelled = True
+
+  def __advance (self):
+    """
+    Step the wheel with one tick and collect the expired timers.
+
+    :return: expired timers
+    :rtype: list
+    """
+    self.__cursor = (self.__cursor + 1) % len(self.__slots)
+    slot = self.__slots[self.__cursor]
+    expired = [t for t in slot if t.rounds == 0]
+    for timer in slot:
+      timer.rounds -= 1
+    for timer in expired:
+      slot.remove(timer)
+      timer.slot = None
+    self.__count -= len(expired)
+    return expired
+
+  def run (self):
+    """
+    Step the wheel and dispatch the functions of the expired timers.
+
+    :return: None
+    """
+    while True:
+      with self.__cond:
+        while not self.__count:
+          self.__cond.wait()
+        delay = self.__next_tick - time.time()
+        if delay > 0:
+          self.__cond.wait(delay)
+          continue
+        self.__next_tick += self.tick
+        expired = self.__advance()
+      for timer in expired:
+        try:
+          self.__dispatch(timer.fire)
+        except Exception:
+          log.exception("Failed to dispatch expired timer of %s!"
+                        % timer.function)
+
+
+timer_wheel = TimerWheel()
+"""Shared timer wheel of the callback timers"""
+
+
 class Callback(object):
   """
   Represent a callback and store the related information.
+
+  The callback also acts as a future: the received result can be waited for
+  with :meth:`wait` independently of the other callbacks.
   """
 
   def __init__ (self, hook, callback_id, domain, type, request_id=None,
@@ -181,10 +367,41 @@ class Callback(object):
     self.domain = domain
     self.type = type
     self.request_id = request_id
+    # Request id of the tracing context the callback is registered in
+    self.trace_id = stats.get_request_id()
     self.__timer = None
     self.data = data
     self.result_code = None
     self.body = None
+    self.__done = threading.Event()
+
+  @property
+  def done (self):
+    """
+    :return: Return True if the result of the callback has been received.
+    :rtype: bool
+    """
+    return self.__done.is_set()
+
+  def complete (self):
+    """
+    Mark the callback as finished and wake up the waiters.
+
+    :return: None
+    """
+    self.__done.set()
+
+  def wait (self, timeout=None):
+    """
+    Block-wait until the result of the callback is received.
+
+    :param timeout: max waiting time in sec (optional)
+    :type timeout: float
+    :return: the callback is finished
+    :rtype: bool
+    """
+    self.__done.wait(timeout=timeout)
+    return self.__done.is_set()
 
   def setup_timer (self, timeout, hook, **kwargs):
     """
@@ -205,8 +422,7 @@ class Callback(object):
       log.debug("Setup timeout: %s for callback: %s"
                 % (timeout, self.callback_id))
       kwargs['domain'] = self.domain
-      self.__timer = Timer(timeout, hook, kwargs=kwargs)
-      self.__timer.start()
+      self.__timer = timer_wheel.schedule(timeout, hook, kwargs=kwargs)
     else:
       log.warning("Callback timer has already been set up!")
 
@@ -227,7 +443,7 @@ class Callback(object):
     :return: timeout value
     :rtype: float
     """
-    return float(self.__timer.interval)
+    return float(self.__timer.interval) if self.__timer else None
 
   def short (self):
     """
@@ -269,9 +485,10 @@ class CallbackManager(HTTPServer, Thread):
                         bind_and_activate=False)
     self.wait_timeout = float(timeout)
     self.__register = {}
+    # Callbacks are subscribed from deploy workers and invoked by the server
+    self.__register_lock = threading.Lock()
     self.__domain_proxy = {}
     self.daemon = True
-    self.__blocking_mutex = threading.Event()
     log.debug("Init %s" % self.__class__.__name__)
 
   @classmethod
@@ -403,16 +620,20 @@ class CallbackManager(HTTPServer, Thread):
     """
     log.debug("Register callback for response: %s on domain: %s" %
               (cb_id, domain))
-    if cb_id not in self.__register:
-      cb = Callback(hook=hook, callback_id=cb_id, type=type,
-                    domain=domain, request_id=req_id, data=data)
-      _timeout = timeout if timeout is not None else self.wait_timeout
-      cb.setup_timer(_timeout, self.invoke_hook, msg_id=cb_id, result=0)
-      self.__register[(domain, cb_id)] = cb
-      return cb
-    else:
+    with self.__register_lock:
+      if (domain, cb_id) not in self.__register:
+        cb = Callback(hook=hook, callback_id=cb_id, type=type,
+                      domain=domain, request_id=req_id, data=data)
+        self.__register[(domain, cb_id)] = cb
+      else:
+        cb = None
+    if cb is None:
       log.warning("Hook is already registered for id: %s on domain: %s"
                   % (cb_id, domain))
+      return
+    _timeout = timeout if timeout is not None else self.wait_timeout
+    cb.setup_timer(_timeout, self.invoke_hook, msg_id=cb_id, result=0)
+    return cb
 
   def unsubscribe_callback (self, cb_id, domain):
     """
@@ -427,7 +648,8 @@ class CallbackManager(HTTPServer, Thread):
     """
     log.debug("Unregister callback for response: %s from domain: %s"
               % (cb_id, domain))
-    cb = self.__register.pop((domain, cb_id), None)
+    with self.__register_lock:
+      cb = self.__register.pop((domain, cb_id), None)
     if cb:
       cb.stop_timer()
     return cb
@@ -453,30 +675,30 @@ class CallbackManager(HTTPServer, Thread):
       log.error("Received response code is not valid: %s! Abort callback..."
                 % result)
       return
-    if (domain, msg_id) not in self.__register:
+    with self.__register_lock:
+      cb = self.__register.get((domain, msg_id))
+    if cb is None:
       log.warning("Received unregistered callback with id: %s from domain: %s"
                   % (msg_id, domain))
       return
     log.debug("Received valid callback with id: %s, result: %s from domain: %s"
               % (msg_id, "TIMEOUT" if not result else result, domain))
-    cb = self.__register.get((domain, msg_id))
-    if cb is None:
-      log.error("Missing callback: %s from register!" % msg_id)
-      return
-    stats.add_measurement_start_entry(type=stats.TYPE_DEPLOY_CALLBACK,
-                                      info="%s-callback_received" % domain)
+    stats.add_measurement_end_entry(type=stats.TYPE_DEPLOY_CALLBACK,
+                                    info=domain, request_id=cb.trace_id)
     cb.result_code = result
     cb.body = body
-    if cb.hook is None:
-      log.debug("No hook was defined!")
-      self.__blocking_mutex.set()
-      return
-    elif callable(cb.hook):
-      log.debug("Schedule callback hook: %s" % cb.short())
-      cb.hook(callback=cb)
-    else:
-      log.warning("No callable hook was defined for the received callback: %s!"
-                  % msg_id)
+    try:
+      if cb.hook is None:
+        log.debug("No hook was defined!")
+      elif callable(cb.hook):
+        log.debug("Schedule callback hook: %s" % cb.short())
+        cb.hook(callback=cb)
+      else:
+        log.warning("No callable hook was defined for the received callback: "
+                    "%s!" % msg_id)
+    finally:
+      # Wake up only the waiters of this callback
+      cb.complete()
 
   def register_and_block_wait (self, cb_id, type, req_id=None, data=None,
                                timeout=None):
@@ -499,10 +721,11 @@ class CallbackManager(HTTPServer, Thread):
     cb = self.subscribe_callback(hook=None, cb_id=cb_id, type=type,
                                  req_id=req_id, domain=None,
                                  data=data, timeout=timeout)
+    if cb is None:
+      return
     _timeout = timeout if timeout is not None else self.wait_timeout + 1
     log.debug("Waiting for callback result...")
-    self.__blocking_mutex.wait(timeout=_timeout)
-    self.__blocking_mutex.clear()
+    cb.wait(timeout=_timeout)
     return self.unsubscribe_callback(cb_id=cb.callback_id, domain=None)
 
   def wait_for_callback (self, cb):
@@ -514,9 +737,20 @@ class CallbackManager(HTTPServer, Thread):
     :return: original callback object
     :rtype cb: :class:`Callback`
     """
-    _timeout = cb.get_timer_timeout() + 1.0
+    _timeout = self.__get_wait_timeout(cb)
     log.debug("Waiting for callback result...")
-    self.__blocking_mutex.wait(timeout=_timeout)
-    self.__blocking_mutex.clear()
+    cb.wait(timeout=_timeout)
     return self.unsubscribe_callback(cb_id=cb.callback_id,
                                      domain=cb.domain)
+
+  def __get_wait_timeout (self, cb):
+    """
+    Return the block-wait timeout of the given callback.
+
+    :param cb: callback object
+    :type cb: :class:`Callback`
+    :return: timeout value
+    :rtype: float
+    """
+    timeout = cb.get_timer_timeout()
+    return (timeout if timeout is not None else self.wait_timeout) + 1.0
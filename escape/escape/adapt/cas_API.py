@@ -107,6 +107,9 @@ class ControllerAdaptationAPI(AbstractAPI):
     """
     log.debug("Initializing Controller Adaptation Sublayer...")
     self.controller_adapter = ControllerAdapter(self, with_infr=self._with_infr)
+    # Concurrently orchestrated requests are committed against the DoV revision
+    RequestScheduler().register_revision_source(
+      lambda: self.controller_adapter.DoVManager.dov.revision)
     if self._mapped_nffg:
       try:
         mapped_request = self._read_data_from_file(self._mapped_nffg)
@@ -178,7 +181,8 @@ class ControllerAdaptationAPI(AbstractAPI):
       deploy_status = self.controller_adapter.install_nffg(
         mapped_nffg=mapped_nffg,
         original_request=original_request,
-        direct_deploy=direct_deploy)
+        direct_deploy=direct_deploy,
+        revision=RequestScheduler().get_admission_revision(id=mapped_nffg.id))
     except Exception as e:
       log.error("Something went wrong during NFFG installation: %s" % e)
       self._process_mapping_result(nffg_id=mapped_nffg.id, fail=True)
@@ -188,6 +192,8 @@ class ControllerAdaptationAPI(AbstractAPI):
       return
     log.getChild('API').debug("Invoked install_nffg on %s is finished!" %
                               self.__class__.__name__)
+    if deploy_status is not None and deploy_status.conflict:
+      RequestScheduler().set_request_conflict(id=mapped_nffg.id)
     if deploy_status is None:
       log.error("Deploy status is missing!")
       self._process_mapping_result(nffg_id=mapped_nffg.id, fail=True)
@@ -218,6 +224,12 @@ class ControllerAdaptationAPI(AbstractAPI):
       log.getChild('API').debug("Request status is missing for NFFG: %s! "
                                 "Skip result processing..." % nffg_id)
       return
+    # Only the layer which received the request handles its result, and
+    # it can be retried exclusively if it conflicted with concurrent requests
+    if fail and RequestScheduler().reschedule_failed_request(id=nffg_id):
+      log.getChild('API').debug("Request: %s is rescheduled! "
+                                "Skip result processing..." % nffg_id)
+      return
     log.getChild('API').debug("Process mapping result...")
     message_id = req_status.message_id
     if message_id is not None:
@@ -16,13 +16,21 @@ Contains Manager classes which contains the higher-level logic for complete
 domain management. Uses Adapter classes for ensuring protocol-specific
 connections with entities in the particular domain.
 """
-from escape.adapt.callback import CallbackManager
+import functools
+import httplib
+import itertools
+import time
+
+from escape.adapt.callback import CallbackManager, Callback
 from escape.util.api import RequestScheduler
 from escape.util.config import CONFIG
 from escape.util.conversion import NFFGConverter
 from escape.util.domain import *
-from escape.util.misc import get_global_parameter, schedule_as_coop_task
+from escape.util.metrics import metrics
+from escape.util.misc import get_global_parameter, schedule_as_coop_task, \
+  LazyDump
 from escape.util.stat import stats
+from pox.core import core
 from pox.lib.util import dpid_to_str
 
 
@@ -190,17 +198,28 @@ class SDNDomainManager(AbstractDomainManager):
   .. note::
     Uses :class:`InternalPOXAdapter` for controlling the network.
   """
+  # Events raised by this class
+  _eventMixin_events = {DomainChangedEvent, EditConfigHookEvent}
   # Domain name
   name = "SDN"
   # Default domain name
   DEFAULT_DOMAIN_NAME = "SDN"
+  # Default timeout of switch confirmations in sec
+  DEFAULT_CONFIRM_TIMEOUT = 5.0
+  # Callback type of confirmed installations
+  CALLBACK_TYPE_INSTALL = "INSTALL"
 
-  def __init__ (self, domain_name=DEFAULT_DOMAIN_NAME, *args, **kwargs):
+  def __init__ (self, domain_name=DEFAULT_DOMAIN_NAME, confirm=False,
+                confirm_timeout=DEFAULT_CONFIRM_TIMEOUT, *args, **kwargs):
     """
     Init.
 
     :param domain_name: the domain name
     :type domain_name: str
+    :param confirm: wait for the switch confirmations of installed flowrules
+    :type confirm: bool
+    :param confirm_timeout: timeout of switch confirmations in sec
+    :type confirm_timeout: float
     :param args: optional param list
     :type args: list
     :param kwargs: optional keywords
@@ -212,6 +231,12 @@ class SDNDomainManager(AbstractDomainManager):
                                            **kwargs)
     self.controlAdapter = None  # DomainAdapter for POX - InternalPOXAdapter
     self.topoAdapter = None  # SDN topology adapter - SDNDomainTopoAdapter
+    self.confirm = confirm
+    self.confirm_timeout = confirm_timeout
+    # Installations waiting for confirmation:
+    # callback id --> [callback, pending DPIDs, errors, sealed]
+    self.__confirmations = {}
+    self.__confirmation_cntr = itertools.count(1)
 
   def init (self, configurator, **kwargs):
     """
@@ -274,14 +299,128 @@ class SDNDomainManager(AbstractDomainManager):
     """
     self.log.info(">>> Install %s domain part..." % self.domain_name)
     try:
-      result = (self._delete_flowrules(nffg_part=nffg_part),
-                self._deploy_flowrules(nffg_part=nffg_part))
-      return all(result)
+      # Only the differences are sent to the switches based on the shadow
+      # flow tables, so explicit flowrule deletion is not necessary
+      if not self.confirm:
+        return self._deploy_flowrules(nffg_part=nffg_part)
+      cb = self.__setup_confirmation(nffg_part=nffg_part)
+      if not self._deploy_flowrules(nffg_part=nffg_part,
+                                    callback_id=cb.callback_id):
+        self.__confirmations[cb.callback_id][2].append(
+          "Flowrule deploy was unsuccessful")
+      # Every batch is sent --> the installation can be finished
+      self.__confirmations[cb.callback_id][3] = True
+      self.__check_confirmation(callback_id=cb.callback_id)
+      # The result is reported by an EditConfigHookEvent
+      return True
     except:
       self.log.exception(
         "Got exception during NFFG installation into: %s!" % self.domain_name)
       return False
 
+  def __setup_confirmation (self, nffg_part):
+    """
+    Register a callback for the confirmation of the given installation.
+
+    :param nffg_part: NF-FG need to be deployed
+    :type nffg_part: :class:`NFFG`
+    :return: registered callback
+    :rtype: :class:`Callback`
+    """
+    cb = Callback(hook=self._confirmation_expired,
+                  callback_id="%s-flowmod-%s" % (self.domain_name,
+                                                 next(self.__confirmation_cntr)),
+                  domain=self.domain_name,
+                  type=self.CALLBACK_TYPE_INSTALL,
+                  request_id=nffg_part.id,
+                  data=nffg_part)
+    self.__confirmations[cb.callback_id] = [cb, set(), [], False]
+    cb.setup_timer(timeout=self.confirm_timeout,
+                   hook=self._confirmation_expired,
+                   callback_id=cb.callback_id)
+    return cb
+
+  def _flowrules_confirmed (self, callback_id, dpid, errors):
+    """
+    Handle the confirmation of the flowrules installed into a switch.
+
+    :param callback_id: id of the related installation callback
+    :type callback_id: str
+    :param dpid: DPID of the switch
+    :type dpid: int
+    :param errors: received errors
+    :type errors: list
+    :return: None
+    """
+    confirmation = self.__confirmations.get(callback_id)
+    if confirmation is None:
+      self.log.debug("Installation: %s has already been finished! "
+                     "Skip confirmation of DPID: %s" % (callback_id,
+                                                         dpid_to_str(dpid)))
+      return
+    self.log.debug("Flowrules of DPID: %s have been confirmed for "
+                   "installation: %s" % (dpid_to_str(dpid), callback_id))
+    confirmation[1].discard(dpid)
+    confirmation[2].extend(errors)
+    self.__check_confirmation(callback_id=callback_id)
+
+  def __check_confirmation (self, callback_id):
+    """
+    Finish the given installation if every switch has confirmed it.
+
+    :param callback_id: id of the installation callback
+    :type callback_id: str
+    :return: None
+    """
+    cb, pending, errors, sealed = self.__confirmations[callback_id]
+    if not sealed or pending:
+      return
+    del self.__confirmations[callback_id]
+    cb.stop_timer()
+    cb.body = errors
+    if errors:
+      self.log.error("Installation: %s has been confirmed with errors:\n%s" %
+                     (callback_id, "\n".join(errors)))
+      cb.result_code = httplib.INTERNAL_SERVER_ERROR
+      status = EditConfigHookEvent.STATUS_ERROR
+    else:
+      self.log.info("Installation: %s has been confirmed by every switch!"
+                    % callback_id)
+      cb.result_code = httplib.OK
+      status = EditConfigHookEvent.STATUS_OK
+    # Raise the result after the deploy status has been updated
+    core.callLater(self.raiseEventNoErrors, EditConfigHookEvent,
+                   domain=self.domain_name, status=status, callback=cb)
+
+  @schedule_as_coop_task
+  def _confirmation_expired (self, domain, callback_id):
+    """
+    Handle the expired timeout of the given installation.
+
+    :param domain: domain name
+    :type domain: str
+    :param callback_id: id of the installation callback
+    :type callback_id: str
+    :return: None
+    """
+    confirmation = self.__confirmations.pop(callback_id, None)
+    if confirmation is None:
+      return
+    cb, pending, errors, sealed = confirmation
+    self.log.warning("Confirmation of installation: %s in domain: %s exceeded "
+                     "timeout(%s)! Missing DPIDs: %s" %
+                     (callback_id, domain, self.confirm_timeout,
+                      map(dpid_to_str, pending)))
+    # The actual flow tables of the silent switches are unknown
+    for dpid in pending:
+      self.controlAdapter.invalidate_flow_table(dpid=dpid)
+    cb.result_code = 0
+    cb.body = errors
+    self.raiseEventNoErrors(EditConfigHookEvent,
+                            domain=self.domain_name,
+                            status=EditConfigHookEvent.STATUS_TIMEOUT,
+                            callback=cb)
+
   def _delete_flowrules (self, nffg_part):
     """
     Delete all flowrules from the first (default) table of all infras.
@@ -318,14 +457,17 @@ class SDNDomainManager(AbstractDomainManager):
                    ("SUCCESS" if result else "FAILURE"))
     return result
 
-  def _deploy_flowrules (self, nffg_part):
+  def _deploy_flowrules (self, nffg_part, callback_id=None):
     """
     Install the flowrules given in the NFFG.
 
-    If a flowrule is already defined it will be updated.
+    Only the differences compared to the shadow flow tables of the switches
+    are sent. If a flowrule is already defined it will be updated.
 
     :param nffg_part: NF-FG need to be deployed
     :type nffg_part: :class:`NFFG`
+    :param callback_id: id of the installation waiting for confirmation
+    :type callback_id: str
     :return: deploy was successful or not
     :rtype: bool
     """
@@ -371,6 +513,7 @@ class SDNDomainManager(AbstractDomainManager):
           "DPID: %s is not found!" % (infra, dpid_to_str(dpid)))
         result = False
         continue
+      flowrules = []
       for port in infra.ports:
         for flowrule in port.flowrules:
           try:
@@ -387,8 +530,15 @@ class SDNDomainManager(AbstractDomainManager):
             result = False
             continue
           self.log.debug("Assemble OpenFlow flowrule from: %s" % flowrule)
-          self.controlAdapter.install_flowrule(infra.id, match=match,
-                                               action=action)
+          flowrules.append((match, action))
+      if callback_id is not None:
+        self.__confirmations[callback_id][1].add(dpid)
+        confirmed = functools.partial(self._flowrules_confirmed, callback_id)
+      else:
+        confirmed = None
+      if not self.controlAdapter.sync_flowrules(infra.id, flowrules=flowrules,
+                                                callback=confirmed):
+        result = False
     self.log.info("Flowrule deploy result: %s" %
                   ("SUCCESS" if result else "FAILURE"))
     return result
@@ -445,13 +595,18 @@ class UnifyDomainManager(AbstractRemoteDomainManager):
   CALLBACK_TYPE_INSTALL = "INSTALL"
   CALLBACK_TYPE_INFO = "INFO"
   CALLBACK_TYPE_RESET = "RESET"
+  # Max age of the cached domain topology reused for deployment in sec
+  DEFAULT_MAX_TOPOLOGY_AGE = 3
 
-  def __init__ (self, domain_name=DEFAULT_DOMAIN_NAME, *args, **kwargs):
+  def __init__ (self, domain_name=DEFAULT_DOMAIN_NAME,
+                max_topology_age=DEFAULT_MAX_TOPOLOGY_AGE, *args, **kwargs):
     """
     Init.
 
     :param domain_name: the domain name
     :type domain_name: str
+    :param max_topology_age: max age of the reused topology cache in sec
+    :type max_topology_age: float
     :param args: optional param list
     :type args: list
     :param kwargs: optional keywords
@@ -466,6 +621,7 @@ class UnifyDomainManager(AbstractRemoteDomainManager):
     self.__disable_poll_during_deployment = CONFIG.no_poll_during_deployment()
     self.__reset_mode = False
     self.__last_success_state = None
+    self.max_topology_age = max_topology_age
 
   def enable_reset_mode (self):
     """
@@ -632,11 +788,11 @@ class UnifyDomainManager(AbstractRemoteDomainManager):
     self.log.info(">>> Install %s domain part..." % self.domain_name)
     try:
       log.debug("Request and store the most recent domain topology....")
-      topo = self.topoAdapter.get_config()
+      topo = self.topoAdapter.get_recent_config(max_age=self.max_topology_age)
       if topo:
         self.__last_success_state = topo
-        log.log(VERBOSE,
-                "Last successful state:\n%s" % self.__last_success_state.xml())
+        log.log(VERBOSE, "Last successful state:\n%s",
+                LazyDump(self.__last_success_state.xml))
       request_params = {"diff": self._diff,
                         "message_id": "edit-config-%s" % nffg_part.id}
       cb = None
@@ -649,27 +805,32 @@ class UnifyDomainManager(AbstractRemoteDomainManager):
                                   msg_id=request_params.get('message_id'),
                                   type=self.CALLBACK_TYPE_INSTALL,
                                   data=nffg_part)
+      edit_start = time.time()
       response = self.topoAdapter.edit_config(nffg_part, **request_params)
+      if response is None and self.topoAdapter.is_conflict():
+        self.log.warning("Domain: %s rejected the request due to outdated "
+                         "topology! Refresh topology and retry..."
+                         % self.domain_name)
+        topo = self.topoAdapter.get_config()
+        if topo:
+          self.__last_success_state = topo
+          response = self.topoAdapter.edit_config(nffg_part, **request_params)
+      metrics.histogram(name="escape_edit_config_duration_seconds",
+                        help="Latency of the edit-config calls.",
+                        labels=("domain",)).observe(time.time() - edit_start,
+                                                    domain=self.domain_name)
       stats.add_measurement_start_entry(type=stats.TYPE_DEPLOY_REQUEST,
-                                        info="%s-%s"
-                                             % (self.domain_name,
-                                                "with_callback" if
-                                                self.callback_manager else
-                                                "no_callback"))
-      if not self.callback_manager:
-        stats.add_measurement_end_entry(type=stats.TYPE_DEPLOY_REQUEST,
-                                        info="%s-no_callback" %
-                                             self.domain_name)
-      else:
-        stats.add_measurement_end_entry(type=stats.TYPE_DEPLOY_REQUEST,
-                                        info="%s-with_callback" %
-                                             self.domain_name)
+                                        info=self.domain_name)
+      stats.add_measurement_end_entry(type=stats.TYPE_DEPLOY_REQUEST,
+                                      info=self.domain_name)
       if self.callback_manager and cb:
         if response is None or response == 0:
           log.debug("Unsubscribe callback of unsuccessful request!")
           self.callback_manager.unsubscribe_callback(cb_id=cb.callback_id,
                                                      domain=self.domain_name)
           return response
+        stats.add_measurement_start_entry(type=stats.TYPE_DEPLOY_CALLBACK,
+                                          info=self.domain_name)
       return response is not None
     except:
       self.log.exception("Got exception during NFFG installation into: %s." %
@@ -692,8 +853,7 @@ class UnifyDomainManager(AbstractRemoteDomainManager):
       log.debug("Request for the most recent domain topology....")
       self.topoAdapter.get_config()
       reset_state = self.__last_success_state
-      log.log(VERBOSE,
-              "Full RESET topology:\n%s" % reset_state)
+      log.log(VERBOSE, "Full RESET topology:\n%s", reset_state)
       request_params = {"diff": self._diff,
                         "message_id": "rollback-%s" % request_id}
       cb = None
@@ -834,9 +994,6 @@ class UnifyDomainManager(AbstractRemoteDomainManager):
     """
     self.log.debug("Callback hook (%s) invoked with callback id: %s" %
                    (callback.type, callback.callback_id))
-    stats.add_measurement_end_entry(type=stats.TYPE_DEPLOY_CALLBACK,
-                                    info="%s-callback_handling"
-                                         % self.domain_name)
     self.callback_manager.unsubscribe_callback(cb_id=callback.callback_id,
                                                domain=self.domain_name)
     if callback.type == self.CALLBACK_TYPE_INSTALL:
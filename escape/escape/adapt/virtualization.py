@@ -14,8 +14,12 @@
 """
 Contains components relevant to virtualization of resources and views.
 """
+import ast
+import copy
+import hashlib
 import threading
 import weakref
+from collections import namedtuple, OrderedDict
 
 import os
 from wrapt.decorators import synchronized
@@ -24,7 +28,8 @@ from escape.adapt import log
 from escape.adapt.policy_enforcement import PolicyEnforcementMetaClass
 from escape.nffg_lib.nffg import NFFGToolBox, NFFG
 from escape.util.config import CONFIG
-from escape.util.misc import enum, VERBOSE
+from escape.util.metrics import metrics
+from escape.util.misc import enum, VERBOSE, LazyDump
 from pox.lib.revent.revent import EventMixin, Event
 
 # Common reference name for the DomainVirtualizer
@@ -41,16 +46,83 @@ class DoVChangedEvent(Event):
   TYPE = enum("UPDATE", "EXTEND", "CHANGE", "REDUCE", "EMPTY")
   """Constants for type of changes"""
 
-  def __init__ (self, cause):
+  def __init__ (self, cause, revision=None, domain=None):
     """
     Init.
 
     :param cause: cause of the change
     :type cause: str
+    :param revision: new revision number of the DoV
+    :type revision: int
+    :param domain: affected domain or None if the whole view can be affected
+    :type domain: str
     :return: None
     """
     super(DoVChangedEvent, self).__init__()
     self.cause = cause
+    self.revision = revision
+    self.domain = domain
+
+
+DomainState = namedtuple('DomainState', ('digest', 'nfs', 'status'))
+"""Structure digest, NF digests and element status of a domain stored in the
+DoV"""
+
+
+class DoVSnapshot(object):
+  """
+  Read-only view of the DoV tied to a specific revision.
+
+  The same snapshot object is shared between every reader of the given
+  revision, so the wrapped topology MUST NOT be modified! Use :meth:`copy` to
+  get a private, modifiable topology.
+  """
+  __slots__ = ('__revision', '__nffg')
+
+  def __init__ (self, revision, nffg):
+    """
+    Init.
+
+    :param revision: DoV revision the snapshot was taken from
+    :type revision: int
+    :param nffg: frozen copy of the global topology
+    :type nffg: :class:`NFFG`
+    :return: None
+    """
+    self.__revision = revision
+    self.__nffg = nffg
+
+  def __str__ (self):
+    """
+    Return with specific string representation.
+
+    :return: string representation
+    :rtype: str
+    """
+    return "DoVSnapshot(revision=%s, nffg=%s)" % (self.__revision, self.__nffg)
+
+  @property
+  def revision (self):
+    """
+    :return: Return the DoV revision of the snapshot.
+    :rtype: int
+    """
+    return self.__revision
+
+  @property
+  def nffg (self):
+    """
+    :return: Return the shared, read-only topology of the snapshot.
+    :rtype: :class:`NFFG`
+    """
+    return self.__nffg
+
+  def copy (self):
+    """
+    :return: Return a private, modifiable copy of the snapshot topology.
+    :rtype: :class:`NFFG`
+    """
+    return self.__nffg.copy()
 
 
 class MissingGlobalViewEvent(Event):
@@ -148,6 +220,7 @@ class AbstractFilteringVirtualizer(AbstractVirtualizer):
     self.__dirty = None  # Set None to signal domain has not changed yet
     self.__revision = None  # Revision number of view, changed by every update
     self.__cache = None  # Cache for computed topology
+    self.__changes = set()  # Pending DoV changes as (cause, domain) tuples
     if global_view is not None:
       # Save the Global view (a.k.a DoV) reference and offer a filtered NFFG
       self.global_view = weakref.proxy(global_view)
@@ -204,10 +277,20 @@ class AbstractFilteringVirtualizer(AbstractVirtualizer):
         self.__roll_next_revision()
       else:
         log.debug("DoV has been changed! Requesting new resource NFFG...")
-      # If Virtualizer dirty resource info is changed since last request or has
-      # never queried yet -> acquire resource info with template method
-      # Acquire and cache new resource
-      self.__cache = self._acquire_resource()
+      updated = None
+      if self.__cache is not None and self.__changes:
+        # Try to patch the cached resource based on the collected changes
+        updated = self._update_resource(resource=self.__cache,
+                                        changes=self.__changes)
+      if updated is not None:
+        log.debug("Cached resource NFFG has been updated incrementally!")
+        self.__cache = updated
+      else:
+        # If Virtualizer dirty resource info is changed since last request or
+        # has never queried yet -> acquire resource info with template method
+        # Acquire and cache new resource
+        self.__cache = self._acquire_resource()
+      self.__changes.clear()
       log.debug("Clear dirty flag...")
       # Clear dirty flag
       self.__dirty = False
@@ -240,6 +323,26 @@ class AbstractFilteringVirtualizer(AbstractVirtualizer):
     # Topology is changed, set dirty flag
     self.__roll_next_revision()
     self.__dirty = True
+    # Repeated changes of the same domain are collapsed, so the set is
+    # bounded by the number of domains even if the view is never queried
+    self.__changes.add((event.cause, getattr(event, 'domain', None)))
+
+  def _update_resource (self, resource, changes):
+    """
+    Template method for updating the cached resource info incrementally based
+    on the collected DoV changes.
+
+    Return None to fall back to the full recalculation with
+    :meth:`_acquire_resource`.
+
+    :param resource: cached resource info
+    :type resource: :class:`NFFG`
+    :param changes: set of (cause, domain) tuples of collected changes
+    :type changes: set
+    :return: updated resource info or None
+    :rtype: :class:`NFFG`
+    """
+    return None
 
   def _acquire_resource (self):
     """
@@ -292,6 +395,21 @@ class DomainVirtualizer(AbstractVirtualizer):
     self._mgr = weakref.proxy(mgr)
     # Define DoV az an empty NFFG by default
     self.__global_nffg = NFFG(id=DoV, name=DoV + "-uninitialized")
+    # Revision number of the DoV, changed by every modification
+    self.__revision = 0
+    # Read-only snapshot of the actual revision created on demand
+    self.__snapshot = None
+    # Domain states of the actual revision calculated on demand:
+    # (revision, {domain name --> DomainState})
+    self.__domain_states = (None, {})
+    # NF id --> mapping info of the hosting BiSBiS
+    self.__nf_bindings = {}
+    # domain name --> ids of the NFs hosted in the domain
+    self.__domain_nfs = {}
+    # domain name --> ids of the BiSBiS nodes of the domain
+    self.__domain_infras = {}
+    # domain name --> (number of hosted NFs, ids of the connected SAPs)
+    self.__domain_sizes = {}
     if global_res is not None:
       self.set_domain_as_global_view(domain=NFFG.DEFAULT_DOMAIN,
                                      nffg=global_res)
@@ -344,16 +462,319 @@ class DomainVirtualizer(AbstractVirtualizer):
     else:
       return False
 
+  @property
+  def revision (self):
+    """
+    :return: Return the revision number of the DoV.
+    :rtype: int
+    """
+    return self.__revision
+
   @synchronized(__DoV_lock)
   def get_resource_info (self):
     """
     Return the copy of the global resource info represented this class.
 
+    The returned topology is owned by the caller and can be modified freely.
+    Use :meth:`get_snapshot` for read-only access.
+
     :return: global resource info
     :rtype: :class:`NFFG`
     """
     return self.__global_nffg.copy()
 
+  @synchronized(__DoV_lock)
+  def get_snapshot (self):
+    """
+    Return the read-only snapshot of the actual DoV revision.
+
+    The topology is copied only once per revision at the first request and
+    the same snapshot is shared between the readers until the next change.
+
+    :return: read-only snapshot of the global resource info
+    :rtype: :any:`DoVSnapshot`
+    """
+    if self.__snapshot is None or self.__snapshot.revision != self.__revision:
+      log.debug("Create DoV snapshot with revision: %s" % self.__revision)
+      self.__snapshot = DoVSnapshot(revision=self.__revision,
+                                    nffg=self.__global_nffg.copy())
+    return self.__snapshot
+
+  def __commit_change (self, cause, domain=None, infras=()):
+    """
+    Step the DoV revision, invalidate the actual snapshot and notify the
+    observing Virtualizers about the topology change.
+
+    Must be called with the DoV lock acquired.
+
+    :param cause: cause of the change
+    :type cause: str
+    :param domain: affected domain or None if the whole view can be affected
+    :type domain: str
+    :param infras: ids of BiSBiS nodes added to the affected domain
+    :type infras: collections.Iterable
+    :return: None
+    """
+    self.__revision += 1
+    self.__snapshot = None
+    log.debug("New DoV revision: %s" % self.__revision)
+    self.__update_domain_index(domain=domain, infras=infras)
+    metrics.gauge(name="escape_dov_revision",
+                  help="Actual revision of the DoV.").set(self.__revision)
+    dov_size = metrics.gauge(name="escape_dov_nodes",
+                             help="Number of nodes in the DoV.",
+                             labels=("type",))
+    dov_size.set(sum(len(i) for i in self.__domain_infras.itervalues()),
+                 type="infra")
+    dov_size.set(sum(n for n, _ in self.__domain_sizes.itervalues()),
+                 type="nf")
+    dov_size.set(len(set().union(*(s for _, s in
+                                   self.__domain_sizes.itervalues()))),
+                 type="sap")
+    # Raise event for observing Virtualizers about topology change
+    self.raiseEventNoErrors(DoVChangedEvent, cause=cause,
+                            revision=self.__revision, domain=domain)
+
+  def __update_domain_index (self, domain=None, infras=()):
+    """
+    Update the NF --> BiSBiS index and the node counters for the given domain
+    or rebuild them for the whole DoV.
+
+    Only the BiSBiS nodes of the affected domain are visited: the ones
+    already indexed and the newly added ones given in ``infras``.
+
+    Must be called with the DoV lock acquired.
+
+    :param domain: affected domain or None to rebuild the whole index
+    :type domain: str
+    :param infras: ids of BiSBiS nodes added to the affected domain
+    :type infras: collections.Iterable
+    :return: None
+    """
+    nffg = self.__global_nffg
+    if domain is None:
+      self.__nf_bindings.clear()
+      self.__domain_nfs.clear()
+      self.__domain_infras.clear()
+      self.__domain_sizes.clear()
+      nodes = list(nffg.infras)
+    else:
+      for nf_id in self.__domain_nfs.pop(domain, ()):
+        self.__nf_bindings.pop(nf_id, None)
+      self.__domain_sizes.pop(domain, None)
+      candidates = self.__domain_infras.pop(domain, set()).union(infras)
+      nodes = [nffg[i] for i in candidates
+               if i in nffg and nffg[i].type == NFFG.TYPE_INFRA and
+               nffg[i].domain == domain]
+    for infra in nodes:
+      self.__domain_infras.setdefault(infra.domain, set()).add(infra.id)
+      nfs, saps = self.__domain_sizes.get(infra.domain, (0, set()))
+      for nf in nffg.running_nfs(infra.id):
+        nfs += 1
+        binding = self.__bind_nf(nf_id=nf.id)
+        if binding is not None:
+          self.__nf_bindings[nf.id] = binding
+          self.__domain_nfs.setdefault(infra.domain, set()).add(nf.id)
+      saps.update(n for n in nffg.network.neighbors(infra.id)
+                  if nffg[n].type == NFFG.TYPE_SAP)
+      self.__domain_sizes[infra.domain] = (nfs, saps)
+
+  def __bind_nf (self, nf_id):
+    """
+    Collect the mapping info of the given NF from the DoV.
+
+    :param nf_id: NF id
+    :type nf_id: str or int
+    :return: mapping info or None if the NF is not bound to one BiSBiS
+    :rtype: dict
+    """
+    bisbis = [n.id for n in self.__global_nffg.infra_neighbors(nf_id)]
+    if len(bisbis) != 1:
+      log.log(VERBOSE, "Detected unexpected number of BiSBiS node: %s for NF: "
+                       "%s!" % (bisbis, nf_id))
+      return None
+    bisbis = bisbis.pop()
+    # Add NF id
+    nf = {"id": nf_id, "ports": []}
+    for dyn_link in self.__global_nffg.network[nf_id][bisbis].itervalues():
+      port = OrderedDict(id=dyn_link.src.id)
+      if dyn_link.src.l4 is not None:
+        try:
+          port['management'] = ast.literal_eval(dyn_link.src.l4)
+        except SyntaxError:
+          log.warning("L4 address entry: %s is not valid Python expression! "
+                      "Add the original string..." % dyn_link.src.l4)
+          port['management'] = dyn_link.src.l4
+      nf['ports'].append(port)
+    # Add infra node ID and domain name
+    bisbis = bisbis.split('@')
+    return {"nf": nf,
+            "bisbis": {"id": bisbis[0],
+                       "domain": bisbis[1] if len(bisbis) > 1 else None}}
+
+  @synchronized(__DoV_lock)
+  def get_nf_binding (self, nf_id):
+    """
+    Return the mapping info of the given NF: the hosting BiSBiS, its domain
+    and the NF ports with management addresses.
+
+    The info is served from an index updated by the DoV modifications.
+
+    :param nf_id: NF id
+    :type nf_id: str or int
+    :return: mapping info or None if the NF is not found
+    :rtype: dict
+    """
+    binding = self.__nf_bindings.get(nf_id)
+    return copy.deepcopy(binding) if binding is not None else None
+
+  @synchronized(__DoV_lock)
+  def get_domain_states (self, domains=None):
+    """
+    Calculate the state of the stored domains without copying the DoV.
+
+    The state consists of a digest of the infrastructure (nodes, resources,
+    ports, static links, flowrules), a digest of every hosted NF with its
+    ports and dynamic links and the status of the deployed NFs and
+    flowrules. The states are calculated only once per revision and only for
+    the requested domains.
+
+    :param domains: requested domain names or None for every domain
+    :type domains: collections.Iterable
+    :return: DoV revision and the domain states keyed by domain names
+    :rtype: tuple
+    """
+    revision, states = self.__domain_states
+    if revision != self.__revision:
+      states = {}
+      self.__domain_states = (self.__revision, states)
+    if domains is None:
+      domains = self.__domain_infras.keys()
+    else:
+      domains = [d for d in set(domains) if d in self.__domain_infras]
+    for domain in domains:
+      if domain not in states:
+        states[domain] = self.__calculate_domain_state(
+          [self.__global_nffg[i] for i in self.__domain_infras[domain]])
+    return self.__revision, {d: states[d] for d in domains}
+
+  @classmethod
+  def __freeze (cls, value):
+    """
+    Convert the given attribute value into an order-independent, comparable
+    form.
+
+    :param value: attribute value
+    :type value: object
+    :return: converted value
+    :rtype: object
+    """
+    if hasattr(value, 'persist'):
+      value = value.persist()
+    if isinstance(value, dict):
+      return tuple(sorted((k, cls.__freeze(v)) for k, v in value.iteritems()))
+    elif isinstance(value, (list, tuple)):
+      return tuple(cls.__freeze(v) for v in value)
+    elif isinstance(value, (set, frozenset)):
+      return tuple(sorted(cls.__freeze(v) for v in value))
+    return value
+
+  @classmethod
+  def __port_state (cls, port):
+    """
+    :return: Return the structural attributes of the given port.
+    :rtype: tuple
+    """
+    return (port.id, port.sap, getattr(port, 'role', None),
+            getattr(port, 'capability', None),
+            getattr(port, 'technology', None), port.l4,
+            cls.__freeze(port.properties),
+            cls.__freeze(getattr(port, 'sap_data', None)))
+
+  @staticmethod
+  def __resource_state (res):
+    """
+    :return: Return the attributes of the given node resource.
+    :rtype: tuple
+    """
+    return tuple(getattr(res, attr, None)
+                 for attr in ('cpu', 'mem', 'storage', 'cost', 'zone',
+                              'delay', 'bandwidth'))
+
+  @staticmethod
+  def __digest (structure):
+    """
+    :return: Return the digest of the given structure.
+    :rtype: str
+    """
+    return hashlib.sha1(repr(structure)).hexdigest()
+
+  def __calculate_domain_state (self, infras):
+    """
+    Calculate the state of the domain defined by the given infra nodes.
+
+    The dynamic ports and links of the infras are part of the digest of the
+    connected NF instead of the infrastructure digest, so deployed and
+    removed NFs can be detected separately.
+
+    :param infras: infra nodes of the domain
+    :type infras: list
+    :return: domain state
+    :rtype: :any:`DomainState`
+    """
+    structure, nfs, status = [], {}, {}
+    network = self.__global_nffg.network
+    for infra in sorted(infras, key=lambda i: i.id):
+      structure.append((infra.id, infra.infra_type,
+                        self.__resource_state(infra.resources),
+                        self.__freeze(infra.supported)))
+      dynamic_ports = set()
+      for nf in self.__global_nffg.running_nfs(infra.id):
+        links = nfs.setdefault(nf.id, [(nf.functional_type,
+                                        getattr(nf, 'deployment_type', None),
+                                        self.__resource_state(nf.resources),
+                                        tuple(self.__port_state(p)
+                                              for p in nf.ports))])
+        for link in network[nf.id][infra.id].itervalues():
+          links.append((link.id, link.src.id, infra.id, link.dst.id,
+                        getattr(link, 'delay', None),
+                        getattr(link, 'bandwidth', None)))
+          dynamic_ports.add(link.dst.id)
+        status[nf.id] = nf.status
+      for port in infra.ports:
+        if port.id not in dynamic_ports:
+          structure.append((infra.id, self.__port_state(port)))
+        for fr in port.flowrules:
+          structure.append((infra.id, fr.id, port.id, fr.match, fr.action,
+                            fr.bandwidth, fr.delay))
+          # Flowrule ids are only unique per infra node
+          status[(infra.id, fr.id)] = getattr(fr, 'status', None)
+      for neighbor, links in network[infra.id].iteritems():
+        for link in links.itervalues():
+          if link.type == NFFG.TYPE_LINK_DYNAMIC:
+            continue
+          structure.append((link.id, link.type, link.src.id, neighbor,
+                            link.dst.id, getattr(link, 'bandwidth', None),
+                            getattr(link, 'delay', None),
+                            getattr(link, 'cost', None)))
+    return DomainState(digest=self.__digest(structure),
+                       nfs={nf_id: (self.__digest(links), links)
+                            for nf_id, links in nfs.iteritems()},
+                       status=status)
+
+  @synchronized(__DoV_lock)
+  def copy_nfs (self, nf_ids):
+    """
+    Return the copy of the given NF nodes without copying the DoV.
+
+    :param nf_ids: NF ids
+    :type nf_ids: collections.Iterable
+    :return: NF copies keyed by their ids, missing NFs are skipped
+    :rtype: dict
+    """
+    return {nf_id: self.__global_nffg[nf_id].copy() for nf_id in nf_ids
+            if nf_id in self.__global_nffg}
+
   @synchronized(__DoV_lock)
   def set_domain_as_global_view (self, domain, nffg):
     """
@@ -374,9 +795,8 @@ class DomainVirtualizer(AbstractVirtualizer):
     self.__global_nffg = nffg.copy()
     self.__global_nffg.id = DoV
     self.__global_nffg.name = DoV
-    log.debug("DoV stat:\n%s" % self.__global_nffg.get_stat())
-    # Raise event for observing Virtualizers about topology change
-    self.raiseEventNoErrors(DoVChangedEvent, cause=DoVChangedEvent.TYPE.UPDATE)
+    log.debug("DoV stat:\n%s", LazyDump(self.__global_nffg.get_stat))
+    self.__commit_change(cause=DoVChangedEvent.TYPE.UPDATE)
     return self.__global_nffg
 
   @synchronized(__DoV_lock)
@@ -395,9 +815,8 @@ class DomainVirtualizer(AbstractVirtualizer):
     dov_name = self.__global_nffg.name
     self.__global_nffg = nffg.copy()
     self.__global_nffg.id, self.__global_nffg.name = dov_id, dov_name
-    log.debug("DoV stat:\n%s" % self.__global_nffg.get_stat())
-    # Raise event for observing Virtualizers about topology change
-    self.raiseEventNoErrors(DoVChangedEvent, cause=DoVChangedEvent.TYPE.UPDATE)
+    log.debug("DoV stat:\n%s", LazyDump(self.__global_nffg.get_stat))
+    self.__commit_change(cause=DoVChangedEvent.TYPE.UPDATE)
     return self.__global_nffg
 
   @synchronized(__DoV_lock)
@@ -416,9 +835,9 @@ class DomainVirtualizer(AbstractVirtualizer):
     # NFFG
     NFFGToolBox.merge_new_domain(base=self.__global_nffg, nffg=nffg, log=log)
     # Raise event for observing Virtualizers about topology change
-    log.debug("DoV stat:\n%s" % self.__global_nffg.get_stat())
-    log.log(VERBOSE, "Merged Dov:\n%s" % self.__global_nffg.dump())
-    self.raiseEventNoErrors(DoVChangedEvent, cause=DoVChangedEvent.TYPE.EXTEND)
+    log.debug("DoV stat:\n%s", LazyDump(self.__global_nffg.get_stat))
+    log.log(VERBOSE, "Merged Dov:\n%s", LazyDump(self.__global_nffg.dump))
+    self.__commit_change(cause=DoVChangedEvent.TYPE.EXTEND)
     return self.__global_nffg
 
   @synchronized(__DoV_lock)
@@ -435,15 +854,16 @@ class DomainVirtualizer(AbstractVirtualizer):
     :rtype: :class:`NFFG`
     """
     NFFGToolBox.remove_domain(base=self.__global_nffg, domain=domain, log=log)
-    # log.log(VERBOSE, "Reduced Dov:\n%s" % self.__global_nffg.dump())
+    # log.log(VERBOSE, "Reduced Dov:\n%s", LazyDump(self.__global_nffg.dump))
     NFFGToolBox.merge_new_domain(base=self.__global_nffg, nffg=nffg, log=log)
-    log.debug("DoV stat:\n%s" % self.__global_nffg.get_stat())
-    log.log(VERBOSE, "Re-merged DoV:\n%s" % self.__global_nffg.dump())
+    log.debug("DoV stat:\n%s", LazyDump(self.__global_nffg.get_stat))
+    log.log(VERBOSE, "Re-merged DoV:\n%s", LazyDump(self.__global_nffg.dump))
     if self.__global_nffg.is_empty():
       log.warning("No Node had been remained after updating the domain part: "
                   "%s! DoV is empty!" % domain)
-    # Raise event for observing Virtualizers about topology change
-    self.raiseEventNoErrors(DoVChangedEvent, cause=DoVChangedEvent.TYPE.CHANGE)
+    self.__commit_change(cause=DoVChangedEvent.TYPE.CHANGE,
+                         domain=domain,
+                         infras=[i.id for i in nffg.infras])
     return self.__global_nffg
 
   @synchronized(__DoV_lock)
@@ -462,10 +882,11 @@ class DomainVirtualizer(AbstractVirtualizer):
     if self.__global_nffg.is_empty():
       log.warning("No Node had been remained after updating the domain part: "
                   "%s! DoV is empty!" % domain)
-    log.debug("DoV stat:\n%s" % self.__global_nffg.get_stat())
-    log.log(VERBOSE, "Updated DoV:\n%s" % self.__global_nffg.dump())
-    # Raise event for observing Virtualizers about topology change
-    self.raiseEventNoErrors(DoVChangedEvent, cause=DoVChangedEvent.TYPE.CHANGE)
+    log.debug("DoV stat:\n%s", LazyDump(self.__global_nffg.get_stat))
+    log.log(VERBOSE, "Updated DoV:\n%s", LazyDump(self.__global_nffg.dump))
+    self.__commit_change(cause=DoVChangedEvent.TYPE.CHANGE,
+                         domain=domain,
+                         infras=[i.id for i in nffg.infras])
     return self.__global_nffg
 
   @synchronized(__DoV_lock)
@@ -482,10 +903,10 @@ class DomainVirtualizer(AbstractVirtualizer):
     if self.__global_nffg.is_empty():
       log.warning("No Node had been remained after updating the domain part: "
                   "%s! DoV is empty!" % domain)
-    log.debug("DoV stat:\n%s" % self.__global_nffg.get_stat())
-    log.log(VERBOSE, "Reduced Dov:\n%s" % self.__global_nffg.dump())
-    # Raise event for observing Virtualizers about topology change
-    self.raiseEventNoErrors(DoVChangedEvent, cause=DoVChangedEvent.TYPE.REDUCE)
+    log.debug("DoV stat:\n%s", LazyDump(self.__global_nffg.get_stat))
+    log.log(VERBOSE, "Reduced Dov:\n%s", LazyDump(self.__global_nffg.dump))
+    self.__commit_change(cause=DoVChangedEvent.TYPE.REDUCE,
+                         domain=domain)
     return self.__global_nffg
 
   @synchronized(__DoV_lock)
@@ -507,9 +928,10 @@ class DomainVirtualizer(AbstractVirtualizer):
                 "Skip cleanup domain: %s" % domain)
       return self.__global_nffg
     NFFGToolBox.clear_domain(base=self.__global_nffg, domain=domain, log=log)
-    log.debug("DoV stat:\n%s" % self.__global_nffg.get_stat())
-    log.log(VERBOSE, "Cleaned Dov:\n%s" % self.__global_nffg.dump())
-    self.raiseEventNoErrors(DoVChangedEvent, cause=DoVChangedEvent.TYPE.CHANGE)
+    log.debug("DoV stat:\n%s", LazyDump(self.__global_nffg.get_stat))
+    log.log(VERBOSE, "Cleaned Dov:\n%s", LazyDump(self.__global_nffg.dump))
+    self.__commit_change(cause=DoVChangedEvent.TYPE.CHANGE,
+                         domain=domain)
     return self.__global_nffg
 
   @synchronized(__DoV_lock)
@@ -531,8 +953,9 @@ class DomainVirtualizer(AbstractVirtualizer):
     NFFGToolBox.update_status_info(nffg=nffg, status=NFFG.STATUS_DEPLOY)
     NFFGToolBox.update_nffg_by_status(base=self.__global_nffg, updated=nffg,
                                       log=log)
-    log.log(VERBOSE, "Updated Dov:\n%s" % self.__global_nffg.dump())
-    self.raiseEventNoErrors(DoVChangedEvent, cause=DoVChangedEvent.TYPE.CHANGE)
+    log.log(VERBOSE, "Updated Dov:\n%s", LazyDump(self.__global_nffg.dump))
+    self.__commit_change(cause=DoVChangedEvent.TYPE.CHANGE,
+                         domain=domain)
     return self.__global_nffg
 
   @synchronized(__DoV_lock)
@@ -547,9 +970,9 @@ class DomainVirtualizer(AbstractVirtualizer):
       log.debug("DoV is empty! Skip DoV cleanup")
       return self.__global_nffg
     NFFGToolBox.remove_deployed_services(nffg=self.__global_nffg, log=log)
-    log.debug("DoV stat:\n%s" % self.__global_nffg.get_stat())
-    log.log(VERBOSE, "Cleared Dov:\n%s" % self.__global_nffg.dump())
-    self.raiseEventNoErrors(DoVChangedEvent, cause=DoVChangedEvent.TYPE.CHANGE)
+    log.debug("DoV stat:\n%s", LazyDump(self.__global_nffg.get_stat))
+    log.log(VERBOSE, "Cleared Dov:\n%s", LazyDump(self.__global_nffg.dump))
+    self.__commit_change(cause=DoVChangedEvent.TYPE.CHANGE)
     return self.__global_nffg
 
 
@@ -581,10 +1004,223 @@ class GlobalViewVirtualizer(AbstractFilteringVirtualizer):
                                                 type=self.TYPE)
 
   def _acquire_resource (self):
-    return self.global_view.get_resource_info()
+    """
+    Return the read-only snapshot of the global view.
+
+    The snapshot is shared with the other readers of the same DoV revision,
+    so it MUST NOT be modified.
 
+    :return: global resource info
+    :rtype: :class:`NFFG`
+    """
+    return self.global_view.get_snapshot().nffg
 
-class SingleBiSBiSVirtualizer(AbstractFilteringVirtualizer):
+
+class AbstractSBBVirtualizer(AbstractFilteringVirtualizer):
+  """
+  Abstract class for Virtualizers offering a Single BiSBiS view.
+
+  Maintains the cached SBB view incrementally: the state of every domain is
+  stored at SBB generation. If the infrastructure of the changed domains is
+  unchanged, the added and removed NFs and the statuses of NFs and flowrules
+  are patched in the cached view. Other structural changes, including the
+  flowrules which are recalculated from the end-to-end hops, cause a full SBB
+  regeneration.
+  """
+
+  def __init__ (self, id, global_view, type):
+    """
+    Init.
+
+    :param id: id of the assigned entity
+    :type: id: str
+    :param global_view: virtualizer instance represents the global view
+    :type global_view: :any:`DomainVirtualizer`
+    :param type: Virtualizer type
+    :type type: str
+    :return: None
+    """
+    super(AbstractSBBVirtualizer, self).__init__(id=id,
+                                                 global_view=global_view,
+                                                 type=type)
+    self._domain_states = None  # Domain states the cached SBB is based on
+    self._flowrules = None  # Flowrule id --> flowrules of the cached SBB
+
+  def _is_tracked_domain (self, domain):
+    """
+    Return True if the given domain is part of the generated SBB view.
+
+    :param domain: domain name
+    :type domain: str
+    :return: domain is tracked or not
+    :rtype: bool
+    """
+    return True
+
+  def _save_domain_states (self, revision):
+    """
+    Store the actual domain states if the DoV has not changed since the
+    given revision.
+
+    :param revision: DoV revision the SBB view was generated from
+    :type revision: int
+    :return: None
+    """
+    self._flowrules = None
+    current, states = self.global_view.get_domain_states()
+    if current != revision:
+      log.debug("DoV has been changed during SBB generation! "
+                "Skip storing domain states...")
+      self._domain_states = None
+    else:
+      self._domain_states = {d: s for d, s in states.iteritems()
+                             if self._is_tracked_domain(d)}
+
+  def _get_flowrules (self, resource):
+    """
+    Return the flowrules of the cached SBB view keyed by flowrule id.
+
+    The index is built at the first status patch after SBB generation.
+
+    :param resource: cached SBB view
+    :type resource: :class:`NFFG`
+    :return: flowrule id --> list of flowrules
+    :rtype: dict
+    """
+    if self._flowrules is None:
+      self._flowrules = {}
+      for infra in resource.infras:
+        for port in infra.ports:
+          for fr in port.flowrules:
+            self._flowrules.setdefault(fr.id, []).append(fr)
+    return self._flowrules
+
+  def _update_nfs (self, resource, removed, added):
+    """
+    Remove and add the given NFs with their dynamic links in the cached SBB
+    view.
+
+    :param resource: cached SBB view
+    :type resource: :class:`NFFG`
+    :param removed: ids of the removed NFs
+    :type removed: collections.Iterable
+    :param added: NF id --> NF digest and dynamic links of the added NFs
+    :type added: dict
+    :return: the SBB view is patched or not
+    :rtype: bool
+    """
+    sbb = [infra for infra in resource.infras]
+    if len(sbb) != 1:
+      log.debug("SBB view has unexpected number of BiSBiS nodes: %s! "
+                "Regenerate SBB view..." % len(sbb))
+      return False
+    sbb = sbb.pop()
+    for nf_id in removed:
+      if nf_id not in resource:
+        continue
+      ports = [l.src.id for l in resource.network[sbb.id][nf_id].itervalues()]
+      resource.del_node(nf_id)
+      for port_id in ports:
+        sbb.del_port(id=port_id)
+    nfs = self.global_view.copy_nfs(added)
+    for nf_id, (digest, links) in added.iteritems():
+      if nf_id not in nfs or nf_id in resource:
+        log.debug("NF: %s is not consistent with SBB view! "
+                  "Regenerate SBB view..." % nf_id)
+        return False
+      nf = resource.add_nf(nf=nfs[nf_id])
+      # The first item is the NF itself, the others are its dynamic links
+      for link_id, nf_port, infra_id, infra_port, delay, bw in links[1:]:
+        if infra_port in sbb.ports:
+          log.debug("Port: %s of NF: %s is not unique in SBB view! "
+                    "Regenerate SBB view..." % (infra_port, nf_id))
+          return False
+        resource.add_undirected_link(port1=nf.ports[nf_port],
+                                     port2=sbb.add_port(id=infra_port),
+                                     p1p2id=link_id,
+                                     p2p1id="%s-back" % link_id,
+                                     dynamic=True, delay=delay, bandwidth=bw)
+    log.debug("Patched NFs in SBB view - removed: %s, added: %s" %
+              (len(removed), len(added)))
+    return True
+
+  def _update_resource (self, resource, changes):
+    """
+    Patch the NFs and the statuses of NFs and flowrules in the cached SBB view
+    if the infrastructure of the changed domains remained the same.
+
+    :param resource: cached SBB view
+    :type resource: :class:`NFFG`
+    :param changes: set of (cause, domain) tuples of collected changes
+    :type changes: set
+    :return: updated SBB view or None
+    :rtype: :class:`NFFG`
+    """
+    if self._domain_states is None:
+      return None
+    causes = {cause for cause, domain in changes}
+    if DoVChangedEvent.TYPE.EXTEND in causes:
+      log.debug("DoV has been extended! Regenerate SBB view...")
+      return None
+    if any(domain is None for cause, domain in changes):
+      revision, states = self.global_view.get_domain_states()
+      states = {d: s for d, s in states.iteritems()
+                if self._is_tracked_domain(d)}
+      affected = set(states) | set(self._domain_states)
+    else:
+      affected = {domain for cause, domain in changes
+                  if self._is_tracked_domain(domain)}
+      revision, states = self.global_view.get_domain_states(domains=affected)
+    patch, removed, added = {}, set(), {}
+    for domain in affected:
+      old, new = self._domain_states.get(domain), states.get(domain)
+      if old is None and new is None:
+        continue
+      if old is None or new is None or old.digest != new.digest:
+        log.debug("Structure of domain: %s has been changed! "
+                  "Regenerate SBB view..." % domain)
+        return None
+      for nf_id, nf_state in old.nfs.iteritems():
+        if new.nfs.get(nf_id, (None,))[0] != nf_state[0]:
+          removed.add(nf_id)
+      for nf_id, nf_state in new.nfs.iteritems():
+        if old.nfs.get(nf_id, (None,))[0] != nf_state[0]:
+          added[nf_id] = nf_state
+      patch.update((id, status) for id, status in new.status.iteritems()
+                   if old.status.get(id) != status and id not in added)
+    if removed or added:
+      # Changed NFs are in both sets, so they are removed and re-added
+      if not self._update_nfs(resource=resource, removed=removed,
+                              added=added):
+        return None
+      self._flowrules = None
+    if patch:
+      flowrules = self._get_flowrules(resource=resource)
+      for id, status in patch.iteritems():
+        if isinstance(id, tuple):
+          # Flowrule status is keyed by (infra id, flowrule id)
+          frs = flowrules.get(id[1], ())
+          if len(frs) != 1:
+            log.debug("Flowrule: %s is not unique in SBB view! "
+                      "Regenerate SBB view..." % id[1])
+            return None
+          frs[0].status = status
+        elif id in resource:
+          resource[id].status = status
+        else:
+          log.debug("Element: %s is not found in SBB view! "
+                    "Regenerate SBB view..." % id)
+          return None
+    log.debug("Patched element statuses in SBB view: %s" % len(patch))
+    for domain in affected:
+      if domain in states:
+        self._domain_states[domain] = states[domain]
+      else:
+        self._domain_states.pop(domain, None)
+    return resource
+
+
+class SingleBiSBiSVirtualizer(AbstractSBBVirtualizer):
   """
   Actual Virtualizer class for ESCAPEv2.
 
@@ -619,14 +1255,16 @@ class SingleBiSBiSVirtualizer(AbstractFilteringVirtualizer):
     :return: single BiSBiS representation of the global view
     :rtype: :class:`NFFG`
     """
-    dov = self.global_view.get_resource_info()
-    if dov.is_empty():
+    # Read-only snapshot is enough as the SBB view is generated from scratch
+    dov = self.global_view.get_snapshot()
+    if dov.nffg.is_empty():
       # DoV is not initialized yet! Probably only just remote Mgrs has been
       # enabled! return with the default empty DoV
       log.warning(
         "Requested global resource view is empty! Return the default empty "
         "topology!")
-      return dov
+      self._domain_states = None
+      return dov.copy()
     else:
       if str(self.sbb_id).startswith('$'):
         if str(self.sbb_id)[1:] in os.environ:
@@ -634,10 +1272,11 @@ class SingleBiSBiSVirtualizer(AbstractFilteringVirtualizer):
           log.debug("Detected SBB id from environment variable: %s"
                     % self.sbb_id)
       # Generate the Single BiSBiS representation
-      sbb = NFFGToolBox.generate_SBB_representation(nffg=dov,
+      sbb = NFFGToolBox.generate_SBB_representation(nffg=dov.nffg,
                                                     sbb_id=self.sbb_id,
                                                     log=log)
-      log.log(VERBOSE, "Generated SBB:\n%s" % sbb.dump())
+      log.log(VERBOSE, "Generated SBB:\n%s", LazyDump(sbb.dump))
+      self._save_domain_states(revision=dov.revision)
       return sbb
 
 
@@ -656,7 +1295,7 @@ class ZeroDelayedSBBVirtualizer(SingleBiSBiSVirtualizer):
     return sbb
 
 
-class LocalSingleBiSBiSVirtualizer(AbstractFilteringVirtualizer):
+class LocalSingleBiSBiSVirtualizer(AbstractSBBVirtualizer):
   """
   Actual Virtualizer class for ESCAPEv2.
 
@@ -684,6 +1323,19 @@ class LocalSingleBiSBiSVirtualizer(AbstractFilteringVirtualizer):
                                                        global_view=global_view,
                                                        type=self.TYPE)
 
+  def _is_tracked_domain (self, domain):
+    """
+    Return True if the given domain is not detected by an external
+    DomainManager.
+
+    :param domain: domain name
+    :type domain: str
+    :return: domain is tracked or not
+    :rtype: bool
+    """
+    ext_mgr = CONFIG.get_external_managers() or ()
+    return not any(ext in str(domain) for ext in ext_mgr)
+
   @staticmethod
   def __filter_external_domains (nffg):
     """
@@ -719,19 +1371,22 @@ class LocalSingleBiSBiSVirtualizer(AbstractFilteringVirtualizer):
     :return: single BiSBiS representation of the global view
     :rtype: :class:`NFFG`
     """
-    dov = self.global_view.get_resource_info()
-    if dov.is_empty():
+    # Read-only snapshot is enough as the SBB view is generated from scratch
+    dov = self.global_view.get_snapshot()
+    if dov.nffg.is_empty():
       # DoV is not initialized yet! Probably only just remote Mgrs has been
       # enabled! return with the default empty DoV
       log.warning(
         "Requested global resource view is empty! Return the default empty "
         "topology!")
-      return dov
+      self._domain_states = None
+      return dov.copy()
     else:
-      filtered_dov = self.__filter_external_domains(nffg=dov)
+      filtered_dov = self.__filter_external_domains(nffg=dov.nffg)
       # Generate the Single BiSBiS representation
       sbb = NFFGToolBox.generate_SBB_representation(nffg=filtered_dov, log=log)
-      log.log(VERBOSE, "Generated SBB:\n%s" % sbb.dump())
+      log.log(VERBOSE, "Generated SBB:\n%s", LazyDump(sbb.dump))
+      self._save_domain_states(revision=dov.revision)
       return sbb
 
 
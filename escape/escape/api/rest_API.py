@@ -31,6 +31,7 @@ from escape.nffg_lib import NFFG
 from escape.util.api import AbstractAPI, RequestScheduler, RequestCache
 from escape.util.com_logger import MessageDumper
 from escape.util.config import CONFIG
+from escape.util.metrics import metrics
 from escape.util.conversion import NFFGConverter
 from escape.util.misc import get_escape_version, \
   call_as_coop_task, quit_with_ok, quit_with_code
@@ -240,12 +241,21 @@ class MainApiServer(object):
     host = CONFIG.get_rest_api_host()
     port = CONFIG.get_rest_api_port()
     self.flask = Flask(__name__)
+    self.flask.add_url_rule(rule="/metrics", endpoint="metrics",
+                            view_func=self.metrics, methods=("GET",))
     self.__werkzeug = make_server(host=host if host else self.DEFAULT_HOST,
                                   port=port if port else self.DEFAULT_PORT,
                                   app=self.flask)
     # Suppress low level logging
     logging.getLogger("werkzeug").setLevel(logging.WARNING)
 
+  @staticmethod
+  def metrics ():
+    """
+    Expose the collected metrics in text-based format of Prometheus.
+    """
+    return Response(metrics.expose(), content_type=metrics.CONTENT_TYPE)
+
   def start (self):
     if not self.started:
       self._thread.start()
@@ -455,7 +465,8 @@ class StatusView(AbstractAPIView):
     log.debug("Responded status code: %s, data: %s" % (code, result))
     MessageDumper().dump_to_file(data=repr((code, result)),
                                  unique="ESCAPE-%s-status" %
-                                        self.mgr.LAYER_NAME)
+                                        self.mgr.LAYER_NAME,
+                                 failed=code >= httplib.BAD_REQUEST)
     return Response(result, status=code, headers={"message-id": message_id})
 
 
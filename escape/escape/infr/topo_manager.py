@@ -17,6 +17,8 @@ domain management.
 """
 import pprint
 import re
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
 
 from ncclient import NCClientError
 from ncclient.operations import OperationError
@@ -72,6 +74,8 @@ class VNFStarterAdapter(AbstractNETCONFAdapter, AbstractESCAPEAdapter,
     # Call base constructors directly to avoid super() and MRO traps
     AbstractNETCONFAdapter.__init__(self, *args, **kwargs)
     AbstractESCAPEAdapter.__init__(self, *args, **kwargs)
+    # Adapters of the different EE agents: connection data --> adapter
+    self.__agent_adapters = {}
     log.debug(
       "Init VNFStarterAdapter - type: %s, params: %s" % (self.type, kwargs))
 
@@ -98,20 +102,34 @@ class VNFStarterAdapter(AbstractNETCONFAdapter, AbstractESCAPEAdapter,
     raise RuntimeError("VNFStarterAdapter does not support this function: "
                        "get_topology_resource() !")
 
-  def update_connection_params (self, **kwargs):
+  def finit (self):
     """
-    Update connection params.
+    Close the persistent sessions of the EE agents.
 
-    :return: only updated params
-    :rtype: dict
+    :return: None
     """
-    for param in ('server', 'port', 'username', 'password'):
-      if param in kwargs:
-        if kwargs[param] == getattr(self, param):
-          del kwargs[param]
-        else:
-          setattr(self, param, kwargs[param])
-    return kwargs
+    super(VNFStarterAdapter, self).finit()
+    for adapter in self.__agent_adapters.itervalues():
+      if adapter.persistent and adapter.connected:
+        adapter.disconnect()
+
+  def get_agent_adapter (self, **kwargs):
+    """
+    Return the adapter of the EE agent given by the connection params.
+
+    The adapters are created once per agent and can be used concurrently with
+    each other.
+
+    :return: adapter of the agent
+    :rtype: :any:`VNFStarterAdapter`
+    """
+    params = dict((p, kwargs.get(p, getattr(self, p)))
+                  for p in ('server', 'port', 'username', 'password'))
+    key = (params['server'], params['port'], params['username'])
+    if key not in self.__agent_adapters:
+      log.debug("Create adapter for EE agent: %s:%s" % key[:2])
+      self.__agent_adapters[key] = self.clone(**params)
+    return self.__agent_adapters[key]
 
   def _invoke_rpc (self, request_data):
     """
@@ -348,17 +366,17 @@ class VNFStarterAdapter(AbstractNETCONFAdapter, AbstractESCAPEAdapter,
                                     options=nf_opt)
         # Get created VNF's id
         vnf_id = reply['access_info']['vnf_id']
-        # Connect VNF to the given Container
-        if isinstance(nf_ports, (tuple, list)):
-          for port in nf_ports:
-            adapter.connectVNF(vnf_id=vnf_id, vnf_port=port, switch_id=infra_id)
-        else:
-          adapter.connectVNF(vnf_id=vnf_id, vnf_port=nf_ports,
-                             switch_id=infra_id)
-        # Start Click-based VNF
-        adapter.startVNF(vnf_id=vnf_id)
-        # Return with whole VNF description
-        return adapter.getVNFInfo(vnf_id=vnf_id)
+        if not isinstance(nf_ports, (tuple, list)):
+          nf_ports = (nf_ports,)
+        log.debug("Call connectVNF, startVNF and getVNFInfo for VNF id: %s "
+                  "(batched: %s)" % (vnf_id, adapter.batched))
+        # Connect VNF to the given Container, start Click-based VNF and
+        # return with whole VNF description
+        calls = [("connectVNF", dict(vnf_id=vnf_id, vnf_port=port,
+                                     switch_id=infra_id)) for port in nf_ports]
+        calls.append(("startVNF", dict(vnf_id=vnf_id)))
+        calls.append(("getVNFInfo", dict(vnf_id=vnf_id)))
+        return adapter.call_RPC_batch(calls)[-1]
       except RPCError:
         log.error("Got Error during deployVNF through NETCONF:")
         raise
@@ -490,13 +508,18 @@ class InternalDomainManager(AbstractDomainManager):
   DEFAULT_DOMAIN_NAME = "INTERNAL"
   # Set the internal manager status
   IS_INTERNAL_MANAGER = True
+  # Default number of concurrent NF deployments
+  DEFAULT_DEPLOY_WORKERS = 4
 
-  def __init__ (self, domain_name=DEFAULT_DOMAIN_NAME, *args, **kwargs):
+  def __init__ (self, domain_name=DEFAULT_DOMAIN_NAME,
+                deploy_workers=DEFAULT_DEPLOY_WORKERS, *args, **kwargs):
     """
     Init.
 
     :param domain_name: the domain name
     :type domain_name: str
+    :param deploy_workers: max number of EEs deployed concurrently
+    :type deploy_workers: int
     :param args: optional param list
     :type args: list
     :param kwargs: optional keywords
@@ -516,6 +539,7 @@ class InternalDomainManager(AbstractDomainManager):
     self.sapinfos = {}
     # Mapper structure for non-integer link id
     self.vlan_register = {}
+    self.deploy_workers = deploy_workers
 
   def init (self, configurator, **kwargs):
     """
@@ -657,11 +681,12 @@ class InternalDomainManager(AbstractDomainManager):
         return all(result)
       self.log.info(
         "Perform traffic steering according to mapped tunnels/labels...")
-      # OpenFlow flowrule deletion/addition is fairly cheap operations
-      # The most robust solution is to delete every flowrule
-      result.extend((self._delete_flowrules(nffg=nffg_part),
-                     # and (re)add the new ones
-                     self._deploy_flowrules(nffg_part=nffg_part)))
+      if nffg_part.is_bare():
+        # Bare topology is probably a cleanup topo --> remove every flowrule
+        result.append(self._delete_flowrules(nffg=nffg_part))
+      else:
+        # Only the flowrule differences are sent based on the shadow tables
+        result.append(self._deploy_flowrules(nffg_part=nffg_part))
       return all(result)
     except:
       self.log.exception("Got exception during NFFG installation into: %s." %
@@ -745,15 +770,11 @@ class InternalDomainManager(AbstractDomainManager):
                          "agent of Node: %s" % infra_id)
           result = False
           continue
-        updated = self.remoteAdapter.update_connection_params(
-          **connection_params)
-        if updated:
-          self.log.debug("Update connection params in %s: %s" % (
-            self.remoteAdapter.__class__.__name__, updated))
+        adapter = self.remoteAdapter.get_agent_adapter(**connection_params)
         self.log.debug("Stop deployed NF: %s" % nf_id)
         try:
           vnf_id = self.deployed_vnfs[(infra_id, nf_id)]['vnf_id']
-          reply = self.remoteAdapter.removeNF(vnf_id=vnf_id)
+          reply = adapter.removeNF(vnf_id=vnf_id)
           self.log.log(VERBOSE,
                        "Removed NF status:\n%s" % pprint.pformat(reply))
           # Remove NF from deployed cache
@@ -778,6 +799,50 @@ class InternalDomainManager(AbstractDomainManager):
                    ("SUCCESS" if result else "FAILURE"))
     return result
 
+  def __deploy_nfs (self, deploys):
+    """
+    Initiate the given NFs through the agents of the EEs.
+
+    NFs of different agents are deployed concurrently using persistent
+    adapters, NFs of the same agent are deployed one after another.
+
+    :param deploys: list of (infra, nf, params, connection params)
+    :type deploys: list
+    :return: list of (deployed VNF description, raised exception) in order
+    :rtype: list
+    """
+    agents = OrderedDict()
+    for i, (infra, nf, params, connection_params) in enumerate(deploys):
+      adapter = self.remoteAdapter.get_agent_adapter(**connection_params)
+      agents.setdefault(adapter.connection_data, (adapter, []))[1].append(
+        (i, nf, params))
+    results = [(None, None)] * len(deploys)
+
+    def deploy_on_agent (agent):
+      adapter, jobs = agent
+      for i, nf, params in jobs:
+        self.log.info("Initiating NF: %s ..." % nf.id)
+        self.log.debug("NF parameters: %s" % params)
+        try:
+          results[i] = (adapter.deployNF(**params), None)
+        except BaseException as e:
+          results[i] = (None, e)
+
+    workers = min(self.deploy_workers, len(agents))
+    if workers > 1:
+      self.log.debug("Deploy NFs on %s EE agents concurrently with workers: "
+                     "%s" % (len(agents), workers))
+      pool = ThreadPool(processes=workers)
+      try:
+        pool.map(deploy_on_agent, agents.values())
+      finally:
+        pool.close()
+        pool.join()
+    else:
+      for agent in agents.itervalues():
+        deploy_on_agent(agent)
+    return results
+
   def _deploy_new_nfs (self, nffg):
     """
     Install the NFs mapped in the given NFFG.
@@ -803,6 +868,8 @@ class InternalDomainManager(AbstractDomainManager):
       self.log.warning("Missing topology description from %s domain! "
                        "Skip deploying NFs..." % self.domain_name)
       return False
+    # NFs need to be initiated: (infra, nf, params, connection params)
+    deploys = []
     # Iter through the container INFRAs in the given mapped NFFG part
     # print mn_topo.dump()
     for infra in nffg.infras:
@@ -855,94 +922,88 @@ class InternalDomainManager(AbstractDomainManager):
                          "agent of Node: %s" % infra.id)
           result = False
           continue
-        # Save last used adapter --> and last RPC result
-        self.log.info("Initiating NF: %s ..." % nf.id)
-        self.log.debug("NF parameters: %s" % params)
-        updated = self.remoteAdapter.update_connection_params(
-          **connection_params)
-        if updated:
-          self.log.debug("Update connection params in %s: %s" % (
-            self.remoteAdapter.__class__.__name__, updated))
-        try:
-          vnf = self.remoteAdapter.deployNF(**params)
-        except NCClientError as e:
-          self.log.error("Got NETCONF RPC communication error during NF: %s "
-                         "deploy! Skip deploy..." % nf.id)
-          self.log.error(VERBOSE, "Exception: %s" % e)
-          result = False
-          continue
-        except BaseException:
-          self.log.error("Got unexpected error during NF: %s "
-                         "initiation! Skip initiation..." % nf.name)
-          result = False
-          continue
-        self.log.log(VERBOSE, "Initiated VNF:\n%s" % pprint.pformat(vnf))
-        # Check if NETCONF communication was OK
-        if vnf and 'initiated_vnfs' in vnf and vnf['initiated_vnfs']['pid'] \
-           and vnf['initiated_vnfs']['status'] == \
-              VNFStarterAPI.VNFStatus.s_UP_AND_RUNNING:
-          self.log.info("NF: %s initiation has been verified on Node: %s" % (
-            nf.id, infra.id))
-          self.log.debug("Initiated VNF id: %s, PID: %s, status: %s" % (
-            vnf['initiated_vnfs']['vnf_id'], vnf['initiated_vnfs']['pid'],
-            vnf['initiated_vnfs']['status']))
-        else:
-          self.log.error("Initiated NF: %s is not verified. Initiation was "
-                         "unsuccessful!" % nf.id)
-          result = False
-          continue
-        # Store NETCONF related info of deployed NF
-        self.deployed_vnfs[(infra.id, nf.id)] = vnf['initiated_vnfs']
-        # Add initiated NF to topo description
-        self.log.debug("Update Infrastructure layer topology description...")
-        deployed_nf = nf.copy()
-        deployed_nf.ports.clear()
-        mn_topo.add_nf(nf=deployed_nf)
-        self.log.debug("Add deployed NFs to topology...")
-        # Add Link between actual NF and INFRA
-        for nf_id, infra_id, link in nffg.real_out_edges_iter(nf.id):
-          # Get Link's src ref to new NF's port
-          nf_port = deployed_nf.ports.append(nf.ports[link.src.id].copy())
-
-          def get_sw_port (vnf):
-            """
-            Return the switch port parsed from result of getVNFInfo
-
-            :param vnf: VNF description returned by NETCONF server
-            :type vnf: dict
-            :return: port id
-            :rtype: int
-            """
-            if isinstance(vnf['initiated_vnfs']['link'], list):
-              for _link in vnf['initiated_vnfs']['link']:
-                if str(_link['vnf_port']) == str(nf_port.id):
-                  return int(_link['sw_port'])
-            else:
-              return int(vnf['initiated_vnfs']['link']['sw_port'])
-
-          # Get OVS-generated physical port number
-          infra_port_num = get_sw_port(vnf)
-          if infra_port_num is None:
-            self.log.warning("Can't get Container port from RPC result! Set "
-                             "generated port number...")
-          # Create INFRA side Port
-          infra_port = mn_topo.network.node[infra_id].add_port(
-            id=infra_port_num)
-          self.log.debug("%s - detected physical %s" %
-                         (deployed_nf, infra_port))
-          # Add Links to mn topo
-          mn_topo.add_undirected_link(port1=nf_port, port2=infra_port,
-                                      dynamic=True, delay=link.delay,
-                                      bandwidth=link.bandwidth)
-          # Port mapping
-          dynamic_port = nffg.network.node[infra_id].ports[link.dst.id].id
-          self.portmap[dynamic_port] = infra_port_num
-          # Update port in nffg_part
-          nffg.network.node[infra_id].ports[
-            link.dst.id].id = infra_port_num
-
-        self.log.debug("%s topology description is updated with NF: %s" % (
-          self.domain_name, deployed_nf.name))
+        # Collect the NF and deploy the NFs of the different EEs concurrently
+        deploys.append((infra, nf, params, connection_params))
+    for (infra, nf, params, connection_params), (vnf, error) in zip(
+       deploys, self.__deploy_nfs(deploys=deploys)):
+      if isinstance(error, NCClientError):
+        self.log.error("Got NETCONF RPC communication error during NF: %s "
+                       "deploy! Skip deploy..." % nf.id)
+        self.log.log(VERBOSE, "Exception: %s" % error)
+        result = False
+        continue
+      elif error is not None:
+        self.log.error("Got unexpected error during NF: %s "
+                       "initiation! Skip initiation..." % nf.name)
+        result = False
+        continue
+      self.log.log(VERBOSE, "Initiated VNF:\n%s" % pprint.pformat(vnf))
+      # Check if NETCONF communication was OK
+      if vnf and 'initiated_vnfs' in vnf and vnf['initiated_vnfs']['pid'] \
+         and vnf['initiated_vnfs']['status'] == \
+            VNFStarterAPI.VNFStatus.s_UP_AND_RUNNING:
+        self.log.info("NF: %s initiation has been verified on Node: %s" % (
+          nf.id, infra.id))
+        self.log.debug("Initiated VNF id: %s, PID: %s, status: %s" % (
+          vnf['initiated_vnfs']['vnf_id'], vnf['initiated_vnfs']['pid'],
+          vnf['initiated_vnfs']['status']))
+      else:
+        self.log.error("Initiated NF: %s is not verified. Initiation was "
+                       "unsuccessful!" % nf.id)
+        result = False
+        continue
+      # Store NETCONF related info of deployed NF
+      self.deployed_vnfs[(infra.id, nf.id)] = vnf['initiated_vnfs']
+      # Add initiated NF to topo description
+      self.log.debug("Update Infrastructure layer topology description...")
+      deployed_nf = nf.copy()
+      deployed_nf.ports.clear()
+      mn_topo.add_nf(nf=deployed_nf)
+      self.log.debug("Add deployed NFs to topology...")
+      # Add Link between actual NF and INFRA
+      for nf_id, infra_id, link in nffg.real_out_edges_iter(nf.id):
+        # Get Link's src ref to new NF's port
+        nf_port = deployed_nf.ports.append(nf.ports[link.src.id].copy())
+
+        def get_sw_port (vnf):
+          """
+          Return the switch port parsed from result of getVNFInfo
+
+          :param vnf: VNF description returned by NETCONF server
+          :type vnf: dict
+          :return: port id
+          :rtype: int
+          """
+          if isinstance(vnf['initiated_vnfs']['link'], list):
+            for _link in vnf['initiated_vnfs']['link']:
+              if str(_link['vnf_port']) == str(nf_port.id):
+                return int(_link['sw_port'])
+          else:
+            return int(vnf['initiated_vnfs']['link']['sw_port'])
+
+        # Get OVS-generated physical port number
+        infra_port_num = get_sw_port(vnf)
+        if infra_port_num is None:
+          self.log.warning("Can't get Container port from RPC result! Set "
+                           "generated port number...")
+        # Create INFRA side Port
+        infra_port = mn_topo.network.node[infra_id].add_port(
+          id=infra_port_num)
+        self.log.debug("%s - detected physical %s" %
+                       (deployed_nf, infra_port))
+        # Add Links to mn topo
+        mn_topo.add_undirected_link(port1=nf_port, port2=infra_port,
+                                    dynamic=True, delay=link.delay,
+                                    bandwidth=link.bandwidth)
+        # Port mapping
+        dynamic_port = nffg.network.node[infra_id].ports[link.dst.id].id
+        self.portmap[dynamic_port] = infra_port_num
+        # Update port in nffg_part
+        nffg.network.node[infra_id].ports[
+          link.dst.id].id = infra_port_num
+
+      self.log.debug("%s topology description is updated with NF: %s" % (
+        self.domain_name, deployed_nf.name))
 
     self.log.debug("Rewrite dynamically generated port numbers in flowrules...")
     # Update port numbers in flowrules
@@ -956,16 +1017,24 @@ class InternalDomainManager(AbstractDomainManager):
         continue
       for port in infra.ports:
         for flowrule in port.flowrules:
-          _match = flowrule.match.split(';')
-          if not _match[0].startswith("in_port="):
+          _match = NFFGConverter.compile_field(type=NFFGConverter.TYPE_MATCH,
+                                               field=flowrule.match)
+          if not _match.parts[0].startswith("in_port="):
             self.log.warning("Missing 'in_port' from match field: %s" %
                              flowrule.match)
             continue
-          _action = flowrule.action.split(';')
-          if not _action[0].startswith("output="):
+          _action = NFFGConverter.compile_field(
+            type=NFFGConverter.TYPE_ACTION, field=flowrule.action)
+          if not _action.parts[0].startswith("output="):
             self.log.warning("Missing 'output' from action field: %s" %
                              flowrule.action)
             continue
+          if not any(str(dyn) in _match.parts[0] or str(dyn) in
+                     _action.parts[0] for dyn in self.portmap):
+            # Nothing to rewrite --> keep the original (cached) fields
+            continue
+          _match = list(_match.parts)
+          _action = list(_action.parts)
           for dyn, phy in self.portmap.iteritems():
             _match[0] = _match[0].replace(str(dyn), str(phy))
             _action[0] = _action[0].replace(str(dyn), str(phy))
@@ -1041,7 +1110,8 @@ class InternalDomainManager(AbstractDomainManager):
     """
     Install the flowrules given in the NFFG.
 
-    If a flowrule is already defined it will be updated.
+    Only the differences compared to the shadow flow tables of the switches
+    are sent. If a flowrule is already defined it will be updated.
 
     :param nffg_part: NF-FG part need to be deployed
     :type nffg_part: :class:`NFFG`
@@ -1092,6 +1162,7 @@ class InternalDomainManager(AbstractDomainManager):
                          (infra, dpid_to_str(dpid)))
         result = False
         continue
+      flowrules = []
       for port in infra.ports:
         for flowrule in port.flowrules:
           try:
@@ -1129,7 +1200,9 @@ class InternalDomainManager(AbstractDomainManager):
               self.log.error("Abort Flowrule deployment...")
               return
           self.log.debug("Assemble OpenFlow flowrule from: %s" % flowrule)
-          self.controlAdapter.install_flowrule(infra.id, match, action)
+          flowrules.append((match, action))
+      if not self.controlAdapter.sync_flowrules(infra.id, flowrules=flowrules):
+        result = False
     self.log.info("Flowrule deploy result: %s" %
                   ("SUCCESS" if result else "FAILURE"))
     self.log.log(VERBOSE,
@@ -632,6 +632,12 @@ class ResourceOrchestrationAPI(AbstractAPI):
       self.log.debug("Request status is missing for NFFG: %s! "
                      "Skip result processing..." % nffg_id)
       return
+    # Only the layer which received the request handles its result, and
+    # it can be retried exclusively if it conflicted with concurrent requests
+    if fail and RequestScheduler().reschedule_failed_request(id=nffg_id):
+      self.log.debug("Request: %s is rescheduled! "
+                     "Skip result processing..." % nffg_id)
+      return
     self.log.debug("Process mapping result...")
     message_id = req_status.message_id
     if message_id is not None:
@@ -15,9 +15,12 @@
 Contains classes which implement :class:`NFFG` mapping functionality.
 """
 import cProfile
+import hashlib
 import pprint
 import pstats
+import threading
 import time
+from collections import OrderedDict
 
 from alg1.MappingAlgorithms import MAP
 from alg1.UnifyExceptionTypes import *
@@ -30,11 +33,125 @@ from escape.util.stat import stats
 from pox.lib.revent.revent import Event
 
 
+class MappingResultCache(object):
+  """
+  Bounded LRU cache for mapping results keyed by the fingerprint of the
+  request, the revision of the resource view and the mapping config.
+
+  The revision contains the DoV revision which is stepped by every change of
+  the resources, so a cached result is reused only on the same resources.
+  """
+  # Ignored mapping parameters in cache key
+  VOLATILE_PARAMS = ('persistent', 'mapping_state')
+
+  def __init__ (self, size):
+    """
+    Init.
+
+    :param size: max number of cached results
+    :type size: int
+    :return: None
+    """
+    self.size = size
+    self.__cache = OrderedDict()
+    # Threaded mapping can access the cache from worker threads
+    self.__lock = threading.Lock()
+
+  def __len__ (self):
+    return len(self.__cache)
+
+  @classmethod
+  def get_key (cls, graph, revision, params):
+    """
+    Calculate the cache key of a mapping.
+
+    The request fingerprint is the digest of the canonical JSON format of the
+    request without its id and name.
+
+    :param graph: request graph
+    :type graph: :class:`NFFG`
+    :param revision: revision of the resource view
+    :type revision: tuple
+    :param params: mapping parameters
+    :type params: dict
+    :return: cache key
+    :rtype: tuple
+    """
+    # Dump the request once with cleared id and name
+    graph_id, graph_name = graph.id, graph.name
+    graph.id = graph.name = None
+    try:
+      fingerprint = hashlib.sha1(graph.dump()).hexdigest()
+    finally:
+      graph.id, graph.name = graph_id, graph_name
+    config = repr(sorted((k, v) for k, v in params.iteritems()
+                         if k not in cls.VOLATILE_PARAMS))
+    return fingerprint, revision, config
+
+  def has_revision (self, revision):
+    """
+    Return True if there is a cached result for the given resource revision.
+
+    Used to skip the calculation of the request fingerprint on sure misses.
+
+    :param revision: revision of the resource view
+    :type revision: tuple
+    :return: cached result exists for the revision
+    :rtype: bool
+    """
+    with self.__lock:
+      return any(key[1] == revision for key in self.__cache)
+
+  def get (self, key):
+    """
+    Return with a copy of the cached mapping result.
+
+    :param key: cache key
+    :type key: tuple
+    :return: mapped NFFG or None
+    :rtype: :class:`NFFG`
+    """
+    with self.__lock:
+      mapped_nffg = self.__cache.pop(key, None)
+      if mapped_nffg is None:
+        return None
+      # Reinsert to mark as recently used
+      self.__cache[key] = mapped_nffg
+      return mapped_nffg.copy()
+
+  def put (self, key, mapped_nffg):
+    """
+    Cache a copy of the given mapping result.
+
+    :param key: cache key
+    :type key: tuple
+    :param mapped_nffg: mapped NFFG
+    :type mapped_nffg: :class:`NFFG`
+    :return: None
+    """
+    with self.__lock:
+      self.__cache.pop(key, None)
+      self.__cache[key] = mapped_nffg.copy()
+      while len(self.__cache) > self.size:
+        self.__cache.popitem(last=False)
+
+  def clear (self):
+    """
+    Remove all cached results.
+
+    :return: None
+    """
+    with self.__lock:
+      self.__cache.clear()
+
+
 class ESCAPEMappingStrategy(AbstractMappingStrategy):
   """
   Implement a strategy to map initial :class:`NFFG` into extended :class:`NFFG`.
   """
   LAYER_NAME = LAYER_NAME
+  # Mapping result caches of the layers
+  _result_caches = {}
 
   def __init__ (self):
     """
@@ -72,14 +189,11 @@ class ESCAPEMappingStrategy(AbstractMappingStrategy):
     log.debug("Call mapping algorithm with parameters:\n%s" %
               pprint.pformat(params))
     stat_level = stat_level if stat_level else cls.__name__
-    stats.add_measurement_start_entry(type=stats_type, info=stat_level)
-    try:
+    with stats.span(type=stats_type, info=stat_level):
       if profiling:
         ret = cls.cprofiler_decorator(MAP, request, topology, **params)
       else:
         ret = cls.timer_decorator(MAP, request, topology, **params)
-    finally:
-      stats.add_measurement_end_entry(type=stats_type, info=stat_level)
     return ret
 
   @staticmethod
@@ -122,10 +236,28 @@ class ESCAPEMappingStrategy(AbstractMappingStrategy):
     return result
 
   @classmethod
-  def map (cls, graph, resource, persistent=None, pre_state=None):
+  def get_result_cache (cls):
+    """
+    Return the mapping result cache of the layer or None if it is disabled.
+
+    :return: result cache
+    :rtype: :class:`MappingResultCache`
+    """
+    if cls.LAYER_NAME not in cls._result_caches:
+      size = CONFIG.get_mapping_cache_size(layer=cls.LAYER_NAME)
+      cls._result_caches[cls.LAYER_NAME] = MappingResultCache(size=size) \
+        if size > 0 else None
+    return cls._result_caches[cls.LAYER_NAME]
+
+  @classmethod
+  def map (cls, graph, resource, persistent=None, pre_state=None,
+           revision=None):
     """
     Default mapping algorithm of ESCAPEv2.
 
+    If the ``revision`` of the resource view is given, the mapping result is
+    cached and reused for the same request on the same resource revision.
+
     :param graph: Network Function forwarding Graph
     :type graph: :class:`NFFG`
     :param resource: global virtual resource info
@@ -134,6 +266,8 @@ class ESCAPEMappingStrategy(AbstractMappingStrategy):
     :type persistent: object
     :param pre_state: use mapping state for continued mapping
     :type pre_state: :class:`MappingState`
+    :param revision: revision of the resource view
+    :type revision: tuple
     :return: mapped Network Function Forwarding Graph
     :rtype: :class:`NFFG`
     """
@@ -147,7 +281,11 @@ class ESCAPEMappingStrategy(AbstractMappingStrategy):
       return
     try:
       # Run pre-mapping step to resolve target-less flowrules
-      cls._resolve_external_ports(graph, resource)
+      if any(port.role == "EXTERNAL"
+             for infra in graph.infras for port in infra.ports):
+        # Resource view can be a shared, read-only DoV snapshot
+        resource = resource.copy()
+        cls._resolve_external_ports(graph, resource)
       # Copy mapping config
       mapper_params = CONFIG.get_mapping_config(layer=cls.LAYER_NAME).copy()
       mapper_params['persistent'] = persistent
@@ -162,9 +300,30 @@ class ESCAPEMappingStrategy(AbstractMappingStrategy):
         log.info("Use 'trial and error' approach for mapping")
         mapper_params['return_mapping_state'] = True
         mapper_params['mapping_state'] = pre_state
-      mapping_result = cls.call_mapping_algorithm(request=graph.copy(),
-                                                  topology=resource.copy(),
-                                                  **mapper_params)
+      # Stateful mappings are not cached
+      cache = cls.get_result_cache()
+      if revision is None or persistent is not None or pre_state is not None:
+        cache = None
+      cache_key = None
+      mapping_result = None
+      if cache is not None and cache.has_revision(revision):
+        cache_key = MappingResultCache.get_key(graph=graph, revision=revision,
+                                               params=mapper_params)
+        mapping_result = cache.get(key=cache_key)
+        if mapping_result is not None:
+          log.info("Reuse cached mapping result for request: %s on resource "
+                   "revision: %s" % (graph, revision))
+      if mapping_result is None:
+        mapping_result = cls.call_mapping_algorithm(request=graph.copy(),
+                                                    topology=resource.copy(),
+                                                    **mapper_params)
+        if cache is not None and mapping_result is not None and \
+           not isinstance(mapping_result, (tuple, list)):
+          if cache_key is None:
+            cache_key = MappingResultCache.get_key(graph=graph,
+                                                   revision=revision,
+                                                   params=mapper_params)
+          cache.put(key=cache_key, mapped_nffg=mapping_result)
       if isinstance(mapping_result, tuple or list):
         mapped_nffg = mapping_result[0]
       else:
@@ -350,17 +509,20 @@ class ResourceOrchestrationMapper(AbstractMapper):
       log.info("Schedule mapping algorithm: %s in a worker thread" %
                self.strategy.__name__)
       call_as_coop_task(self._start_mapping, graph=input_graph,
-                        resource=virt_resource)
+                        resource=virt_resource,
+                        revision=self._get_resource_revision(resource_view))
       log.info("NF-FG: %s orchestration is finished by %s" % (
         input_graph, self.__class__.__name__))
       # Return with None
       return None
     else:
       state = self.last_mapping_state if continued else None
-      mapping_result = self.strategy.map(graph=input_graph,
-                                         resource=virt_resource,
-                                         persistent=self.persistent_state,
-                                         pre_state=state)
+      mapping_result = self.strategy.map(
+        graph=input_graph,
+        resource=virt_resource,
+        persistent=self.persistent_state,
+        pre_state=state,
+        revision=self._get_resource_revision(resource_view))
       if isinstance(mapping_result, tuple or list):
         if len(mapping_result) == 2:
           mapped_nffg = mapping_result[0]
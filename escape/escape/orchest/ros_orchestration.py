@@ -14,13 +14,12 @@
 """
 Contains classes relevant to Resource Orchestration Sublayer functionality.
 """
-import ast
-from collections import OrderedDict
-
 from escape.adapt.virtualization import VirtualizerManager
+from escape.nffg_lib.nffg import NFFG
 from escape.orchest import log as log, LAYER_NAME
 from escape.orchest.ros_mapping import ResourceOrchestrationMapper
 from escape.util.config import CONFIG
+from escape.util.history import RequestHistory
 from escape.util.mapping import AbstractOrchestrator, ProcessorError
 from escape.util.misc import VERBOSE
 from escape.util.virtualizer_helper import detect_bb_nf_from_path, \
@@ -67,6 +66,7 @@ class ResourceOrchestrator(AbstractOrchestrator):
     """
     if self.nfibManager:
       self.nfibManager.finalize()
+    self.nffgManager.close()
 
   def instantiate_nffg (self, nffg, continued_request_id=None):
     """
@@ -153,7 +153,7 @@ class ResourceOrchestrator(AbstractOrchestrator):
       log.error("Service request(id: %s) is not found!" % service_id)
       return "Service request is not found!"
     # Get the overall view a.k.a. DoV
-    dov = self.virtualizerManager.dov.get_resource_info()
+    dov = self.virtualizerManager.dov
     # Collect NFs
     nfs = [nf.id for nf in request.nfs]
     log.debug("Collected NFs: %s" % nfs)
@@ -164,8 +164,8 @@ class ResourceOrchestrator(AbstractOrchestrator):
     """
     Collect mapping of given NFs on the global view(DoV).
 
-    :param dov: global topology
-    :type dov: :class:`NFFG`
+    :param dov: global view
+    :type dov: :any:`DomainVirtualizer`
     :param nfs: list of NFs
     :type nfs: list
     :return: mapping
@@ -174,36 +174,13 @@ class ResourceOrchestrator(AbstractOrchestrator):
     mappings = []
     # Process NFs
     for nf_id in nfs:
-      mapping = {}
-      # Get the connected infra node
-      if nf_id not in dov:
-        log.warning("NF: %s is not found in the global topology(DoV)!" % nf_id)
-        continue
-      bisbis = [n.id for n in dov.infra_neighbors(nf_id)]
-      log.log(VERBOSE, "Detected mapped BiSBiS node:" % bisbis)
-      if len(bisbis) != 1:
-        log.warning(
-          "Detected unexpected number of BiSBiS node: %s!" % bisbis)
+      # Get the indexed binding of the NF
+      mapping = dov.get_nf_binding(nf_id)
+      if mapping is None:
+        log.warning("NF: %s is not found in the global topology(DoV) or not "
+                    "bound to exactly one BiSBiS node!" % nf_id)
         continue
-      bisbis = bisbis.pop()
-      # Add NF id
-      nf = {"id": nf_id, "ports": []}
-      for dyn_link in dov.network[nf_id][bisbis].itervalues():
-        port = OrderedDict(id=dyn_link.src.id)
-        if dyn_link.src.l4 is not None:
-          try:
-            port['management'] = ast.literal_eval(dyn_link.src.l4)
-          except SyntaxError:
-            log.warning("L4 address entry: %s is not valid Python expression! "
-                        "Add the original string..." % dyn_link.src.l4)
-            port['management'] = dyn_link.src.l4
-        nf['ports'].append(port)
-      mapping['nf'] = nf
-      # Add infra node ID and domain name
-      bisbis = bisbis.split('@')
-      bb_mapping = {"id": bisbis[0],
-                    "domain": bisbis[1] if len(bisbis) > 1 else None}
-      mapping['bisbis'] = bb_mapping
+      log.log(VERBOSE, "Detected mapped BiSBiS node: %s" % mapping['bisbis'])
       mappings.append(mapping)
     return mappings
 
@@ -219,7 +196,7 @@ class ResourceOrchestrator(AbstractOrchestrator):
     :return: mapping structure extended with embedding info
     :rtype: :class:`Virtualizer`
     """
-    dov = self.virtualizerManager.dov.get_resource_info()
+    dov = self.virtualizerManager.dov
     response = mappings.yang_copy()
     log.debug("Start checking mappings...")
     for mapping in response:
@@ -291,12 +268,13 @@ class NFFGManager(object):
     """
     super(NFFGManager, self).__init__()
     log.debug("Init %s" % self.__class__.__name__)
-    self._nffgs = dict()
+    self._nffgs = RequestHistory(name="nffgs", dumper=lambda n: n.dump(),
+                                 loader=NFFG.parse)
     self._last = None
 
   def save (self, nffg):
     """
-    Save NF-FG in a dict.
+    Save NF-FG in the bounded request history.
 
     :param nffg: Network Function Forwarding Graph
     :type nffg: :class:`NFFG`
@@ -330,5 +308,13 @@ class NFFGManager(object):
     """
     return self._nffgs.get(nffg_id, None)
 
+  def close (self):
+    """
+    Release the on-disk NF-FG history.
+
+    :return: None
+    """
+    self._nffgs.close()
+
   def __len__ (self):
     return len(self._nffgs)
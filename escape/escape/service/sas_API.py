@@ -177,6 +177,8 @@ class ServiceLayerAPI(AbstractAPI):
     :param event: event object
     """
     log.info("Service Layer is going down...")
+    if self.service_orchestrator:
+      self.service_orchestrator.sgManager.close()
     if self.gui_proc:
       log.debug("Shut down GUI process - PID: %s" % self.gui_proc.pid)
       self.gui_proc.terminate()
@@ -327,7 +329,6 @@ class ServiceLayerAPI(AbstractAPI):
       else:
         log.warning("Something went wrong in service request initiation: "
                     "mapped service data is missing!")
-        self.__handle_mapping_result(nffg_id=service_nffg.id, fail=True)
         stats.add_measurement_end_entry(type=stats.TYPE_SERVICE,
                                         info=LAYER_NAME + "-FAILED")
         self._handle_InstantiationFinishedEvent(
@@ -335,7 +336,6 @@ class ServiceLayerAPI(AbstractAPI):
             id=service_nffg.id,
             result=InstantiationFinishedEvent.MAPPING_ERROR))
     except ProcessorError as e:
-      self.__handle_mapping_result(nffg_id=service_nffg.id, fail=True)
       stats.add_measurement_end_entry(type=stats.TYPE_SERVICE,
                                       info=LAYER_NAME + "-DENIED")
       self._handle_InstantiationFinishedEvent(
@@ -378,6 +378,12 @@ class ServiceLayerAPI(AbstractAPI):
       log.getChild('API').debug("Request status is missing for NFFG: %s! "
                                 "Skip result processing..." % nffg_id)
       return
+    # Only the layer which received the request handles its result, and
+    # it can be retried exclusively if it conflicted with concurrent requests
+    if fail and RequestScheduler().reschedule_failed_request(id=nffg_id):
+      log.getChild('API').debug("Request: %s is rescheduled! "
+                                "Skip result processing..." % nffg_id)
+      return
     log.getChild('API').debug("Process mapping result...")
     message_id = req_status.message_id
     if message_id is not None:
@@ -153,16 +153,19 @@ class ServiceGraphMapper(AbstractMapper):
         "Schedule mapping algorithm: %s in a worker thread" %
         self.strategy.__name__)
       call_as_coop_task(self._start_mapping, graph=input_graph,
-                        resource=virt_resource)
+                        resource=virt_resource,
+                        revision=self._get_resource_revision(resource_view))
       log.info("SG: %s orchestration is finished by %s" % (
         input_graph, self.__class__.__name__))
       # Return with None
       return None
     else:
       state = self.last_mapping_state if continued else None
-      mapping_result = self.strategy.map(graph=input_graph,
-                                         resource=virt_resource,
-                                         pre_state=state)
+      mapping_result = self.strategy.map(
+        graph=input_graph,
+        resource=virt_resource,
+        pre_state=state,
+        revision=self._get_resource_revision(resource_view))
       if isinstance(mapping_result, tuple or list):
         if len(mapping_result) == 2:
           mapped_nffg = mapping_result[0]
@@ -14,8 +14,10 @@
 """
 Contains classes relevant to Service Adaptation Sublayer functionality.
 """
+from escape.nffg_lib.nffg import NFFG
 from escape.service import log as log, LAYER_NAME
 from escape.service.sas_mapping import ServiceGraphMapper
+from escape.util.history import RequestHistory
 from escape.util.mapping import AbstractOrchestrator, ProcessorError
 from escape.util.misc import VERBOSE
 from pox.lib.revent.revent import EventMixin, Event
@@ -139,12 +141,14 @@ class SGManager(object):
     """
     super(SGManager, self).__init__()
     log.debug("Init %s" % self.__class__.__name__)
-    self._service_graphs = dict()
+    self._service_graphs = RequestHistory(name="sgs",
+                                          dumper=lambda sg: sg.dump(),
+                                          loader=NFFG.parse)
     self._last = None
 
   def save (self, sg):
     """
-    Save SG in a dict.
+    Save SG in the bounded request history.
 
     :param sg: Service Graph
     :type sg: :class:`NFFG`
@@ -169,6 +173,14 @@ class SGManager(object):
     """
     return self._service_graphs.get(graph_id, None)
 
+  def close (self):
+    """
+    Release the on-disk SG history.
+
+    :return: None
+    """
+    self._service_graphs.close()
+
   def get_last_request (self):
     """
     Return with the last saved :class:`NFFG`:
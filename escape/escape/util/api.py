@@ -24,13 +24,17 @@ import urlparse
 import uuid
 from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
 from Queue import Queue
+from collections import OrderedDict, deque
 from SocketServer import ThreadingMixIn
 
 import requests
 from requests.exceptions import Timeout, RequestException
 
 from escape import __project__
+from escape.nffg_lib.nffg import NFFG
 from escape.util.config import CONFIG
+from escape.util.history import RequestHistory
+from escape.util.metrics import metrics
 from escape.util.misc import SimpleStandaloneHelper, quit_with_error, \
   get_escape_version
 from escape.util.pox_extension import POXCoreRegisterMetaClass
@@ -294,7 +298,11 @@ class RequestCache(object):
     :return: None
     """
     super(RequestCache, self).__init__()
-    self.__cache = dict()
+    # Requests under processing are kept in memory to be updated in place
+    self.__cache = RequestHistory(name="requests", indexes=('nffg_id',),
+                                  active=lambda r: r.status in (
+                                    RequestStatus.INITIATED,
+                                    RequestStatus.PROCESSING))
 
   def cache_request (self, message_id, status=None, params=None):
     """
@@ -324,10 +332,11 @@ class RequestCache(object):
     """
     try:
       key = nffg.id
-      self.__cache[key] = RequestStatus(message_id=key,
-                                        nffg_id=nffg.id,
-                                        status=RequestStatus.INITIATED,
-                                        params=nffg.metadata.pop('params'))
+      self.__cache.put(key, RequestStatus(message_id=key,
+                                          nffg_id=nffg.id,
+                                          status=RequestStatus.INITIATED,
+                                          params=nffg.metadata.pop('params')),
+                       nffg_id=nffg.id)
       return key
     except KeyError:
       return
@@ -393,10 +402,7 @@ class RequestCache(object):
     :param message_id: service request status
     :rtype: :class:`RequestStatus`
     """
-    try:
-      return self.__cache[message_id]
-    except KeyError:
-      return None
+    return self.__cache.get(message_id)
 
   def get_request_by_nffg_id (self, nffg_id):
     """
@@ -406,10 +412,7 @@ class RequestCache(object):
     :type nffg_id: str or int
     :rtype: :class:`RequestStatus`
     """
-    for req in self.__cache.itervalues():
-      if req.nffg_id == nffg_id:
-        return req
-    return None
+    return self.__cache.get_by('nffg_id', nffg_id)
 
   def get_status (self, id):
     """
@@ -425,6 +428,14 @@ class RequestCache(object):
     except KeyError:
       return RequestStatus.UNKNOWN
 
+  def close (self):
+    """
+    Release the on-disk request history.
+
+    :return: None
+    """
+    self.__cache.close()
+
 
 class RESTServer(ThreadingMixIn, HTTPServer, object):
   """
@@ -482,6 +493,7 @@ class RESTServer(ThreadingMixIn, HTTPServer, object):
     """
     if self.started:
       self.shutdown()
+    self.request_cache.close()
 
   def run (self):
     """
@@ -1088,6 +1100,11 @@ class APIRequest(object):
     self.hook = hook
     self.data = data
     self.kwargs = kwargs
+    # Used only by concurrent scheduling
+    self.footprint = None
+    self.revision = None
+    self.conflict = False
+    self.retries = 0
 
   def __str__ (self):
     return "Request(id: %s, %s  -->  %s, params: %s)" % (
@@ -1098,9 +1115,21 @@ class RequestScheduler(threading.Thread):
   """
   Manager class for registering and scheduling service requests registered from
   other thread.
+
+  In FIFO mode (default) the requests are orchestrated one by one. In
+  CONCURRENT mode multiple requests can be under orchestration at the same time
+  if their footprints (the NF and BiSBiS ids referred in the request) do not
+  overlap. The footprint is only an optimistic pre-filter: the revision of the
+  resource view is stored at admission and the committing layer checks it
+  against the changes of other requests. Only the requests failed due to such
+  a detected conflict are rescheduled for exclusive orchestration. Without a
+  registered revision source the requests are admitted exclusively.
   """
   __metaclass__ = POXCoreRegisterMetaClass
   _core_name = "RequestScheduler"
+  # Scheduling modes
+  MODE_FIFO = "FIFO"
+  MODE_CONCURRENT = "CONCURRENT"
 
   def __init__ (self):
     """
@@ -1114,8 +1143,20 @@ class RequestScheduler(threading.Thread):
     self.__progress = None
     self.__standby = False
     self.log = core.getLogger("SCHEDULER")
+    self.mode = CONFIG.get_request_scheduling_mode()
+    if self.mode not in (self.MODE_FIFO, self.MODE_CONCURRENT):
+      self.log.warning("Unknown scheduling mode: %s! Using %s mode..."
+                       % (self.mode, self.MODE_FIFO))
+      self.mode = self.MODE_FIFO
+    # Requests waiting for admission in CONCURRENT mode
+    self.__waiting = deque()
+    # Admitted requests in CONCURRENT mode: {id: request}
+    self.__reservations = OrderedDict()
+    self.__max_concurrent = max(CONFIG.get_max_concurrent_requests(), 1)
+    # Getter of the resource view revision used for optimistic commit
+    self.__revision_source = None
     self.start()
-    self.log.info('Init %s' % self)
+    self.log.info('Init %s in %s mode' % (self, self.mode))
 
   @property
   def orchestration_in_progress (self):
@@ -1123,7 +1164,7 @@ class RequestScheduler(threading.Thread):
     :return: If any service request orchestration is in progress
     :rtype: bool
     """
-    return self.__progress is not None
+    return self.__progress is not None or bool(self.__reservations)
 
   def set_orchestration_finished (self, id):
     """
@@ -1133,6 +1174,8 @@ class RequestScheduler(threading.Thread):
     :type id: str or int
     :return: None
     """
+    if self.mode == self.MODE_CONCURRENT:
+      return self.__release_request(id=id)
     if self.__progress is None:
       self.log.debug("No orchestration in progress!")
     elif self.__progress != id:
@@ -1141,11 +1184,109 @@ class RequestScheduler(threading.Thread):
       self.log.info("Set orchestration status of request: %s --> FINISHED"
                     % self.__progress)
       stats.add_measurement_end_entry(stats.TYPE_SCHEDULED, id)
-      stats.finish_request_measurement()
+      stats.finish_request_measurement(request_id=id)
       with self.__condition:
         self.__progress = None
         self.__condition.notify()
 
+  def __release_request (self, id):
+    """
+    Release the reservation of the concurrently orchestrated request given by
+    id.
+
+    :param id: service request id
+    :type id: str or int
+    :return: None
+    """
+    with self.__condition:
+      if self.__reservations.pop(id, None) is None:
+        self.log.debug("No orchestration in progress with id: %s!" % id)
+        return
+      self.log.info("Set orchestration status of request: %s --> FINISHED"
+                    % id)
+      self.__condition.notify()
+    stats.add_measurement_end_entry(stats.TYPE_SCHEDULED, id)
+    stats.finish_request_measurement(request_id=id)
+
+  def register_revision_source (self, source):
+    """
+    Register the function which returns the actual revision of the resource
+    view the requests are committed into. The revision is stored at the
+    admission of the requests in CONCURRENT mode.
+
+    :param source: revision getter
+    :type source: callable
+    :return: None
+    """
+    with self.__condition:
+      self.__revision_source = source
+      self.__condition.notify()
+
+  def get_admission_revision (self, id):
+    """
+    Return the resource view revision stored at the admission of the request
+    given by id.
+
+    :param id: service request id
+    :type id: str or int
+    :return: revision or None if the request is not orchestrated in
+      CONCURRENT mode
+    :rtype: int
+    """
+    with self.__condition:
+      request = self.__reservations.get(id)
+      return request.revision if request is not None else None
+
+  def set_request_conflict (self, id):
+    """
+    Mark the request given by id failed due to a conflict with the changes of
+    other requests detected at commit time.
+
+    :param id: service request id
+    :type id: str or int
+    :return: None
+    """
+    with self.__condition:
+      request = self.__reservations.get(id)
+      if request is not None:
+        self.log.debug("Set conflict for request: %s" % id)
+        request.conflict = True
+
+  def reschedule_failed_request (self, id):
+    """
+    Reschedule the failed request given by id for exclusive orchestration if it
+    was failed due to a conflict with other concurrently orchestrated requests.
+
+    Must be called only once per result as the rescheduled request is not
+    tracked as in progress anymore.
+
+    :param id: service request id
+    :type id: str or int
+    :return: the request has been rescheduled or not
+    :rtype: bool
+    """
+    if self.mode != self.MODE_CONCURRENT:
+      return False
+    with self.__condition:
+      request = self.__reservations.get(id)
+      if request is None or not request.conflict:
+        return False
+      if request.retries >= CONFIG.get_request_conflict_retries():
+        self.log.debug("Request: %s has reached the retry limit!" % id)
+        return False
+      del self.__reservations[id]
+      request.retries += 1
+      request.conflict = False
+      # Request is orchestrated alone from now on
+      request.footprint = None
+      self.__waiting.appendleft(request)
+      self.__condition.notify()
+    self.log.warning("Request: %s has failed due to a conflict with other "
+                     "requests! Reschedule request exclusively (retry: %s)..."
+                     % (id, request.retries))
+    stats.add_measurement_end_entry(stats.TYPE_SCHEDULED, id)
+    return True
+
   def schedule_request (self, id, layer, hook, data, **kwargs):
     """
     Schedule a service request with the given data.
@@ -1168,18 +1309,28 @@ class RequestScheduler(threading.Thread):
                       data=data,
                       kwargs=kwargs)
     if not self.__standby:
-      self.__queue.put(data)
+      if self.mode == self.MODE_CONCURRENT:
+        data.footprint = self._get_footprint(data.data)
+        with self.__condition:
+          self.__waiting.append(data)
+          self.__condition.notify()
+      else:
+        self.__queue.put(data)
+      metrics.counter(name="escape_scheduled_requests_total",
+                      help="Number of scheduled service requests.",
+                      labels=("layer",)).inc(layer=layer)
       self.log.info("Schedule request: %s on %s --> %s..." % (id,
                                                               layer,
                                                               hook.__name__))
     else:
-      if id == self.__progress:
+      if id == self.__progress or id in self.__reservations:
         self.log.info("Continue service request in standby mode: %s..." % id)
         self._proceed_API_call(data)
       else:
         self.log.error("Received request: %s is different from request in "
                        "standby: %s" % (id, self.__progress))
-    self.log.debug("Remained requests: %s" % self.__queue.qsize())
+    self.log.debug("Remained requests: %s" % (self.__queue.qsize() +
+                                              len(self.__waiting)))
 
   def set_orchestration_standby (self):
     """
@@ -1189,7 +1340,98 @@ class RequestScheduler(threading.Thread):
     """
     self.__standby = True
     self.log.info("Set request in progress: %s in standby mode"
-                  % self.__progress)
+                  % (self.__progress if self.mode == self.MODE_FIFO
+                     else self.__reservations.keys()))
+
+  @staticmethod
+  def _get_footprint (data):
+    """
+    Return the resource footprint of the given request data as the set of the
+    referred NF and BiSBiS ids. SAPs are not considered as they are the shared
+    attachment points of the services.
+
+    :param data: request data
+    :type data: :class:`NFFG` or object
+    :return: footprint or None if the request must be orchestrated exclusively
+    :rtype: frozenset
+    """
+    if not isinstance(data, NFFG):
+      return None
+    footprint = {nf.id for nf in data.nfs}
+    footprint.update(infra.id for infra in data.infras)
+    return frozenset(footprint) if footprint else None
+
+  def __get_admissible_request (self):
+    """
+    Remove and return the first waiting request which can be admitted along
+    with the requests already in progress.
+
+    Waiting requests cannot overtake earlier waiting requests with overlapping
+    footprints, so the FIFO order of conflicting requests is kept.
+
+    Must be called with acquired condition lock.
+
+    :return: admissible request or None
+    :rtype: :class:`APIRequest`
+    """
+    if len(self.__reservations) >= self.__max_concurrent:
+      return None
+    if any(r.footprint is None for r in self.__reservations.itervalues()):
+      # Exclusive request is in progress
+      return None
+    if self.__revision_source is None and self.__reservations:
+      # Conflicts cannot be detected at commit time
+      return None
+    reserved = set()
+    for r in self.__reservations.itervalues():
+      reserved.update(r.footprint)
+    for request in self.__waiting:
+      if request.footprint is None:
+        if not self.__reservations and request is self.__waiting[0]:
+          self.__waiting.popleft()
+          return request
+        # Nothing can overtake an exclusive request
+        return None
+      if reserved.isdisjoint(request.footprint):
+        self.__waiting.remove(request)
+        return request
+      # Keep the order of overlapping requests
+      reserved.update(request.footprint)
+    return None
+
+  def __admit_request (self):
+    """
+    Admit the first admissible waiting request and store the actual revision
+    of the resource view for the commit check.
+
+    Must be called with acquired condition lock.
+
+    :return: admitted request or None
+    :rtype: :class:`APIRequest`
+    """
+    request = self.__get_admissible_request()
+    if request is None:
+      return None
+    if self.__revision_source is not None:
+      request.revision = self.__revision_source()
+    self.__reservations[request.id] = request
+    self.log.debug("Admit request: %s, requests in progress: %s"
+                   % (request.id, self.__reservations.keys()))
+    return request
+
+  def __run_concurrent (self):
+    """
+    Admit waiting requests with non-overlapping footprints concurrently.
+
+    :return: None
+    """
+    while True:
+      with self.__condition:
+        request = self.__admit_request()
+        while request is None:
+          self.__condition.wait()
+          request = self.__admit_request()
+      self._proceed_API_call(request=request)
 
   def _proceed_API_call (self, request):
     """
@@ -1202,6 +1444,7 @@ class RequestScheduler(threading.Thread):
     :return: None
     """
     self.log.info("Start request processing in coop-task: %s" % request)
+    stats.set_request_id(request_id=request.id)
     stats.add_measurement_start_entry(stats.TYPE_SCHEDULED, request.id)
     if callable(request.hook):
       return request.hook(id=request.id, data=request.data, **request.kwargs)
@@ -1215,6 +1458,8 @@ class RequestScheduler(threading.Thread):
 
     :return: None
     """
+    if self.mode == self.MODE_CONCURRENT:
+      return self.__run_concurrent()
     while True:
       with self.__condition:
         if self.__progress:
@@ -14,11 +14,14 @@
 """
 Contains functions and classes for remote visualization.
 """
+import gzip
+import itertools
 import os
 import shutil
 import threading
 import time
 import urlparse
+from collections import OrderedDict, deque
 
 import wrapt
 from requests import Session, ConnectionError, HTTPError, Timeout
@@ -63,6 +66,9 @@ class RemoteVisualizer(Session):
   # Default timeout value in sec
   DEFAULT_TIMEOUT = 1
   """Default timeout value in sec"""
+  # Name of the background notifier thread
+  NOTIFIER_NAME = "visualizer-notifier"
+  """Name of the background notifier thread"""
 
   def __init__ (self, url=None, rpc=None, timeout=DEFAULT_TIMEOUT,
                 instance_id=None):
@@ -99,6 +105,15 @@ class RemoteVisualizer(Session):
                                    unique_nf_id=CONFIG.ensure_unique_vnf_id())
     # Suppress low level logging
     self.__suppress_requests_logging()
+    # Pending notifications of the background notifier: {key: notification}
+    self.__pending = OrderedDict()
+    self.__pending_lock = threading.Condition()
+    self.__queue_size = CONFIG.get_visualization_queue_size()
+    self.__cntr = itertools.count()
+    self.__notifier = None
+    self.__running = False
+    if CONFIG.get_visualization_async():
+      core.addListenerByName("GoingDownEvent", self._handle_GoingDownEvent)
 
   @staticmethod
   def __suppress_requests_logging (level=None):
@@ -119,6 +134,117 @@ class RemoteVisualizer(Session):
     logging.getLogger("requests").setLevel(level)
     logging.getLogger("urllib3").setLevel(level)
 
+  def notify (self, data, url=None, unique_id=None, copy=False, **kwargs):
+    """
+    Notify the remote server about the given data.
+
+    If asynchronous notification is enabled, the notification is only queued
+    and the conversion and sending is done by a background thread. Pending
+    notifications with the same ``unique_id`` are coalesced, so only the most
+    recent one is sent. If the queue is full, the oldest notification is
+    dropped.
+
+    :param data: topology description need to send
+    :type data: :class:`NFFG` or :class:`Virtualizer`
+    :param url: additional URL (optional)
+    :type url: str
+    :param unique_id: use given ID as NFFG id
+    :type unique_id: str or int
+    :param copy: queue a copy of the given data (default: False)
+    :type copy: bool
+    :param kwargs: additional params to request
+    :type kwargs: dict
+    :return: response text if the notification was sent synchronously or
+      the notification is queued
+    :rtype: str or bool
+    """
+    if not CONFIG.get_visualization_async():
+      return self.send_notification(data=data, url=url, unique_id=unique_id,
+                                    **kwargs)
+    if data is None:
+      self.log.warning("Missing data! Skip notifying remote visualizer.")
+      return False
+    if copy and isinstance(data, NFFG):
+      data = data.copy()
+    # Notifications without explicit ID can not be coalesced
+    key = (url, unique_id if unique_id else "#%s" % next(self.__cntr))
+    with self.__pending_lock:
+      if key in self.__pending:
+        self.log.debug("Coalesce pending notification: %s" % unique_id)
+        # Keep the position of the pending notification but replace its data
+        self.__pending[key] = (data, url, unique_id, kwargs)
+      else:
+        if len(self.__pending) >= self.__queue_size:
+          dropped = self.__pending.popitem(last=False)
+          self.log.warning("Notification queue is full! Drop stale "
+                           "notification: %s" % dropped[1][2])
+        self.__pending[key] = (data, url, unique_id, kwargs)
+      self.__start_notifier()
+      self.__pending_lock.notify()
+    return True
+
+  def __start_notifier (self):
+    """
+    Start the background notifier thread if it is not running.
+
+    Must be called with acquired pending lock.
+
+    :return: None
+    """
+    if self.__notifier is not None and self.__notifier.is_alive():
+      return
+    self.__running = True
+    self.__notifier = threading.Thread(name=self.NOTIFIER_NAME,
+                                       target=self.__process_notifications)
+    self.__notifier.daemon = True
+    self.__notifier.start()
+
+  def __process_notifications (self):
+    """
+    Main loop of the background notifier thread.
+
+    :return: None
+    """
+    self.log.debug("Remote visualizer notifier is started")
+    while True:
+      with self.__pending_lock:
+        while self.__running and not self.__pending:
+          self.__pending_lock.wait()
+        if not self.__running:
+          break
+        key, notification = self.__pending.popitem(last=False)
+      data, url, unique_id, kwargs = notification
+      try:
+        self.send_notification(data=data, url=url, unique_id=unique_id,
+                               **kwargs)
+      except Exception as e:
+        self.log.exception("Got unexpected exception during notifying remote "
+                           "Visualizer: %s" % e)
+    self.log.debug("Remote visualizer notifier is stopped")
+
+  def stop (self):
+    """
+    Stop the background notifier thread and drop pending notifications.
+
+    :return: None
+    """
+    with self.__pending_lock:
+      if self.__pending:
+        self.log.debug("Drop %s pending notification(s)" % len(self.__pending))
+        self.__pending.clear()
+      self.__running = False
+      self.__pending_lock.notify_all()
+
+  def _handle_GoingDownEvent (self, event):
+    """
+    Stop background notifier at shutdown.
+
+    :param event: shutdown event
+    :type event: :class:`GoingDownEvent`
+    :return: None
+    """
+    self.stop()
+
   def send_notification (self, data, url=None, unique_id=None, **kwargs):
     """
     Send given data to a remote server for visualization.
@@ -183,10 +309,16 @@ class RemoteVisualizer(Session):
 class MessageDumper(object):
   """
   Dump messages into file in thread-safe way.
+
+  The files are written by a background thread, optionally compressed, and
+  rotated by the overall size and the number of the files. With sampling only
+  the first N messages of each kind and the failed exchanges are dumped.
   """
   __metaclass__ = Singleton
   DIR = os.path.join(LOG_FOLDER, "trails/")
   """Default log dir"""
+  WRITER_NAME = "MessageDumper"
+  DEFAULT_QUEUE_SIZE = 64
   __lock = threading.Lock()
 
   def __init__ (self):
@@ -194,8 +326,27 @@ class MessageDumper(object):
     Init.
     """
     self.__cntr = 0
+    cfg = CONFIG.get_trails_config()
+    self.background = cfg.get('async', True)
+    self.queue_size = int(cfg.get('queue_size', self.DEFAULT_QUEUE_SIZE))
+    self.compress = cfg.get('compress', False)
+    self.max_size = int(cfg.get('max_size', 0)) * 1024 * 1024
+    self.max_files = int(cfg.get('max_files', 0))
+    self.first = int(cfg.get('first', 0))
+    # Sampling counters: {unique name part: number of received messages}
+    self.__samples = {}
+    # Written files and the sum of their size for rotation
+    self.__files = deque()
+    self.__size = 0
+    # Pending messages of the background writer: (file path, data)
+    self.__pending = deque()
+    self.__pending_lock = threading.Condition()
+    self.__writer = None
+    self.__running = False
     self.__clear_trails()
     self.__init()
+    if self.background:
+      core.addListenerByName("GoingDownEvent", self._handle_GoingDownEvent)
 
   @wrapt.synchronized(__lock)
   def increase_cntr (self):
@@ -241,7 +392,25 @@ class MessageDumper(object):
           shutil.rmtree(os.path.join(PROJECT_ROOT, self.DIR, f),
                         ignore_errors=True)
 
-  def dump_to_file (self, data, unique):
+  @wrapt.synchronized(__lock)
+  def __is_sampled (self, unique, failed):
+    """
+    Return True if the message should be dumped according to sampling.
+
+    :param unique: unique name part
+    :type unique: str
+    :param failed: message belongs to a failed exchange
+    :type failed: bool
+    :return: message is dumped or not
+    :rtype: bool
+    """
+    if not self.first or failed:
+      return True
+    cntr = self.__samples.get(unique, 0) + 1
+    self.__samples[unique] = cntr
+    return cntr <= self.first
+
+  def dump_to_file (self, data, unique, failed=False):
     """
     Dump given raw data into file.
 
@@ -249,17 +418,129 @@ class MessageDumper(object):
     :type data: str
     :param unique: unique name part
     :type unique: str
+    :param failed: message belongs to a failed exchange (default: False)
+    :type failed: bool
     :return: None
     """
     if not isinstance(data, basestring):
       log.error("Data is not str: %s" % type(data))
       return
+    if not self.__is_sampled(unique=unique, failed=failed):
+      return
     date = time.strftime("%Y%m%d%H%M%S")
     cntr = self.increase_cntr()
     file_path = os.path.join(self.log_dir,
-                             "%s_%03d_%s.log" % (date, cntr, unique))
+                             "%s_%03d_%s%s.log" % (date, cntr, unique,
+                                                   "_FAILED" if failed else ""))
+    if self.compress:
+      file_path += ".gz"
+    if self.background:
+      with self.__pending_lock:
+        if len(self.__pending) < self.queue_size:
+          self.__pending.append((file_path, data))
+          self.__start_writer()
+          self.__pending_lock.notify()
+          return
+      log.debug("Message queue is full! Write file synchronously...")
+    self.__write(file_path=file_path, data=data)
+
+  def __write (self, file_path, data):
+    """
+    Write the data into the given file and rotate the old files.
+
+    :param file_path: file path
+    :type file_path: str
+    :param data: raw data
+    :type data: str
+    :return: None
+    """
     if os.path.exists(file_path):
       log.warning("File path exist! %s" % file_path)
     log.debug("Logging data to file: %s..." % file_path)
-    with open(file_path, "w") as f:
-      f.write(data)
+    try:
+      if self.compress:
+        with gzip.open(file_path, "wb") as f:
+          f.write(data)
+      else:
+        with open(file_path, "w") as f:
+          f.write(data)
+      self.__rotate(file_path=file_path)
+    except (IOError, OSError) as e:
+      log.error("Failed to write file: %s! Cause: %s" % (file_path, e))
+
+  @wrapt.synchronized(__lock)
+  def __rotate (self, file_path):
+    """
+    Register the written file and remove the oldest files above the limits.
+
+    :param file_path: written file
+    :type file_path: str
+    :return: None
+    """
+    if not self.max_size and not self.max_files:
+      return
+    size = os.path.getsize(file_path)
+    self.__files.append((file_path, size))
+    self.__size += size
+    while len(self.__files) > 1 and (
+          (self.max_files and len(self.__files) > self.max_files) or
+          (self.max_size and self.__size > self.max_size)):
+      old_path, old_size = self.__files.popleft()
+      self.__size -= old_size
+      try:
+        os.remove(old_path)
+      except OSError:
+        pass
+
+  def __start_writer (self):
+    """
+    Start the background writer thread if it is not running.
+
+    Must be called with acquired pending lock.
+
+    :return: None
+    """
+    if self.__writer is not None and self.__writer.is_alive():
+      return
+    self.__running = True
+    self.__writer = threading.Thread(name=self.WRITER_NAME,
+                                     target=self.__process_messages)
+    self.__writer.daemon = True
+    self.__writer.start()
+
+  def __process_messages (self):
+    """
+    Main loop of the background writer thread.
+
+    :return: None
+    """
+    while True:
+      with self.__pending_lock:
+        while self.__running and not self.__pending:
+          self.__pending_lock.wait()
+        if not self.__pending:
+          break
+        file_path, data = self.__pending.popleft()
+      self.__write(file_path=file_path, data=data)
+
+  def stop (self):
+    """
+    Stop the background writer thread after the pending messages are written.
+
+    :return: None
+    """
+    with self.__pending_lock:
+      self.__running = False
+      self.__pending_lock.notify_all()
+    if self.__writer is not None:
+      self.__writer.join()
+
+  def _handle_GoingDownEvent (self, event):
+    """
+    Flush pending messages at shutdown.
+
+    :param event: shutdown event
+    :type event: :class:`GoingDownEvent`
+    :return: None
+    """
+    self.stop()
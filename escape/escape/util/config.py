@@ -346,6 +346,20 @@ class ESCAPEConfig(object):
     except (KeyError, AttributeError):
       return False
 
+  def get_mapping_cache_size (self, layer):
+    """
+    Return the number of cached mapping results for the ``layer``.
+
+    :param layer: layer name
+    :type layer: str
+    :return: size of mapping result cache (default: 0 - disabled)
+    :rtype: int
+    """
+    try:
+      return int(self.__config[layer]['MAPPER']['result-cache-size'])
+    except (KeyError, AttributeError, ValueError, TypeError):
+      return 0
+
   def get_strategy (self, layer):
     """
     Return with the Strategy class of the given layer.
@@ -423,6 +437,37 @@ class ESCAPEConfig(object):
     except KeyError:
       return False
 
+  def get_process_pool (self, layer):
+    """
+    Return the number of worker processes used to run the mapping strategy in
+    separated processes. If value is not defined: return 0 (disabled).
+
+    :param layer: layer name
+    :type layer: str
+    :return: number of worker processes
+    :rtype: int
+    """
+    try:
+      return int(self.__config[layer]['STRATEGY']['PROCESS-POOL'])
+    except (KeyError, ValueError, TypeError):
+      return 0
+
+  def get_mapping_timeout (self, layer):
+    """
+    Return the timeout of the mapping performed in a worker process.
+    If value is not defined: return 300.
+
+    :param layer: layer name
+    :type layer: str
+    :return: timeout in sec or None if it is disabled
+    :rtype: float
+    """
+    try:
+      timeout = float(self.__config[layer]['STRATEGY']['MAPPING-TIMEOUT'])
+      return timeout if timeout > 0 else None
+    except (KeyError, ValueError, TypeError):
+      return 300
+
   ##############################################################################
   # REST_API layer getters
   ##############################################################################
@@ -464,6 +509,68 @@ class ESCAPEConfig(object):
     except KeyError:
       return None
 
+  def get_request_scheduling_mode (self):
+    """
+    Return the scheduling mode of received service requests.
+
+    :return: scheduling mode: FIFO | CONCURRENT (default: FIFO)
+    :rtype: str
+    """
+    try:
+      return str(self.__config['REST-API']['scheduler']['mode']).upper()
+    except (KeyError, TypeError):
+      return "FIFO"
+
+  def get_max_concurrent_requests (self):
+    """
+    Return the max number of service requests orchestrated concurrently.
+
+    :return: max number of requests (default: 4)
+    :rtype: int
+    """
+    try:
+      return int(self.__config['REST-API']['scheduler']['max_concurrent'])
+    except (KeyError, ValueError, TypeError):
+      return 4
+
+  def get_request_conflict_retries (self):
+    """
+    Return the number of exclusive retries of service requests failed due to a
+    conflict with concurrently orchestrated requests.
+
+    :return: number of retries (default: 1)
+    :rtype: int
+    """
+    try:
+      return int(self.__config['REST-API']['scheduler']['retry'])
+    except (KeyError, ValueError, TypeError):
+      return 1
+
+  def get_request_history_capacity (self):
+    """
+    Return the max number of received requests kept in memory.
+
+    :return: number of requests (default: 64)
+    :rtype: int
+    """
+    try:
+      return max(1, int(self.__config['REST-API']['history']['capacity']))
+    except (KeyError, ValueError, TypeError):
+      return 64
+
+  def get_request_history_spill (self):
+    """
+    Return True if the older requests should be stored on disk instead of
+    dropping them.
+
+    :return: spill is enabled or not (default: True)
+    :rtype: bool
+    """
+    try:
+      return bool(self.__config['REST-API']['history']['spill'])
+    except (KeyError, TypeError):
+      return True
+
   def get_rest_api_resource_params (self, layer):
     """
     Return the Cf-Or API params for agent request handler.
@@ -750,6 +857,37 @@ class ESCAPEConfig(object):
     except KeyError:
       return 0
 
+  def parallel_domain_deploy (self):
+    """
+    :return: Return whether remote domains are deployed concurrently.
+    :rtype: bool
+    """
+    try:
+      return self.__config[ADAPT]['deployment']['PARALLEL-DEPLOY']
+    except KeyError:
+      return False
+
+  def get_domain_deploy_workers (self):
+    """
+    :return: Return the max number of concurrent domain deployments.
+    :rtype: int
+    """
+    try:
+      return int(self.__config[ADAPT]['deployment']['DEPLOY-WORKERS'])
+    except (KeyError, ValueError, TypeError):
+      return 4
+
+  def get_domain_deploy_timeout (self):
+    """
+    :return: Return the max time in sec the coop task waits for the
+      domain deployments in parallel mode.
+    :rtype: float
+    """
+    try:
+      return float(self.__config[ADAPT]['deployment']['DEPLOY-TIMEOUT'])
+    except (KeyError, ValueError, TypeError):
+      return 300
+
   def flowrule_stitching (self):
     try:
       return self.__config[ADAPT]['deployment'][
@@ -1022,6 +1160,58 @@ class ESCAPEConfig(object):
     except (KeyError, AttributeError, TypeError):
       return {}
 
+  ##############################################################################
+  # Statistics getters
+  ##############################################################################
+
+  def get_trace_export (self):
+    """
+    Return True if the measured spans should be exported in trace format.
+
+    :return: trace export is enabled or not (default: False)
+    :rtype: bool
+    """
+    try:
+      return self.__config['stats']['trace']
+    except (KeyError, TypeError):
+      return False
+
+  def get_trails_config (self):
+    """
+    Return the configuration of the message trails for :class:`MessageDumper`.
+
+    :return: message trails config
+    :rtype: dict
+    """
+    try:
+      return self.__config['stats']['trails'].copy()
+    except (KeyError, AttributeError, TypeError):
+      return {}
+
+  def get_log_dump_max_size (self):
+    """
+    Return the max length of the logged topology dumps.
+
+    :return: max length, 0 means unlimited (default: 0)
+    :rtype: int
+    """
+    try:
+      return int(self.__config['stats']['dump_max_size'])
+    except (KeyError, ValueError, TypeError):
+      return 0
+
+  def get_log_dump_sample_rate (self):
+    """
+    Return the sampling rate of the logged topology dumps.
+
+    :return: every N-th dump is logged in full (default: 1)
+    :rtype: int
+    """
+    try:
+      return int(self.__config['stats']['dump_sample_rate'])
+    except (KeyError, ValueError, TypeError):
+      return 1
+
   ##############################################################################
   # Visualizations layer getters
   ##############################################################################
@@ -1086,6 +1276,30 @@ class ESCAPEConfig(object):
     except KeyError:
       return {}
 
+  def get_visualization_async (self):
+    """
+    Return True if the remote Visualizer should be notified asynchronously.
+
+    :return: async notification is enabled or not (default: True)
+    :rtype: bool
+    """
+    try:
+      return self.__config['visualization']['async']
+    except KeyError:
+      return True
+
+  def get_visualization_queue_size (self):
+    """
+    Return the max number of pending notifications of the remote Visualizer.
+
+    :return: queue size (default: 16)
+    :rtype: int
+    """
+    try:
+      return int(self.__config['visualization']['queue_size'])
+    except (KeyError, ValueError, TypeError):
+      return 16
+
   def get_domain_url (self, domain=None):
     """
     Assemble the URL of the given domain based on the global configuration.
@@ -27,7 +27,8 @@ try:
   from escape.nffg_lib.nffg import AbstractNFFG, NFFG, NodeSAP, NFFGToolBox, \
     VERSION as N_VERSION
   from escape.nffg_lib.nffg_elements import Constraints
-  from escape.util.misc import VERBOSE, unicode_to_str, remove_units
+  from escape.util.misc import VERBOSE, unicode_to_str, remove_units, \
+    LazyDump
 except (ImportError, AttributeError):
   import os
 
@@ -37,7 +38,7 @@ except (ImportError, AttributeError):
   # Import for standalone running
   from nffg import AbstractNFFG, NFFG, NFFGToolBox, VERSION as N_VERSION
   from nffg_elements import Constraints
-  from misc import VERBOSE, unicode_to_str, remove_units
+  from misc import VERBOSE, unicode_to_str, remove_units, LazyDump
 
 try:
   # Import for ESCAPEv2
@@ -53,6 +54,169 @@ except (ImportError, AttributeError):
   from virtualizer import __version__ as V_VERSION, Virtualizer
 
 
+class CompiledFlowruleField(object):
+  """
+  Parsed, read-only representation of a flowrule match/action field.
+
+  The objects are created by :meth:`compile` which caches the parsed fields by
+  its source string so the same field is split only once and the same object
+  is shared between the conversion and deploy steps.
+  """
+  __slots__ = ('source', 'type', 'parts', 'ops', 'in_port', 'output', 'tag',
+               'vlan', 'untag', 'flowclass', 'explicit', 'error', '__converted')
+  # Max number of cached fields
+  CACHE_SIZE = 65536
+  # Cached compiled fields: (type, source) --> CompiledFlowruleField
+  __cache = {}
+
+  def __init__ (self, type, source):
+    """
+    Init.
+
+    :param type: the name of the field ('MATCH' or 'ACTION')
+    :type type: str
+    :param source: field data
+    :type source: str
+    :return: None
+    """
+    self.source = source
+    self.type = type.upper()
+    # Raw operands in original order
+    self.parts = tuple(source.split(NFFGConverter.OP_DELIMITER))
+    # Operands as (key, value) pairs, value is None for bare operands
+    self.ops = tuple(tuple(p.split(NFFGConverter.KV_DELIMITER, 1))
+                     if NFFGConverter.KV_DELIMITER in p else (p, None)
+                     for p in self.parts)
+    self.in_port = None
+    self.output = None
+    self.tag = None
+    self.vlan = None
+    self.untag = False
+    self.flowclass = None
+    # Operands not defined by the general operations
+    self.explicit = ()
+    # Error message of the first malformed operand or None
+    self.error = None
+    self.__converted = None
+    self.__parse()
+
+  def __parse (self):
+    """
+    Parse the operands into the typed attributes.
+
+    :return: None
+    """
+    explicit = []
+    for part, (key, value) in zip(self.parts, self.ops):
+      if value is None:
+        if key == NFFGConverter.OP_UNTAG:
+          self.untag = True
+          if self.type == NFFGConverter.TYPE_ACTION:
+            continue
+        elif self.type == NFFGConverter.TYPE_MATCH:
+          # Bare operands in match are handled as raw flowclass
+          self.flowclass = part
+        explicit.append(part)
+        if self.error is None:
+          self.error = "Not a key-value pair: %s" % part
+      elif key == NFFGConverter.OP_INPORT:
+        self.in_port = value
+      elif key == NFFGConverter.OP_OUTPUT:
+        self.output = value
+      elif key == NFFGConverter.OP_TAG:
+        self.tag = value
+        self.vlan = value.split(NFFGConverter.LABEL_DELIMITER)[-1]
+      elif key == NFFGConverter.OP_FLOWCLASS and \
+         self.type == NFFGConverter.TYPE_MATCH:
+        self.flowclass = value
+      else:
+        if self.type == NFFGConverter.TYPE_MATCH:
+          self.flowclass = part
+        explicit.append(part)
+        if self.error is None:
+          self.error = "Unrecognizable key: %s" % key
+    self.explicit = tuple(explicit)
+
+  def __str__ (self):
+    return "%s(%s: %s)" % (self.__class__.__name__, self.type, self.source)
+
+  @property
+  def first (self):
+    """
+    :return: Return the key of the leading operand.
+    :rtype: str
+    """
+    return self.ops[0][0]
+
+  def to_dict (self):
+    """
+    Return the dict-based format of the field used for flowrule creation.
+
+    The returned dict is a copy and can be modified freely.
+
+    :raise: :any:`RuntimeError` if the field is malformed
+    :return: splitted data structure
+    :rtype: dict
+    """
+    if self.error is not None:
+      raise RuntimeError(self.error)
+    if self.__converted is None:
+      ret = {}
+      if self.in_port is not None:
+        try:
+          ret['in_port'] = int(self.in_port)
+        except ValueError:
+          ret['in_port'] = self.in_port
+      if self.tag is not None:
+        if self.type == NFFGConverter.TYPE_MATCH:
+          ret['vlan_id'] = self.vlan
+        elif self.type == NFFGConverter.TYPE_ACTION:
+          ret['vlan_push'] = self.vlan
+        else:
+          raise RuntimeError('Not supported field type: %s!' % self.type)
+      if self.output is not None:
+        ret['out'] = self.output
+      if self.untag and self.type == NFFGConverter.TYPE_ACTION:
+        ret['vlan_pop'] = True
+      if self.flowclass is not None:
+        ret['flowclass'] = self.flowclass
+      self.__converted = ret
+    return self.__converted.copy()
+
+  @classmethod
+  def compile (cls, type, field):
+    """
+    Return the cached compiled field or parse and cache the given field.
+
+    :param type: the name of the field ('MATCH' or 'ACTION')
+    :type type: str
+    :param field: field data
+    :type field: str
+    :return: compiled field
+    :rtype: :any:`CompiledFlowruleField`
+    """
+    key = (type.upper(), field)
+    try:
+      return cls.__cache[key]
+    except KeyError:
+      pass
+    compiled = cls(type=type,
+                   source=intern(field) if isinstance(field, str) else field)
+    if len(cls.__cache) >= cls.CACHE_SIZE:
+      cls.__cache.clear()
+    cls.__cache[key] = compiled
+    return compiled
+
+  @classmethod
+  def clear_cache (cls):
+    """
+    Remove the cached fields.
+
+    :return: None
+    """
+    cls.__cache.clear()
+
+
 # noinspection PyShadowingNames
 class NFFGConverter(object):
   """
@@ -118,6 +282,8 @@ class NFFGConverter(object):
     """
     Split the match/action field into a dict-based format for flowrule creation.
 
+    The field is parsed only once and the compiled form is cached.
+
     :param type: the name of the field ('MATCH' or 'ACTION')
     :type type: str
     :param field: field data
@@ -125,42 +291,21 @@ class NFFGConverter(object):
     :return: splitted data structure
     :rtype: dict
     """
-    ret = {}
-    parts = field.split(cls.OP_DELIMITER)
-    if len(parts) < 1:
-      raise RuntimeError(
-        "Wrong format: %s! Separator (%s) not found!" % (
-          field, cls.OP_DELIMITER))
-    for part in parts:
-      kv = part.split(cls.KV_DELIMITER, 1)
-      if len(kv) != 2:
-        if kv[0] == cls.OP_UNTAG and type.upper() == cls.TYPE_ACTION:
-          ret['vlan_pop'] = True
-          continue
-        else:
-          raise RuntimeError("Not a key-value pair: %s" % part)
-      if kv[0] == cls.OP_INPORT:
-        try:
-          ret['in_port'] = int(kv[1])
-        except ValueError:
-          # self.log.warning(
-          #    "in_port is not a valid port number: %s! Skip "
-          #    "converting..." % kv[1])
-          ret['in_port'] = kv[1]
-      elif kv[0] == cls.OP_TAG:
-        if type.upper() == cls.TYPE_MATCH:
-          ret['vlan_id'] = kv[1].split(cls.LABEL_DELIMITER)[-1]
-        elif type.upper() == cls.TYPE_ACTION:
-          ret['vlan_push'] = kv[1].split(cls.LABEL_DELIMITER)[-1]
-        else:
-          raise RuntimeError('Not supported field type: %s!' % type)
-      elif kv[0] == cls.OP_OUTPUT:
-        ret['out'] = kv[1]
-      elif kv[0] == cls.OP_FLOWCLASS and type.upper() == cls.TYPE_MATCH:
-        ret['flowclass'] = kv[1]
-      else:
-        raise RuntimeError("Unrecognizable key: %s" % kv[0])
-    return ret
+    return cls.compile_field(type=type, field=field).to_dict()
+
+  @staticmethod
+  def compile_field (type, field):
+    """
+    Return the compiled and cached form of the match/action field.
+
+    :param type: the name of the field ('MATCH' or 'ACTION')
+    :type type: str
+    :param field: field data
+    :type field: str
+    :return: compiled field
+    :rtype: :any:`CompiledFlowruleField`
+    """
+    return CompiledFlowruleField.compile(type=type, field=field)
 
   def _gen_unique_bb_id (self, v_node):
     """
@@ -232,13 +377,12 @@ class NFFGConverter(object):
     # E.g.:  "match": "in_port=SAP2|fwd|1;TAG=SAP1|comp|1" -->
     # <match>(in_port=1)dl_tag=1</match>
     ret = []
-    match_part = match.split(';')
-    if len(match_part) < 2:
-      if not match_part[0].startswith("in_port"):
+    match_part = self.compile_field(type=self.TYPE_MATCH, field=match)
+    if len(match_part.ops) < 2:
+      if not match_part.parts[0].startswith("in_port"):
         self.log.warning("Invalid match field: %s" % match)
       return
-    for kv in match_part:
-      op = kv.split('=', 1)
+    for op in match_part.ops:
       if op[0] not in self.GENERAL_OPERATIONS:
         self.log.warning("Unsupported match operand: %s" % op[0])
         continue
@@ -272,13 +416,12 @@ class NFFGConverter(object):
     """
     # E.g.:  "action": "output=2;UNTAG"
     ret = []
-    action_part = action.split(';')
-    if len(action_part) < 2:
-      if not action_part[0].startswith("output"):
+    action_part = self.compile_field(type=self.TYPE_ACTION, field=action)
+    if len(action_part.ops) < 2:
+      if not action_part.parts[0].startswith("output"):
         self.log.warning("Invalid action field: %s" % action)
       return
-    for kv in action_part:
-      op = kv.split('=')
+    for kv, op in zip(action_part.parts, action_part.ops):
       if op[0] not in self.GENERAL_OPERATIONS:
         # self.log.warning("Unsupported action operand: %s" % op[0])
         # return
@@ -1345,7 +1488,8 @@ class NFFGConverter(object):
           sg_id = int(path[-1])
           for f in infra.flowrules():
             if f.id == sg_id:
-              dst_port_id = f.action.split(';')[0].split('=')[1]
+              dst_port_id = self.compile_field(type=self.TYPE_ACTION,
+                                               field=f.action).ops[0][1]
               dst_port = infra.ports[dst_port_id]
               self.log.debug("Found dst port: %s" % dst_port_id)
               break
@@ -1534,18 +1678,10 @@ class NFFGConverter(object):
     for sbb in nffg.infras:
       for flowrule in sbb.flowrules():
         # Get source port / in_port
-        in_port = None
-        flowclass = None
         fr_id = flowrule.id
-        for item in flowrule.match.split(';'):
-          if item.startswith('in_port'):
-            in_port = item.split('=')[1]
-          elif item.startswith('TAG') or item.startswith('UNTAG'):
-            pass
-          elif item.startswith('flowclass'):
-            flowclass = item.split('=', 1)[1]
-          else:
-            flowclass = item
+        match = self.compile_field(type=self.TYPE_MATCH, field=flowrule.match)
+        in_port = match.in_port
+        flowclass = match.flowclass
         if in_port is not None:
           # Detect the connected NF/SAP port for sg_hop
           opposite_node = [l.dst for u, v, l in nffg.real_out_edges_iter(sbb.id)
@@ -1564,10 +1700,8 @@ class NFFGConverter(object):
             "hop recreation..." % flowrule)
           return
         # Get destination port / output
-        output = None
-        for item in flowrule.action.split(';'):
-          if item.startswith('output'):
-            output = item.split('=')[1]
+        output = self.compile_field(type=self.TYPE_ACTION,
+                                    field=flowrule.action).output
         if output is not None:
           # Detect the connected NF/SAP port for sg_hop
           opposite_node = [l.dst for u, v, l in nffg.real_out_edges_iter(sbb.id)
@@ -2225,13 +2359,13 @@ class NFFGConverter(object):
           fe_pri = None
 
           # Check if match starts with in_port
-          fe = fr.match.split(';')
-          if fe[0].split('=')[0] != "in_port":
+          fe = self.compile_field(type=self.TYPE_MATCH, field=fr.match)
+          if fe.first != self.OP_INPORT:
             self.log.warning("Missing 'in_port' from match in %s. Skip "
                              "flowrule conversion..." % fr)
             continue
           # Check if the src port is a physical or virtual port
-          in_port = fe[0].split('=')[1]
+          in_port = fe.ops[0][1]
           if in_port in v_node.ports.port.keys():
             # Flowrule in_port is a phy port in Infra Node
             in_port = v_node.ports[in_port]
@@ -2270,13 +2404,13 @@ class NFFGConverter(object):
           # Process match field
           match = self._convert_flowrule_match(fr.match)
           # Check if action starts with outport
-          fe = fr.action.split(';')
-          if fe[0].split('=')[0] != "output":
+          fe = self.compile_field(type=self.TYPE_ACTION, field=fr.action)
+          if fe.first != self.OP_OUTPUT:
             self.log.warning("Missing 'output' from action in %s."
                              "Skip flowrule conversion..." % fr)
             continue
           # Check if the dst port is a physical or virtual port
-          out_port = fe[0].split('=')[1]
+          out_port = fe.ops[0][1]
           if out_port in v_node.ports.port.keys():
             # Flowrule output is a phy port in Infra Node
             out_port = v_node.ports[out_port]
@@ -2326,8 +2460,8 @@ class NFFGConverter(object):
           virt_fe = virt_lib.Flowentry(id=fe_id, priority=fe_pri, port=in_port,
                                        match=match, action=action, out=out_port,
                                        resources=_resources, name=v_fe_name)
-          self.log.log(VERBOSE, "Generated Flowentry:\n%s" %
-                       v_node.flowtable.add(virt_fe).xml())
+          v_fe = v_node.flowtable.add(virt_fe)
+          self.log.log(VERBOSE, "Generated Flowentry:\n%s", LazyDump(v_fe.xml))
           # Handel operation tag
           if fr.operation is not None:
             self.log.debug("Convert operation tag: %s for flowrule: %s" % (
@@ -2711,7 +2845,7 @@ class NFFGConverter(object):
         sbb.NF_instances[str(nf.id)].ports.add(v_nf_port)
         self.log.debug("Added Port: %s to NF node: %s" %
                        (port, v_nf.id.get_as_text()))
-      self.log.log(VERBOSE, "Created NF:\n%s" % v_nf.xml())
+      self.log.log(VERBOSE, "Created NF:\n%s", LazyDump(v_nf.xml))
     # Add flowrules
     self.log.debug("Converting SG hops into flowrules...")
     for hop in request.sg_hops:
@@ -2733,7 +2867,7 @@ class NFFGConverter(object):
       fe.resources.delay.set_value(hop.delay)
       fe.resources.bandwidth.set_value(hop.bandwidth)
       self.log.debug("Added flowrule: %s" % fe.id.get_value())
-      self.log.log(VERBOSE, "Created Flowrule:\n%s" % fe.xml())
+      self.log.log(VERBOSE, "Created Flowrule:\n%s", LazyDump(fe.xml))
     # Add requirements
     self._convert_nffg_reqs(nffg=request, virtualizer=base)
     # Check connected NF constraints
@@ -14,8 +14,12 @@
 """
 Implement the supporting classes for domain adapters.
 """
+import hashlib
+import httplib
+import threading
 import time
 import urlparse
+from collections import OrderedDict
 
 from requests import Session, ConnectionError, HTTPError, Timeout, \
   RequestException
@@ -25,12 +29,14 @@ from escape import __version__
 from escape.adapt import log
 from escape.nffg_lib.nffg import NFFG
 from escape.util.config import ConfigurationError
+from escape.util.metrics import metrics
 from escape.util.misc import enum, VERBOSE
 from escape.util.pox_extension import OpenFlowBridge, \
   ExtendedOFConnectionArbiter
 from pox.lib.addresses import EthAddr, IPAddr
 from pox.lib.recoco import Timer
 from pox.lib.revent import EventMixin, Event
+from pox.lib.util import dpid_to_str
 
 
 class BaseResultEvent(Event):
@@ -421,6 +427,9 @@ class AbstractRemoteDomainManager(AbstractDomainManager):
                                                       **kwargs)
     # Timer for polling function
     self.__timer = None
+    # Serialize the communication of deploy workers and co-op tasks with the
+    # domain agent
+    self.deploy_lock = threading.RLock()
     self._poll = poll if poll is not None else False
     self._diff = diff if diff is not None else self.DEFAULT_DIFF_VALUE
     self._keepalive = keepalive if keepalive else False
@@ -529,6 +538,21 @@ class AbstractRemoteDomainManager(AbstractDomainManager):
     Keepalive hook function to detect whether the managed domain is alive and
     raise event according to domain state.
 
+    :return: None
+    """
+    if not self.deploy_lock.acquire(False):
+      self.log.debug("Domain: %s is under deployment! Skip keepalive..."
+                     % self.domain_name)
+      return
+    try:
+      self.__check_alive()
+    finally:
+      self.deploy_lock.release()
+
+  def __check_alive (self):
+    """
+    Check the domain agent and raise event according to domain state.
+
     :return: None
     """
     if not self._detected:
@@ -598,6 +622,22 @@ class AbstractRemoteDomainManager(AbstractDomainManager):
     to slow/rapid poll. When an agent is (re)detected update the current
     resource information.
 
+    :return: None
+    """
+    # Polling must not wait for a running deploy in the co-op context
+    if not self.deploy_lock.acquire(False):
+      self.log.debug("Domain: %s is under deployment! Skip polling..."
+                     % self.domain_name)
+      return
+    try:
+      self.__poll_domain()
+    finally:
+      self.deploy_lock.release()
+
+  def __poll_domain (self):
+    """
+    Check the domain agent and update the current resource information.
+
     :return: None
     """
     # If domain is not detected
@@ -616,7 +656,12 @@ class AbstractRemoteDomainManager(AbstractDomainManager):
     # If domain has already detected
     else:
       # Check the domain is still reachable
+      poll_start = time.time()
       changed = self.topoAdapter.check_topology_changed()
+      metrics.histogram(name="escape_domain_poll_duration_seconds",
+                        help="Time spent by polling the domain agent.",
+                        labels=("domain",)).observe(time.time() - poll_start,
+                                                    domain=self.domain_name)
       # No changes
       if changed is False:
         # Nothing to do
@@ -857,6 +902,12 @@ class AbstractOFControllerAdapter(AbstractESCAPEAdapter):
     # Set an OpenFlow nexus as a source of OpenFlow events
     self.openflow = OpenFlowBridge()
     self.controller_address = (address, port)
+    # Shadow flow tables: DPID --> (connection, {(match, priority): flow_mod})
+    self._flow_tables = {}
+    # Unconfirmed batches: barrier xid --> (DPID, xids, errors, callback)
+    self._pending_barriers = {}
+    # Flow_mod xid --> barrier xid of the containing batch
+    self._flow_xids = {}
     # Initiate our specific connection Arbiter
     arbiter = ExtendedOFConnectionArbiter.activate()
     # Register our OpenFlow event source
@@ -952,7 +1003,9 @@ class AbstractOFControllerAdapter(AbstractESCAPEAdapter):
     log.debug("Delete flow entries from INFRA %s on connection: %s ..." %
               (id, conn))
     msg = of.ofp_flow_mod(command=of.OFPFC_DELETE)
-    conn.send(msg)
+    # Hold back while the switch can't keep up with the sent flow_mods
+    conn.whenUnblocked(conn.send, msg)
+    self._flow_tables[conn.dpid] = (conn, OrderedDict())
 
   def install_flowrule (self, id, match, action):
     """
@@ -971,6 +1024,31 @@ class AbstractOFControllerAdapter(AbstractESCAPEAdapter):
       log.warning("Missing connection for node element: %s! Skip flowrule "
                   "installation..." % id)
       return
+    msg = self._assemble_flow_mod(id=id, match=match, action=action)
+    if msg is None:
+      return
+    log.debug(
+      "Install flow entry into INFRA: %s on connection: %s ..." % (id, conn))
+    conn.whenUnblocked(conn.send, msg)
+    log.log(VERBOSE, "Sent raw OpenFlow flowrule:\n%s" % msg)
+    # Keep the shadow table consistent with the installed flowrule
+    table = self._flow_tables.get(conn.dpid)
+    if table is not None and table[0] is conn:
+      table[1][self._get_flow_key(msg)] = msg
+
+  def _assemble_flow_mod (self, id, match, action):
+    """
+    Assemble the OpenFlow flow_mod message of a flowrule.
+
+    :param id: ID of the infra element stored in the NFFG
+    :type id: str
+    :param match: match part of the rule (keys: in_port, vlan_id)
+    :type match: dict
+    :param action: action part of the rule (keys: out, vlan_push, vlan_pop)
+    :type action: dict
+    :return: assembled flow_mod or None in case of invalid fields
+    :rtype: :class:`ofp_flow_mod`
+    """
     msg = of.ofp_flow_mod()
     msg.match.in_port = match['in_port']
     if 'vlan_id' in match:
@@ -979,7 +1057,7 @@ class AbstractOFControllerAdapter(AbstractESCAPEAdapter):
       except ValueError:
         log.warning("VLAN_ID: %s in match field is not a valid number! "
                     "Skip flowrule installation..." % match['vlan_id'])
-        return
+        return None
       msg.match.dl_vlan = vlan_id
     # Append explicit matching parameters to OF flowrule
     if 'flowclass' in match:
@@ -1002,7 +1080,7 @@ class AbstractOFControllerAdapter(AbstractESCAPEAdapter):
       except ValueError:
         log.warning("VLAN_PUSH: %s in action field is not a valid number! "
                     "Skip flowrule installation..." % action['vlan_push'])
-        return
+        return None
       msg.actions.append(of.ofp_action_vlan_vid(vlan_vid=vlan_push))
       # msg.actions.append(of.ofp_action_vlan_vid())
     out = action['out']
@@ -1030,12 +1108,212 @@ class AbstractOFControllerAdapter(AbstractESCAPEAdapter):
     except ValueError:
       log.warning("Output port: %s is not a valid port in flowrule action: %s! "
                   "Skip flowrule installation..." % (action['out'], action))
-      return
+      return None
     msg.actions.append(of.ofp_action_output(port=out_port))
-    log.debug(
-      "Install flow entry into INFRA: %s on connection: %s ..." % (id, conn))
-    conn.send(msg)
-    log.log(VERBOSE, "Sent raw OpenFlow flowrule:\n%s" % msg)
+    return msg
+
+  @staticmethod
+  def _get_flow_key (msg):
+    """
+    Return the identifier of the flow entry defined by the given flow_mod.
+
+    :param msg: flow_mod message
+    :type msg: :class:`ofp_flow_mod`
+    :return: packed match and priority
+    :rtype: tuple
+    """
+    return msg.match.pack(), msg.priority
+
+  @staticmethod
+  def _get_flow_state (msg):
+    """
+    Return the modifiable part of the flow entry defined by the given flow_mod.
+
+    :param msg: flow_mod message
+    :type msg: :class:`ofp_flow_mod`
+    :return: packed actions, cookie and timeouts
+    :rtype: tuple
+    """
+    return ("".join(a.pack() for a in msg.actions), msg.cookie,
+            msg.idle_timeout, msg.hard_timeout)
+
+  def sync_flowrules (self, id, flowrules, callback=None):
+    """
+    Synchronize the flow table of an OpenFlow switch with the given flowrules.
+
+    The installed flowrules are tracked in a per-DPID shadow table and only the
+    differences (modified, added and deleted flow entries) are sent in one
+    batch. If the shadow table is missing or belongs to a previous connection
+    the whole table is rewritten.
+
+    If a callback is given, the batch is closed with a barrier request and the
+    callback is called with the DPID and the list of the received errors when
+    the switch has acknowledged the whole batch or has been disconnected.
+
+    :param id: ID of the infra element stored in the NFFG
+    :type id: str
+    :param flowrules: list of match/action dict pairs
+    :type flowrules: list
+    :param callback: function called when the batch is confirmed (optional)
+    :type callback: callable
+    :return: synchronization was successful or not
+    :rtype: bool
+    """
+    dpid = self.infra_to_dpid[id]
+    conn = self.openflow.getConnection(dpid=dpid)
+    if not conn:
+      log.warning("Missing connection for node element: %s! Skip flowrule "
+                  "synchronization..." % id)
+      if callback is not None:
+        callback(dpid=dpid, errors=["Missing connection for %s" % id])
+      return False
+    result = True
+    new_table = OrderedDict()
+    for match, action in flowrules:
+      msg = self._assemble_flow_mod(id=id, match=match, action=action)
+      if msg is None:
+        result = False
+        continue
+      new_table[self._get_flow_key(msg)] = msg
+    batch, xids = [], []
+
+    def append (flow_mod):
+      # Packing assigns the xid of the message
+      batch.append(flow_mod.pack())
+      xids.append(flow_mod.xid)
+
+    table = self._flow_tables.get(conn.dpid)
+    if table is None or table[0] is not conn:
+      log.debug("Missing shadow flow table for INFRA: %s! "
+                "Rewrite the whole table..." % id)
+      append(of.ofp_flow_mod(command=of.OFPFC_DELETE))
+      for msg in new_table.itervalues():
+        append(msg)
+      added, modified, deleted = len(new_table), 0, None
+    else:
+      old_table = table[1]
+      added = modified = deleted = 0
+      # Install the new entries first to avoid traffic blackout
+      for key, msg in new_table.iteritems():
+        old = old_table.get(key)
+        if old is None:
+          append(msg)
+          added += 1
+        elif self._get_flow_state(old) != self._get_flow_state(msg):
+          msg.command = of.OFPFC_MODIFY_STRICT
+          append(msg)
+          msg.command = of.OFPFC_ADD
+          modified += 1
+      for key, old in old_table.iteritems():
+        if key not in new_table:
+          append(of.ofp_flow_mod(command=of.OFPFC_DELETE_STRICT,
+                                 match=old.match,
+                                 priority=old.priority))
+          deleted += 1
+    self._flow_tables[conn.dpid] = (conn, new_table)
+    log.debug("Synchronize flow table of INFRA: %s on connection: %s - "
+              "added: %s, modified: %s, deleted: %s" %
+              (id, conn, added, modified,
+               "ALL" if deleted is None else deleted))
+    if callback is not None:
+      barrier = of.ofp_barrier_request()
+      batch.append(barrier.pack())
+      # Track the xids of the batch to tie the errors back to the request
+      self._pending_barriers[barrier.xid] = (conn.dpid, xids, [], callback)
+      for xid in xids:
+        self._flow_xids[xid] = barrier.xid
+    if batch:
+      conn.whenUnblocked(conn.send, b"".join(batch))
+    return result
+
+  def _drop_pending_batches (self, dpid):
+    """
+    Drop the unconfirmed batches of the given switch.
+
+    :param dpid: DPID of the switch
+    :type dpid: int
+    :return: dropped batches
+    :rtype: list
+    """
+    dropped = []
+    for barrier_xid, batch in self._pending_barriers.items():
+      if batch[0] == dpid:
+        del self._pending_barriers[barrier_xid]
+        for xid in batch[1]:
+          self._flow_xids.pop(xid, None)
+        dropped.append(batch)
+    return dropped
+
+  def invalidate_flow_table (self, dpid):
+    """
+    Drop the shadow flow table and the unconfirmed batches of the given switch.
+
+    The next synchronization will rewrite the whole flow table.
+
+    :param dpid: DPID of the switch
+    :type dpid: int
+    :return: None
+    """
+    self._flow_tables.pop(dpid, None)
+    self._drop_pending_batches(dpid=dpid)
+
+  def _handle_ConnectionDown (self, event):
+    """
+    Drop the shadow flow table and fail the unconfirmed batches of the
+    disconnected switch.
+
+    :param event: event object
+    :type event: :class:`pox.openflow.ConnectionDown`
+    :return: None
+    """
+    self._flow_tables.pop(event.dpid, None)
+    for dpid, xids, errors, callback in self._drop_pending_batches(
+       dpid=event.dpid):
+      errors.append("DPID: %s disconnected before confirmation"
+                    % dpid_to_str(dpid))
+      callback(dpid=dpid, errors=errors)
+
+  def _handle_ErrorIn (self, event):
+    """
+    Handle OpenFlow error messages related to a synchronized flowrule batch.
+
+    :param event: event object
+    :type event: :class:`pox.openflow.ErrorIn`
+    :return: None
+    """
+    barrier_xid = self._flow_xids.pop(event.xid, None)
+    if barrier_xid is None:
+      if event.ofp.type == of.OFPET_FLOW_MOD_FAILED:
+        # The shadow table does not reflect the real flow table anymore
+        self._flow_tables.pop(event.dpid, None)
+      return
+    error = "DPID: %s, xid: %s, type: %s, code: %s" % (
+      dpid_to_str(event.dpid), event.xid,
+      of.ofp_error_type_map.get(event.ofp.type, event.ofp.type),
+      event.ofp.code)
+    log.error("Flowrule installation error: %s" % error)
+    self._pending_barriers[barrier_xid][2].append(error)
+    # The shadow table does not reflect the real flow table anymore
+    self._flow_tables.pop(event.dpid, None)
+
+  def _handle_BarrierIn (self, event):
+    """
+    Handle the confirmation of a synchronized flowrule batch.
+
+    :param event: event object
+    :type event: :class:`pox.openflow.BarrierIn`
+    :return: None
+    """
+    batch = self._pending_barriers.pop(event.xid, None)
+    if batch is None:
+      return
+    dpid, xids, errors, callback = batch
+    for xid in xids:
+      self._flow_xids.pop(xid, None)
+    log.debug("Flowrule batch of DPID: %s has been confirmed with errors: %s" %
+              (dpid_to_str(dpid), len(errors)))
+    if callback is not None:
+      callback(dpid=dpid, errors=errors)
 
 
 class VNFStarterAPI(object):
@@ -1289,6 +1567,8 @@ class AbstractRESTAdapter(Session):
   # HTTP methods
   GET = "GET"
   POST = "POST"
+  # Return value of conditional requests in case of unchanged content
+  NOT_MODIFIED = object()
 
   def __init__ (self, base_url, prefix="", auth=None, **kwargs):
     """
@@ -1305,6 +1585,8 @@ class AbstractRESTAdapter(Session):
     :return: None
     """
     super(AbstractRESTAdapter, self).__init__()
+    # Cache validators of accepted responses: {url: (etag, last-mod, digest)}
+    self.__validators = {}
     if not base_url:
       return
     if base_url.endswith('/'):
@@ -1348,7 +1630,8 @@ class AbstractRESTAdapter(Session):
     logging.getLogger("requests").setLevel(level)
     logging.getLogger("urllib3").setLevel(level)
 
-  def send_request (self, method, url=None, body=None, **kwargs):
+  def send_request (self, method, url=None, body=None, expected_status=(),
+                    **kwargs):
     """
     Prepare the request and send it. If valid URL is given that value will be
     used else it will be append to the end of the ``base_url``. If ``url`` is
@@ -1360,6 +1643,9 @@ class AbstractRESTAdapter(Session):
     :type url: str
     :param body: request body
     :type body: :class:`NFFG` or dict or bytes or str
+    :param expected_status: error status codes not raised as
+      :class:`HTTPError` (default: empty)
+    :type expected_status: tuple
     :return: raw response data
     :rtype: str
     """
@@ -1390,7 +1676,9 @@ class AbstractRESTAdapter(Session):
     # Make request
     self._response = self.request(method=method, url=url, data=body, **kwargs)
     # Raise an exception in case of bad request (4xx <= status code <= 5xx)
-    self._response.raise_for_status()
+    # unless the caller handles the status code itself
+    if self._response.status_code not in expected_status:
+      self._response.raise_for_status()
     # Return with body content
     return self._response.text if self._response is not None else None
 
@@ -1496,6 +1784,96 @@ class AbstractRESTAdapter(Session):
                        "interrupted by user!" % (self.name, self._base_url))
       return None
 
+  def send_conditional (self, method, url=None, body=None, quietly=False,
+                        **kwargs):
+    """
+    Send REST request extended with conditional headers (If-None-Match,
+    If-Modified-Since) based on the validators stored for the given ``url``
+    by :meth:`store_validators`.
+
+    If the remote agent does not support conditional requests, the raw body is
+    compared with the digest of the last accepted response. In both cases
+    :attr:`NOT_MODIFIED` is returned if the content has not been changed,
+    so the caller can skip the parsing of the body.
+
+    :param method: HTTP method
+    :type method: str
+    :param url: valid URL or relevant part follows ``self.base_url``
+    :type url: str
+    :param body: request body
+    :type body: :class:`NFFG` or dict or bytes or str
+    :param quietly: log errors only in VERBOSE mode (default: False)
+    :type quietly: bool
+    :return: raw response data or ``NOT_MODIFIED``
+    :rtype: str or object
+    """
+    etag, last_modified, digest = self.__validators.get(url, (None,) * 3)
+    headers = kwargs.setdefault('headers', dict())
+    if etag is not None:
+      headers['If-None-Match'] = etag
+    if last_modified is not None:
+      headers['If-Modified-Since'] = last_modified
+    conditional = etag is not None or last_modified is not None
+    if conditional:
+      # Failed precondition means unchanged content here, not an error
+      kwargs['expected_status'] = (httplib.PRECONDITION_FAILED,)
+    # Drop previous response to avoid checking stale status code in case of
+    # connection errors
+    self._response = None
+    if quietly:
+      data = self.send_quietly(method, url, body, **kwargs)
+    else:
+      data = self.send_no_error(method, url, body, **kwargs)
+    status = self.get_last_response_status()
+    if conditional and status in (httplib.NOT_MODIFIED,
+                                  httplib.PRECONDITION_FAILED):
+      log.log(VERBOSE, "Remote agent(adapter: %s, url: %s) responded with "
+                       "status: %s" % (self.name, self._base_url, status))
+      return self.NOT_MODIFIED
+    if data and digest is not None and digest == self.__digest():
+      log.log(VERBOSE, "Received content from remote agent(adapter: %s, url: "
+                       "%s) is unchanged" % (self.name, self._base_url))
+      return self.NOT_MODIFIED
+    return data
+
+  def __digest (self):
+    """
+    Calculate the digest of the raw body of the last response.
+
+    :return: hex digest
+    :rtype: str
+    """
+    return hashlib.sha1(self._response.content).hexdigest()
+
+  def store_validators (self, url=None):
+    """
+    Store the cache validators (ETag, Last-Modified and body digest) of the
+    last response as the reference of later conditional requests on ``url``.
+
+    Should be called only when the content of the last response is accepted
+    and cached by the adapter.
+
+    :param url: URL used by the last request
+    :type url: str
+    :return: None
+    """
+    if self._response is None or not self._response.content:
+      return
+    headers = self._response.headers
+    self.__validators[url] = (headers.get('ETag'),
+                              headers.get('Last-Modified'),
+                              self.__digest())
+
+  def clear_validators (self, url=None):
+    """
+    Remove the stored cache validators of the given ``url``.
+
+    :param url: URL used by the requests
+    :type url: str
+    :return: None
+    """
+    self.__validators.pop(url, None)
+
   def is_content_type (self, ctype):
     """
     Return True is the content type of the last request contains the given
@@ -0,0 +1,277 @@
+# Copyright 2017 Janos Czentye
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Contains a bounded store for the history of received requests.
+"""
+import anydbm
+import cPickle
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+import zlib
+from collections import OrderedDict
+
+from escape.util.config import CONFIG
+from escape_logging import LOG_FOLDER
+from pox.core import core
+
+log = core.getLogger("HISTORY")
+
+
+class RequestHistory(object):
+  """
+  Bounded store of received requests.
+
+  The most recently used items are kept in memory. The older ones are
+  serialized with the given ``dumper``, compressed and moved into a local DBM
+  file, and loaded back with ``loader`` on demand. Secondary indexes map
+  alternative ids (e.g. NFFG id, message id) to the primary key.
+
+  Every store spills into its own temporary directory under :attr:`DIR`, so
+  parallel processes and restarts never truncate each other's files. Items
+  marked as ``active`` are never moved out of the memory.
+  """
+  DIR = os.path.join(LOG_FOLDER, "history")
+  """Default parent dir of the spilled requests"""
+  DB_FILE = "history"
+  """Name of the DBM file in the store's own dir"""
+
+  def __init__ (self, name, capacity=None, spill=None, dumper=None,
+                loader=None, indexes=(), active=None):
+    """
+    Init.
+
+    :param name: name of the store
+    :type name: str
+    :param capacity: max number of items kept in memory (default: from CONFIG)
+    :type capacity: int
+    :param spill: store evicted items on disk instead of dropping them
+      (default: from CONFIG)
+    :type spill: bool
+    :param dumper: serializer function of the items (default: pickle)
+    :type dumper: callable
+    :param loader: deserializer function of the items (default: pickle)
+    :type loader: callable
+    :param indexes: names of the secondary indexes
+    :type indexes: tuple
+    :param active: predicate of the items which must be kept in memory
+    :type active: callable
+    """
+    self.name = name
+    self.capacity = capacity if capacity is not None else \
+      CONFIG.get_request_history_capacity()
+    self.spill = spill if spill is not None else \
+      CONFIG.get_request_history_spill()
+    self.dumper = dumper if dumper is not None else \
+      lambda item: cPickle.dumps(item, cPickle.HIGHEST_PROTOCOL)
+    self.loader = loader if loader is not None else cPickle.loads
+    self.active = active
+    self.__memory = OrderedDict()
+    self.__spilled = set()
+    # Spilled items which are still referenced elsewhere
+    self.__detached = weakref.WeakValueDictionary()
+    # index name --> {value: key}
+    self.__indexes = dict((index, {}) for index in indexes)
+    # key --> {index name: value}
+    self.__index_values = {}
+    self.__db = None
+    self.__db_dir = None
+    self.__lock = threading.RLock()
+
+  def __len__ (self):
+    return len(self.__memory) + len(self.__spilled)
+
+  def __contains__ (self, key):
+    return key in self.__memory or key in self.__spilled
+
+  def __getitem__ (self, key):
+    with self.__lock:
+      if key in self.__memory:
+        # Mark as recently used
+        item = self.__memory.pop(key)
+        self.__memory[key] = item
+        return item
+      elif key in self.__spilled:
+        return self.__restore(key)
+      else:
+        raise KeyError(key)
+
+  def __setitem__ (self, key, item):
+    self.put(key, item)
+
+  def put (self, key, item, **index_values):
+    """
+    Store the given item.
+
+    :param key: primary key
+    :type key: str or int
+    :param item: stored item
+    :type item: object
+    :param index_values: values of the secondary indexes
+    :type index_values: dict
+    :return: None
+    """
+    with self.__lock:
+      if key in self.__spilled:
+        self.__spilled.discard(key)
+        self.__detached.pop(key, None)
+        del self.__db[repr(key)]
+      self.__memory.pop(key, None)
+      self.__memory[key] = item
+      for index, value in index_values.iteritems():
+        if value is not None:
+          self.__indexes[index][value] = key
+          self.__index_values.setdefault(key, {})[index] = value
+      self.__shrink()
+
+  def get (self, key, default=None):
+    """
+    Return the item given by the primary key.
+
+    :param key: primary key
+    :type key: str or int
+    :param default: returned value if the key is missing
+    :type default: object
+    :return: stored item
+    :rtype: object
+    """
+    try:
+      return self[key]
+    except KeyError:
+      return default
+
+  def get_by (self, index, value, default=None):
+    """
+    Return the item given by a secondary index.
+
+    :param index: index name
+    :type index: str
+    :param value: value of the indexed attribute
+    :type value: str or int
+    :param default: returned value if the key is missing
+    :type default: object
+    :return: stored item
+    :rtype: object
+    """
+    with self.__lock:
+      key = self.__indexes[index].get(value)
+      return self.get(key, default) if key is not None else default
+
+  def __shrink (self):
+    """
+    Evict the least recently used inactive items over the capacity.
+
+    If all the items are active the capacity is exceeded temporarily.
+
+    :return: None
+    """
+    over = len(self.__memory) - self.capacity
+    if over <= 0:
+      return
+    victims = []
+    for key, item in self.__memory.iteritems():
+      if len(victims) >= over:
+        break
+      if self.active is None or not self.active(item):
+        victims.append(key)
+    for key in victims:
+      self.__evict(key)
+
+  def __open_db (self):
+    """
+    Create the store's own dir and DBM file on first use.
+
+    :return: None
+    """
+    if not os.path.exists(self.DIR):
+      os.makedirs(self.DIR)
+    self.__db_dir = tempfile.mkdtemp(prefix="%s-%s-" % (self.name,
+                                                        os.getpid()),
+                                     dir=self.DIR)
+    self.__db = anydbm.open(os.path.join(self.__db_dir, self.DB_FILE), 'n')
+
+  def __evict (self, key):
+    """
+    Move the given item to the disk or drop it.
+
+    :param key: primary key
+    :type key: str or int
+    :return: None
+    """
+    item = self.__memory.pop(key)
+    if self.spill:
+      try:
+        if self.__db is None:
+          self.__open_db()
+        self.__db[repr(key)] = zlib.compress(self.dumper(item), 1)
+        self.__spilled.add(key)
+        try:
+          self.__detached[key] = item
+        except TypeError:
+          # Item type does not support weak references
+          pass
+        log.debug("Request: %s is moved from memory to history: %s" %
+                  (key, self.name))
+        return
+      except Exception as e:
+        log.error("Failed to store request: %s in history: %s! Cause: %s" %
+                  (key, self.name, e))
+    log.debug("Request: %s is dropped from history: %s" % (key, self.name))
+    for index, value in self.__index_values.pop(key, {}).iteritems():
+      if self.__indexes[index].get(value) == key:
+        del self.__indexes[index][value]
+
+  def __restore (self, key):
+    """
+    Load the given item from the disk back into the memory.
+
+    If the spilled item is still referenced elsewhere, that instance is
+    restored instead of a deserialized copy.
+
+    :param key: primary key
+    :type key: str or int
+    :return: restored item
+    :rtype: object
+    """
+    item = self.__detached.pop(key, None)
+    if item is None:
+      item = self.loader(zlib.decompress(self.__db[repr(key)]))
+    del self.__db[repr(key)]
+    self.__spilled.discard(key)
+    self.__memory[key] = item
+    log.debug("Request: %s is restored from history: %s" % (key, self.name))
+    self.__shrink()
+    return item
+
+  def close (self):
+    """
+    Close and remove the on-disk store.
+
+    :return: None
+    """
+    with self.__lock:
+      if self.__db is not None:
+        self.__db.close()
+        self.__db = None
+      if self.__db_dir is not None:
+        shutil.rmtree(self.__db_dir, ignore_errors=True)
+        self.__db_dir = None
+      for key in self.__spilled:
+        for index, value in self.__index_values.pop(key, {}).iteritems():
+          if self.__indexes[index].get(value) == key:
+            del self.__indexes[index][value]
+      self.__spilled.clear()
+      self.__detached.clear()
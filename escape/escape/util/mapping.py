@@ -14,8 +14,16 @@
 """
 Contains abstract classes for NFFG mapping.
 """
+import itertools
+import multiprocessing
+import os
+import signal
 import threading
+import time
+import zlib
+from multiprocessing.queues import SimpleQueue
 
+from escape.nffg_lib.nffg import NFFG
 from escape.util.config import CONFIG
 from escape.util.misc import call_as_coop_task
 from pox.core import core
@@ -38,7 +46,7 @@ class AbstractMappingStrategy(object):
     super(AbstractMappingStrategy, self).__init__()
 
   @classmethod
-  def map (cls, graph, resource, pre_state=None):
+  def map (cls, graph, resource, pre_state=None, revision=None):
     """
     Abstract function for mapping algorithm.
 
@@ -49,6 +57,8 @@ class AbstractMappingStrategy(object):
     :type graph: :class:`NFFG`
     :param resource: resource info
     :type resource: :class:`NFFG`
+    :param revision: revision of the resource view (optional)
+    :type revision: tuple
     :raise: :any:`exceptions.NotImplementedError`
     :return: mapped graph
     :rtype: :class:`NFFG`
@@ -261,6 +271,358 @@ class PostMapEvent(Event):
     self.result_graph = result_graph
 
 
+# Queue used by the worker processes to report the start of a job
+_started_jobs = None
+
+
+def _init_worker (started_jobs):
+  """
+  Initialize a worker process of :class:`MappingProcessPool`.
+
+  :param started_jobs: queue for reporting the started jobs
+  :type started_jobs: :class:`multiprocessing.queues.SimpleQueue`
+  :return: None
+  """
+  global _started_jobs
+  _started_jobs = started_jobs
+
+
+def _run_mapping_in_worker (job_id, strategy, graph, resource, revision=None):
+  """
+  Run the mapping strategy in a worker process.
+
+  The request and resource graphs are transferred as compressed JSON.
+
+  :param job_id: id of the mapping job
+  :type job_id: int
+  :param strategy: mapping strategy class
+  :type strategy: :any:`AbstractMappingStrategy`
+  :param graph: compressed request graph
+  :type graph: str
+  :param resource: compressed resource graph
+  :type resource: str
+  :param revision: revision of the resource view (optional)
+  :type revision: tuple
+  :return: compressed mapping result or None
+  :rtype: str
+  """
+  # SimpleQueue writes synchronously, so the report is not lost even if the
+  # worker is killed right after
+  _started_jobs.put((job_id, os.getpid()))
+  try:
+    result = strategy.map(graph=NFFG.parse(zlib.decompress(graph)),
+                          resource=NFFG.parse(zlib.decompress(resource)),
+                          revision=revision)
+    if isinstance(result, (tuple, list)):
+      result = result[0]
+    return zlib.compress(result.dump(), 1) if result is not None else None
+  except Exception:
+    core.getLogger("worker").exception("Got unexpected error during mapping "
+                                       "in worker process!")
+    return None
+
+
+class MappingJob(object):
+  """
+  Handler of a mapping running in a worker process.
+  """
+
+  def __init__ (self, id, pool, callback, timeout=None):
+    """
+    Init.
+
+    :param id: job id
+    :type id: int
+    :param pool: worker pool running the job
+    :type pool: :class:`MappingProcessPool`
+    :param callback: called with the mapped NFFG or None exactly once
+    :type callback: callable
+    :param timeout: timeout of the mapping in sec (optional)
+    :type timeout: float
+    :return: None
+    """
+    self.id = id
+    self.pool = pool
+    self.callback = callback
+    self.__lock = threading.Lock()
+    self.__finished = False
+    self.__timer = None
+    if timeout is not None:
+      self.__timer = threading.Timer(timeout, self.__timeout)
+      self.__timer.daemon = True
+      self.__timer.start()
+
+  @property
+  def finished (self):
+    return self.__finished
+
+  def finish (self, result, cancel=False):
+    """
+    Finish the job with the given raw result.
+
+    :param result: compressed mapping result or None
+    :type result: str
+    :param cancel: stop the mapping if it is still running (default: False)
+    :type cancel: bool
+    :return: the job has been finished by this call or not
+    :rtype: bool
+    """
+    with self.__lock:
+      if self.__finished:
+        return False
+      self.__finished = True
+    if self.__timer is not None:
+      self.__timer.cancel()
+    self.pool.remove_job(self, cancel=cancel)
+    try:
+      nffg = NFFG.parse(zlib.decompress(result)) if result else None
+    except Exception:
+      core.getLogger("worker").exception("Got invalid mapping result from "
+                                         "worker process!")
+      nffg = None
+    self.callback(nffg)
+    return True
+
+  def __timeout (self):
+    """
+    Abort the job when timeout is reached.
+
+    :return: None
+    """
+    if not self.__finished:
+      core.getLogger("worker").error("Mapping in worker process has reached "
+                                     "timeout! Cancel mapping...")
+      self.cancel()
+
+  def cancel (self):
+    """
+    Cancel the job. The running mapping can be stopped only by the
+    termination of its worker process, which is replaced by the pool. Other
+    jobs of the pool are not affected.
+
+    :return: None
+    """
+    self.finish(result=None, cancel=True)
+
+
+class MappingProcessPool(object):
+  """
+  Pool of warm worker processes for running mapping strategies without
+  competing for the GIL with the coop scheduler of POX.
+
+  The workers report the jobs they start, so a job is failed if its worker
+  dies and a cancelled job is stopped by killing only its own worker.
+  """
+  # Pools of the layers
+  __pools = {}
+  __pools_lock = threading.Lock()
+  # Period of checking the workers of the running jobs in sec
+  WATCHDOG_PERIOD = 1
+
+  def __init__ (self, processes=1):
+    """
+    Init.
+
+    :param processes: number of worker processes
+    :type processes: int
+    :return: None
+    """
+    self.processes = processes
+    self.__pool = None
+    self.__started_jobs = None
+    self.__watchdog = None
+    # job id --> job
+    self.__jobs = {}
+    # job id --> pid of the worker running the job
+    self.__workers = {}
+    # Cancelled jobs not started yet
+    self.__cancelled = set()
+    self.__job_ids = itertools.count()
+    self.__lock = threading.Lock()
+
+  @classmethod
+  def get_pool (cls, layer_name, processes=1):
+    """
+    Return the shared worker pool of the given layer.
+
+    :param layer_name: layer name
+    :type layer_name: str
+    :param processes: number of worker processes
+    :type processes: int
+    :return: worker pool
+    :rtype: :class:`MappingProcessPool`
+    """
+    with cls.__pools_lock:
+      if layer_name not in cls.__pools:
+        cls.__pools[layer_name] = cls(processes=processes)
+      return cls.__pools[layer_name]
+
+  @classmethod
+  def initialize_pools (cls, layers):
+    """
+    Start the worker processes of the given layers which are configured to
+    use a process pool.
+
+    Should be called at startup: forking the process later, when more
+    threads are running, can leave the workers with locks held by threads
+    which do not exist in the child process.
+
+    :param layers: layer names
+    :type layers: collections.Iterable
+    :return: None
+    """
+    for layer in layers:
+      processes = CONFIG.get_process_pool(layer)
+      if processes > 0:
+        cls.get_pool(layer_name=layer, processes=processes).start()
+
+  def start (self):
+    """
+    Start the worker processes if they are not running yet.
+
+    :return: None
+    """
+    with self.__lock:
+      self.__start()
+
+  def __start (self):
+    """
+    Start the worker processes. Must be called with the lock acquired.
+
+    :return: None
+    """
+    if self.__pool is not None:
+      return
+    core.getLogger("worker").debug("Initialize %s worker process(es)..."
+                                   % self.processes)
+    self.__started_jobs = SimpleQueue()
+    self.__pool = multiprocessing.Pool(processes=self.processes,
+                                       initializer=_init_worker,
+                                       initargs=(self.__started_jobs,))
+    self.__watchdog = threading.Thread(target=self.__watch_workers,
+                                       name="MappingWatchdog")
+    self.__watchdog.daemon = True
+    self.__watchdog.start()
+
+  def submit (self, strategy, graph, resource, callback, revision=None,
+              timeout=None):
+    """
+    Run the mapping strategy in a worker process.
+
+    :param strategy: mapping strategy class
+    :type strategy: :any:`AbstractMappingStrategy`
+    :param graph: request graph
+    :type graph: :class:`NFFG`
+    :param resource: resource graph
+    :type resource: :class:`NFFG`
+    :param callback: called with the mapped NFFG or None
+    :type callback: callable
+    :param revision: revision of the resource view (optional)
+    :type revision: tuple
+    :param timeout: timeout of mapping in sec (optional)
+    :type timeout: float
+    :return: job handler
+    :rtype: :class:`MappingJob`
+    """
+    job = MappingJob(id=next(self.__job_ids), pool=self, callback=callback,
+                     timeout=timeout)
+    args = (job.id, strategy, zlib.compress(graph.dump(), 1),
+            zlib.compress(resource.dump(), 1), revision)
+    with self.__lock:
+      if self.__pool is None:
+        core.getLogger("worker").warning("Worker processes were not "
+                                         "initialized at startup!")
+        self.__start()
+      self.__jobs[job.id] = job
+      self.__pool.apply_async(_run_mapping_in_worker, args=args,
+                              callback=job.finish)
+    return job
+
+  def remove_job (self, job, cancel=False):
+    """
+    Remove a finished job.
+
+    :param job: mapping job
+    :type job: :class:`MappingJob`
+    :param cancel: kill the worker process running the job. If the job has
+      not been started yet, its worker is killed when it reports the start.
+    :type cancel: bool
+    :return: None
+    """
+    with self.__lock:
+      self.__jobs.pop(job.id, None)
+      pid = self.__workers.pop(job.id, None)
+      if cancel and pid is None:
+        self.__cancelled.add(job.id)
+    if cancel and pid is not None:
+      self.__kill(pid)
+
+  @staticmethod
+  def __kill (pid):
+    """
+    Terminate the given worker process.
+
+    :param pid: process id
+    :type pid: int
+    :return: None
+    """
+    core.getLogger("worker").debug("Terminate worker process: %s..." % pid)
+    try:
+      os.kill(pid, signal.SIGTERM)
+    except OSError:
+      pass
+
+  @staticmethod
+  def __is_alive (pid):
+    """
+    :param pid: process id
+    :type pid: int
+    :return: the process is still running or not
+    :rtype: bool
+    """
+    try:
+      os.kill(pid, 0)
+      return True
+    except OSError:
+      return False
+
+  def __watch_workers (self):
+    """
+    Collect the started jobs reported by the workers and fail the jobs whose
+    worker has died (e.g. killed by the OOM killer or crashed). Runs in a
+    separate thread.
+
+    :return: None
+    """
+    while True:
+      try:
+        while not self.__started_jobs.empty():
+          job_id, pid = self.__started_jobs.get()
+          with self.__lock:
+            cancelled = job_id in self.__cancelled
+            self.__cancelled.discard(job_id)
+            if job_id in self.__jobs:
+              self.__workers[job_id] = pid
+          if cancelled:
+            # Job has been cancelled before it was started
+            self.__kill(pid)
+      except (IOError, EOFError):
+        # Queue is closed at shutdown
+        return
+      with self.__lock:
+        workers = self.__workers.items()
+      lost = [job_id for job_id, pid in workers if not self.__is_alive(pid)]
+      for job_id in lost:
+        with self.__lock:
+          self.__workers.pop(job_id, None)
+          job = self.__jobs.get(job_id)
+        if job is not None:
+          core.getLogger("worker").error("Worker process of mapping job: %s "
+                                         "has been lost!" % job_id)
+          job.finish(result=None)
+      time.sleep(self.WATCHDOG_PERIOD)
+
+
 class AbstractMapper(EventMixin):
   """
   Abstract class for graph mapping function.
@@ -303,6 +665,10 @@ class AbstractMapper(EventMixin):
     # Set threaded
     self._threaded = threaded if threaded is not None else CONFIG.get_threaded(
       layer_name)
+    # Set process pool - process-based mapping follows the threaded call path
+    self._processes = CONFIG.get_process_pool(layer_name)
+    if self._processes > 0:
+      self._threaded = True
     # Set strategy
     if strategy is None:
       # Use the Strategy in CONFIG
@@ -410,7 +776,28 @@ class AbstractMapper(EventMixin):
     # Return the mapped NFFG
     return mapping_result
 
-  def _start_mapping (self, graph, resource):
+  @staticmethod
+  def _get_resource_revision (resource_view):
+    """
+    Return the identifier of the actual revision of the given resource view.
+
+    The revision is taken from the observed DoV, since the own revision of a
+    filtering view restarts whenever the view is recreated.
+
+    :param resource_view: resource view
+    :type resource_view: :any:`AbstractVirtualizer`
+    :return: view type, view id and DoV revision or None if the view is not
+      revisioned
+    :rtype: tuple
+    """
+    global_view = getattr(resource_view, 'global_view', resource_view)
+    revision = getattr(global_view, 'revision', None)
+    if revision is None:
+      return None
+    return (resource_view.__class__.__name__,
+            getattr(resource_view, 'id', None), revision)
+
+  def _start_mapping (self, graph, resource, revision=None):
     """
     Run mapping algorithm in a separate Python thread.
 
@@ -421,17 +808,35 @@ class AbstractMapper(EventMixin):
     :type graph: :class:`NFFG`
     :param resource: global resource
     :type resource: :class:`NFFG`
+    :param revision: revision of the resource view (optional)
+    :type revision: tuple
     :return: None
     """
 
     def run ():
       core.getLogger("worker").info(
         "Schedule mapping algorithm: %s" % self.strategy.__name__)
-      nffg = self.strategy.map(graph=graph, resource=resource)
+      nffg = self.strategy.map(graph=graph, resource=resource,
+                               revision=revision)
       # Must use call_as_coop_task because we want to call a function in a
       # coop microtask environment from a separate thread
       call_as_coop_task(self._mapping_finished, mapped_nffg=nffg)
 
+    def finished (nffg):
+      # Called from the result handler thread of the pool or the timer
+      call_as_coop_task(self._mapping_finished, mapped_nffg=nffg)
+
+    if self._processes > 0:
+      core.getLogger("worker").info(
+        "Schedule mapping algorithm: %s in a worker process" %
+        self.strategy.__name__)
+      pool = MappingProcessPool.get_pool(layer_name=self._layer_name,
+                                         processes=self._processes)
+      pool.submit(
+        strategy=self.strategy, graph=graph, resource=resource,
+        callback=finished, revision=revision,
+        timeout=CONFIG.get_mapping_timeout(self._layer_name))
+      return
     core.getLogger("worker").debug("Initialize working thread...")
     self._mapping_thread = threading.Thread(target=run)
     self._mapping_thread.daemon = True
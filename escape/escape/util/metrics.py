@@ -0,0 +1,303 @@
+# Copyright 2017 Janos Czentye
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Contains an in-process metrics registry with counters, gauges and fixed-bucket
+histograms exposed in the text-based exposition format of Prometheus.
+"""
+import bisect
+import threading
+from collections import OrderedDict
+
+from escape.util.misc import Singleton
+
+
+class AbstractMetric(object):
+  """
+  Abstract class for metrics with labels.
+  """
+  TYPE = None
+
+  def __init__ (self, name, help="", labels=()):
+    """
+    Init.
+
+    :param name: metric name
+    :type name: str
+    :param help: description of the metric
+    :type help: str
+    :param labels: label names
+    :type labels: tuple
+    :return: None
+    """
+    self.name = name
+    self.help = help
+    self.labels = tuple(labels)
+    # Values keyed by label values
+    self._values = OrderedDict()
+    self._lock = threading.Lock()
+
+  def _get_key (self, labels):
+    """
+    Return the ordered label values of the given labels.
+
+    :param labels: label values
+    :type labels: dict
+    :return: label values
+    :rtype: tuple
+    """
+    if set(labels) != set(self.labels):
+      raise ValueError("Invalid labels: %s for metric: %s!" % (labels.keys(),
+                                                               self.name))
+    return tuple(str(labels[l]) for l in self.labels)
+
+  def _format_labels (self, key, **extra):
+    """
+    Format the given label values.
+
+    :param key: label values
+    :type key: tuple
+    :param extra: additional labels
+    :type extra: dict
+    :return: formatted labels
+    :rtype: str
+    """
+    labels = zip(self.labels, key) + sorted(extra.items())
+    if not labels:
+      return ""
+    return "{%s}" % ",".join('%s="%s"' % (
+      k, v.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+                             for k, v in labels)
+
+  def _expose_values (self):
+    """
+    Return the sample lines of the metric.
+
+    :return: sample lines
+    :rtype: list
+    """
+    raise NotImplementedError
+
+  def expose (self):
+    """
+    Return the metric in text-based exposition format.
+
+    :return: metric description
+    :rtype: str
+    """
+    lines = ["# HELP %s %s" % (self.name, self.help),
+             "# TYPE %s %s" % (self.name, self.TYPE)]
+    with self._lock:
+      lines.extend(self._expose_values())
+    return "\n".join(lines)
+
+
+class Counter(AbstractMetric):
+  """
+  Monotonically increasing counter.
+  """
+  TYPE = "counter"
+
+  def inc (self, amount=1, **labels):
+    """
+    Increase the counter.
+
+    :param amount: increment (default: 1)
+    :type amount: int or float
+    :return: None
+    """
+    key = self._get_key(labels)
+    with self._lock:
+      self._values[key] = self._values.get(key, 0) + amount
+
+  def _expose_values (self):
+    return ["%s%s %s" % (self.name, self._format_labels(key), value)
+            for key, value in self._values.iteritems()]
+
+
+class Gauge(AbstractMetric):
+  """
+  Gauge for arbitrary values.
+  """
+  TYPE = "gauge"
+
+  def set (self, value, **labels):
+    """
+    Set the gauge.
+
+    :param value: actual value
+    :type value: int or float
+    :return: None
+    """
+    key = self._get_key(labels)
+    with self._lock:
+      self._values[key] = value
+
+  def inc (self, amount=1, **labels):
+    """
+    Increase the gauge.
+
+    :param amount: increment (default: 1)
+    :type amount: int or float
+    :return: None
+    """
+    key = self._get_key(labels)
+    with self._lock:
+      self._values[key] = self._values.get(key, 0) + amount
+
+  def dec (self, amount=1, **labels):
+    """
+    Decrease the gauge.
+
+    :param amount: decrement (default: 1)
+    :type amount: int or float
+    :return: None
+    """
+    self.inc(-amount, **labels)
+
+  def _expose_values (self):
+    return ["%s%s %s" % (self.name, self._format_labels(key), value)
+            for key, value in self._values.iteritems()]
+
+
+class Histogram(AbstractMetric):
+  """
+  Histogram with fixed buckets.
+  """
+  TYPE = "histogram"
+  # Default buckets in sec
+  DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60)
+
+  def __init__ (self, name, help="", labels=(), buckets=DEFAULT_BUCKETS):
+    """
+    Init.
+
+    :param name: metric name
+    :type name: str
+    :param help: description of the metric
+    :type help: str
+    :param labels: label names
+    :type labels: tuple
+    :param buckets: upper bounds of the buckets
+    :type buckets: tuple
+    :return: None
+    """
+    super(Histogram, self).__init__(name=name, help=help, labels=labels)
+    self.buckets = tuple(sorted(buckets))
+
+  def observe (self, value, **labels):
+    """
+    Observe the given value.
+
+    :param value: observed value
+    :type value: int or float
+    :return: None
+    """
+    key = self._get_key(labels)
+    with self._lock:
+      if key not in self._values:
+        # Bucket counters (the last one is +Inf), sum
+        self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+      counts, _ = entry = self._values[key]
+      counts[bisect.bisect_left(self.buckets, value)] += 1
+      entry[1] += value
+
+  def _expose_values (self):
+    lines = []
+    for key, (counts, total) in self._values.iteritems():
+      cumulative = 0
+      for bound, count in zip(self.buckets + ("+Inf",), counts):
+        cumulative += count
+        lines.append("%s_bucket%s %s" % (self.name,
+                                         self._format_labels(key,
+                                                             le=str(bound)),
+                                         cumulative))
+      lines.append("%s_sum%s %s" % (self.name, self._format_labels(key), total))
+      lines.append("%s_count%s %s" % (self.name, self._format_labels(key),
+                                      cumulative))
+    return lines
+
+
+class MetricsRegistry(object):
+  """
+  Registry of the metrics of ESCAPE.
+  """
+  __metaclass__ = Singleton
+  # Content type of the exposed metrics
+  CONTENT_TYPE = "text/plain; version=0.0.4"
+
+  def __init__ (self):
+    """
+    Init.
+
+    :return: None
+    """
+    self.__metrics = OrderedDict()
+    self.__lock = threading.Lock()
+
+  def __register (self, klass, name, **kwargs):
+    """
+    Return the registered metric or register a new one.
+
+    :param klass: metric class
+    :type klass: :class:`AbstractMetric`
+    :param name: metric name
+    :type name: str
+    :return: metric
+    :rtype: :class:`AbstractMetric`
+    """
+    with self.__lock:
+      metric = self.__metrics.get(name)
+      if metric is None:
+        metric = self.__metrics[name] = klass(name=name, **kwargs)
+      elif not isinstance(metric, klass):
+        raise ValueError("Metric: %s is already registered with type: %s!"
+                         % (name, metric.TYPE))
+      return metric
+
+  def counter (self, name, help="", labels=()):
+    """
+    :return: Return the counter with the given name.
+    :rtype: :class:`Counter`
+    """
+    return self.__register(Counter, name, help=help, labels=labels)
+
+  def gauge (self, name, help="", labels=()):
+    """
+    :return: Return the gauge with the given name.
+    :rtype: :class:`Gauge`
+    """
+    return self.__register(Gauge, name, help=help, labels=labels)
+
+  def histogram (self, name, help="", labels=(),
+                 buckets=Histogram.DEFAULT_BUCKETS):
+    """
+    :return: Return the histogram with the given name.
+    :rtype: :class:`Histogram`
+    """
+    return self.__register(Histogram, name, help=help, labels=labels,
+                           buckets=buckets)
+
+  def expose (self):
+    """
+    Return the registered metrics in text-based exposition format.
+
+    :return: metrics
+    :rtype: str
+    """
+    with self.__lock:
+      registered = self.__metrics.values()
+    return "\n".join(m.expose() for m in registered) + "\n"
+
+
+metrics = MetricsRegistry()
@@ -16,13 +16,16 @@ Contains miscellaneous helper functions.
 """
 import cProfile
 import io
+import itertools
 import logging
 import os
 import pstats
 import re
 import shutil
 import socket
+import threading
 import time
+import types
 import warnings
 import weakref
 from functools import wraps
@@ -34,6 +37,102 @@ VERBOSE = 5
 """Verbose logging level"""
 
 
+class LazyDump(object):
+  """
+  Deferred log payload which calls the given serializer function only if the
+  log record is actually emitted.
+
+  Must be given as a logging argument instead of formatting the message
+  in place, e.g.::
+
+    log.log(VERBOSE, "Merged DoV:\n%s", LazyDump(nffg.dump))
+
+  Huge dumps can be truncated (:attr:`MAX_SIZE`) and sampled
+  (:attr:`SAMPLE_RATE`) with :meth:`configure`. The payload is rendered and
+  sampled only once, so every log handler emits the same result.
+  """
+  MAX_SIZE = 0
+  """Max length of the emitted dumps, 0 means unlimited"""
+  SAMPLE_RATE = 1
+  """Only every N-th dump is emitted in full"""
+  __counter = itertools.count()
+  __slots__ = ('func', 'args', 'kwargs', '_rendered')
+
+  def __init__ (self, func, *args, **kwargs):
+    """
+    Init.
+
+    :param func: serializer function
+    :type func: callable
+    :param args: positional args of the function
+    :type args: list
+    :param kwargs: keyword args of the function
+    :type kwargs: dict
+    """
+    self.func = func
+    self.args = args
+    self.kwargs = kwargs
+    self._rendered = None
+
+  @classmethod
+  def configure (cls, max_size=None, sample_rate=None):
+    """
+    Set the truncation and sampling of the dumps.
+
+    :param max_size: max length of the dumps, 0 means unlimited
+    :type max_size: int
+    :param sample_rate: emit every N-th dump in full
+    :type sample_rate: int
+    :return: None
+    """
+    if max_size is not None:
+      cls.MAX_SIZE = max(0, int(max_size))
+    if sample_rate is not None:
+      cls.SAMPLE_RATE = max(1, int(sample_rate))
+
+  def __str__ (self):
+    """
+    Serialize the payload.
+
+    :return: dump
+    :rtype: str
+    """
+    if self._rendered is None:
+      self._rendered = self.__render()
+    return self._rendered
+
+  def __render (self):
+    """
+    Call the serializer function and apply the sampling and truncation.
+
+    :return: dump
+    :rtype: str
+    """
+    if self.SAMPLE_RATE > 1 and next(self.__counter) % self.SAMPLE_RATE:
+      return "<dump is omitted by sampling rate: 1/%s>" % self.SAMPLE_RATE
+    data = self.func(*self.args, **self.kwargs)
+    if not isinstance(data, basestring):
+      data = str(data)
+    if self.MAX_SIZE and len(data) > self.MAX_SIZE:
+      return "%s\n<%s of %s chars are omitted>" % (data[:self.MAX_SIZE],
+                                                   len(data) - self.MAX_SIZE,
+                                                   len(data))
+    return data
+
+
+def _bind_stat_context (func):
+  """
+  Bind the tracing context of the actual thread to the given function.
+
+  :param func: function
+  :type func: func
+  :return: wrapped function
+  :rtype: func
+  """
+  from escape.util.stat import stats
+  return stats.bind_context(func)
+
+
 def schedule_as_coop_task (func):
   """
   Decorator functions for running functions in an asynchronous way as a
@@ -51,7 +150,7 @@ def schedule_as_coop_task (func):
   @wraps(func)
   def decorator (*args, **kwargs):
     # Use POX internal thread-safe wrapper for scheduling
-    return core.callLater(func, *args, **kwargs)
+    return core.callLater(_bind_stat_context(func), *args, **kwargs)
 
   return decorator
 
@@ -74,7 +173,8 @@ def schedule_delayed_as_coop_task (delay=0):
       @wraps(func)
       def delayed_wrapper (*args, **kwargs):
         # Use POX internal thread-safe wrapper for scheduling
-        return core.callDelayed(delay, func, *args, **kwargs)
+        return core.callDelayed(delay, _bind_stat_context(func), *args,
+                                **kwargs)
 
       # Return specific wrapper
       return delayed_wrapper
@@ -83,7 +183,7 @@ def schedule_delayed_as_coop_task (delay=0):
       @wraps(func)
       def one_time_wrapper (*args, **kwargs):
         # Use POX internal thread-safe wrapper for scheduling
-        return core.callLater(func, *args, **kwargs)
+        return core.callLater(_bind_stat_context(func), *args, **kwargs)
 
       # Return specific wrapper
       return one_time_wrapper
@@ -105,7 +205,7 @@ def call_as_coop_task (func, *args, **kwargs):
   :return: None
   """
   from pox.core import core
-  core.callLater(func, *args, **kwargs)
+  core.callLater(_bind_stat_context(func), *args, **kwargs)
 
 
 def call_delayed_as_coop_task (func, delay=0, *args, **kwargs):
@@ -125,7 +225,7 @@ def call_delayed_as_coop_task (func, delay=0, *args, **kwargs):
   :return: None
   """
   from pox.core import core
-  core.callDelayed(delay, func, *args, **kwargs)
+  core.callDelayed(delay, _bind_stat_context(func), *args, **kwargs)
 
 
 def run_cmd (cmd):
@@ -322,6 +422,8 @@ class Singleton(type):
   Realize Singleton design pattern in a pythonic way.
   """
   _instances = {}
+  # Singletons can be first used from worker threads concurrently
+  _lock = threading.RLock()
 
   # noinspection PyArgumentList
   def __call__ (cls, *args, **kwargs):
@@ -329,7 +431,9 @@ class Singleton(type):
     Override.
     """
     if cls not in cls._instances:
-      cls._instances[cls] = super(Singleton, cls).__call__(*args, **kwargs)
+      with cls._lock:
+        if cls not in cls._instances:
+          cls._instances[cls] = super(Singleton, cls).__call__(*args, **kwargs)
     return cls._instances[cls]
 
 
@@ -481,18 +585,28 @@ def get_escape_revision ():
   return escape.__project__, get_escape_version(), get_escape_branch_name()
 
 
-def notify_remote_visualizer (data, url=None, unique_id=None, **kwargs):
+def notify_remote_visualizer (data, url=None, unique_id=None, copy=False,
+                              **kwargs):
   """
   Send the given data to a remote visualization server.
   If url is given use this address to send instead of the url defined in the
   global config.
 
-  :param data: topology description need to send
-  :type data: :class:`NFFG` or :class:`Virtualizer`
+  If asynchronous notification is enabled, the given data is processed later
+  in a background thread, therefore it must not be modified by the caller
+  unless ``copy`` is set.
+
+  If ``data`` is a function, it is called to get the topology only if the
+  visualizer is enabled.
+
+  :param data: topology description need to send or a function returning it
+  :type data: :class:`NFFG` or :class:`Virtualizer` or callable
   :param url: additional URL (acquired from config by default)
   :type url: str
   :param unique_id: use given ID as NFFG id
   :type unique_id: str or int
+  :param copy: notify with a copy of the given data (default: False)
+  :type copy: bool
   :param kwargs: optional parameters for request lib
   :type kwargs: dict
   :return: response
@@ -500,8 +614,10 @@ def notify_remote_visualizer (data, url=None, unique_id=None, **kwargs):
   """
   from pox.core import core
   if core.hasComponent('visualizer'):
-    return core.visualizer.send_notification(data=data, url=url,
-                                             unique_id=unique_id, **kwargs)
+    if isinstance(data, (types.FunctionType, types.MethodType)):
+      data = data()
+    return core.visualizer.notify(data=data, url=url, unique_id=unique_id,
+                                  copy=copy, **kwargs)
 
 
 def do_profile (func):
@@ -14,14 +14,113 @@
 """
 Implement the supporting classes for communication over NETCONF.
 """
+import copy
+import threading
 from StringIO import StringIO
 
 from lxml import etree
 from ncclient import manager, NCClientError
-from ncclient.operations import RPCError
+from ncclient.operations import RPCError, TimeoutExpiredError
 from ncclient.xml_ import new_ele, sub_ele
 
 
+class NETCONFSessionPool(object):
+  """
+  Pool of persistent NETCONF sessions keyed by the connection data of the
+  agents.
+
+  The sessions are created on demand and kept open between the RPC calls to
+  avoid an SSH/NETCONF handshake per call.
+  """
+
+  def __init__ (self):
+    """
+    Init.
+
+    :return: None
+    """
+    # (server, port, username) --> ncclient Manager
+    self.__sessions = {}
+    # (server, port, username) --> Lock guarding the session setup
+    self.__locks = {}
+    self.__lock = threading.Lock()
+
+  def __get_lock (self, key):
+    """
+    Return the lock of the given agent.
+
+    :param key: connection data of the agent
+    :type key: tuple
+    :return: lock object
+    :rtype: :class:`threading.Lock`
+    """
+    with self.__lock:
+      return self.__locks.setdefault(key, threading.Lock())
+
+  def acquire (self, server, port, username, password, timeout):
+    """
+    Return a connected session to the given agent and connect if the session
+    is missing or closed.
+
+    :param server: server address
+    :type server: str
+    :param port: port number
+    :type port: int
+    :param username: username
+    :type username: str
+    :param password: password
+    :type password: str
+    :param timeout: connection timeout
+    :type timeout: int
+    :return: connection manager
+    :rtype: :class:`ncclient.manager.Manager`
+    """
+    key = (server, port, username)
+    # Sessions of different agents can be set up concurrently
+    with self.__get_lock(key):
+      session = self.__sessions.get(key)
+      if session is None or not session.connected:
+        session = manager.connect(host=server, port=port,
+                                  username=username,
+                                  password=password,
+                                  hostkey_verify=False,
+                                  timeout=timeout)
+        self.__sessions[key] = session
+      return session
+
+  def close (self, server, port, username):
+    """
+    Close the session of the given agent.
+
+    :param server: server address
+    :type server: str
+    :param port: port number
+    :type port: int
+    :param username: username
+    :type username: str
+    :return: None
+    """
+    key = (server, port, username)
+    with self.__get_lock(key):
+      session = self.__sessions.pop(key, None)
+      if session is not None and session.connected:
+        session.close_session()
+
+  def close_all (self):
+    """
+    Close every pooled session.
+
+    :return: None
+    """
+    with self.__lock:
+      keys = self.__sessions.keys()
+    for key in keys:
+      self.close(*key)
+
+
+session_pool = NETCONFSessionPool()
+
+
 class AbstractNETCONFAdapter(object):
   """
   Abstract class for various Adapters rely on NETCONF protocol (:rfc:`4741`).
@@ -40,10 +139,15 @@ class AbstractNETCONFAdapter(object):
   """RPC namespace. Must be set by derived classes through RPC_NAMESPACE"""
 
   def __init__ (self, server, port, username, password, timeout=10,
-                debug=False, *args, **kwargs):
+                debug=False, persistent=False, batched=False, *args,
+                **kwargs):
     """
     Initialize connection parameters.
 
+    If persistent is set, the sessions are taken from the shared
+    :any:`NETCONFSessionPool` and kept open after the RPC calls. If batched is
+    set, the RPCs given to :meth:`call_RPC_batch` are pipelined in one session.
+
     :param server: server address
     :type server: str
     :param port: port number
@@ -56,6 +160,10 @@ class AbstractNETCONFAdapter(object):
     :type timeout: int
     :param debug: print DEBUG infos, RPC messages ect. (default: False)
     :type debug: bool
+    :param persistent: use pooled, persistent sessions (default: False)
+    :type persistent: bool
+    :param batched: pipeline batched RPC calls (default: False)
+    :type batched: bool
     :return: None
     """
     super(AbstractNETCONFAdapter, self).__init__()
@@ -65,6 +173,8 @@ class AbstractNETCONFAdapter(object):
     self.password = password
     self.timeout = int(timeout) if timeout is not None else 10
     self.debug = debug
+    self.persistent = persistent
+    self.batched = batched
     # variables for the last RPC reply
     self._rpc_reply_formatted = dict()
     self._rpc_reply_as_xml = ""
@@ -130,11 +240,18 @@ class AbstractNETCONFAdapter(object):
     :rtype: :class:`ncclient.manager.Manager`
     """
     # __connection is responsible for keeping the connection up.
-    self.__connection = manager.connect(host=self.server, port=self.port,
-                                        username=self.username,
-                                        password=self.password,
-                                        hostkey_verify=False,
-                                        timeout=self.timeout)
+    if self.persistent:
+      self.__connection = session_pool.acquire(server=self.server,
+                                               port=self.port,
+                                               username=self.username,
+                                               password=self.password,
+                                               timeout=self.timeout)
+    else:
+      self.__connection = manager.connect(host=self.server, port=self.port,
+                                          username=self.username,
+                                          password=self.password,
+                                          hostkey_verify=False,
+                                          timeout=self.timeout)
     if self.debug:
       print "Connecting to %s:%s with %s/%s ---> %s" % (
         self.server, self.port, self.username, self.password,
@@ -147,11 +264,32 @@ class AbstractNETCONFAdapter(object):
 
     :return: None
     """
-    if self.connected:
+    if self.persistent:
+      session_pool.close(*self.connection_data)
+    elif self.connected:
       self.__connection.close_session()
     if self.debug:
       print "Connection closed!"
 
+  def clone (self, **params):
+    """
+    Return a copy of the adapter with the given connection params and without
+    an active connection. Persistent clones share the pooled sessions.
+
+    :param params: updated connection params (server, port, username, ...)
+    :type params: dict
+    :return: adapter copy
+    :rtype: :any:`AbstractNETCONFAdapter`
+    """
+    adapter = copy.copy(self)
+    adapter.__connection = None
+    adapter._rpc_reply_formatted = dict()
+    adapter._rpc_reply_as_xml = ""
+    for param in ('server', 'port', 'username', 'password'):
+      if param in params:
+        setattr(adapter, param, params[param])
+    return adapter
+
   def get_config (self, source="running", to_file=False):
     """
     This function will download the configuration of the NETCONF agent in an
@@ -417,6 +555,46 @@ class AbstractNETCONFAdapter(object):
       else:
         raise
 
+  def call_RPC_batch (self, calls, no_rpc_error=False):
+    """
+    Call the given RPCs in order. In batched mode the requests are pipelined
+    in the session and the replies are collected afterwards.
+
+    :param calls: list of RPC name and params pairs
+    :type calls: list
+    :param no_rpc_error: return with dict (RPC error) instead of exception
+    :type no_rpc_error: bool
+    :return: RPC replies in order
+    :rtype: list
+    """
+    if not self.batched or len(calls) < 2:
+      return [self.call_RPC(rpc_name, no_rpc_error=no_rpc_error, **params)
+              for rpc_name, params in calls]
+    requests = [self._create_rpc_request(rpc_name, **params)
+                for rpc_name, params in calls]
+    self.__connection.async_mode = True
+    try:
+      rpcs = [self.__connection.dispatch(request) for request in requests]
+    finally:
+      self.__connection.async_mode = False
+    replies = []
+    for rpc in rpcs:
+      if not rpc.event.wait(self.timeout):
+        raise TimeoutExpiredError("No reply received for batched RPC!")
+      if rpc.error is not None:
+        raise rpc.error
+      reply = rpc.reply
+      if not reply.ok:
+        if no_rpc_error:
+          result = {"rpc-reply": "Error"}
+          result.update(reply.error.to_dict())
+          replies.append(result)
+          continue
+        raise reply.error
+      self._rpc_reply_as_xml = reply.xml
+      replies.append(self._parse_rpc_response())
+    return replies
+
   def __enter__ (self):
     """
     Context manager setup action.
@@ -439,7 +617,8 @@ class AbstractNETCONFAdapter(object):
 
     :return: None
     """
-    if self.connected:
+    # Persistent sessions are kept open for the next calls
+    if self.connected and not self.persistent:
       self.disconnect()
 
 
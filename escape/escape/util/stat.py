@@ -11,10 +11,15 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import json
 import os
+import threading
 import time
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
+from contextlib import contextmanager
+from functools import wraps
 
+from escape.util.metrics import metrics
 from escape.util.misc import Singleton
 from escape_logging import LOG_FOLDER
 from pox.core import core
@@ -42,11 +47,167 @@ class StatTimestamp(_StatEntry):
                      "%f" % self.timestamp))
 
 
+class Span(object):
+  """
+  Container class for a measured time interval of a request orchestration.
+  """
+  __slots__ = ('id', 'parent', 'request', 'type', 'info', 'thread', 'start',
+               'end')
+
+  def __init__ (self, id, parent, request, type, info, thread, start):
+    """
+    Init.
+
+    :param id: unique span id
+    :type id: int
+    :param parent: id of the parent span
+    :type parent: int
+    :param request: id of the traced request
+    :type request: str or int
+    :param type: span type
+    :type type: int
+    :param info: additional info
+    :type info: str
+    :param thread: thread which opened the span
+    :type thread: :class:`threading.Thread`
+    :param start: start timestamp
+    :type start: float
+    :return: None
+    """
+    self.id = id
+    self.parent = parent
+    self.request = request
+    self.type = type
+    self.info = info
+    self.thread = thread
+    self.start = start
+    self.end = None
+
+  def __str__ (self):
+    return "Span(id: %s, parent: %s, type: %s, info: %s, duration: %s)" % (
+      self.id, self.parent, OrchestrationStatCollector.get_type_name(self.type),
+      self.info, self.duration)
+
+  @property
+  def duration (self):
+    """
+    :return: Return the length of the closed span or None.
+    :rtype: float
+    """
+    return self.end - self.start if self.end is not None else None
+
+  def to_trace_event (self):
+    """
+    Convert the closed span into a complete event of the Trace Event Format.
+
+    :return: trace event
+    :rtype: dict
+    """
+    type_name = OrchestrationStatCollector.get_type_name(self.type)
+    name = "%s:%s" % (type_name, self.info) if self.info is not None \
+      else type_name
+    return {"name": name,
+            "cat": type_name,
+            "ph": "X",
+            "ts": int(self.start * 1e6),
+            "dur": int((self.end - self.start) * 1e6),
+            "pid": os.getpid(),
+            "tid": self.thread.ident,
+            "args": {"request": str(self.request),
+                     "span": self.id,
+                     "parent": self.parent}}
+
+
+class RequestTrace(object):
+  """
+  Container class for the span tree and raw timestamps of a request.
+  """
+
+  def __init__ (self, request_id):
+    """
+    Init.
+
+    :param request_id: service request id
+    :type request_id: str or int
+    :return: None
+    """
+    self.request_id = request_id
+    # Trace of a request initiated with temporary id can be renamed once
+    self.renamable = False
+    self.entries = []
+    self.spans = []
+    # Open spans: {type: OrderedDict(info: [span])}
+    self.open_spans = {}
+
+  def open (self, span):
+    """
+    Register an opened span.
+
+    :param span: opened span
+    :type span: :class:`Span`
+    :return: None
+    """
+    self.spans.append(span)
+    self.open_spans.setdefault(span.type, OrderedDict()).setdefault(
+      span.info, []).append(span)
+
+  def close (self, type, info):
+    """
+    Close the last opened span with the given type and info.
+
+    If no info is given the last opened span of the type is closed.
+
+    :param type: span type
+    :type type: int
+    :param info: additional info
+    :type info: str
+    :return: the closed span or None
+    :rtype: :class:`Span`
+    """
+    spans = self.open_spans.get(type)
+    if not spans:
+      return None
+    if info is None:
+      key = next(reversed(spans))
+    elif info in spans:
+      key = info
+    else:
+      return None
+    opened = spans[key]
+    span = opened.pop()
+    if not opened:
+      del spans[key]
+    return span
+
+  def get_open_span (self, type, info=None):
+    """
+    Return the last opened span with the given type. If the ``info`` is given
+    the span with the same info is preferred.
+
+    :param type: span type
+    :type type: int
+    :param info: additional info
+    :type info: str
+    :return: opened span or None
+    :rtype: :class:`Span`
+    """
+    spans = self.open_spans.get(type)
+    if not spans:
+      return None
+    if info in spans:
+      return spans[info][-1]
+    return spans[next(reversed(spans))][-1]
+
+
 class OrchestrationStatCollector(object):
   """
   Manager class to collect and persist timestamp values of an orchestration
   process.
 
+  The timestamps are organized into per-request span trees. The request of a
+  timestamp is defined by the context of the actual thread, which is
+  propagated into the scheduled coop tasks by :meth:`bind_context`.
+
   General structure of a timestamp entry in file:
     <counter>,<TYPE>,<arbitrary info>,<CMD>,<timestamp>
   """
@@ -69,6 +230,8 @@ class OrchestrationStatCollector(object):
   # Command constants
   CMD_START = "START"
   CMD_STOP = "END"
+  # Max number of traced requests kept in memory
+  MAX_TRACES = 64
 
   def __init__ (self, stats_folder):
     """
@@ -81,8 +244,11 @@ class OrchestrationStatCollector(object):
     self.stats_folder = stats_folder
     log.debug("Setup stat collector with folder: %s" % stats_folder)
     self.__cntr = 0
-    self.__measured_values = []
-    self.__request_id = None
+    self.__traces = OrderedDict()
+    self.__context = threading.local()
+    self.__lock = threading.RLock()
+    self.__trace_file = None
+    self.__traced_threads = set()
     if not os.path.exists(self.stats_folder):
       os.mkdir(self.stats_folder)
     self.clear_stats()
@@ -91,11 +257,61 @@ class OrchestrationStatCollector(object):
     """
     Set the request Id of the service request under orchestration.
 
+    If the measurement of the actual request has been initiated with a
+    temporary id, the collected trace is renamed.
+
     :param request_id: service request id
     :type request_id: str or int
     :return: None
     """
-    self.__request_id = request_id
+    with self.__lock:
+      current = self.get_request_id()
+      trace = self.__traces.get(current)
+      if trace is not None and trace.renamable and current != request_id \
+         and request_id not in self.__traces:
+        del self.__traces[current]
+        trace.request_id = request_id
+        trace.renamable = False
+        for span in trace.spans:
+          span.request = request_id
+        self.__traces[request_id] = trace
+      self.__context.request_id = request_id
+
+  def get_request_id (self):
+    """
+    :return: Return the request id of the actual context or None if the
+      actual thread is not bound to any request.
+    :rtype: str or int
+    """
+    return getattr(self.__context, 'request_id', None)
+
+  def bind_context (self, func):
+    """
+    Bind the tracing context of the actual thread to the given function, so
+    the timestamps of the function are assigned to the same request even if it
+    is called later in a coop task or in a different thread.
+
+    :param func: function
+    :type func: callable
+    :return: wrapped function
+    :rtype: callable
+    """
+    request_id = getattr(self.__context, 'request_id', None)
+    span = getattr(self.__context, 'span', None)
+    if request_id is None and span is None:
+      return func
+
+    @wraps(func)
+    def wrapper (*args, **kwargs):
+      prev = (getattr(self.__context, 'request_id', None),
+              getattr(self.__context, 'span', None))
+      self.__context.request_id, self.__context.span = request_id, span
+      try:
+        return func(*args, **kwargs)
+      finally:
+        self.__context.request_id, self.__context.span = prev
+
+    return wrapper
 
   @classmethod
   def get_type_name (cls, number):
@@ -132,6 +348,120 @@ class OrchestrationStatCollector(object):
       if f != ".placeholder":
         os.remove(os.path.join(self.stats_folder, f))
 
+  def enable_trace_export (self, file_name=None):
+    """
+    Stream the closed spans into the given file in the JSON Array format of
+    the Trace Event Format, which can be loaded by trace viewers
+    (e.g. chrome://tracing) even if the array is not closed.
+
+    :param file_name: use explicit file name
+    :type file_name: str
+    :return: None
+    """
+    if not file_name:
+      file_name = os.path.join(self.stats_folder, "trace-%s.json" %
+                               time.strftime("%Y%m%d%H%M%S"))
+    with self.__lock:
+      if self.__trace_file is not None:
+        self.__trace_file.close()
+      self.__trace_file = open(file_name, "w")
+      self.__trace_file.write("[\n")
+      self.__traced_threads.clear()
+    log.info("Export traces into: %s" % file_name)
+
+  def disable_trace_export (self):
+    """
+    Stop trace export and close the trace file.
+
+    :return: None
+    """
+    with self.__lock:
+      if self.__trace_file is not None:
+        self.__trace_file.close()
+        self.__trace_file = None
+
+  def __export_span (self, span):
+    """
+    Write the given closed span into the trace file.
+
+    Must be called with acquired lock.
+
+    :param span: closed span
+    :type span: :class:`Span`
+    :return: None
+    """
+    if self.__trace_file is None:
+      return
+    try:
+      if span.thread.ident not in self.__traced_threads:
+        self.__traced_threads.add(span.thread.ident)
+        self.__trace_file.write(json.dumps({"name": "thread_name",
+                                            "ph": "M",
+                                            "pid": os.getpid(),
+                                            "tid": span.thread.ident,
+                                            "args": {"name": span.thread.name}})
+                                + ",\n")
+      self.__trace_file.write(json.dumps(span.to_trace_event()) + ",\n")
+      self.__trace_file.flush()
+    except (IOError, ValueError) as e:
+      log.error("Trace export is failed: %s! Disable trace export..." % e)
+      self.__trace_file = None
+
+  def __get_trace (self, request_id):
+    """
+    Return the trace of the given request. Create a new one if it is missing.
+
+    Must be called with acquired lock.
+
+    :param request_id: service request id
+    :type request_id: str or int
+    :return: request trace
+    :rtype: :class:`RequestTrace`
+    """
+    trace = self.__traces.get(request_id)
+    if trace is None:
+      trace = self.__traces[request_id] = RequestTrace(request_id=request_id)
+      while len(self.__traces) > self.MAX_TRACES:
+        dropped = self.__traces.popitem(last=False)[0]
+        log.debug("Drop unfinished trace of request: %s" % dropped)
+    return trace
+
+  def __get_parent (self, trace, type, info):
+    """
+    Return the parent span id of a new span.
+
+    The parent is the span of the actual context if it is set, else the
+    relevant open span defined by the type hierarchy, e.g. the domain span of
+    an edit-config request or the layer span of a mapping.
+
+    :param trace: request trace
+    :type trace: :class:`RequestTrace`
+    :param type: span type
+    :type type: int
+    :param info: additional info
+    :type info: str
+    :return: parent span id
+    :rtype: int
+    """
+    span = getattr(self.__context, 'span', None)
+    if span is not None and span.request == trace.request_id and \
+       span.end is None:
+      return span.id
+    parents = []
+    if type in (self.TYPE_DEPLOY_REQUEST, self.TYPE_DEPLOY_CALLBACK):
+      parents.append(self.TYPE_DEPLOY_DOMAIN)
+    if type >= 10:
+      parents.append(type // 10)
+    if type != self.TYPE_OVERALL:
+      parents.extend((self.TYPE_SCHEDULED, self.TYPE_OVERALL))
+    for p in parents:
+      if p == type:
+        continue
+      parent = trace.get_open_span(type=p, info=info)
+      if parent is not None:
+        return parent.id
+    return None
+
   def init_request_measurement (self, request_id):
     """
     Initialize measurement of a service request orchestration.
@@ -140,22 +470,33 @@ class OrchestrationStatCollector(object):
     :type request_id: str or int
     :return: None
     """
-    if self.__request_id != request_id:
-      self.reset()
-    self.__request_id = request_id
+    with self.__lock:
+      self.__traces.pop(request_id, None)
+      self.__context.request_id = request_id
+      self.__context.span = None
     self.add_measurement_start_entry(type=self.TYPE_OVERALL,
-                                     info=self.__request_id)
+                                     info=request_id)
+    with self.__lock:
+      self.__get_trace(request_id=request_id).renamable = True
 
-  def finish_request_measurement (self):
+  def finish_request_measurement (self, request_id=None):
     """
     Stop measurement of the actual service request orchestration and dump
     result into file.
 
+    :param request_id: service request id (default: request of the context)
+    :type request_id: str or int
     :return: None
     """
-    self.add_measurement_end_entry(type=self.TYPE_OVERALL,
-                                   info=self.__request_id)
-    self.dump_to_file()
+    if request_id is None:
+      request_id = self.get_request_id()
+      if request_id is None:
+        return
+    with self.__lock:
+      self.__add_entry(request_id=request_id, type=self.TYPE_OVERALL,
+                       info=request_id, cmd=self.CMD_STOP)
+      self.dump_to_file(request_id=request_id)
+      self.__traces.pop(request_id, None)
 
   def reset (self):
     """
@@ -163,10 +504,95 @@ class OrchestrationStatCollector(object):
 
     :return: None
     """
-    self.__request_id = None
-    del self.__measured_values[:]
+    with self.__lock:
+      self.__context.request_id = None
+      self.__context.span = None
+      self.__traces.clear()
 
-  def add_measurement_start_entry (self, type, info=None):
+  def __add_entry (self, request_id, type, info, cmd):
+    """
+    Add a timestamp to the trace of the given request and open or close the
+    related span.
+
+    :param request_id: service request id
+    :type request_id: str or int
+    :param type: timestamp type
+    :type type: int
+    :param info: additional info
+    :type info: str
+    :param cmd: timestamp command
+    :type cmd: str
+    :return: opened or closed span
+    :rtype: :class:`Span`
+    """
+    if request_id is None:
+      log.debug("Skip measurement timestamp of unbound thread: %s - %s"
+                % (self.get_type_name(type), info))
+      return None
+    timestamp = time.time()
+    with self.__lock:
+      trace = self.__get_trace(request_id=request_id)
+      se = StatTimestamp(id=self.__increase_cntr(),
+                         type=type,
+                         info=info,
+                         cmd=cmd,
+                         timestamp=timestamp)
+      trace.entries.append(se)
+      if cmd == self.CMD_START:
+        span = Span(id=se.id,
+                    parent=self.__get_parent(trace=trace, type=type,
+                                             info=info),
+                    request=request_id,
+                    type=type,
+                    info=info,
+                    thread=threading.current_thread(),
+                    start=timestamp)
+        trace.open(span)
+      else:
+        span = trace.close(type=type, info=info)
+        if span is not None:
+          span.end = timestamp
+          self.__export_span(span)
+    if cmd == self.CMD_STOP and span is not None:
+      self.__observe_metrics(span)
+    log.debug("Measurement timestamp: %s" % str(se))
+    return span
+
+  def __observe_metrics (self, span):
+    """
+    Record the duration of the closed span in the related histogram.
+
+    :param span: closed span
+    :type span: :class:`Span`
+    :return: None
+    """
+    if span.type in (self.TYPE_SERVICE_MAPPING,
+                     self.TYPE_ORCHESTRATION_MAPPING):
+      metrics.histogram(
+        name="escape_mapping_duration_seconds",
+        help="Time spent by the mapping algorithm.",
+        labels=("layer",)).observe(
+        span.duration, layer="service"
+        if span.type == self.TYPE_SERVICE_MAPPING else "orchestration")
+    elif span.type == self.TYPE_CONVERSION:
+      metrics.histogram(
+        name="escape_conversion_duration_seconds",
+        help="Time spent by data conversion steps.",
+        labels=("conversion",)).observe(span.duration,
+                                        conversion=span.info)
+    elif span.type == self.TYPE_DEPLOY_DOMAIN:
+      metrics.histogram(
+        name="escape_domain_deploy_duration_seconds",
+        help="Time spent by the deployment of one domain.",
+        labels=("domain",)).observe(span.duration, domain=span.info)
+    elif span.type == self.TYPE_DEPLOY_CALLBACK:
+      metrics.histogram(
+        name="escape_callback_wait_duration_seconds",
+        help="Time between sending a request and receiving its callback.",
+        labels=("domain",)).observe(span.duration,
+                                    domain=span.info)
+
+  def add_measurement_start_entry (self, type, info=None, request_id=None):
     """
     Add a starting timestamp with the given parameters to the statistic.
 
@@ -174,17 +600,16 @@ class OrchestrationStatCollector(object):
     :type type: str or int
     :param info: additional info
     :type info: str
+    :param request_id: service request id (default: request of the context)
+    :type request_id: str or int
     :return: None
     """
-    se = StatTimestamp(id=self.__increase_cntr(),
-                       type=type,
-                       info=info,
-                       cmd=self.CMD_START,
-                       timestamp=time.time())
-    log.debug("Measurement timestamp: %s" % str(se))
-    self.__measured_values.append(se)
+    if request_id is None:
+      request_id = self.get_request_id()
+    self.__add_entry(request_id=request_id, type=type, info=info,
+                     cmd=self.CMD_START)
 
-  def add_measurement_end_entry (self, type, info=None):
+  def add_measurement_end_entry (self, type, info=None, request_id=None):
     """
     Add a ending timestamp with the given parameters to the statistic.
 
@@ -192,54 +617,86 @@ class OrchestrationStatCollector(object):
     :type type: str or int
     :param info: additional info
     :type info: str
+    :param request_id: service request id (default: request of the context)
+    :type request_id: str or int
     :return: None
     """
-    se = StatTimestamp(id=self.__increase_cntr(),
-                       type=type,
-                       info=info,
-                       cmd=self.CMD_STOP,
-                       timestamp=time.time())
-    log.debug("Measurement timestamp: %s" % str(se))
-    self.__measured_values.append(se)
+    if request_id is None:
+      request_id = self.get_request_id()
+    self.__add_entry(request_id=request_id, type=type, info=info,
+                     cmd=self.CMD_STOP)
+
+  @contextmanager
+  def span (self, type, info=None):
+    """
+    Measure the enclosed block as a span which is the parent of the spans
+    opened in the block.
 
-  def raw_stat (self):
+    :param type: span type
+    :type type: int
+    :param info: additional info
+    :type info: str
+    :return: None
+    """
+    span = self.__add_entry(request_id=self.get_request_id(), type=type,
+                            info=info, cmd=self.CMD_START)
+    prev = getattr(self.__context, 'span', None)
+    self.__context.span = span
+    try:
+      yield span
+    finally:
+      self.__context.span = prev
+      self.add_measurement_end_entry(type=type, info=info)
+
+  def raw_stat (self, request_id=None):
     """
+    :param request_id: service request id (default: request of the context)
+    :type request_id: str or int
     :return: Return the list of raw measured values
     :rtype: list
     """
-    return self.__measured_values
+    if request_id is None:
+      request_id = self.get_request_id()
+    trace = self.__traces.get(request_id)
+    return trace.entries if trace is not None else []
 
-  def _get_measured_types (self):
+  def get_spans (self, request_id=None):
     """
-    :return: Return the types of the stored timestamps.
-    :rtype: set
+    :param request_id: service request id (default: request of the context)
+    :type request_id: str or int
+    :return: Return the list of spans of the request
+    :rtype: list
     """
-    return {mv.type for mv in self.__measured_values}
+    if request_id is None:
+      request_id = self.get_request_id()
+    trace = self.__traces.get(request_id)
+    return trace.spans if trace is not None else []
 
-  def calculate_stat_values (self):
+  def calculate_stat_values (self, request_id=None):
     """
-    Process the raw timestamps and conclude derived measurements.
+    Process the spans and conclude derived measurements.
 
+    :param request_id: service request id (default: request of the context)
+    :type request_id: str or int
     :return: derived measurements
-    :rtype: str
+    :rtype: list
     """
     processed = []
-    for _type in self._get_measured_types():
-      if _type != self.TYPE_DEPLOY_DOMAIN:
-        values = [e.timestamp for e in self.__measured_values if
-                  e.type == _type]
-        processed.append("%s: %s" % (self.get_type_name(_type),
-                                     max(values) - min(values)))
+    intervals = OrderedDict()
+    for span in self.get_spans(request_id=request_id):
+      if span.end is None:
+        continue
+      if span.type == self.TYPE_DEPLOY_DOMAIN:
+        processed.append("- %s: %s" % (span.info, span.duration))
       else:
-        for dd in self.__measured_values:
-          if dd.type == self.TYPE_DEPLOY_DOMAIN and dd.cmd == self.CMD_START:
-            for e in self.__measured_values[dd.id:]:
-              if e.info.startswith(dd.info):
-                processed.append("- %s: %s" % (dd.info,
-                                               e.timestamp - dd.timestamp))
+        start, end = intervals.get(span.type, (span.start, span.end))
+        intervals[span.type] = (min(start, span.start), max(end, span.end))
+    for _type, (start, end) in intervals.iteritems():
+      processed.append("%s: %s" % (self.get_type_name(_type), end - start))
     return processed
 
-  def dump_to_file (self, file_name=None, raw=True, calculated=False):
+  def dump_to_file (self, file_name=None, raw=True, calculated=False,
+                    request_id=None):
     """
     Dump the measured timestamps into a file.
 
@@ -249,20 +706,24 @@ class OrchestrationStatCollector(object):
     :type raw: bool
     :param calculated: dump derived measurements
     :type calculated: bool
+    :param request_id: service request id (default: request of the context)
+    :type request_id: str or int
     :return: None
     """
+    if request_id is None:
+      request_id = self.get_request_id()
     if not file_name:
-      file_name = "%s/%s.stat" % (self.stats_folder, self.__request_id)
+      file_name = "%s/%s.stat" % (self.stats_folder, request_id)
     if os.path.exists(file_name):
       log.warning("Stat file for request already exists: %s! Overwriting..."
                   % file_name)
     with open(file_name, "w") as f:
       if raw:
-        for line in self.raw_stat():
+        for line in self.raw_stat(request_id=request_id):
           f.write(line.dump() + '\n')
       # f.write('=' * 80 + '\n')
       if calculated:
-        for line in self.calculate_stat_values():
+        for line in self.calculate_stat_values(request_id=request_id):
           f.write(line + '\n')
     log.info("Stat for service request is dumped into: %s" % file_name)
 
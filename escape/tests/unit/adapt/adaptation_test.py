@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Janos Czentye
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+
+import Queue
+import os.path
+import sys
+import threading
+import unittest
+sys.path.append(os.path.dirname(__file__) + "/../../..")
+
+from escape.adapt import adaptation, LAYER_NAME
+from escape.adapt.adaptation import GlobalResourceManager, ControllerAdapter, \
+  DomainRequestStatus, InstallationFinishedEvent
+from escape.adapt.managers import UnifyDomainManager
+from escape.util.config import CONFIG
+
+class FakeGraph (object):
+  copies = 0
+
+  def __init__ (self, tag):
+    self.id = self.name = "DoV"
+    self.tag = tag
+    self.infras = []
+
+  def copy (self):
+    FakeGraph.copies += 1
+    graph = FakeGraph(self.tag)
+    graph.id, graph.name = self.id, self.name
+    return graph
+
+  def get_stat (self):
+    return self.tag
+
+class GlobalResourceManagerBackupTest (unittest.TestCase):
+  def setUp (self):
+    self.mgr = GlobalResourceManager()
+    self.mgr.dov.update_full_global_view(FakeGraph("first"))
+    FakeGraph.copies = 0
+
+  def test_no_backup (self):
+    self.assertIsNone(self.mgr.get_backup_state("r1"))
+
+  def test_backup_shares_snapshot (self):
+    self.mgr.backup_dov_state("r1")
+    self.mgr.dov.get_snapshot()
+    self.assertEqual(1, FakeGraph.copies)
+
+  def test_backup_is_private_copy (self):
+    self.mgr.backup_dov_state("r1")
+    self.mgr.dov.update_full_global_view(FakeGraph("second"))
+    backup = self.mgr.get_backup_state("r1")
+    self.assertEqual("first", backup.tag)
+    self.assertEqual("DoV-backup", backup.id)
+    backup.tag = "modified"
+    self.assertEqual("first", self.mgr.get_backup_state("r1").tag)
+
+  def test_backup_per_request (self):
+    self.mgr.backup_dov_state("r1")
+    self.mgr.dov.update_full_global_view(FakeGraph("second"))
+    self.mgr.backup_dov_state("r2")
+    self.assertEqual("first", self.mgr.get_backup_state("r1").tag)
+    self.assertEqual("second", self.mgr.get_backup_state("r2").tag)
+    self.mgr.release_request("r1")
+    self.assertIsNone(self.mgr.get_backup_state("r1"))
+    self.assertEqual("second", self.mgr.get_backup_state("r2").tag)
+
+class FakeToolBox (object):
+  @staticmethod
+  def extract_domain (domain, nffg):
+    return (domain, nffg.tag)
+
+class GlobalResourceManagerReservationTest (unittest.TestCase):
+  def setUp (self):
+    self.mgr = GlobalResourceManager()
+    self.mgr.dov.update_full_global_view(FakeGraph("first"))
+    self.merged = []
+    self.mgr.dov.remerge_domain_in_dov = \
+      lambda domain, nffg: self.merged.append(nffg)
+    self.toolbox = adaptation.NFFGToolBox
+    adaptation.NFFGToolBox = FakeToolBox
+
+  def tearDown (self):
+    adaptation.NFFGToolBox = self.toolbox
+
+  def test_reserved_domain_refused (self):
+    revision = self.mgr.dov.revision
+    self.assertTrue(self.mgr.reserve_domains("r1", ["A", "B"], revision))
+    self.assertFalse(self.mgr.reserve_domains("r2", ["B", "C"], revision))
+    self.assertTrue(self.mgr.reserve_domains("r2", ["C"], revision))
+    self.assertEqual(["C"], self.mgr.get_reserved_domains("r2"))
+
+  def test_outdated_revision_refused (self):
+    revision = self.mgr.dov.revision
+    self.mgr.reserve_domains("r1", ["A"], revision)
+    self.mgr.dov.update_full_global_view(FakeGraph("second"))
+    self.mgr.release_request("r1")
+    self.assertFalse(self.mgr.reserve_domains("r2", ["A"], revision))
+    self.assertTrue(self.mgr.reserve_domains("r2", ["B"], revision))
+    self.assertTrue(self.mgr.reserve_domains("r3", ["A"],
+                                             self.mgr.dov.revision))
+
+  def test_commit_merges_reserved_domains (self):
+    self.mgr.reserve_domains("r1", ["A"], self.mgr.dov.revision)
+    self.mgr.commit_global_view("r1", FakeGraph("mapped"))
+    self.assertEqual([("A", "mapped")], self.merged)
+    self.assertEqual("first", self.mgr.dov.get_snapshot().nffg.tag)
+
+class FakePart (object):
+  def __init__ (self, id):
+    self.id = self.name = id
+
+  def dump (self):
+    return self.id
+
+class FakeDomainManager (UnifyDomainManager):
+  def __init__ (self, domain_name, blocking=False):
+    self.domain_name = domain_name
+    self.deploy_lock = threading.RLock()
+    self.callback_manager = None
+    self._poll = False
+    self.released = threading.Event()
+    if not blocking:
+      self.released.set()
+    self.rollbacks = []
+
+  def init (self, configurator, **kwargs):
+    pass
+
+  def install_nffg (self, nffg_part):
+    self.released.wait()
+    return True
+
+  def rollback_install (self, request_id):
+    self.rollbacks.append(request_id)
+    return True
+
+class FakeLayerAPI (object):
+  def __init__ (self):
+    self.results = []
+
+  def _process_mapping_result (self, nffg_id, fail):
+    self.results.append((nffg_id, fail))
+
+  def raiseEventNoErrors (self, event, **kwargs):
+    pass
+
+class TestControllerAdapter (ControllerAdapter):
+  def init_managers (self, with_infr=False):
+    pass
+
+class ParallelDeployTest (unittest.TestCase):
+  def setUp (self):
+    self.config = CONFIG._ESCAPEConfig__config
+    CONFIG._ESCAPEConfig__config = {
+      LAYER_NAME: {'deployment': {'ROLLBACK-ON-FAILURE': True,
+                                  'DEPLOY-TIMEOUT': 5}}}
+    # Drive the co-op tasks and timers of the adapter explicitly
+    self.tasks = Queue.Queue()
+    self.timers = []
+    self.call_as_coop_task = adaptation.call_as_coop_task
+    self.timer = adaptation.Timer
+    adaptation.call_as_coop_task = lambda func, **kw: self.tasks.put((func, kw))
+    adaptation.Timer = lambda timeout, func, kw: self.timers.append((func, kw))
+    self.layer_API = FakeLayerAPI()
+    self.adapter = TestControllerAdapter(layer_API=self.layer_API)
+    self.adapter.DoVManager.dov.update_full_global_view(FakeGraph("previous"))
+    self.adapter.DoVManager.backup_dov_state("request")
+    self.restored = []
+    self.adapter.DoVManager.set_global_view = \
+      lambda nffg: self.restored.append(nffg)
+    self.slow = FakeDomainManager("slow", blocking=True)
+    self.fast = FakeDomainManager("fast")
+    self.adapter.domains.register_mgr("slow", self.slow)
+    self.adapter.domains.register_mgr("fast", self.fast)
+    self.status = DomainRequestStatus(id="request", domains=("slow", "fast"))
+
+  def tearDown (self):
+    self.slow.released.set()
+    self.adapter.shutdown()
+    adaptation.call_as_coop_task = self.call_as_coop_task
+    adaptation.Timer = self.timer
+    CONFIG._ESCAPEConfig__config = self.config
+
+  def deploy (self):
+    self.adapter._ControllerAdapter__deploy_domains_in_parallel(
+      slices=[("slow", FakePart("slow")), ("fast", FakePart("fast"))],
+      mapped_nffg=FakePart("request"), deploy_status=self.status)
+
+  def run_next_task (self):
+    func, kw = self.tasks.get(timeout=5)
+    func(**kw)
+
+  def test_deploy_does_not_wait (self):
+    self.deploy()
+    self.assertTrue(self.status.still_pending)
+    self.assertEqual(self.status.WAITING,
+                     self.status.get_domain_status("slow"))
+    self.assertEqual(1, len(self.timers))
+    self.run_next_task()
+    self.assertEqual(self.status.OK, self.status.get_domain_status("fast"))
+    self.assertTrue(self.status.still_pending)
+    self.slow.released.set()
+    self.run_next_task()
+    self.assertTrue(self.status.success)
+    self.assertEqual([("request", False)], self.layer_API.results)
+
+  def test_timeout_defers_rollback (self):
+    self.deploy()
+    self.run_next_task()
+    func, kw = self.timers[0]
+    func(**kw)
+    self.assertEqual(self.status.FAILED, self.status.get_domain_status("slow"))
+    self.assertEqual(self.status.RESET, self.status.get_domain_status("fast"))
+    self.assertEqual(["request"], self.fast.rollbacks)
+    self.assertEqual([], self.slow.rollbacks)
+    self.assertEqual([("request", True)], self.layer_API.results)
+    self.assertEqual([], self.restored)
+    # The late result is dropped and the deferred rollback restores the DoV
+    self.slow.released.set()
+    self.run_next_task()
+    self.assertEqual(["request"], self.slow.rollbacks)
+    self.assertTrue(self.status.reset)
+    self.assertEqual(["previous"], [nffg.tag for nffg in self.restored])
+    self.assertEqual([("request", True)], self.layer_API.results)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Janos Czentye
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+
+import unittest
+import threading
+import sys
+import os.path
+sys.path.append(os.path.dirname(__file__) + "/../../..")
+
+from escape.adapt.callback import Callback, TimerWheel
+
+def call (func, *args, **kwargs):
+  return func(*args, **kwargs)
+
+class TimerWheelTest (unittest.TestCase):
+  def setUp (self):
+    self.wheel = TimerWheel(tick=0.01, size=4, dispatch=call)
+    self.fired = []
+    self.event = threading.Event()
+
+  def fire (self, name, last=False):
+    self.fired.append(name)
+    if last:
+      self.event.set()
+
+  def test_slots_and_rounds (self):
+    timers = [self.wheel.schedule(interval, self.fire, args=[interval])
+              for interval in (0.01, 0.04, 0.05, 0.09)]
+    self.assertEqual([(1, 0), (0, 0), (1, 1), (1, 2)],
+                     [(t.slot, t.rounds) for t in timers])
+    for t in timers:
+      t.cancel()
+
+  def test_order (self):
+    self.wheel.schedule(0.09, self.fire, args=[3], kwargs={'last': True})
+    self.wheel.schedule(0.02, self.fire, args=[1])
+    self.wheel.schedule(0.05, self.fire, args=[2])
+    self.assertTrue(self.event.wait(2))
+    self.assertEqual([1, 2, 3], self.fired)
+
+  def test_cancel (self):
+    t = self.wheel.schedule(0.02, self.fire, args=["cancelled"])
+    self.wheel.schedule(0.05, self.fire, args=["expired"],
+                        kwargs={'last': True})
+    t.cancel()
+    self.assertTrue(t.cancelled)
+    self.assertTrue(self.event.wait(2))
+    self.assertEqual(["expired"], self.fired)
+
+  def test_cancel_after_dispatch (self):
+    # The timer is cancelled after it has been handed to the dispatcher
+    dispatched = []
+    wheel = TimerWheel(tick=0.01, size=4, dispatch=dispatched.append)
+    t = wheel.schedule(0.01, self.fire, args=["late"])
+    while not dispatched:
+      self.event.wait(0.01)
+    t.cancel()
+    dispatched[0]()
+    self.assertEqual([], self.fired)
+
+  def test_dispatch (self):
+    dispatched = []
+    def dispatch (func):
+      dispatched.append(func)
+      func()
+    wheel = TimerWheel(tick=0.01, size=4, dispatch=dispatch)
+    wheel.schedule(0.01, self.fire, args=[1], kwargs={'last': True})
+    self.assertTrue(self.event.wait(2))
+    self.assertEqual(1, len(dispatched))
+
+class CallbackTest (unittest.TestCase):
+  def test_complete (self):
+    cb = Callback(hook=None, callback_id=1, domain="D", type="INSTALL")
+    other = Callback(hook=None, callback_id=2, domain="D", type="INSTALL")
+    self.assertFalse(cb.done)
+    self.assertFalse(cb.wait(timeout=0.01))
+    threading.Timer(0.01, cb.complete).start()
+    self.assertTrue(cb.wait(timeout=2))
+    self.assertTrue(cb.done)
+    # Every callback has its own event
+    self.assertFalse(other.done)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Janos Czentye
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+
+import os.path
+import sys
+import unittest
+from collections import defaultdict
+sys.path.append(os.path.dirname(__file__) + "/../../..")
+
+from escape.adapt.virtualization import AbstractSBBVirtualizer, \
+  DoVChangedEvent, DomainState, DomainVirtualizer, GlobalViewVirtualizer
+from pox.lib.revent.revent import EventMixin
+
+class FakeFlowrule (object):
+  def __init__ (self, id):
+    self.id = id
+    self.status = None
+
+class FakePort (object):
+  def __init__ (self, node, id):
+    self.node = node
+    self.id = id
+    self.flowrules = []
+
+class FakePorts (object):
+  def __init__ (self):
+    self.ports = {}
+
+  def __contains__ (self, id):
+    return id in self.ports
+
+  def __getitem__ (self, id):
+    return self.ports[id]
+
+  def __iter__ (self):
+    return iter(self.ports.values())
+
+class FakeNode (object):
+  def __init__ (self, id, status=None, ports=()):
+    self.id = id
+    self.status = status
+    self.ports = FakePorts()
+    for port in ports:
+      self.add_port(id=port)
+
+  def add_port (self, id):
+    port = self.ports.ports[id] = FakePort(self, id)
+    return port
+
+  def del_port (self, id):
+    del self.ports.ports[id]
+
+  def copy (self):
+    return FakeNode(self.id, self.status, [p.id for p in self.ports])
+
+class FakeLink (object):
+  def __init__ (self, id, src, dst):
+    self.id = id
+    self.src = src
+    self.dst = dst
+
+class FakeSBB (object):
+  def __init__ (self):
+    self.nodes = {}
+    self.network = defaultdict(lambda: defaultdict(dict))
+    self.sbb = self.nodes["sbb"] = FakeNode("sbb")
+
+  def __contains__ (self, id):
+    return id in self.nodes
+
+  def __getitem__ (self, id):
+    return self.nodes[id]
+
+  @property
+  def infras (self):
+    return iter([self.sbb])
+
+  def add_nf (self, nf):
+    self.nodes[nf.id] = nf
+    return nf
+
+  def del_node (self, id):
+    del self.nodes[id]
+    self.network.pop(id, None)
+    for neighbors in self.network.itervalues():
+      neighbors.pop(id, None)
+
+  def add_undirected_link (self, port1, port2, p1p2id, p2p1id, dynamic,
+                           delay, bandwidth):
+    self.network[port1.node.id][port2.node.id][p1p2id] = FakeLink(
+      p1p2id, port1, port2)
+    self.network[port2.node.id][port1.node.id][p2p1id] = FakeLink(
+      p2p1id, port2, port1)
+
+  def connect (self, nf, nf_port, sbb_port):
+    self.add_nf(nf)
+    self.add_undirected_link(port1=nf.ports[nf_port],
+                             port2=self.sbb.add_port(id=sbb_port),
+                             p1p2id="%s-link" % nf.id,
+                             p2p1id="%s-link-back" % nf.id,
+                             dynamic=True, delay=None, bandwidth=None)
+
+class FakeDoV (EventMixin):
+  _eventMixin_events = {DoVChangedEvent}
+
+  def __init__ (self, states, nfs=None):
+    self.revision = 1
+    self.states = states
+    self.nfs = nfs if nfs else {}
+
+  def get_domain_states (self, domains=None):
+    if domains is None:
+      domains = self.states.keys()
+    return self.revision, {d: self.states[d] for d in domains
+                           if d in self.states}
+
+  def copy_nfs (self, nf_ids):
+    return {i: self.nfs[i].copy() for i in nf_ids if i in self.nfs}
+
+  def change (self, states, cause=DoVChangedEvent.TYPE.CHANGE, domain="A"):
+    self.revision += 1
+    self.states = states
+    self.raiseEvent(DoVChangedEvent, cause=cause, revision=self.revision,
+                    domain=domain)
+
+class FakeSBBVirtualizer (AbstractSBBVirtualizer):
+  TYPE = "FAKE-SBB"
+
+  def __init__ (self, global_view, sbb):
+    super(FakeSBBVirtualizer, self).__init__(id="test",
+                                             global_view=global_view,
+                                             type=self.TYPE)
+    self.sbb = sbb
+    self.generated = 0
+
+  def _acquire_resource (self):
+    self.generated += 1
+    self._save_domain_states(revision=self.global_view.revision)
+    return self.sbb
+
+def state (digest="infra", nfs=None, nf_status=None, fr_status=None):
+  nfs = nfs if nfs is not None else {"nf1": ("nf1-v1", [("nf1",)])}
+  nf_status = nf_status if nf_status is not None else {"nf1": "INITIALIZED"}
+  status = dict(nf_status)
+  if fr_status is not None:
+    status[("bb1", "fr1")] = fr_status
+  return DomainState(digest=digest, nfs=nfs, status=status)
+
+class SBBVirtualizerUpdateTest (unittest.TestCase):
+  def setUp (self):
+    self.sbb = FakeSBB()
+    self.sbb.connect(FakeNode("nf1", "INITIALIZED", ports=(1,)), 1, "port1")
+    self.fr = FakeFlowrule("fr1")
+    self.sbb.sbb.ports["port1"].flowrules.append(self.fr)
+    self.domain_b = state(digest="infra-b", nfs={}, nf_status={})
+    self.dov = FakeDoV(states={"A": state(fr_status="INITIALIZED"),
+                               "B": self.domain_b})
+    self.virtualizer = FakeSBBVirtualizer(global_view=self.dov,
+                                          sbb=self.sbb)
+    self.virtualizer.get_resource_info()
+
+  def test_status_patch (self):
+    self.dov.change(states={"A": state(nf_status={"nf1": "DEPLOYED"},
+                                       fr_status="DEPLOYED"),
+                            "B": self.domain_b})
+    self.assertIs(self.sbb, self.virtualizer.get_resource_info())
+    self.assertEqual(1, self.virtualizer.generated)
+    self.assertEqual("DEPLOYED", self.sbb["nf1"].status)
+    self.assertEqual("DEPLOYED", self.fr.status)
+
+  def test_structural_fallback (self):
+    self.dov.change(states={"A": state(digest="changed",
+                                       fr_status="INITIALIZED"),
+                            "B": self.domain_b})
+    self.virtualizer.get_resource_info()
+    self.assertEqual(2, self.virtualizer.generated)
+
+  def test_removed_domain_fallback (self):
+    self.dov.change(states={"A": self.dov.states["A"]}, domain="B")
+    self.virtualizer.get_resource_info()
+    self.assertEqual(2, self.virtualizer.generated)
+
+  def test_extend_fallback (self):
+    self.dov.change(states=self.dov.states, cause=DoVChangedEvent.TYPE.EXTEND,
+                    domain=None)
+    self.virtualizer.get_resource_info()
+    self.assertEqual(2, self.virtualizer.generated)
+
+  def test_nf_added_and_removed (self):
+    self.sbb.sbb.ports["port1"].flowrules.remove(self.fr)
+    self.dov.nfs["nf2"] = FakeNode("nf2", "DEPLOYED", ports=(1,))
+    nfs = {"nf2": ("nf2-v1", [("nf2",),
+                              ("nf2-link", 1, "bb1", "port2", None, None)])}
+    self.dov.change(states={"A": state(nfs=nfs,
+                                       nf_status={"nf2": "DEPLOYED"}),
+                            "B": self.domain_b})
+    self.assertIs(self.sbb, self.virtualizer.get_resource_info())
+    self.assertEqual(1, self.virtualizer.generated)
+    self.assertNotIn("nf1", self.sbb)
+    self.assertNotIn("port1", self.sbb.sbb.ports)
+    self.assertEqual("DEPLOYED", self.sbb["nf2"].status)
+    self.assertIn("port2", self.sbb.sbb.ports)
+    link = self.sbb.network["nf2"]["sbb"]["nf2-link"]
+    self.assertEqual((1, "port2"), (link.src.id, link.dst.id))
+    self.assertIn("nf2-link-back", self.sbb.network["sbb"]["nf2"])
+
+  def test_nf_port_conflict_fallback (self):
+    self.dov.nfs["nf2"] = FakeNode("nf2", "DEPLOYED", ports=(1,))
+    nfs = {"nf1": ("nf1-v1", [("nf1",)]),
+           "nf2": ("nf2-v1", [("nf2",),
+                              ("nf2-link", 1, "bb1", "port1", None, None)])}
+    self.dov.change(states={"A": state(nfs=nfs, fr_status="INITIALIZED",
+                                       nf_status={"nf1": "INITIALIZED",
+                                                  "nf2": "DEPLOYED"}),
+                            "B": self.domain_b})
+    self.virtualizer.get_resource_info()
+    self.assertEqual(2, self.virtualizer.generated)
+
+class FakeGraph (object):
+  copies = 0
+
+  def __init__ (self, tag):
+    self.id = self.name = None
+    self.tag = tag
+    self.infras = []
+
+  def copy (self):
+    FakeGraph.copies += 1
+    graph = FakeGraph(self.tag)
+    graph.id, graph.name = self.id, self.name
+    return graph
+
+  def get_stat (self):
+    return self.tag
+
+class FakeManager (object):
+  pass
+
+class DoVSnapshotTest (unittest.TestCase):
+  def setUp (self):
+    self.mgr = FakeManager()
+    self.dov = DomainVirtualizer(self.mgr)
+    self.dov.update_full_global_view(FakeGraph("first"))
+    FakeGraph.copies = 0
+
+  def test_shared_per_revision (self):
+    snapshot = self.dov.get_snapshot()
+    self.assertIs(snapshot, self.dov.get_snapshot())
+    self.assertEqual(self.dov.revision, snapshot.revision)
+    self.assertEqual(1, FakeGraph.copies)
+
+  def test_new_revision (self):
+    snapshot = self.dov.get_snapshot()
+    revision = self.dov.revision
+    self.dov.update_full_global_view(FakeGraph("second"))
+    self.assertEqual(revision + 1, self.dov.revision)
+    new_snapshot = self.dov.get_snapshot()
+    self.assertIsNot(snapshot, new_snapshot)
+    self.assertEqual(revision, snapshot.revision)
+    self.assertEqual("first", snapshot.nffg.tag)
+    self.assertEqual("second", new_snapshot.nffg.tag)
+
+  def test_private_copies (self):
+    snapshot = self.dov.get_snapshot()
+    self.assertIsNot(snapshot.nffg, snapshot.copy())
+    self.assertIsNot(snapshot.nffg, self.dov.get_resource_info())
+
+  def test_global_view_virtualizer (self):
+    view = GlobalViewVirtualizer(global_view=self.dov, id="test")
+    self.assertIs(self.dov.get_snapshot().nffg, view.get_resource_info())
+    self.assertEqual(1, FakeGraph.copies)
+
+if __name__ == '__main__':
+  unittest.main()
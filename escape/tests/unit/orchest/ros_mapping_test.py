@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Janos Czentye
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+
+import json
+import os.path
+import sys
+import unittest
+sys.path.append(os.path.dirname(__file__) + "/../../..")
+
+from escape.orchest.ros_mapping import ESCAPEMappingStrategy, \
+  MappingResultCache
+
+class FakeNFFG (object):
+  def __init__ (self, id, content):
+    self.id = id
+    self.name = "name-%s" % id
+    self.content = content
+    self.mode = None
+    self.metadata = {}
+    self.saps = []
+    self.infras = []
+
+  def dump (self):
+    return json.dumps({"parameters": {"id": self.id, "name": self.name},
+                       "content": self.content}, sort_keys=True)
+
+  def copy (self):
+    nffg = FakeNFFG(self.id, self.content)
+    nffg.name = self.name
+    return nffg
+
+class FakeStrategy (ESCAPEMappingStrategy):
+  LAYER_NAME = "TEST"
+  _result_caches = {}
+  calls = 0
+
+  @classmethod
+  def call_mapping_algorithm (cls, request, topology, profiling=False,
+                              stats_type=None, stat_level=None, **params):
+    cls.calls += 1
+    return FakeNFFG("mapped", request.content)
+
+  @classmethod
+  def _resolve_external_ports (cls, graph, resource):
+    pass
+
+class MappingResultCacheTest (unittest.TestCase):
+  def test_key (self):
+    graph = FakeNFFG("req1", "sg")
+    key = MappingResultCache.get_key(graph=graph, revision=("view", 1, 1),
+                                     params={'mode': None, 'persistent': 1})
+    self.assertEqual("req1", graph.id)
+    self.assertEqual("name-req1", graph.name)
+    # Id, name and volatile params are ignored
+    self.assertEqual(key, MappingResultCache.get_key(
+      graph=FakeNFFG("req2", "sg"), revision=("view", 1, 1),
+      params={'mode': None}))
+    self.assertNotEqual(key, MappingResultCache.get_key(
+      graph=FakeNFFG("req1", "other"), revision=("view", 1, 1),
+      params={'mode': None}))
+    self.assertNotEqual(key, MappingResultCache.get_key(
+      graph=graph, revision=("view", 1, 2), params={'mode': None}))
+
+  def test_hit_and_miss (self):
+    cache = MappingResultCache(size=2)
+    key = ("fp", ("view", 1, 1), "[]")
+    self.assertIsNone(cache.get(key))
+    self.assertFalse(cache.has_revision(("view", 1, 1)))
+    result = FakeNFFG("mapped", "sg")
+    cache.put(key, result)
+    self.assertTrue(cache.has_revision(("view", 1, 1)))
+    self.assertFalse(cache.has_revision(("view", 1, 2)))
+    cached = cache.get(key)
+    self.assertEqual("sg", cached.content)
+    self.assertIsNot(result, cached)
+    self.assertIsNone(cache.get(("fp", ("view", 1, 2), "[]")))
+
+  def test_eviction (self):
+    cache = MappingResultCache(size=2)
+    cache.put(1, FakeNFFG("mapped", 1))
+    cache.put(2, FakeNFFG("mapped", 2))
+    # Touch 1, so 2 becomes the least recently used one
+    cache.get(1)
+    cache.put(3, FakeNFFG("mapped", 3))
+    self.assertEqual(2, len(cache))
+    self.assertIsNone(cache.get(2))
+    self.assertIsNotNone(cache.get(1))
+    self.assertIsNotNone(cache.get(3))
+
+class MappingStrategyCacheTest (unittest.TestCase):
+  def setUp (self):
+    FakeStrategy.calls = 0
+    FakeStrategy._result_caches = {"TEST": MappingResultCache(size=4)}
+
+  def test_reuse_on_same_revision (self):
+    revision = ("view", 1, 1)
+    FakeStrategy.map(graph=FakeNFFG("req1", "sg"), resource=FakeNFFG("r", 0),
+                     revision=revision)
+    result = FakeStrategy.map(graph=FakeNFFG("req2", "sg"),
+                              resource=FakeNFFG("r", 0), revision=revision)
+    self.assertEqual(1, FakeStrategy.calls)
+    self.assertEqual("req2", result.id)
+    FakeStrategy.map(graph=FakeNFFG("req3", "sg"), resource=FakeNFFG("r", 0),
+                     revision=("view", 1, 2))
+    self.assertEqual(2, FakeStrategy.calls)
+
+  def test_bypass (self):
+    revision = ("view", 1, 1)
+    for i in range(2):
+      FakeStrategy.map(graph=FakeNFFG("req", "sg"), resource=FakeNFFG("r", 0),
+                       persistent=object(), revision=revision)
+    self.assertEqual(2, FakeStrategy.calls)
+    for i in range(2):
+      FakeStrategy.map(graph=FakeNFFG("req", "sg"), resource=FakeNFFG("r", 0),
+                       pre_state=object(), revision=revision)
+    self.assertEqual(4, FakeStrategy.calls)
+    for i in range(2):
+      FakeStrategy.map(graph=FakeNFFG("req", "sg"), resource=FakeNFFG("r", 0))
+    self.assertEqual(6, FakeStrategy.calls)
+    self.assertEqual(0, len(FakeStrategy.get_result_cache()))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Janos Czentye
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+
+import itertools
+import os.path
+import sys
+import unittest
+sys.path.append(os.path.dirname(__file__) + "/../../..")
+
+from escape.util import api
+from escape.util.api import RequestScheduler
+from escape.util.config import CONFIG
+
+SCHEDULER_ID = itertools.count()
+
+def hook (id, data, **kwargs):
+  pass
+
+class FakeStats (object):
+  def __getattr__ (self, name):
+    return lambda *args, **kwargs: None
+
+class TestScheduler (RequestScheduler):
+  def start (self):
+    pass
+
+class ConcurrentSchedulingTest (unittest.TestCase):
+  def setUp (self):
+    self.config = CONFIG._ESCAPEConfig__config
+    CONFIG._ESCAPEConfig__config = {
+      'REST-API': {'scheduler': {'mode': 'CONCURRENT', 'retry': 1}}}
+    # Do not dump measurements of the fake requests
+    self.stats = api.stats
+    api.stats = FakeStats()
+    self.scheduler = TestScheduler(
+      _core_name="TestScheduler%s" % next(SCHEDULER_ID))
+    # Request data is the footprint itself
+    self.scheduler._get_footprint = lambda data: data
+    self.revision = 1
+
+  def tearDown (self):
+    api.stats = self.stats
+    CONFIG._ESCAPEConfig__config = self.config
+
+  def schedule (self, id, *footprint):
+    self.scheduler.schedule_request(id=id, layer="test", hook=hook,
+                                    data=frozenset(footprint))
+
+  def admit (self):
+    request = self.scheduler._RequestScheduler__admit_request()
+    return request.id if request is not None else None
+
+  def test_without_revision_source_exclusive (self):
+    self.schedule("r1", "nf1")
+    self.schedule("r2", "nf2")
+    self.assertEqual("r1", self.admit())
+    self.assertIsNone(self.admit())
+
+  def test_disjoint_requests_admitted (self):
+    self.scheduler.register_revision_source(lambda: self.revision)
+    self.schedule("r1", "nf1", "bb1")
+    self.schedule("r2", "nf2", "bb2")
+    self.assertEqual("r1", self.admit())
+    self.revision = 2
+    self.assertEqual("r2", self.admit())
+    self.assertEqual(1, self.scheduler.get_admission_revision("r1"))
+    self.assertEqual(2, self.scheduler.get_admission_revision("r2"))
+
+  def test_overlapping_request_waits (self):
+    self.scheduler.register_revision_source(lambda: self.revision)
+    self.schedule("r1", "nf1", "bb1")
+    self.schedule("r2", "nf2", "bb1")
+    self.schedule("r3", "nf3", "bb3")
+    self.assertEqual("r1", self.admit())
+    self.assertEqual("r3", self.admit())
+    self.assertIsNone(self.admit())
+    self.scheduler.set_orchestration_finished("r1")
+    self.assertEqual("r2", self.admit())
+
+  def test_failure_is_not_rescheduled (self):
+    self.scheduler.register_revision_source(lambda: self.revision)
+    self.schedule("r1", "nf1")
+    self.admit()
+    self.assertFalse(self.scheduler.reschedule_failed_request("r1"))
+
+  def test_conflict_rescheduled_exclusively (self):
+    self.scheduler.register_revision_source(lambda: self.revision)
+    self.schedule("r1", "nf1")
+    self.schedule("r2", "nf2")
+    self.admit()
+    self.admit()
+    self.scheduler.set_request_conflict("r1")
+    self.assertTrue(self.scheduler.reschedule_failed_request("r1"))
+    self.assertIsNone(self.scheduler.get_admission_revision("r1"))
+    # The retry waits for the other requests to finish
+    self.assertIsNone(self.admit())
+    self.scheduler.set_orchestration_finished("r2")
+    self.revision = 3
+    self.assertEqual("r1", self.admit())
+    self.assertEqual(3, self.scheduler.get_admission_revision("r1"))
+    # Retry limit is reached
+    self.scheduler.set_request_conflict("r1")
+    self.assertFalse(self.scheduler.reschedule_failed_request("r1"))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Janos Czentye
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+
+import unittest
+import struct
+import sys
+import os.path
+sys.path.append(os.path.dirname(__file__) + "/../../..")
+
+import pox.openflow.libopenflow_01 as of
+from escape.util.domain import AbstractOFControllerAdapter
+
+class FakeConnection (object):
+  def __init__ (self, dpid):
+    self.dpid = dpid
+    self.sent = []
+  def send (self, data):
+    self.sent.append(data)
+  def whenUnblocked (self, func, *args, **kw):
+    func(*args, **kw)
+  def messages (self):
+    """ unpack the sent OpenFlow messages """
+    msgs = []
+    for data in self.sent:
+      while data:
+        length = struct.unpack("!H", data[2:4])[0]
+        if ord(data[1]) == of.OFPT_FLOW_MOD:
+          msg = of.ofp_flow_mod()
+          msg.unpack(data[:length])
+        else:
+          msg = of.ofp_barrier_request(xid=struct.unpack("!L", data[4:8])[0])
+        msgs.append(msg)
+        data = data[length:]
+    self.sent = []
+    return msgs
+
+class FakeNexus (object):
+  def __init__ (self):
+    self.connections = {}
+  def getConnection (self, dpid):
+    return self.connections.get(dpid)
+
+def rule (in_port, out, vlan=None):
+  match = {'in_port': in_port}
+  action = {'out': out}
+  if vlan is not None:
+    action['vlan_push'] = vlan
+  return match, action
+
+class SyncFlowrulesTest (unittest.TestCase):
+  def setUp (self):
+    self.adapter = AbstractOFControllerAdapter.__new__(
+      AbstractOFControllerAdapter)
+    self.adapter.infra_to_dpid = {'SW1': 1}
+    self.adapter.saps = {}
+    self.adapter.openflow = FakeNexus()
+    self.adapter._flow_tables = {}
+    self.adapter._pending_barriers = {}
+    self.adapter._flow_xids = {}
+    self.conn = self.connect()
+
+  def connect (self):
+    conn = self.adapter.openflow.connections[1] = FakeConnection(dpid=1)
+    return conn
+
+  def sync (self, *flowrules, **kw):
+    self.assertTrue(self.adapter.sync_flowrules('SW1', flowrules=flowrules,
+                                                **kw))
+    return self.conn.messages()
+
+  def commands (self, msgs):
+    return [(m.command, m.match.in_port) for m in msgs]
+
+  def test_full_rewrite (self):
+    msgs = self.sync(rule(1, 2), rule(2, 1))
+    self.assertEqual([(of.OFPFC_DELETE, None), (of.OFPFC_ADD, 1),
+                      (of.OFPFC_ADD, 2)], self.commands(msgs))
+    # No callback, no barrier
+    self.assertEqual({}, self.adapter._pending_barriers)
+
+  def test_diff (self):
+    self.sync(rule(1, 2), rule(2, 1), rule(3, 1))
+    msgs = self.sync(rule(1, 2), rule(2, 3), rule(4, 1))
+    # Added and modified entries first, then the deleted ones
+    self.assertEqual([(of.OFPFC_MODIFY_STRICT, 2), (of.OFPFC_ADD, 4),
+                      (of.OFPFC_DELETE_STRICT, 3)], self.commands(msgs))
+    self.assertEqual(3, msgs[0].actions[0].port)
+
+  def test_modified_action (self):
+    self.sync(rule(1, 2))
+    msgs = self.sync(rule(1, 2, vlan=10))
+    self.assertEqual([(of.OFPFC_MODIFY_STRICT, 1)], self.commands(msgs))
+    self.assertEqual([], self.sync(rule(1, 2, vlan=10)))
+
+  def test_unchanged (self):
+    self.sync(rule(1, 2), rule(2, 1))
+    self.assertEqual([], self.sync(rule(2, 1), rule(1, 2)))
+
+  def test_reconnect (self):
+    self.sync(rule(1, 2), rule(2, 1))
+    # The shadow table of the previous connection must be discarded
+    self.conn = self.connect()
+    msgs = self.sync(rule(1, 2), rule(2, 1))
+    self.assertEqual([(of.OFPFC_DELETE, None), (of.OFPFC_ADD, 1),
+                      (of.OFPFC_ADD, 2)], self.commands(msgs))
+
+  def test_invalidated (self):
+    self.sync(rule(1, 2))
+    self.adapter.invalidate_flow_table(dpid=1)
+    msgs = self.sync(rule(1, 2))
+    self.assertEqual([(of.OFPFC_DELETE, None), (of.OFPFC_ADD, 1)],
+                     self.commands(msgs))
+
+  def test_barrier (self):
+    confirmed = []
+    self.sync(rule(1, 2))
+    msgs = self.sync(rule(1, 2), callback=lambda dpid, errors:
+                     confirmed.append((dpid, errors)))
+    # Nothing to change, but the barrier confirms the sync
+    self.assertEqual(1, len(msgs))
+    self.assertTrue(isinstance(msgs[0], of.ofp_barrier_request))
+    self.assertTrue(msgs[0].xid in self.adapter._pending_barriers)
+
+if __name__ == '__main__':
+  unittest.main()
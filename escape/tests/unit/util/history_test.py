@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Janos Czentye
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+
+import os.path
+import shutil
+import sys
+import tempfile
+import unittest
+sys.path.append(os.path.dirname(__file__) + "/../../..")
+
+from escape.util.history import RequestHistory
+
+class Item (object):
+  def __init__ (self, value, active=False):
+    self.value = value
+    self.active = active
+
+def dump_item (item):
+  return "%s:%s" % (item.value, int(item.active))
+
+def load_item (data):
+  value, active = data.split(":")
+  return Item(value, bool(int(active)))
+
+class RequestHistoryTest (unittest.TestCase):
+  def setUp (self):
+    self.dir = tempfile.mkdtemp()
+    self.orig_dir = RequestHistory.DIR
+    RequestHistory.DIR = self.dir
+    self.history = RequestHistory(name="test", capacity=2, spill=True,
+                                  dumper=dump_item, loader=load_item,
+                                  indexes=('nffg_id',),
+                                  active=lambda i: i.active)
+
+  def tearDown (self):
+    self.history.close()
+    RequestHistory.DIR = self.orig_dir
+    shutil.rmtree(self.dir)
+
+  def test_spill_and_reload (self):
+    for i in range(4):
+      self.history.put(i, Item("item%s" % i))
+    self.assertEqual(4, len(self.history))
+    self.assertIn(0, self.history)
+    self.assertEqual("item0", self.history[0].value)
+    self.assertEqual("item1", self.history[1].value)
+    self.assertRaises(KeyError, self.history.__getitem__, 4)
+    self.assertIsNone(self.history.get(4))
+
+  def test_restore_same_instance (self):
+    item = Item("item0")
+    self.history.put(0, item)
+    self.history.put(1, Item("item1"))
+    self.history.put(2, Item("item2"))
+    item.value = "updated"
+    self.assertIs(item, self.history[0])
+    self.assertEqual("updated", self.history[0].value)
+
+  def test_lru_order (self):
+    history = RequestHistory(name="test", capacity=2, spill=False)
+    try:
+      history.put(0, 0)
+      history.put(1, 1)
+      # Touch 0, so 1 becomes the least recently used one
+      history.get(0)
+      history.put(2, 2)
+      self.assertNotIn(1, history)
+      self.assertIn(0, history)
+      self.assertIn(2, history)
+    finally:
+      history.close()
+
+  def test_active_not_dropped (self):
+    history = RequestHistory(name="drop", capacity=2, spill=False,
+                             active=lambda i: i.active)
+    try:
+      history.put(0, Item("item0", active=True))
+      history.put(1, Item("item1", active=True))
+      history.put(2, Item("item2", active=True))
+      # Capacity is exceeded rather than dropping active items
+      self.assertEqual(3, len(history))
+      history.put(3, Item("item3"))
+      self.assertEqual(3, len(history))
+      self.assertNotIn(3, history)
+    finally:
+      history.close()
+
+  def test_indexes (self):
+    self.history.put(0, Item("item0"), nffg_id="nffg0")
+    self.history.put(1, Item("item1"), nffg_id="nffg1")
+    self.history.put(2, Item("item2"), nffg_id="nffg2")
+    self.assertEqual("item0", self.history.get_by('nffg_id', "nffg0").value)
+    self.assertEqual("item2", self.history.get_by('nffg_id', "nffg2").value)
+    self.assertIsNone(self.history.get_by('nffg_id', "missing"))
+    history = RequestHistory(name="drop", capacity=1, spill=False,
+                             indexes=('nffg_id',))
+    try:
+      history.put(0, 0, nffg_id="nffg0")
+      history.put(1, 1, nffg_id="nffg1")
+      # Index of dropped items is removed as well
+      self.assertIsNone(history.get_by('nffg_id', "nffg0"))
+      self.assertEqual(1, history.get_by('nffg_id', "nffg1"))
+    finally:
+      history.close()
+
+  def test_own_dir (self):
+    other = RequestHistory(name="test", capacity=1, spill=True)
+    try:
+      for i in range(3):
+        self.history.put(i, Item("item%s" % i))
+        other.put(i, "other%s" % i)
+      self.assertEqual(2, len(os.listdir(self.dir)))
+      self.assertEqual("item0", self.history[0].value)
+      self.assertEqual("other0", other[0])
+    finally:
+      other.close()
+    self.assertEqual(1, len(os.listdir(self.dir)))
+
+  def test_close (self):
+    for i in range(3):
+      self.history.put(i, Item("item%s" % i), nffg_id="nffg%s" % i)
+    self.history.close()
+    self.assertEqual([], os.listdir(self.dir))
+    self.assertNotIn(0, self.history)
+    self.assertIsNone(self.history.get_by('nffg_id', "nffg0"))
+    self.assertEqual(2, len(self.history))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Janos Czentye
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import sys
+import os.path
+sys.path.append(os.path.dirname(__file__) + "/../../..")
+
+from escape.util.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+class CounterTest (unittest.TestCase):
+  def test_inc (self):
+    c = Counter("requests_total", help="Requests.", labels=("layer",))
+    c.inc(layer="service")
+    c.inc(2, layer="service")
+    c.inc(layer="orchestration")
+    self.assertEqual("# HELP requests_total Requests.\n"
+                     "# TYPE requests_total counter\n"
+                     'requests_total{layer="service"} 3\n'
+                     'requests_total{layer="orchestration"} 1', c.expose())
+
+  def test_invalid_labels (self):
+    c = Counter("requests_total", labels=("layer",))
+    self.assertRaises(ValueError, c.inc)
+    self.assertRaises(ValueError, c.inc, layer="service", domain="x")
+
+  def test_escape_labels (self):
+    c = Counter("requests_total", labels=("domain",))
+    c.inc(domain='a"b\\c\nd')
+    self.assertEqual('requests_total{domain="a\\"b\\\\c\\nd"} 1',
+                     c.expose().splitlines()[-1])
+
+  def test_no_labels (self):
+    c = Counter("requests_total")
+    c.inc()
+    self.assertEqual("requests_total 1", c.expose().splitlines()[-1])
+
+class GaugeTest (unittest.TestCase):
+  def test_set_inc_dec (self):
+    g = Gauge("pending")
+    g.set(5)
+    g.inc()
+    g.dec(3)
+    self.assertEqual("pending 3", g.expose().splitlines()[-1])
+
+class HistogramTest (unittest.TestCase):
+  def test_observe (self):
+    h = Histogram("duration_seconds", labels=("domain",), buckets=(1, .1))
+    self.assertEqual((.1, 1), h.buckets)
+    for value in (.05, .1, .5, 2):
+      h.observe(value, domain="d")
+    self.assertEqual(['duration_seconds_bucket{domain="d",le="0.1"} 2',
+                      'duration_seconds_bucket{domain="d",le="1"} 3',
+                      'duration_seconds_bucket{domain="d",le="+Inf"} 4',
+                      'duration_seconds_sum{domain="d"} 2.65',
+                      'duration_seconds_count{domain="d"} 4'],
+                     h.expose().splitlines()[2:])
+
+class MetricsRegistryTest (unittest.TestCase):
+  def setUp (self):
+    self.registry = MetricsRegistry()
+
+  def test_singleton (self):
+    self.assertIs(self.registry, MetricsRegistry())
+
+  def test_register_once (self):
+    c = self.registry.counter("test_register_once_total")
+    self.assertIs(c, self.registry.counter("test_register_once_total"))
+    self.assertRaises(ValueError, self.registry.gauge,
+                      "test_register_once_total")
+
+  def test_expose (self):
+    self.registry.gauge("test_expose_gauge", help="Gauge.").set(1)
+    exposed = self.registry.expose()
+    self.assertTrue(exposed.endswith("\n"))
+    self.assertIn("# HELP test_expose_gauge Gauge.\n"
+                  "# TYPE test_expose_gauge gauge\n"
+                  "test_expose_gauge 1\n", exposed)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -187,6 +187,19 @@ def launch (sg_file=None, config=None, gui=False, agent=False, rosapi=False,
   __init_config(config=config, test=test, quit=quit)
   __print_header()
 
+  from escape.util.config import CONFIG
+  from escape.util.misc import LazyDump
+  LazyDump.configure(max_size=CONFIG.get_log_dump_max_size(),
+                     sample_rate=CONFIG.get_log_dump_sample_rate())
+  if CONFIG.get_trace_export():
+    core_log.debug("Enable trace export...")
+    from escape.util.stat import stats
+    stats.enable_trace_export()
+
+  # Fork the mapping worker processes while only a few threads are running
+  from escape.util.mapping import MappingProcessPool
+  MappingProcessPool.initialize_pools(layers=CONFIG.LAYERS)
+
   if visualization:
     core_log.debug("Enable remote visualization...")
     from escape.util.com_logger import RemoteVisualizer
@@ -12,8 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import errno
 import select
 
+EPOLLONESHOT = getattr(select, "EPOLLONESHOT", 1 << 30)
+
 class EpollSelect(object):
   """ a class that implements select.select() type behavior on top of epoll.
       Necessary, because select() only works on FD_SETSIZE (typically 1024) fd's at a time
@@ -23,6 +26,8 @@ class EpollSelect(object):
     self.epoll = select.epoll()
     self.fd_to_obj = {}
     self.registered = {}
+    # EPOLLONESHOT fd's which have fired since they were (re)registered
+    self.disarmed = set()
     self.lastrl = []
     self.lastrl_set = set()
     self.lastwl = []
@@ -112,5 +117,85 @@ class EpollSelect(object):
 
     return (retrl, retwl, retxl)
 
+  def _fileno(self, obj):
+    """ return the fd of obj, or the fd it was registered with if obj has
+        been closed meanwhile (None if it is not known) """
+    if not hasattr(obj, "fileno"):
+      return obj
+    try:
+      return obj.fileno()
+    except Exception:
+      for fd, o in self.fd_to_obj.iteritems():
+        if o is obj:
+          return fd
+      return None
+
+  def register(self, obj, mask):
+    """ set the epoll mask of obj to 'mask'.
+        Use it together with poll() instead of select() to keep a persistent
+        registration set instead of diffing the fd lists on every call.
+        The kernel is only called if the mask changes, or if the fd was
+        registered with EPOLLONESHOT and has fired since (this re-arms it). """
+    fd = self._fileno(obj)
+    if fd is None:
+      return
+    self.fd_to_obj[fd] = obj
+    if self.registered.get(fd) == mask and fd not in self.disarmed:
+      return
+    try:
+      if fd in self.registered:
+        try:
+          self.epoll.modify(fd, mask)
+        except IOError as e:
+          if e.errno != errno.ENOENT:
+            raise
+          # fd was closed and reused meanwhile -> the kernel dropped it
+          self.epoll.register(fd, mask)
+      else:
+        self.epoll.register(fd, mask)
+    except IOError as e:
+      if e.errno != errno.EBADF:
+        raise
+      # fd has already been closed
+      self.unregister(fd)
+      return
+    self.registered[fd] = mask
+    self.disarmed.discard(fd)
+
+  def unregister(self, obj):
+    """ remove the registration of obj """
+    fd = self._fileno(obj)
+    if fd not in self.registered:
+      return
+    try:
+      self.epoll.unregister(fd)
+    except (IOError, ValueError):
+      # fd has already been closed
+      pass
+    del self.registered[fd]
+    self.disarmed.discard(fd)
+    self.fd_to_obj.pop(fd, None)
+
+  def poll(self, timeout=-1):
+    """ wait for the events of the fd's registered with register() and
+        return them in the same form as select() """
+    events = self.epoll.poll(timeout)
+    retrl = []
+    retwl = []
+    retxl = []
+    for (fd, event) in events:
+      obj = self.fd_to_obj.get(fd)
+      if obj is None:
+        continue
+      if self.registered.get(fd, 0) & EPOLLONESHOT:
+        self.disarmed.add(fd)
+      if event & (select.EPOLLIN|select.EPOLLPRI|select.EPOLLRDNORM|select.EPOLLRDBAND):
+        retrl.append(obj)
+      if event & (select.EPOLLOUT|select.EPOLLWRNORM|select.EPOLLWRBAND):
+        retwl.append(obj)
+      if event & (select.EPOLLERR|select.EPOLLHUP):
+        retxl.append(obj)
+    return (retrl, retwl, retxl)
+
   def close(self):
     self.epoll.close()
@@ -14,6 +14,7 @@
 
 from __future__ import print_function
 from collections import deque
+import heapq
 from Queue import PriorityQueue
 from Queue import Queue
 import time
@@ -26,12 +27,16 @@ import socket
 import pox.lib.util
 import random
 from types import GeneratorType
-from pox.lib.epoll_select import EpollSelect
+from pox.lib.epoll_select import EpollSelect, EPOLLONESHOT
 
 #TODO: Need a way to redirect the prints in here to something else (the log).
 
 CYCLE_MAXIMUM = 2
 
+# epoll masks of the select() lists (epoll always reports errors)
+EPOLL_READ = getattr(select, "EPOLLIN", 1) | getattr(select, "EPOLLPRI", 2)
+EPOLL_WRITE = getattr(select, "EPOLLOUT", 4)
+
 # A ReturnFunction can return this to skip a scheduled slice at the last
 # moment.
 ABORT = object()
@@ -283,8 +288,10 @@ class Scheduler (object):
       try:
         rv = t.execute()
       except StopIteration:
+        self._selectHub.forget(t)
         return True
       except:
+        self._selectHub.forget(t)
         try:
           print("Task", t, "caused exception and was de-scheduled")
           traceback.print_exc()
@@ -300,6 +307,7 @@ class Scheduler (object):
           print("Task", t, "caused exception during a blocking operation and " +
                 "was de-scheduled")
           traceback.print_exc()
+          self._selectHub.forget(t)
       elif rv is False:
         # Just unschedule/sleep
         #print "Unschedule", t, rv
@@ -604,12 +612,30 @@ class SelectHub (object):
 
     self._scheduler = scheduler
     self._pinger = pox.lib.util.makePinger()
+    self._epoll = None
     if use_epoll:
-      self._select_func = EpollSelect().select
+      self._epoll = EpollSelect()
+      self._epoll.register(self._pinger, EPOLL_READ)
     else:
       self._select_func = select.select
 
+    # task -> (task, rlist, wlist, xlist, abs_timeout)
     self._tasks = {}
+    # Heap of (abs_timeout, seq, registration).  Entries are removed lazily:
+    # one is only valid while its registration is still in _tasks.
+    self._timers = []
+    self._timer_seq = 0
+    # Persistent selectable -> task maps, updated when tasks come and go
+    # instead of being rebuilt on every cycle
+    self._rl = {}
+    self._wl = {}
+    self._xl = {}
+    # With epoll, a task which has been woken up keeps its selectables
+    # registered until it yields its next Select (or leaves), so that an
+    # unchanged set costs no epoll_ctl calls.  task -> last registration
+    self._parked = {}
+    # Tasks which have finished (appended by the scheduler thread)
+    self._leaving = deque()
 
     self._thread = None
     if threaded:
@@ -652,6 +678,132 @@ class SelectHub (object):
     while not _scheduler._hasQuit:
       _select(tasks, rets)
 
+  def _add (self, stuff):
+    """
+    Start watching the selectables and the timeout of a registration
+    """
+    task,trl,twl,txl,tto = stuff
+    assert task not in self._tasks
+    # Tasks may pass the same list again after changing it (like OF_01 does
+    # with its sockets), so keep a copy to diff against
+    trl = trl and list(trl)
+    twl = twl and list(twl)
+    txl = txl and list(txl)
+    stuff = (task,trl,twl,txl,tto)
+    self._tasks[task] = stuff
+    if tto is not None:
+      self._timer_seq += 1
+      heapq.heappush(self._timers, (tto, self._timer_seq, stuff))
+    changed = None
+    old = self._parked.pop(task, None)
+    if old is not None:
+      changed = self._drop(task, old, stuff)
+    for l,m in ((trl, self._rl), (twl, self._wl), (txl, self._xl)):
+      if not l: continue
+      for i in l:
+        m[i] = task
+    if self._epoll:
+      for l in (trl, twl, txl):
+        if not l: continue
+        for i in l:
+          self._update_epoll(i)
+      if changed:
+        for i in changed:
+          self._update_epoll(i)
+
+  def _drop (self, task, old, new = None):
+    """
+    Stop mapping the selectables of an old registration which are not part
+    of the new one
+
+    Returns the selectables which were dropped.
+    """
+    dropped = []
+    _,orl,owl,oxl,_ = old
+    if new is None: new = (None, None, None, None, None)
+    for l,nl,m in ((orl, new[1], self._rl), (owl, new[2], self._wl),
+                   (oxl, new[3], self._xl)):
+      if not l: continue
+      nl = set(nl) if nl else ()
+      for i in l:
+        # Someone else may have taken over this selectable meanwhile
+        if i not in nl and m.get(i) is task:
+          del m[i]
+          dropped.append(i)
+    return dropped
+
+  def _update_epoll (self, i):
+    """
+    Set the epoll registration of a selectable to what its waiting tasks
+    are interested in
+
+    The fds are registered one-shot, so events on an fd whose task has been
+    woken up (and has not yielded its next Select yet) are reported once
+    instead of on every cycle.
+    """
+    rt = self._rl.get(i)
+    wt = self._wl.get(i)
+    if rt is None and wt is None and i not in self._xl:
+      self._epoll.unregister(i)
+      return
+    tasks = self._tasks
+    mask = EPOLLONESHOT
+    if rt in tasks: mask |= EPOLL_READ
+    if wt in tasks: mask |= EPOLL_WRITE
+    self._epoll.register(i, mask)
+
+  def _remove (self, task):
+    """
+    Stop waking the given task up on its selectables
+
+    Its timer entry (if any) is left in the heap and skipped when popped.
+    With epoll, its selectables are only parked (see _parked).
+    """
+    stuff = self._tasks.pop(task)
+    if self._epoll and (stuff[1] or stuff[2] or stuff[3]):
+      self._parked[task] = stuff
+    else:
+      self._drop(task, stuff)
+
+  def forget (self, task):
+    """
+    Called by the scheduler when a task has finished
+
+    Drops the selectables the task has left registered.
+    """
+    if self._epoll:
+      self._leaving.append(task)
+
+  def _release_timers (self, now):
+    """
+    Wake up the tasks whose timeout has expired
+
+    Returns the time until the next timeout or None if there's no timer.
+    """
+    timers = self._timers
+    tasks = self._tasks
+    while timers:
+      tto,_,stuff = timers[0]
+      if tasks.get(stuff[0]) is not stuff:
+        # Stale entry (task was woken up by IO)
+        heapq.heappop(timers)
+        continue
+      if tto > now:
+        return tto - now
+      heapq.heappop(timers)
+      self._remove(stuff[0])
+      self._return(stuff[0], ([],[],[]))
+    return None
+
+  def _compact_timers (self):
+    """
+    Drop the stale entries if they make up most of the timer heap
+    """
+    if len(self._timers) > 2 * len(self._tasks) + 64:
+      tasks = self._tasks
+      self._timers = [e for e in self._timers if tasks.get(e[2][0]) is e[2]]
+      heapq.heapify(self._timers)
+
   def _select (self, tasks, rets):
     #print("SelectHub cycle")
 
@@ -659,87 +811,77 @@ class SelectHub (object):
     #      which are unique, obviously.  It might be possible to leverage this
     #      to reduce hashing cost (i.e. by picking a really good hashing
     #      function), though this is complicated by wrappers, etc...
-    rl = {}
-    wl = {}
-    xl = {}
-
-    timeout = None
-    timeoutTask = None
-
-    now = time.time()
-
-    expired = None
-
-    #TODO: Fix this.  It's pretty expensive.  There had been some code which
-    #      priority heaped this, but I don't think a fully working version
-    #      ever quite made it.
-    for t,trl,twl,txl,tto in tasks.itervalues():
-      if tto != None:
-        if tto <= now:
-          # Already expired
-          if expired is None: expired = []
-          expired.append(t)
-          if tto-now > 0.1: print("preexpired",tto,now,tto-now)
-          continue
-        tt = tto - now
-        if tt < timeout or timeout is None:
-          timeout = tt
-          timeoutTask = t
-
-      if trl:
-        for i in trl: rl[i] = t
-      if twl:
-        for i in twl: wl[i] = t
-      if txl:
-        for i in txl: xl[i] = t
-
-    if expired:
-      for t in expired:
-        del tasks[t]
-        self._return(t, ([],[],[]))
-
-    if timeout is None: timeout = CYCLE_MAXIMUM
-    ro, wo, xo = self._select_func( rl.keys() + [self._pinger],
-                                    wl.keys(),
-                                    xl.keys(), timeout )
-
-    if len(ro) == 0 and len(wo) == 0 and len(xo) == 0 and timeoutTask != None:
-      # IO is idle - dispatch timers / release timeouts
-      del tasks[timeoutTask]
-      self._return(timeoutTask, ([],[],[]))
+    assert tasks is self._tasks
+    rl = self._rl
+    wl = self._wl
+    xl = self._xl
+
+    timeout = self._release_timers(time.time())
+    if timeout is None or timeout > CYCLE_MAXIMUM: timeout = CYCLE_MAXIMUM
+
+    if self._epoll:
+      # epoll truncates to whole milliseconds; don't spin until the timer
+      if 0 < timeout < 0.001: timeout = 0.001
+      ro, wo, xo = self._epoll.poll(timeout)
     else:
-      # We have IO events
-      if self._pinger in ro:
-        self._pinger.pongAll()
-        while not self._incoming.empty():
-          stuff = self._incoming.get(True)
-          task = stuff[0]
-          assert task not in tasks
-          tasks[task] = stuff
-          self._incoming.task_done()
-        if len(ro) == 1 and len(wo) == 0 and len(xo) == 0:
-          # Just recycle
-          return
-        ro.remove(self._pinger)
-
-      # At least one thread is going to be resumed
-      for i in ro:
+      ro, wo, xo = self._select_func( rl.keys() + [self._pinger],
+                                      wl.keys(),
+                                      xl.keys(), timeout )
+
+    if self._pinger in ro:
+      self._pinger.pongAll()
+      while not self._incoming.empty():
+        stuff = self._incoming.get(True)
+        self._add(stuff)
+        self._incoming.task_done()
+      ro.remove(self._pinger)
+
+    leaving = self._leaving
+    while leaving:
+      task = leaving.popleft()
+      old = self._parked.pop(task, None)
+      if old is not None:
+        for i in self._drop(task, old):
+          self._update_epoll(i)
+
+    # Resume the tasks with IO events (events of parked tasks are ignored)
+    for i in ro:
+      task = rl.get(i)
+      if task not in tasks: continue
+      if task not in rets: rets[task] = ([],[],[])
+      rets[task][0].append(i)
+    for i in wo:
+      task = wl.get(i)
+      if task not in tasks: continue
+      if task not in rets: rets[task] = ([],[],[])
+      rets[task][1].append(i)
+    for i in xo:
+      task = xl.get(i)
+      if task in tasks:
+        if task not in rets: rets[task] = ([],[],[])
+        rets[task][2].append(i)
+      elif i not in ro and rl.get(i) in tasks:
+        # epoll always reports errors/hangups, so let the reader find out
         task = rl[i]
         if task not in rets: rets[task] = ([],[],[])
         rets[task][0].append(i)
-      for i in wo:
-        task = wl[i]
-        if task not in rets: rets[task] = ([],[],[])
-        rets[task][1].append(i)
-      for i in xo:
-        task = xl[i]
-        if task not in rets: rets[task] = ([],[],[])
-        rets[task][2].append(i)
 
-      for t,v in rets.iteritems():
-        del tasks[t]
-        self._return(t, v)
-      rets.clear()
+    for t,v in rets.iteritems():
+      self._remove(t)
+      self._return(t, v)
+    rets.clear()
+
+    if self._epoll:
+      # Re-arm the fired fds which other tasks are still waiting on
+      for l in (ro, wo, xo):
+        for i in l:
+          if (rl.get(i) in tasks or wl.get(i) in tasks
+              or xl.get(i) in tasks):
+            self._update_epoll(i)
+
+    # Dispatch timers which expired while waiting
+    self._release_timers(time.time())
+    self._compact_timers()
 
   def registerSelect (self, task, rlist = None, wlist = None, xlist = None,
                       timeout = None, timeIsAbsolute = False):
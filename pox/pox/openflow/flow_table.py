@@ -21,6 +21,7 @@ from pox.lib.revent import *
 
 import time
 import math
+import heapq
 
 # FlowTable Entries:
 #   match - ofp_match (13-tuple)
@@ -192,12 +193,98 @@ class FlowTableModification (Event):
     self.reason = reason
 
 
+# Match fields which are compared for equality (nw_src/nw_dst are prefixes)
+_MATCH_FIELDS = ('in_port', 'dl_vlan', 'dl_src', 'dl_dst', 'dl_type',
+                 'nw_proto', 'tp_src', 'tp_dst', 'dl_vlan_pcp', 'nw_tos')
+
+def _prefix (addr):
+  """
+  Returns the (unsigned) value of an nw_src/nw_dst address
+  """
+  return (addr if type(addr) is IPAddr else IPAddr(addr)).toUnsigned()
+
+def _match_signature (match):
+  """
+  Returns the signature of the wildcards of the given match
+
+  This is the tuple of the specified fields and the nw_src/nw_dst prefix
+  lengths (0 if wildcarded).
+  """
+  fields = tuple(f for f in _MATCH_FIELDS if getattr(match, f) is not None)
+  nw_src = match.get_nw_src()
+  nw_dst = match.get_nw_dst()
+  return (fields, nw_src[1] if nw_src[0] is not None else 0,
+          nw_dst[1] if nw_dst[0] is not None else 0)
+
+def _match_key (match, signature):
+  """
+  Returns the values of the specified fields of match (in its own group)
+  """
+  fields,src_bits,dst_bits = signature
+  key = [getattr(match, f) for f in fields]
+  key.append(_prefix(match.get_nw_src()[0]) if src_bits else None)
+  key.append(_prefix(match.get_nw_dst()[0]) if dst_bits else None)
+  return tuple(key)
+
+
+class _MatchGroup (object):
+  """
+  Table entries with the same wildcards (one "tuple" of the tuple space)
+
+  Entries are hashed by the values of their specified fields, so looking up
+  a packet in a group is a single dict lookup.
+  """
+  def __init__ (self, signature, wildcards):
+    self.signature = signature
+    # The wildcard bits of the entries (without the nw_src/nw_dst masks)
+    self.wildcards = wildcards
+    # key -> [entries in table order]
+    self.buckets = {}
+    # effective_priority -> number of entries
+    self.priorities = {}
+    self.max_priority = None
+
+  def __len__ (self):
+    return sum(self.priorities.itervalues())
+
+  def packet_key (self, values, nw_src, nw_dst):
+    """
+    Returns the key which the entries matching a packet would have
+    """
+    fields,src_bits,dst_bits = self.signature
+    key = []
+    for f in fields:
+      v = values[f]
+      if v is None: return None
+      key.append(v)
+    if src_bits:
+      if nw_src[0] is None or nw_src[1] < src_bits: return None
+      key.append(_prefix(nw_src[0]) & ~((1 << (32-src_bits))-1))
+    else:
+      key.append(None)
+    if dst_bits:
+      if nw_dst[0] is None or nw_dst[1] < dst_bits: return None
+      key.append(_prefix(nw_dst[0]) & ~((1 << (32-dst_bits))-1))
+    else:
+      key.append(None)
+    return tuple(key)
+
+
 class FlowTable (EventMixin):
   """
   General model of a flow table.
 
   Maintains an ordered list of flow entries, and finds matching entries for
   packets and other entries. Supports expiration of flows.
+
+  Besides the ordered list, entries are indexed by their wildcards (tuple
+  space search), so finding the entry for a packet takes one hash lookup
+  per distinct wildcard pattern rather than a scan of the table.  Exact
+  matches have the highest effective priority, so their group is checked
+  first.  Timeouts are kept in a heap.
+
+  Note: The index is built when an entry is added, so don't change the
+  match or priority of an entry that is in the table.
   """
   _eventMixin_events = set([FlowTableModification])
 
@@ -207,6 +294,18 @@ class FlowTable (EventMixin):
     # Table is a list of TableEntry sorted by descending effective_priority.
     self._table = []
 
+    # entry -> (group, key, order), where order sorts like _table
+    self._index = {}
+    # signature -> _MatchGroup
+    self._groups = {}
+    # Groups by descending max_priority (None if it has to be rebuilt)
+    self._group_order = None
+    # effective_priority -> set of entries
+    self._by_priority = {}
+    # Heap of (deadline, order, entry) for entries with timeouts
+    self._expiry = []
+    self._seq = 0
+
   def _dirty (self):
     """
     Call when table changes
@@ -220,6 +319,78 @@ class FlowTable (EventMixin):
   def __len__ (self):
     return len(self._table)
 
+  @staticmethod
+  def _deadline (entry):
+    """
+    Returns the time after which the entry may be timed out (or None)
+    """
+    deadline = None
+    if entry.idle_timeout > 0:
+      deadline = entry.last_touched + entry.idle_timeout
+    if entry.hard_timeout > 0:
+      hard = entry.created + entry.hard_timeout
+      if deadline is None or hard < deadline: deadline = hard
+    return deadline
+
+  def _index_entry (self, entry):
+    priority = entry.effective_priority
+    self._seq += 1
+    # Entries added later come first among those of equal priority
+    order = (-priority, -self._seq)
+
+    signature = _match_signature(entry.match)
+    group = self._groups.get(signature)
+    if group is None:
+      wildcards = entry.match.wildcards & ~(OFPFW_NW_SRC_MASK |
+                                            OFPFW_NW_DST_MASK)
+      group = self._groups[signature] = _MatchGroup(signature, wildcards)
+    key = _match_key(entry.match, signature)
+    self._index[entry] = (group, key, order)
+    bucket = group.buckets.setdefault(key, [])
+    bucket.append(entry)
+    if len(bucket) > 1:
+      bucket.sort(key=lambda e: self._index[e][2])
+    group.priorities[priority] = group.priorities.get(priority, 0) + 1
+    if group.max_priority is None or priority > group.max_priority:
+      group.max_priority = priority
+      self._group_order = None
+
+    self._by_priority.setdefault(priority, set()).add(entry)
+
+    deadline = self._deadline(entry)
+    if deadline is not None:
+      heapq.heappush(self._expiry, (deadline, order, entry))
+
+  def _unindex_entry (self, entry):
+    group,key,order = self._index.pop(entry)
+    priority = -order[0]
+    bucket = group.buckets[key]
+    bucket.remove(entry)
+    if not bucket: del group.buckets[key]
+    group.priorities[priority] -= 1
+    if not group.priorities[priority]:
+      del group.priorities[priority]
+      if not group.priorities:
+        del self._groups[group.signature]
+        self._group_order = None
+      elif priority == group.max_priority:
+        group.max_priority = max(group.priorities)
+        self._group_order = None
+    entries = self._by_priority[priority]
+    entries.discard(entry)
+    if not entries: del self._by_priority[priority]
+    # (Its entry in the expiry heap is dropped when it comes up)
+
+  def _sorted_groups (self):
+    if self._group_order is None:
+      self._group_order = sorted(self._groups.itervalues(),
+                                 key=lambda g: g.max_priority, reverse=True)
+    return self._group_order
+
+  def _in_table_order (self, entries):
+    index = self._index
+    return sorted(entries, key=lambda e: index[e][2])
+
   def add_entry (self, entry):
     assert isinstance(entry, TableEntry)
 
@@ -240,6 +411,7 @@ class FlowTable (EventMixin):
           continue
         low = middle + 1
     table.insert(low, entry)
+    self._index_entry(entry)
 
     self._dirty()
 
@@ -248,12 +420,32 @@ class FlowTable (EventMixin):
   def remove_entry (self, entry, reason=None):
     assert isinstance(entry, TableEntry)
     self._table.remove(entry)
+    self._unindex_entry(entry)
     self._dirty()
     self.raiseEvent(FlowTableModification(removed=[entry], reason=reason))
 
   def matching_entries (self, match, priority=0, strict=False, out_port=None):
     entry_match = lambda e: e.is_matched_by(match, priority, strict, out_port)
-    return [ entry for entry in self._table if entry_match(entry) ]
+    if strict:
+      # Strictly matching entries have the same match, so the same key
+      signature = _match_signature(match)
+      group = self._groups.get(signature)
+      if group is None: return []
+      try:
+        bucket = group.buckets.get(_match_key(match, signature), ())
+      except TypeError:
+        # Unhashable field value
+        return [ entry for entry in self._table if entry_match(entry) ]
+      return [ entry for entry in bucket if entry_match(entry) ]
+
+    # Entries with more wildcards than match can't be matched by it
+    wildcards = match.wildcards & ~(OFPFW_NW_SRC_MASK | OFPFW_NW_DST_MASK)
+    found = []
+    for group in self._groups.itervalues():
+      if (group.wildcards | wildcards) != wildcards: continue
+      for bucket in group.buckets.itervalues():
+        found.extend(entry for entry in bucket if entry_match(entry))
+    return self._in_table_order(found)
 
   def flow_stats (self, match, out_port=None, now=None):
     mc_es = self.matching_entries(match=match, strict=False, out_port=out_port)
@@ -279,29 +471,35 @@ class FlowTable (EventMixin):
     if not flows: return
     self._dirty()
     remove_flows = set(flows)
-    i = 0
-    while i < len(self._table):
-      entry = self._table[i]
-      if entry in remove_flows:
-        del self._table[i]
-        remove_flows.remove(entry)
-        if not remove_flows: break
-      else:
-        i += 1
-    assert len(remove_flows) == 0
+    assert all(entry in self._index for entry in remove_flows)
+    self._table = [entry for entry in self._table
+                   if entry not in remove_flows]
+    for entry in remove_flows:
+      self._unindex_entry(entry)
     self.raiseEvent(FlowTableModification(removed=flows, reason=reason))
 
   def remove_expired_entries (self, now=None):
     idle = []
     hard = []
     if now is None: now = time.time()
-    for entry in self._table:
+    expiry = self._expiry
+    while expiry and expiry[0][0] < now:
+      _,order,entry = heapq.heappop(expiry)
+      info = self._index.get(entry)
+      if info is None or info[2] != order:
+        # Removed meanwhile
+        continue
       if entry.is_idle_timed_out(now):
         idle.append(entry)
       elif entry.is_hard_timed_out(now):
         hard.append(entry)
-    self._remove_specific_entries(idle, OFPRR_IDLE_TIMEOUT)
-    self._remove_specific_entries(hard, OFPRR_HARD_TIMEOUT)
+      else:
+        # Touched since it was scheduled
+        heapq.heappush(expiry, (self._deadline(entry), order, entry))
+    self._remove_specific_entries(self._in_table_order(idle),
+                                  OFPRR_IDLE_TIMEOUT)
+    self._remove_specific_entries(self._in_table_order(hard),
+                                  OFPRR_HARD_TIMEOUT)
 
   def remove_matching_entries (self, match, priority=0, strict=False,
                                out_port=None, reason=None):
@@ -318,36 +516,42 @@ class FlowTable (EventMixin):
     """
     packet_match = ofp_match.from_packet(packet, in_port, spec_frags = True)
 
-    for entry in self._table:
-      if entry.match.matches_with_wildcards(packet_match,
-                                            consider_other_wildcards=False):
-        return entry
+    values = dict((f, getattr(packet_match, f)) for f in _MATCH_FIELDS)
+    nw_src = packet_match.get_nw_src()
+    nw_dst = packet_match.get_nw_dst()
+
+    best = None
+    best_order = None
+    for group in self._sorted_groups():
+      if best is not None and group.max_priority < -best_order[0]:
+        # Nothing in the rest of the groups could win
+        break
+      key = group.packet_key(values, nw_src, nw_dst)
+      if key is None: continue
+      bucket = group.buckets.get(key)
+      if bucket:
+        order = self._index[bucket[0]][2]
+        if best is None or order < best_order:
+          best = bucket[0]
+          best_order = order
 
-    return None
+    return best
 
   def check_for_overlapping_entry (self, in_entry):
     """
     Tests if the input entry overlaps with another entry in this table.
 
-    Returns true if there is an overlap, false otherwise. Since the table is
-    sorted, there is only a need to check a certain portion of it.
+    Returns true if there is an overlap, false otherwise. Only the entries
+    with the same effective_priority have to be checked.
     """
-    #NOTE: Assumes that entries are sorted by decreasing effective_priority
     #NOTE: Ambiguous whether matching should be based on effective_priority
     #      or the regular priority.  Doing it based on effective_priority
     #      since that's what actually affects packet matching.
-    #NOTE: We could improve performance by doing a binary search to find the
-    #      right priority entries.
 
     priority = in_entry.effective_priority
 
-    for e in self._table:
-      if e.effective_priority < priority:
-        break
-      elif e.effective_priority > priority:
-        continue
-      else:
-        if e.is_matched_by(in_entry.match) or in_entry.is_matched_by(e.match):
-          return True
+    for e in self._by_priority.get(priority, ()):
+      if e.is_matched_by(in_entry.match) or in_entry.is_matched_by(e.match):
+        return True
 
     return False
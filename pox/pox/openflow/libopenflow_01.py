@@ -91,6 +91,24 @@ _PAD3 = _PAD*3
 _PAD4 = _PAD*4
 _PAD6 = _PAD*6
 
+# Precompiled codecs of the frequently (un)packed structures
+_HEADER = struct.Struct("!BBHL")
+_MATCH = struct.Struct("!LH6s6sHBxHBBxxLLHH")
+_MATCH_UNPACK = struct.Struct("!LH6s6sHBxHBBxx4s4sHH")
+_FLOW_MOD = struct.Struct("!QHHHHLHH")
+_ACTION_OUTPUT = struct.Struct("!HHHH")
+
+_structs = {}
+
+def _struct (fmt):
+  """
+  Returns the (cached) precompiled struct.Struct for the given format
+  """
+  s = _structs.get(fmt)
+  if s is None:
+    s = _structs[fmt] = struct.Struct(fmt)
+  return s
+
 class UnderrunError (RuntimeError):
   """
   Raised when one tries to unpack more data than is available
@@ -104,9 +122,9 @@ def _read (data, offset, length):
   return (offset+length, data[offset:offset+length])
 
 def _unpack (fmt, data, offset):
-  size = struct.calcsize(fmt)
-  if (len(data)-offset) < size: raise UnderrunError()
-  return (offset+size, struct.unpack_from(fmt, data, offset))
+  s = _structs.get(fmt) or _struct(fmt)
+  if (len(data)-offset) < s.size: raise UnderrunError()
+  return (offset+s.size, s.unpack_from(data, offset))
 
 def _skip (data, offset, num):
   offset += num
@@ -202,6 +220,17 @@ class ofp_base (object):
     # Can override if you have a better implementation
     return type(self).unpack_new(self.pack())[1]
 
+  def pack_into (self, buf, offset=0):
+    """
+    Packs this object into a writable buffer (e.g., a bytearray)
+
+    Returns the offset after the packed data.
+    Override if you can write into the buffer directly.
+    """
+    packed = self.pack()
+    buf[offset:offset+len(packed)] = packed
+    return offset + len(packed)
+
 # ----------------------------------------------------------------------
 # Class decorators
 # ----------------------------------------------------------------------
@@ -569,19 +598,17 @@ class ofp_header (ofp_base):
   def pack (self):
     assert self._assert()
 
-    packed = b""
-    packed += struct.pack("!BBHL", self.version, self.header_type,
-        len(self), self.xid)
-    return packed
+    return _HEADER.pack(self.version, self.header_type, len(self), self.xid)
 
   def unpack (self, raw, offset=0):
     offset,length = self._unpack_header(raw, offset)
     return offset,length
 
   def _unpack_header (self, raw, offset):
-    offset,(self.version, self.header_type, length, self.xid) = \
-        _unpack("!BBHL", raw, offset)
-    return offset,length
+    if (len(raw)-offset) < 8: raise UnderrunError()
+    (self.version, self.header_type, length, self.xid) = \
+        _HEADER.unpack_from(raw, offset)
+    return offset+8,length
 
   def __eq__ (self, other):
     if type(self) != type(other): return False
@@ -1162,54 +1189,74 @@ class ofp_match (ofp_base):
 
     return True # Always; we don't actually want an assertion error
 
+  # Packed matches by their field values (see pack())
+  _pack_cache = {}
+  _PACK_CACHE_SIZE = 4096
+
   def pack (self, flow_mod=False):
     assert self._assert()
 
-    packed = b""
+    # The same matches tend to be packed over and over (e.g., for every
+    # switch), so the packed form is memoized by the field values.
+    key = (flow_mod and self.adjust_wildcards, self.wildcards,
+           self._in_port, self._dl_src,
+           self._dl_dst, self._dl_vlan, self._dl_vlan_pcp, self._dl_type,
+           self._nw_tos, self._nw_proto, self._nw_src, self._nw_dst,
+           self._tp_src, self._tp_dst)
+    try:
+      return self._pack_cache[key]
+    except KeyError:
+      pass
+    except TypeError:
+      # Unhashable field value
+      return _MATCH.pack(*self._pack_values(flow_mod))
+
+    packed = _MATCH.pack(*self._pack_values(flow_mod))
+    cache = self._pack_cache
+    if len(cache) >= self._PACK_CACHE_SIZE: cache.clear()
+    cache[key] = packed
+    return packed
+
+  def _pack_values (self, flow_mod=False):
+    """
+    Returns the field values in wire format (as packed by _MATCH)
+    """
     if self.adjust_wildcards and flow_mod:
       wc = self._wire_wildcards(self.wildcards)
       assert self._prereq_warning()
     else:
       wc = self.wildcards
-    packed += struct.pack("!LH", wc, self.in_port or 0)
-    if self.dl_src is None:
-      packed += EMPTY_ETH.toRaw()
-    elif type(self.dl_src) is bytes:
-      packed += self.dl_src
-    else:
-      packed += self.dl_src.toRaw()
-    if self.dl_dst is None:
-      packed += EMPTY_ETH.toRaw()
-    elif type(self.dl_dst) is bytes:
-      packed += self.dl_dst
-    else:
-      packed += self.dl_dst.toRaw()
-
-    def check_ip(val):
-      return (val or 0) if self.dl_type == 0x0800 else 0
-    def check_ip_or_arp(val):
-      return (val or 0) if self.dl_type == 0x0800 \
-                           or self.dl_type == 0x0806 else 0
-    def check_tp(val):
-      return (val or 0) if self.dl_type == 0x0800 \
-                           and self.nw_proto in (1,6,17) else 0
-
-    packed += struct.pack("!HB", self.dl_vlan or 0, self.dl_vlan_pcp or 0)
-    packed += _PAD # Hardcode padding
-    packed += struct.pack("!HBB", self.dl_type or 0,
-        check_ip(self.nw_tos), check_ip_or_arp(self.nw_proto))
-    packed += _PAD2 # Hardcode padding
+
+    dl_src = self.dl_src
+    if dl_src is None:
+      dl_src = EMPTY_ETH.toRaw()
+    elif type(dl_src) is not bytes:
+      dl_src = dl_src.toRaw()
+    dl_dst = self.dl_dst
+    if dl_dst is None:
+      dl_dst = EMPTY_ETH.toRaw()
+    elif type(dl_dst) is not bytes:
+      dl_dst = dl_dst.toRaw()
+
     def fix (addr):
       if addr is None: return 0
       if type(addr) is int: return addr & 0xffFFffFF
       if type(addr) is long: return addr & 0xffFFffFF
       return addr.toUnsigned()
 
-    packed += struct.pack("!LLHH", check_ip_or_arp(fix(self.nw_src)),
-        check_ip_or_arp(fix(self.nw_dst)),
-        check_tp(self.tp_src), check_tp(self.tp_dst))
+    dl_type = self.dl_type
+    is_ip = dl_type == 0x0800
+    is_ip_or_arp = is_ip or dl_type == 0x0806
+    is_tp = is_ip and self.nw_proto in (1,6,17)
 
-    return packed
+    return (wc, self.in_port or 0, dl_src, dl_dst,
+            self.dl_vlan or 0, self.dl_vlan_pcp or 0, dl_type or 0,
+            (self.nw_tos or 0) if is_ip else 0,
+            (self.nw_proto or 0) if is_ip_or_arp else 0,
+            fix(self.nw_src) if is_ip_or_arp else 0,
+            fix(self.nw_dst) if is_ip_or_arp else 0,
+            (self.tp_src or 0) if is_tp else 0,
+            (self.tp_dst or 0) if is_tp else 0)
 
   def _normalize_wildcards (self, wildcards):
     """
@@ -1328,18 +1375,16 @@ class ofp_match (ofp_base):
 
   def unpack (self, raw, offset=0, flow_mod=False):
     _offset = offset
-    offset,(wildcards, self._in_port) = _unpack("!LH",raw, offset)
-    offset,self._dl_src = _readether(raw, offset)
-    offset,self._dl_dst = _readether(raw, offset)
-    offset,(self._dl_vlan, self._dl_vlan_pcp) = \
-        _unpack("!HB", raw, offset)
-    offset = _skip(raw, offset, 1)
-    offset,(self._dl_type, self._nw_tos, self._nw_proto) = \
-        _unpack("!HBB", raw, offset)
-    offset = _skip(raw, offset, 2)
-    offset,self._nw_src = _readip(raw, offset)
-    offset,self._nw_dst = _readip(raw, offset)
-    offset,(self._tp_src, self._tp_dst) = _unpack("!HH", raw, offset)
+    if (len(raw)-offset) < 40: raise UnderrunError()
+    (wildcards, self._in_port, dl_src, dl_dst, self._dl_vlan,
+     self._dl_vlan_pcp, self._dl_type, self._nw_tos, self._nw_proto,
+     nw_src, nw_dst, self._tp_src, self._tp_dst) = \
+        _MATCH_UNPACK.unpack_from(raw, offset)
+    offset += 40
+    self._dl_src = EthAddr(dl_src)
+    self._dl_dst = EthAddr(dl_dst)
+    self._nw_src = IPAddr(nw_src, networkOrder = True)
+    self._nw_dst = IPAddr(nw_dst, networkOrder = True)
 
     # Only unwire wildcards for flow_mod
     self.wildcards = self._normalize_wildcards(
@@ -1558,10 +1603,7 @@ class ofp_action_output (ofp_action_base):
 
     assert self._assert()
 
-    packed = b""
-    packed += struct.pack("!HHHH", self.type, len(self), self.port,
-                          self.max_len)
-    return packed
+    return _ACTION_OUTPUT.pack(self.type, 8, self.port, self.max_len)
 
   def unpack (self, raw, offset=0):
     _offset = offset
@@ -2314,20 +2356,41 @@ class ofp_flow_mod (ofp_header):
       buffer_id = NO_BUFFER
 
     assert self._assert()
-    packed = b""
-    packed += ofp_header.pack(self)
-    packed += self.match.pack(flow_mod=True)
-    packed += struct.pack("!QHHHHLHH", self.cookie, self.command,
-                          self.idle_timeout, self.hard_timeout,
-                          self.priority, buffer_id, self.out_port,
-                          self.flags)
+    packed = [ofp_header.pack(self),
+              self.match.pack(flow_mod=True),
+              _FLOW_MOD.pack(self.cookie, self.command,
+                             self.idle_timeout, self.hard_timeout,
+                             self.priority, buffer_id, self.out_port,
+                             self.flags)]
     for i in self.actions:
-      packed += i.pack()
+      packed.append(i.pack())
 
     if po:
-      packed += ofp_barrier_request().pack()
-      packed += po.pack()
-    return packed
+      packed.append(ofp_barrier_request().pack())
+      packed.append(po.pack())
+    return b"".join(packed)
+
+  def pack_into (self, buf, offset=0):
+    """
+    Packs this flow_mod into a writable buffer (e.g., a bytearray)
+
+    Returns the offset after the packed data.
+    """
+    length = len(self)
+    if self.data or len(buf) - offset < length:
+      # May be more than one message (see pack()) / buffer must grow
+      return ofp_base.pack_into(self, buf, offset)
+    assert self._assert()
+    _HEADER.pack_into(buf, offset, self.version, self.header_type, length,
+                      self.xid)
+    buf[offset+8:offset+48] = self.match.pack(flow_mod=True)
+    _FLOW_MOD.pack_into(buf, offset+48, self.cookie, self.command,
+                        self.idle_timeout, self.hard_timeout, self.priority,
+                        self._buffer_id, self.out_port, self.flags)
+    offset += 72
+    for i in self.actions:
+      offset = i.pack_into(buf, offset)
+    return offset
 
   def unpack (self, raw, offset=0):
     offset,length = self._unpack_header(raw, offset)
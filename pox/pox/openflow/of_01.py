@@ -36,23 +36,14 @@ log = core.getLogger()
 
 import socket
 import select
+from collections import deque
+from pox.lib.epoll_select import EpollSelect
 
 # List where the index is an OpenFlow message type (OFPT_xxx), and
 # the values are unpack functions that unpack the wire format of that
 # type into a message object.
 unpackers = make_type_to_unpacker_table()
 
-try:
-  PIPE_BUF = select.PIPE_BUF
-except:
-  try:
-    # Try to get it from where PyPy (sometimes) has it
-    import IN
-    PIPE_BUF = IN.PIPE_BUF
-  except:
-    # (Hopefully) reasonable default
-    PIPE_BUF = 512
-
 import pox.openflow.libopenflow_01 as of
 
 import threading
@@ -381,112 +372,131 @@ statsHandlerMap = {
 }
 
 
-# Deferred sending should be unusual, so don't worry too much about
-# efficiency
 class DeferredSender (threading.Thread):
   """
   Class that handles sending when a socket write didn't complete
+
+  It waits (using epoll where available) until the sockets become
+  writable again and then lets the connections write out their queues.
   """
   def __init__ (self):
     threading.Thread.__init__(self)
+    # It stops on GoingDown anyway, so don't let it hold up the process
+    self.daemon = True
     core.addListeners(self)
-    self._dataForConnection = {}
+    self._waiting = set() # Connections waiting for writability
+    self._added = set()
+    self._removed = set()
     self._lock = threading.RLock()
     self._waker = pox.lib.util.makePinger()
-    self.sending = False
+    self._epoll = None
+    if hasattr(select, 'epoll'):
+      self._epoll = EpollSelect()
+      self._epoll.register(self._waker, select.EPOLLIN)
 
     self.start()
 
   def _handle_GoingDownEvent (self, event):
     self._waker.ping()
 
-  def _sliceup (self, data):
+  def send (self, con):
     """
-    Takes an array of data bytes, and slices into elements of
-    PIPE_BUF bytes each
+    Write out the send queue of con as soon as its socket is writable
     """
-    out = []
-    while len(data) > PIPE_BUF:
-      out.append(data[0:PIPE_BUF])
-      data = data[PIPE_BUF:]
-    if len(data) > 0:
-      out.append(data)
-    return out
-
-  def send (self, con, data):
     with self._lock:
-      self.sending = True
-
-      data = self._sliceup(data)
-
-      if con not in self._dataForConnection:
-        self._dataForConnection[con] = data
-      else:
-        self._dataForConnection[con].extend(data)
-
+      self._removed.discard(con)
+      self._added.add(con)
       self._waker.ping()
 
   def kill (self, con):
     with self._lock:
+      self._added.discard(con)
+      self._removed.add(con)
+      self._waker.ping()
+
+  def _update (self):
+    with self._lock:
+      added, self._added = self._added, set()
+      removed, self._removed = self._removed, set()
+    for con in removed:
+      self._forget(con)
+    for con in added:
+      if con.disconnected or con in self._waiting: continue
       try:
-        del self._dataForConnection[con]
-      except:
-        pass
+        if self._epoll: self._epoll.register(con, select.EPOLLOUT)
+      except Exception:
+        # Socket closed meanwhile
+        continue
+      self._waiting.add(con)
 
-      self._waker.ping()
+  def _forget (self, con):
+    if con not in self._waiting: return
+    self._waiting.discard(con)
+    if self._epoll:
+      try:
+        self._epoll.unregister(con)
+      except Exception:
+        log.exception("%s: Can't stop waiting for writability", con)
 
   def run (self):
     while core.running:
+      self._update()
 
-      with self._lock:
-        cons = self._dataForConnection.keys()
-
-      rlist, wlist, elist = select.select([self._waker], cons, cons, 5)
+      if self._epoll:
+        rlist, wlist, elist = self._epoll.poll(5)
+      else:
+        cons = list(self._waiting)
+        rlist, wlist, elist = select.select([self._waker], cons, cons, 5)
       if not core.running: break
 
-      with self._lock:
-        if len(rlist) > 0:
-          self._waker.pongAll()
+      if self._waker in rlist:
+        self._waker.pongAll()
+
+      for con in elist:
+        if con is self._waker: continue
+        if con not in self._waiting: continue
+        self._forget(con)
+        con.msg("DeferredSender/Socket error")
+        con._send_deferred = False
+        con.disconnect(defer_event=True)
+
+      for con in wlist:
+        if con not in self._waiting: continue
+        self._forget(con)
+        try:
+          # Re-registers itself if the queue still can't be written out
+          con._write_out(deferred = True)
+        except:
+          con.msg("Unknown error doing deferred sending")
+          con._send_deferred = False
+          con.disconnect(defer_event=True)
+
+    if self._epoll: self._epoll.close()
+
+class SendFlusher (object):
+  """
+  Writes out the data that Connections queued in the current co-op cycle
+  """
+  def __init__ (self):
+    self._pending = []
+    self._lock = threading.Lock()
 
-        for con in elist:
-          try:
-            del self._dataForConnection[con]
-          except:
-            pass
+  def add (self, con):
+    with self._lock:
+      self._pending.append(con)
+      if len(self._pending) > 1: return
+    core.callLater(self._flush)
 
-        for con in wlist:
-          try:
-            alldata = self._dataForConnection[con]
-            while len(alldata):
-              data = alldata[0]
-              try:
-                l = con.sock.send(data)
-                if l != len(data):
-                  alldata[0] = data[l:]
-                  break
-                del alldata[0]
-              except socket.error as (errno, strerror):
-                if errno != EAGAIN:
-                  con.msg("DeferredSender/Socket error: " + strerror)
-                  con.disconnect()
-                  del self._dataForConnection[con]
-                break
-              except:
-                con.msg("Unknown error doing deferred sending")
-                break
-            if len(alldata) == 0:
-              try:
-                del self._dataForConnection[con]
-                if len(self._dataForConnection) == 0:
-                  self.sending = False
-                  break
-              except:
-                pass
-          except:
-            try:
-              del self._dataForConnection[con]
-            except:
-              pass
+  def _flush (self):
+    with self._lock:
+      pending, self._pending = self._pending, []
+    for con in pending:
+      try:
+        con._write_out()
+      except:
+        log.exception("%s: Exception while sending", con)
+
+_sendFlusher = SendFlusher()
 
 class DummyOFNexus (object):
   def raiseEventNoErrors (self, event, *args, **kw):
@@ -716,6 +726,17 @@ class Connection (EventMixin):
   # Globally unique identifier for the Connection instance
   ID = 0
 
+  # Bounds of the adaptive size of a single socket read
+  MIN_READ_SIZE = 4096
+  MAX_READ_SIZE = 65536
+
+  # Max number of bytes passed to a single socket send
+  MAX_WRITE_SIZE = 256 * 1024
+  # Above this many queued outgoing bytes the connection is send_blocked
+  SEND_HIGH_WATERMARK = 4 * 1024 * 1024
+  # ..and it stays so until the queue has drained down to this many bytes
+  SEND_LOW_WATERMARK = 1024 * 1024
+
   _aborted_connections = 0
 
   def msg (self, m):
@@ -734,7 +755,19 @@ class Connection (EventMixin):
 
     self.ofnexus = _dummyOFNexus
     self.sock = sock
-    self.buf = b''
+    # Received but not yet unpacked data
+    self.buf = bytearray()
+    # Current size of a single read (adapts to the incoming traffic)
+    self._read_size = self.MIN_READ_SIZE
+    self._read_chunk = bytearray(self._read_size)
+    # Outgoing data queued in the current co-op cycle (or waiting for the
+    # socket to become writable) and its size in bytes
+    self._send_queue = deque()
+    self._send_queued = 0
+    self._send_deferred = False
+    self._send_lock = threading.RLock()
+    # Functions waiting for send_blocked to be cleared (see whenUnblocked())
+    self._unblocked_waiters = []
     Connection.ID += 1
     self.ID = Connection.ID
 
@@ -806,6 +839,12 @@ class Connection (EventMixin):
         core.callDelayed(20, self._do_abort_message)
     else:
       self.info(msg)
+    if not self.disconnected:
+      # Best effort to get out what has been sent before disconnecting
+      try:
+        self._write_out(quiet = True)
+      except:
+        pass
     self.disconnected = True
     try:
       self.ofnexus._disconnect(self.dpid)
@@ -818,10 +857,10 @@ class Connection (EventMixin):
         self.raiseEventNoErrors(ConnectionDown, self)
 
     try:
-      #deferredSender.kill(self)
-      pass
+      deferredSender.kill(self)
     except:
       pass
+    del self._unblocked_waiters[:]
     try:
       self.sock.shutdown(socket.SHUT_RDWR)
     except:
@@ -847,24 +886,120 @@ class Connection (EventMixin):
       assert isinstance(data, of.ofp_header)
       data = data.pack()
 
-    if deferredSender.sending:
-      log.debug("deferred sender is sending!")
-      deferredSender.send(self, data)
-      return
-    try:
-      l = self.sock.send(data)
-      if l != len(data):
-        self.msg("Didn't send complete buffer.")
-        data = data[l:]
-        deferredSender.send(self, data)
-    except socket.error as (errno, strerror):
-      if errno == EAGAIN:
-        self.msg("Out of send buffer space.  " +
-                 "Consider increasing SO_SNDBUF.")
-        deferredSender.send(self, data)
-      else:
-        self.msg("Socket error: " + strerror)
-        self.disconnect(defer_event=True)
+    # Messages sent in the same co-op cycle are written out together
+    with self._send_lock:
+      first = self._send_queued == 0
+      self._send_queue.append(data)
+      self._send_queued += len(data)
+    if first:
+      _sendFlusher.add(self)
+
+  @property
+  def send_blocked (self):
+    """
+    True if too much outgoing data is queued up for this connection
+
+    Senders of bulk data (e.g., lots of flow_mods) should hold back while
+    this is set, e.g., by continuing from whenUnblocked().
+    """
+    return (self._send_queued > self.SEND_HIGH_WATERMARK
+            or len(self._unblocked_waiters) > 0)
+
+  def whenUnblocked (self, func, *args, **kw):
+    """
+    Call func once this connection is not send_blocked anymore
+
+    It is called right away if the connection isn't blocked.  Otherwise it
+    is called from the co-op context after the send queue has drained down
+    to SEND_LOW_WATERMARK, in the order the functions have been added.
+    """
+    with self._send_lock:
+      if self.send_blocked:
+        self._unblocked_waiters.append((func, args, kw))
+        return
+    func(*args, **kw)
+
+  def _check_unblocked (self):
+    """
+    Schedule the waiters of whenUnblocked() if the queue has drained
+    """
+    if self._unblocked_waiters and \
+       self._send_queued <= self.SEND_LOW_WATERMARK:
+      waiters = self._unblocked_waiters[:]
+      del self._unblocked_waiters[:]
+      core.callLater(self._call_unblocked, waiters)
+
+  def _call_unblocked (self, waiters):
+    while waiters:
+      if self.disconnected: return
+      if self._send_queued > self.SEND_HIGH_WATERMARK:
+        # Blocked again; the rest has to wait some more
+        with self._send_lock:
+          self._unblocked_waiters[0:0] = waiters
+        return
+      func, args, kw = waiters.pop(0)
+      try:
+        func(*args, **kw)
+      except:
+        log.exception("%s: Exception in send unblocked handler", self)
+
+  def flush (self):
+    """
+    Write out the queued outgoing data (normally done once per cycle)
+
+    Returns True if everything has been written out.
+    """
+    return self._write_out()
+
+  def _write_out (self, deferred = False, quiet = False):
+    """
+    Write out the send queue with as few socket sends as possible
+
+    If the socket can't take all of it, the rest is left to the
+    DeferredSender, which calls this again (deferred=True) once the socket
+    is writable.
+    """
+    with self._send_lock:
+      if self.disconnected: return False
+      if self._send_deferred:
+        if not deferred: return False # DeferredSender is in charge
+        self._send_deferred = False
+      queue = self._send_queue
+      while queue:
+        if len(queue) == 1 or len(queue[0]) >= self.MAX_WRITE_SIZE:
+          data = queue.popleft()
+        else:
+          # Coalesce the queued messages into a single buffer
+          chunks = []
+          size = 0
+          while queue and size < self.MAX_WRITE_SIZE:
+            size += len(queue[0])
+            chunks.append(queue.popleft())
+          data = b''.join(chunks)
+        try:
+          l = self.sock.send(data)
+        except socket.error as (errno, strerror):
+          if errno != EAGAIN:
+            queue.clear()
+            self._send_queued = 0
+            if not quiet:
+              self.msg("Socket error: " + strerror)
+              self.disconnect(defer_event=True)
+            return False
+          l = 0
+        self._send_queued -= l
+        if l != len(data):
+          queue.appendleft(data[l:])
+          if quiet: return False
+          if not deferred:
+            self.msg("Out of send buffer space.  " +
+                     "Consider increasing SO_SNDBUF.")
+          self._send_deferred = True
+          deferredSender.send(self)
+          self._check_unblocked()
+          return False
+      self._check_unblocked()
+      return True
 
   def read (self):
     """
@@ -874,37 +1009,59 @@ class Connection (EventMixin):
     Note: This function will block if data is not available.
     """
     try:
-      d = self.sock.recv(2048)
+      l = self.sock.recv_into(self._read_chunk, self._read_size)
     except:
       return False
-    if len(d) == 0:
+    if l == 0:
       return False
-    self.buf += d
-    buf_len = len(self.buf)
-
-
-    offset = 0
-    while buf_len - offset >= 8: # 8 bytes is minimum OF message size
+    buf = self.buf
+    buf += memoryview(self._read_chunk)[:l]
+    buf_len = len(buf)
+
+    # Find the end of the complete messages.  Indexing the bytearray gives
+    # the header fields as ints, so nothing is copied here.
+    end = 0
+    good = True
+    while buf_len - end >= 8: # 8 bytes is minimum OF message size
       # We pull the first four bytes of the OpenFlow header off by hand
-      # (using ord) to find the version/length/type so that we can
-      # correctly call libopenflow to unpack it.
+      # to find the version/length/type so that we can correctly call
+      # libopenflow to unpack it.
+      if buf[end] != of.OFP_VERSION and buf[end+1] != of.OFPT_HELLO:
+        # (We let a HELLO through and hope the other side switches down.)
+        log.warning("Bad OpenFlow version (0x%02x) on connection %s"
+                    % (buf[end], self))
+        good = False # Throw connection away after the preceding messages
+        break
 
-      ofp_type = ord(self.buf[offset+1])
+      msg_length = buf[end+2] << 8 | buf[end+3]
+      if msg_length < 8:
+        # A length below the header size would never advance the scan
+        log.warning("Bad OpenFlow message length (%i) on connection %s"
+                    % (msg_length, self))
+        good = False # Throw connection away after the preceding messages
+        break
 
-      if ord(self.buf[offset]) != of.OFP_VERSION:
-        if ofp_type == of.OFPT_HELLO:
-          # We let this through and hope the other side switches down.
-          pass
-        else:
-          log.warning("Bad OpenFlow version (0x%02x) on connection %s"
-                      % (ord(self.buf[offset]), self))
-          return False # Throw connection away
+      if buf_len - end < msg_length:
+        # Make the next read large enough for the rest of this message
+        self._adapt_read_size(msg_length - (buf_len - end))
+        break
+      end += msg_length
+    else:
+      self._adapt_read_size(l)
+
+    if end == 0: return good
 
-      msg_length = ord(self.buf[offset+2]) << 8 | ord(self.buf[offset+3])
+    # Unpack every complete message from a single copy and drop them from
+    # the buffer (only the trailing partial message is moved)
+    data = memoryview(buf)[:end].tobytes()
+    del buf[:end]
 
-      if buf_len - offset < msg_length: break
+    offset = 0
+    while offset < end:
+      ofp_type = ord(data[offset+1])
+      msg_length = ord(data[offset+2]) << 8 | ord(data[offset+3])
 
-      new_offset,msg = self.unpackers[ofp_type](self.buf, offset)
+      new_offset,msg = self.unpackers[ofp_type](data, offset)
       assert new_offset - offset == msg_length
       offset = new_offset
 
@@ -917,10 +1074,22 @@ class Connection (EventMixin):
                       ("\n" + str(self) + " ").join(str(msg).split('\n')))
         continue
 
-    if offset != 0:
-      self.buf = self.buf[offset:]
+    return good
 
-    return True
+  def _adapt_read_size (self, wanted):
+    """
+    Set the size of the next read based on the size of the last one
+    (or on the missing part of a large message)
+    """
+    size = self._read_size
+    if wanted >= size:
+      size = min(max(size * 2, wanted), self.MAX_READ_SIZE)
+    elif wanted < size // 4:
+      size = max(size // 2, self.MIN_READ_SIZE)
+    if size != self._read_size:
+      self._read_size = size
+      if size > len(self._read_chunk):
+        self._read_chunk = bytearray(size)
 
   def _incoming_stats_reply (self, ofp):
     # This assumes that you don't receive multiple stats replies
@@ -21,6 +21,7 @@ import SocketServer
 import threading
 import socket
 import signal
+import select
 
 from copy import copy
 
@@ -100,5 +101,34 @@ class EpollSelectTest(unittest.TestCase):
       check( ([],[],[]), self.es.select(sockets, [], sockets, 0))
       check( ([],sockets,[]), self.es.select(sockets, sockets, sockets, 0))
 
+  def test_register_poll(self):
+    c = socket.create_connection( (self.ip, self.port))
+    self.es.register(c, select.EPOLLIN)
+    self.assertEqual(([],[],[]), self.es.poll(0.1))
+    self.es.register(c, select.EPOLLIN|select.EPOLLOUT)
+    self.assertEqual(([],[c],[]), self.es.poll(0.1))
+    self.es.register(c, select.EPOLLIN)
+    c.send("Hallo\n")
+    self.assertEqual(([c],[],[]), self.es.poll(0.5))
+    self.es.unregister(c)
+    self.assertEqual(([],[],[]), self.es.poll(0))
+    self.assertEqual({}, self.es.registered)
+
+  def test_oneshot(self):
+    c = socket.create_connection( (self.ip, self.port))
+    self.es.register(c, select.EPOLLOUT|select.EPOLLONESHOT)
+    self.assertEqual(([],[c],[]), self.es.poll(0.1))
+    self.assertEqual(([],[],[]), self.es.poll(0))
+    # Registering the same mask again re-arms it
+    self.es.register(c, select.EPOLLOUT|select.EPOLLONESHOT)
+    self.assertEqual(([],[c],[]), self.es.poll(0.1))
+
+  def test_unregister_closed(self):
+    c = socket.create_connection( (self.ip, self.port))
+    self.es.register(c, select.EPOLLIN)
+    c.close()
+    self.es.unregister(c)
+    self.assertEqual({}, self.es.registered)
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import sys
+import os.path
+import socket
+import time
+
+sys.path.append(os.path.dirname(__file__) + "/../../..")
+
+import pox.lib.recoco.recoco as recoco
+from pox.lib.recoco.recoco import SelectHub
+
+class FakeScheduler (object):
+  _hasQuit = False
+
+  def __init__ (self):
+    self.woken = []
+
+  def fast_schedule (self, task):
+    self.woken.append((task, task.rv))
+
+class Task (object):
+  def __init__ (self, name):
+    self.name = name
+    self.rv = None
+  def __repr__ (self):
+    return self.name
+
+class SelectHubTest (unittest.TestCase):
+  use_epoll = False
+
+  def setUp (self):
+    # Nobody pings the hub here, so don't block for long on idle cycles
+    self.cycle_maximum = recoco.CYCLE_MAXIMUM
+    recoco.CYCLE_MAXIMUM = 0.01
+    self.sched = FakeScheduler()
+    self.hub = SelectHub(self.sched, use_epoll=self.use_epoll, threaded=False)
+    self.sockets = socket.socketpair()
+
+  def tearDown (self):
+    recoco.CYCLE_MAXIMUM = self.cycle_maximum
+    for s in self.sockets: s.close()
+
+  def cycle (self, n=1):
+    for _ in range(n):
+      self.hub._select(self.hub._tasks, {})
+
+  def wait_woken (self, n):
+    """ cycle until n wakeups happened (new registrations are picked up
+        by the cycle after the ping) """
+    deadline = time.time() + 2
+    while len(self.sched.woken) < n and time.time() < deadline:
+      self.cycle()
+    self.assertEqual(n, len(self.sched.woken))
+
+  def woken (self):
+    return [t for t,rv in self.sched.woken]
+
+  def test_timers_in_order (self):
+    now = time.time()
+    tasks = [Task(str(i)) for i in range(5)]
+    for i in (3, 0, 4, 1, 2):
+      self.hub.registerTimer(tasks[i], now + 0.01 * i, True)
+    self.wait_woken(5)
+    self.assertEqual(tasks, self.woken())
+    self.assertEqual({}, self.hub._tasks)
+
+  def test_read (self):
+    a, b = self.sockets
+    t = Task("reader")
+    self.hub.registerSelect(t, [a], None, None, timeout=10)
+    self.cycle()
+    self.assertEqual([], self.sched.woken)
+    b.send("x")
+    self.wait_woken(1)
+    self.assertEqual([(t, ([a],[],[]))], self.sched.woken)
+    # The timeout of the finished select must not fire anymore
+    self.assertEqual({}, self.hub._tasks)
+    if not self.use_epoll:
+      self.assertEqual({}, self.hub._rl)
+    self.hub._release_timers(time.time() + 20)
+    self.assertEqual(1, len(self.sched.woken))
+
+  def test_reregister (self):
+    a, b = self.sockets
+    t = Task("reader")
+    self.hub.registerSelect(t, [a], None, None, timeout=0.01)
+    self.wait_woken(1)
+    self.assertEqual([(t, ([],[],[]))], self.sched.woken)
+    self.hub.registerSelect(t, [a], [b])
+    self.wait_woken(2)
+    self.assertEqual((t, ([],[b],[])), self.sched.woken[-1])
+
+  def test_compact_timers (self):
+    a, b = self.sockets
+    b.send("x")
+    for i in range(200):
+      self.hub.registerSelect(Task(str(i)), [a], timeout=100)
+      self.wait_woken(i + 1)
+    self.assertTrue(len(self.hub._timers) <= 64)
+
+class CountingEpoll (object):
+  def __init__ (self, epoll):
+    self._epoll = epoll
+    self.calls = 0
+    self.timeouts = []
+  def poll (self, timeout=-1):
+    self.timeouts.append(timeout)
+    return self._epoll.poll(timeout)
+  def __getattr__ (self, name):
+    if name in ("register", "modify", "unregister"):
+      self.calls += 1
+    return getattr(self._epoll, name)
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "requires Linux")
+class EpollSelectHubTest (SelectHubTest):
+  use_epoll = True
+
+  def setUp (self):
+    SelectHubTest.setUp(self)
+    self.epoll = self.hub._epoll.epoll = CountingEpoll(self.hub._epoll.epoll)
+    self.pairs = [socket.socketpair() for _ in range(20)]
+
+  def tearDown (self):
+    SelectHubTest.tearDown(self)
+    for p in self.pairs:
+      for s in p: s.close()
+
+  def test_persistent_registration (self):
+    socks = [a for a,b in self.pairs]
+    t = Task("reader")
+    self.hub.registerSelect(t, socks, None, socks)
+    self.cycle()
+    self.assertEqual(20, self.epoll.calls)
+    for n in range(1, 4):
+      self.pairs[n][1].send("x")
+      self.wait_woken(n)
+      self.assertEqual(([socks[n]],[],[]), self.sched.woken[-1][1])
+      socks[n].recv(1)
+      # Only the fd which fired has to be re-armed
+      self.epoll.calls = 0
+      self.hub.registerSelect(t, socks, None, socks)
+      self.cycle()
+      self.assertEqual(1, self.epoll.calls)
+
+  def test_parked_events (self):
+    a, b = self.pairs[0]
+    t = Task("reader")
+    self.hub.registerSelect(t, [a])
+    b.send("x")
+    self.wait_woken(1)
+    # Still readable, but the task is not waiting: no busy wakeups
+    self.cycle(3)
+    self.assertEqual(1, len(self.sched.woken))
+    self.hub.registerSelect(t, [a])
+    self.wait_woken(2)
+    self.assertEqual(([a],[],[]), self.sched.woken[-1][1])
+
+  def test_drop_and_leave (self):
+    socks = [a for a,b in self.pairs]
+    t = Task("reader")
+    self.hub.registerSelect(t, socks, timeout=0.01)
+    self.wait_woken(1)
+    # The task drops half of its sockets
+    self.hub.registerSelect(t, socks[:10], timeout=0.01)
+    self.wait_woken(2)
+    self.assertEqual(11, len(self.hub._epoll.registered))
+    self.assertEqual(set(socks[:10]), set(self.hub._rl))
+    self.hub.forget(t)
+    self.cycle()
+    self.assertEqual(1, len(self.hub._epoll.registered)) # Pinger
+    self.assertEqual({}, self.hub._rl)
+    self.assertEqual({}, self.hub._parked)
+
+  def test_submillisecond_timeout (self):
+    t = Task("sleeper")
+    self.hub.registerTimer(t, time.time() + 0.0005, True)
+    self.wait_woken(1)
+    # epoll would truncate these to 0 and spin
+    self.assertTrue(all(x == 0 or x >= 0.001 for x in self.epoll.timeouts))
+
+if __name__ == '__main__':
+  unittest.main()
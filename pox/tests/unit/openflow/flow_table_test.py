@@ -111,7 +111,52 @@ class FlowTableTest(unittest.TestCase):
       t.remove_expired_entries(now=time)
       self.assertEqual(sorted([e.cookie for e in t.entries]), remaining)
 
-  # def test_check_for_overlap_entries(self):
+  def test_entry_for_packet(self):
+    """ test that the highest priority matching entry is found """
+    t = FlowTable()
+    def add(cookie, priority, **kw):
+      t.add_entry(TableEntry(priority=priority, cookie=cookie, match=ofp_match(**kw)))
+    add(1, 1)
+    add(2, 10, dl_type=0x800, nw_dst="10.0.0.0/24")
+    add(3, 20, dl_type=0x800, nw_dst="10.0.0.0/24", nw_proto=6, tp_dst=80)
+    add(4, 10, dl_type=0x800, nw_dst="10.0.0.0/16")
+    add(5, 30, dl_type=0x806)
+
+    def packet(dst, port=80):
+      e = ethernet(type=0x800, src=EthAddr("00:00:00:00:00:01"), dst=EthAddr("00:00:00:00:00:02"))
+      ip = ipv4(srcip=IPAddr("10.1.1.1"), dstip=IPAddr(dst), protocol=6)
+      ip.payload = tcp(srcport=1234, dstport=port)
+      e.payload = ip
+      return e
+
+    for (dst, port, cookie) in (
+          ("10.0.0.1", 80, 3),
+          ("10.0.0.1", 22, 4), # same priority as 2, added later
+          ("10.0.1.1", 80, 4),
+          ("10.1.0.1", 80, 1),
+          ):
+      self.assertEqual(t.entry_for_packet(packet(dst, port), 1).cookie, cookie)
+
+    # Exact matches beat everything
+    exact = ofp_match.from_packet(packet("10.1.0.1"), 1)
+    add(6, 0, **dict((k, getattr(exact, k)) for k in ofp_match_data if getattr(exact, k) is not None))
+    self.assertEqual(t.entry_for_packet(packet("10.1.0.1"), 1).cookie, 6)
+    self.assertEqual(t.entry_for_packet(packet("10.1.0.1"), 2).cookie, 1)
+
+    t.remove_matching_entries(ofp_match(dl_type=0x800, nw_dst="10.0.0.0/16"), priority=10, strict=True)
+    self.assertEqual(t.entry_for_packet(packet("10.0.0.1", 22), 1).cookie, 2)
+    t.remove_matching_entries(ofp_match())
+    self.assertEqual(t.entry_for_packet(packet("10.0.0.1"), 1), None)
+    self.assertEqual(len(t), 0)
+
+  def test_check_for_overlap_entries(self):
+    t = FlowTable()
+    t.add_entry(TableEntry(priority=5, match=ofp_match(dl_type=0x800, nw_src="10.0.0.0/24")))
+    overlaps = lambda priority, **kw: t.check_for_overlapping_entry(TableEntry(priority=priority, match=ofp_match(**kw)))
+    self.assertTrue(overlaps(5, dl_type=0x800))
+    self.assertTrue(overlaps(5, dl_type=0x800, nw_src="10.0.0.1"))
+    self.assertFalse(overlaps(6, dl_type=0x800))
+    self.assertFalse(overlaps(5, dl_type=0x806))
 
 
 
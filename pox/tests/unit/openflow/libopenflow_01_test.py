@@ -135,6 +135,23 @@ class ofp_match_test(unittest.TestCase):
     assertMatch(create(nw_src="10.0.0.0/25"), create(nw_src="10.0.0.127"))
     assertNoMatch(create(nw_src="10.0.0.0/25"), create(nw_src="10.0.0.128"))
 
+  def test_pack_cache(self):
+    """ ofp_match: memoized packing follows changes of the match """
+    m = ofp_match(in_port=1, dl_type=0x0800, nw_proto=6, tp_dst=80)
+    p = m.pack()
+    self.assertEqual(p, m.pack())
+    self.assertEqual(p, ofp_match(in_port=1, dl_type=0x0800, nw_proto=6, tp_dst=80).pack())
+    m.tp_dst = 22
+    self.assertEqual(extract_num(m.pack(), 38, 2), 22)
+    m.tp_dst = None
+    self.assertEqual(extract_num(m.pack(), 38, 2), 0)
+    m.nw_proto = 50
+    m.tp_dst = 22
+    self.assertEqual(extract_num(m.pack(), 38, 2), 0, "tp_dst ignored for non TCP/UDP/ICMP")
+    m.nw_dst = "10.0.0.0/24"
+    self.assertEqual(extract_num(m.pack(), 32, 4), 0x0a000000)
+    self.assertNotEqual(m.pack(), m.pack(flow_mod=True))
+
 class ofp_command_test(unittest.TestCase):
   # custom map of POX class to header type, for validation
   ofp_type = {
@@ -312,6 +329,18 @@ class ofp_command_test(unittest.TestCase):
             for (check_attr,val) in attrs.iteritems():
               self.assertEqual(getattr(unpacked, check_attr), val)
 
+  def test_pack_into_flow_mod(self):
+    o = ofp_flow_mod(xid=5, match=ofp_match(in_port=1, dl_type=0x0800),
+                     actions=self.some_actions[-1], priority=12)
+    packed = o.pack()
+    buf = bytearray(16 + len(packed))
+    self.assertEqual(o.pack_into(buf, 16), 16 + len(packed))
+    self.assertEqual(bytes(buf[16:]), packed)
+    # Buffer too short: grows (if it can)
+    buf = bytearray(4)
+    self.assertEqual(o.pack_into(buf, 4), 4 + len(packed))
+    self.assertEqual(bytes(buf[4:]), packed)
+
 class ofp_action_test(unittest.TestCase):
   def assert_packed_action(self, cls, packed, a_type, length):
     self.assertEqual(extract_num(packed, 0,2), a_type, "Action %s: expected type %d (but is %d)" % (cls, a_type, extract_num(packed, 0,2)))
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at:
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import sys
+import os.path
+import socket
+import time
+sys.path.append(os.path.dirname(__file__) + "/../../..")
+
+import pox.openflow.of_01 as of_01
+from pox.openflow.libopenflow_01 import *
+
+class _Recorder (object):
+  def __init__ (self):
+    self.msgs = []
+  def __getitem__ (self, ofp_type):
+    return lambda con, msg: self.msgs.append(msg)
+
+class ConnectionReadTest (unittest.TestCase):
+  def setUp (self):
+    self.switch, sock = socket.socketpair()
+    self.con = of_01.Connection(sock)
+    self.con.handlers = self.recorder = _Recorder()
+    self.switch.settimeout(5)
+    self.switch.recv(100) # Hello
+
+  def tearDown (self):
+    self.switch.close()
+    self.con.sock.close()
+
+  def test_fragmented (self):
+    msgs = [ofp_echo_request(body="x" * i, xid=i) for i in range(1, 20)]
+    raw = b"".join(m.pack() for m in msgs)
+    # Feed byte by byte, then in chunks crossing message boundaries
+    for i in range(0, 40):
+      self.switch.send(raw[i])
+      self.assertTrue(self.con.read())
+    for i in range(40, len(raw), 7):
+      self.switch.send(raw[i:i+7])
+      self.assertTrue(self.con.read())
+    self.assertEqual([m.xid for m in msgs],
+                     [m.xid for m in self.recorder.msgs])
+    self.assertEqual([m.body for m in msgs],
+                     [m.body for m in self.recorder.msgs])
+    self.assertEqual(0, len(self.con.buf))
+
+  def test_large_message (self):
+    msg = ofp_echo_request(body="y" * 60000)
+    self.switch.sendall(msg.pack())
+    while not self.recorder.msgs:
+      self.assertTrue(self.con.read())
+    self.assertEqual(msg.body, self.recorder.msgs[0].body)
+    self.assertTrue(self.con._read_size > of_01.Connection.MIN_READ_SIZE)
+
+  def test_bad_version (self):
+    good = ofp_echo_request(xid=1).pack()
+    self.switch.send(good + b"\x05" + good[1:])
+    self.assertFalse(self.con.read())
+    self.assertEqual([1], [m.xid for m in self.recorder.msgs])
+
+  def test_bad_length (self):
+    good = ofp_echo_request(xid=1).pack()
+    # A zero length header must not stall the read loop
+    self.switch.send(good + b"\x01\x02\x00\x00\x00\x00\x00\x02")
+    self.assertFalse(self.con.read())
+    self.assertEqual([1], [m.xid for m in self.recorder.msgs])
+
+  def test_closed (self):
+    self.switch.close()
+    self.assertFalse(self.con.read())
+
+class ConnectionSendTest (unittest.TestCase):
+  def setUp (self):
+    if of_01.deferredSender is None:
+      of_01.deferredSender = of_01.DeferredSender()
+    self.switch, sock = socket.socketpair()
+    sock.setblocking(0)
+    self.con = of_01.Connection(sock)
+    self.con.flush()
+    self.switch.settimeout(5)
+    self.switch.recv(100) # Hello
+
+  def tearDown (self):
+    self.switch.close()
+    self.con.sock.close()
+
+  def recv_all (self, size):
+    data = b""
+    while len(data) < size:
+      data += self.switch.recv(size - len(data))
+    return data
+
+  def test_coalesce (self):
+    msgs = [ofp_echo_request(xid=i).pack() for i in range(100)]
+    # Send the messages from within one co-op slice, so that they are
+    # written out together
+    def send_all ():
+      for m in msgs: self.con.send(m)
+    of_01.core.callLater(send_all)
+    self.assertEqual(b"".join(msgs), self.recv_all(800))
+
+  def test_backlog (self):
+    # Fill up the socket buffer; the rest stays queued until it's drained
+    self.con.SEND_HIGH_WATERMARK = 1024 * 1024
+    msg = ofp_echo_request(body="z" * 60000).pack()
+    for i in range(40):
+      self.con.send(msg)
+    self.assertTrue(self.con.send_blocked)
+    self.con.flush()
+    self.assertEqual(msg * 40, self.recv_all(len(msg) * 40))
+    self.assertFalse(self.con.send_blocked)
+
+  def wait_for (self, cond):
+    deadline = time.time() + 5
+    while not cond() and time.time() < deadline:
+      time.sleep(0.01)
+    self.assertTrue(cond())
+
+  def test_deferred_unregister (self):
+    self.con.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+    msg = ofp_echo_request(body="w" * 60000).pack()
+    for i in range(4):
+      self.con.send(msg)
+    # EAGAIN: the rest is left to the DeferredSender
+    self.assertFalse(self.con.flush())
+    fd = self.con.sock.fileno()
+    epoll = of_01.deferredSender._epoll
+    if epoll is not None:
+      self.wait_for(lambda: fd in epoll.registered)
+    self.assertEqual(msg * 4, self.recv_all(len(msg) * 4))
+    self.wait_for(lambda: self.con not in of_01.deferredSender._waiting)
+    if epoll is not None:
+      self.assertFalse(fd in epoll.registered)
+    self.assertFalse(self.con._send_deferred)
+
+  def test_when_unblocked (self):
+    self.con.SEND_HIGH_WATERMARK = 1024 * 1024
+    self.con.SEND_LOW_WATERMARK = 64 * 1024
+    msg = ofp_echo_request(body="v" * 60000).pack()
+    for i in range(40):
+      self.con.send(msg)
+    called = []
+    self.con.whenUnblocked(called.append, 1)
+    self.con.whenUnblocked(called.append, 2)
+    self.assertTrue(self.con.send_blocked)
+    self.con.flush()
+    self.assertEqual([], called)
+    self.recv_all(len(msg) * 40)
+    self.wait_for(lambda: called == [1, 2])
+    self.assertFalse(self.con.send_blocked)
+    self.con.whenUnblocked(called.append, 3)
+    self.assertEqual([1, 2, 3], called)
+
+if __name__ == '__main__':
+  unittest.main()